@@ -102,6 +102,41 @@ exports.gettasks = function gettasks(req, res) {
       });
 };
 
+/**
+ * Retrieves the statistics rollups of completed tasks, optionally starting
+ * from a given day.
+ *
+ * @example
+ * gcloud beta functions call getrollups \
+ *    --data '{"instance": "turbinia-prod", "start_day":"2020-01-01"}'
+ *
+ * @param {object} req Cloud Function request context.
+ * @param {object} req.body The request body.
+ * @param {string} req.body.start_day The first day to get rollups for in
+ *    YYYY-MM-DD format
+ * @param {object} res Cloud Function response context.
+ */
+exports.getrollups = function getrollups(req, res) {
+  if (!req.body.instance) {
+    throw new Error('Instance parameter not provided in request.');
+  }
+
+  var query = datastore.createQuery('TurbiniaStatsRollup')
+                  .filter('instance', '=', req.body.instance);
+  if (req.body.start_day) {
+    console.log('Getting Turbinia rollups since: ' + req.body.start_day);
+    query = query.filter('day', '>=', req.body.start_day)
+  }
+
+  return datastore.runQuery(query)
+      .then((results) => { res.status(200).send(results); })
+      .catch((err) => {
+        console.error('Error in runQuery' + err);
+        res.status(500).send(err);
+        return Promise.reject(err);
+      });
+};
+
 /**
  * Closes tasks based on Request ID, Task ID, or/and user.
  *
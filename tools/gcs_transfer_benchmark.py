@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks GCS output writer transfers with different transfer settings.
+
+This can be run against a local GCS emulator (e.g. fake-gcs-server) by setting
+the STORAGE_EMULATOR_HOST environment variable, for example:
+
+  STORAGE_EMULATOR_HOST=http://localhost:4443 \\
+      gcs_transfer_benchmark.py --size 1024 gs://bucket/benchmark
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from turbinia import config
+from turbinia import output_manager
+
+
+def Benchmark(gcs_path, source_path, part_size, threads, parallel):
+  """Uploads and downloads a file with the given settings.
+
+  Args:
+    gcs_path (str): The GCS path to write to.
+    source_path (str): The local file to upload.
+    part_size (int): The part size in bytes.
+    threads (int): The number of concurrent transfers.
+    parallel (bool): Whether to use parallel transfers.
+
+  Returns:
+    tuple(float, float): The upload and download times in seconds.
+  """
+  local_output_dir = tempfile.mkdtemp(prefix='turbinia-benchmark')
+  try:
+    writer = output_manager.GCSOutputWriter(
+        gcs_path, unique_dir='benchmark-{0:d}'.format(int(time.time())),
+        local_output_dir=local_output_dir)
+    writer.part_size = part_size
+    writer.transfer_threads = threads
+    writer.parallel_threshold = 0 if parallel else float('inf')
+
+    start_time = time.time()
+    saved_path = writer.copy_to(source_path)
+    upload_time = time.time() - start_time
+
+    start_time = time.time()
+    writer.copy_from(saved_path)
+    download_time = time.time() - start_time
+  finally:
+    shutil.rmtree(local_output_dir)
+  return upload_time, download_time
+
+
+def Main():
+  """Main function for the GCS transfer benchmark."""
+  parser = argparse.ArgumentParser(
+      description='Benchmarks Turbinia GCS transfers.')
+  parser.add_argument('gcs_path', help='GCS path to write test files to')
+  parser.add_argument(
+      '--size', type=int, default=1024, help='Test file size in MiB')
+  parser.add_argument(
+      '--part_sizes', default='16,64', help='Comma separated part sizes in MiB')
+  parser.add_argument(
+      '--threads', default='1,4,8,16',
+      help='Comma separated numbers of concurrent transfers')
+  args = parser.parse_args()
+
+  config.LoadConfig()
+  if not config.GCS_OUTPUT_PATH:
+    print('GCS_OUTPUT_PATH needs to be set in the Turbinia config.')
+    return 1
+
+  source_dir = tempfile.mkdtemp(prefix='turbinia-benchmark')
+  source_path = os.path.join(source_dir, 'benchmark.bin')
+  try:
+    with open(source_path, 'wb') as file_object:
+      for _ in range(args.size):
+        file_object.write(os.urandom(2**20))
+
+    settings = [(0, 1, False)]
+    for part_size in args.part_sizes.split(','):
+      for threads in args.threads.split(','):
+        settings.append((int(part_size) * (2**20), int(threads), True))
+
+    print(
+        '{0:>10s} {1:>8s} {2:>12s} {3:>12s}'.format(
+            'part MiB', 'threads', 'up MiB/s', 'down MiB/s'))
+    for part_size, threads, parallel in settings:
+      upload_time, download_time = Benchmark(
+          args.gcs_path, source_path, part_size, threads, parallel)
+      print(
+          '{0:>10s} {1:8d} {2:12.1f} {3:12.1f}'.format(
+              str(part_size // (2**20)) if parallel else 'single', threads,
+              args.size / upload_time, args.size / download_time))
+  finally:
+    shutil.rmtree(source_dir)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the local file copy methods used by the local output writer.
+
+Copies a test file from a source directory (e.g. the task tmp_dir) to a
+destination directory (e.g. OUTPUT_DIR) with each copy method, for example:
+
+  local_output_benchmark.py --size 2048 /var/tmp /var/lib/turbinia/output
+"""
+
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from turbinia.lib import file_copy
+
+
+def Benchmark(source_path, destination_dir, method):
+  """Copies a file with the given method.
+
+  Args:
+    source_path (str): The file to copy.
+    destination_dir (str): The directory to copy the file to.
+    method (str): One of 'shutil', 'nohardlink' or 'auto'.
+
+  Returns:
+    tuple(str, float): The copy method used and the time in seconds.
+  """
+  destination_path = os.path.join(
+      destination_dir, 'benchmark-{0:s}.bin'.format(method))
+  start_time = time.time()
+  if method == 'shutil':
+    shutil.copy(source_path, destination_path)
+    used_method = 'shutil.copy'
+  else:
+    used_method = file_copy.copy_file(
+        source_path, destination_path, allow_hardlink=method == 'auto')
+  copy_time = time.time() - start_time
+  os.remove(destination_path)
+  return used_method, copy_time
+
+
+def Main():
+  """Main function for the local output benchmark."""
+  parser = argparse.ArgumentParser(
+      description='Benchmarks Turbinia local output copies.')
+  parser.add_argument('source_dir', help='Directory to create the test file in')
+  parser.add_argument('destination_dir', help='Directory to copy the file to')
+  parser.add_argument(
+      '--size', type=int, default=1024, help='Test file size in MiB')
+  parser.add_argument(
+      '--sparse', action='store_true',
+      help='Only write data to every other MiB of the test file')
+  args = parser.parse_args()
+
+  source_dir = tempfile.mkdtemp(
+      prefix='turbinia-benchmark', dir=args.source_dir)
+  destination_dir = tempfile.mkdtemp(
+      prefix='turbinia-benchmark', dir=args.destination_dir)
+  source_path = os.path.join(source_dir, 'benchmark.bin')
+  try:
+    with open(source_path, 'wb') as file_object:
+      for index in range(args.size):
+        if args.sparse and index % 2:
+          file_object.seek(2**20, os.SEEK_CUR)
+        else:
+          file_object.write(os.urandom(2**20))
+      file_object.truncate(args.size * 2**20)
+
+    print('{0:>12s} {1:>16s} {2:>12s}'.format('mode', 'method', 'MiB/s'))
+    for method in ('shutil', 'nohardlink', 'auto'):
+      used_method, copy_time = Benchmark(source_path, destination_dir, method)
+      print(
+          '{0:>12s} {1:>16s} {2:12.1f}'.format(
+              method, used_method, args.size / max(copy_time, 1e-6)))
+  finally:
+    shutil.rmtree(source_dir)
+    shutil.rmtree(destination_dir)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(Main())
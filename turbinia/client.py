@@ -16,13 +16,12 @@
 
 from __future__ import unicode_literals
 
-from collections import defaultdict
 from datetime import datetime
 from datetime import timedelta
 
+import io
 import json
 import logging
-from operator import itemgetter
 from operator import attrgetter
 import os
 import stat
@@ -32,9 +31,14 @@ import shutil
 from turbinia import config
 from turbinia.config import logger
 from turbinia.config import DATETIME_FORMAT
+from turbinia import task_events
 from turbinia import task_manager
+from turbinia import status_api
+from turbinia import task_cache
+from turbinia import task_report
+from turbinia import task_retention
 from turbinia import TurbiniaException
-from turbinia.lib import text_formatter as fmt
+from turbinia.lib import stats_rollup
 from turbinia.jobs import manager as job_manager
 from turbinia.workers import Priority
 from turbinia.workers.artifact import FileArtifactExtractionTask
@@ -79,6 +83,20 @@ TASK_MAP = {
     'dockertask': DockerContainersEnumerationTask
 }
 
+# Minimum number of seconds between polls when waiting for a request.
+MIN_POLL_INTERVAL = 5
+
+# Task fields used for status reports and statistics, so that the status API
+# does not need to return large fields like report_data when they are not used.
+STATUS_FIELDS = [
+    'id', 'name', 'request_id', 'requester', 'report_priority', 'status',
+    'successful', 'worker_name', 'last_update'
+]
+STATISTICS_FIELDS = [
+    'id', 'name', 'request_id', 'requester', 'run_time', 'successful',
+    'worker_name', 'last_update'
+]
+
 config.LoadConfig()
 if config.TASK_MANAGER.lower() == 'psq':
   import psq
@@ -89,7 +107,7 @@ if config.TASK_MANAGER.lower() == 'psq':
 
   from turbinia.lib.google_cloud import GoogleCloudFunction
 elif config.TASK_MANAGER.lower() == 'celery':
-  from turbinia.state_manager import RedisStateManager
+  from turbinia import state_manager
 
 log = logging.getLogger('turbinia')
 logger.setup()
@@ -164,20 +182,30 @@ def check_directory(directory):
 class TurbiniaStats(object):
   """Statistics for Turbinia task execution.
 
+  The run times are summarized in a StatsRollup, so statistics can also be
+  created from the rollups maintained by the state manager without fetching
+  the individual tasks.
+
   Attributes:
     count(int): The number of tasks
     min(datetime.timedelta): The minimum run time of all tasks
     max(datetime.timedelta): The maximum run time of all tasks
     mean(datetime.timedelta): The mean run time of all tasks
-    tasks(list): A list of tasks to calculate stats for
+    p50(datetime.timedelta): The median run time of all tasks
+    p90(datetime.timedelta): The 90th percentile run time of all tasks
+    p99(datetime.timedelta): The 99th percentile run time of all tasks
+    rollup(StatsRollup): The summary of the run times in seconds
   """
 
-  def __init__(self, description=None):
+  def __init__(self, description=None, rollup=None):
     self.description = description
     self.min = None
     self.mean = None
     self.max = None
-    self.tasks = []
+    self.p50 = None
+    self.p90 = None
+    self.p99 = None
+    self.rollup = rollup or stats_rollup.StatsRollup()
 
   def __str__(self):
     return self.format_stats()
@@ -189,7 +217,7 @@ class TurbiniaStats(object):
     Returns:
       Int of task count.
     """
-    return len(self.tasks)
+    return self.rollup.count
 
   def add_task(self, task):
     """Add a task result dict.
@@ -197,22 +225,35 @@ class TurbiniaStats(object):
     Args:
       task(dict): The task results we want to count stats for.
     """
-    self.tasks.append(task)
+    self.rollup.add(task['run_time'].total_seconds())
+
+  @staticmethod
+  def _get_timedelta(seconds):
+    """Converts seconds to a timedelta without the microseconds.
+
+    Args:
+      seconds (float): The number of seconds.
+
+    Returns:
+      datetime.timedelta: The time delta, or None if seconds is None.
+    """
+    if seconds is None:
+      return None
+    delta = timedelta(seconds=seconds)
+    # Remove the microseconds to keep things cleaner
+    return delta - timedelta(microseconds=delta.microseconds)
 
   def calculate_stats(self):
     """Calculates statistics of the current tasks."""
-    if not self.tasks:
+    if not self.rollup.count:
       return
 
-    sorted_tasks = sorted(self.tasks, key=itemgetter('run_time'))
-    self.min = sorted_tasks[0]['run_time']
-    self.max = sorted_tasks[len(sorted_tasks) - 1]['run_time']
-    self.mean = sorted_tasks[len(sorted_tasks) // 2]['run_time']
-
-    # Remove the microseconds to keep things cleaner
-    self.min = self.min - timedelta(microseconds=self.min.microseconds)
-    self.max = self.max - timedelta(microseconds=self.max.microseconds)
-    self.mean = self.mean - timedelta(microseconds=self.mean.microseconds)
+    self.min = self._get_timedelta(self.rollup.min)
+    self.max = self._get_timedelta(self.rollup.max)
+    self.mean = self._get_timedelta(self.rollup.mean)
+    self.p50 = self._get_timedelta(self.rollup.quantile(0.5))
+    self.p90 = self._get_timedelta(self.rollup.quantile(0.9))
+    self.p99 = self._get_timedelta(self.rollup.quantile(0.99))
 
   def format_stats(self):
     """Formats statistics data.
@@ -220,8 +261,11 @@ class TurbiniaStats(object):
     Returns:
       String of statistics data
     """
-    return '{0:s}: Count: {1:d}, Min: {2!s}, Mean: {3!s}, Max: {4!s}'.format(
-        self.description, self.count, self.min, self.mean, self.max)
+    return (
+        '{0:s}: Count: {1:d}, Min: {2!s}, Mean: {3!s}, Max: {4!s}, '
+        'P50: {5!s}, P90: {6!s}, P99: {7!s}'.format(
+            self.description, self.count, self.min, self.mean, self.max,
+            self.p50, self.p90, self.p99))
 
   def format_stats_csv(self):
     """Formats statistics data into CSV output.
@@ -229,14 +273,19 @@ class TurbiniaStats(object):
     Returns:
       String of statistics data in CSV format
     """
-    return '{0:s}, {1:d}, {2!s}, {3!s}, {4!s}'.format(
-        self.description, self.count, self.min, self.mean, self.max)
+    return '{0:s}, {1:d}, {2!s}, {3!s}, {4!s}, {5!s}, {6!s}, {7!s}'.format(
+        self.description, self.count, self.min, self.mean, self.max, self.p50,
+        self.p90, self.p99)
 
 
 class TurbiniaClient(object):
   """Client class for Turbinia.
 
   Attributes:
+    status_api (StatusAPIClient): Status API client used to get Task data if
+        STATUS_API_URL is set, or None.
+    task_cache (TaskCache): Cache of the Tasks of requests if TASK_CACHE_DIR is
+        set, or None.
     task_manager (TaskManager): Turbinia task manager
   """
 
@@ -247,6 +296,12 @@ class TurbiniaClient(object):
     else:
       self.task_manager = task_manager.get_task_manager()
       self.task_manager.setup(server=False)
+    self.status_api = None
+    if config.STATUS_API_URL:
+      self.status_api = status_api.StatusAPIClient()
+    self.task_cache = None
+    if config.TASK_CACHE_DIR:
+      self.task_cache = task_cache.TaskCache()
 
   def create_task(self, task_name):
     """Creates a Turbinia Task by name.
@@ -274,10 +329,60 @@ class TurbiniaClient(object):
     for job in self.task_manager.jobs:
       log.info('\t{0:s}'.format(job.NAME))
 
+  def get_task_event_subscriber(self, instance, request_id=None):
+    """Subscribes to the Task state change events of a request.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      request_id (string): The Id of the request we want events for.
+
+    Returns:
+      TaskEventSubscriber: The subscriber, or None if Task state changes are
+          not pushed to clients.
+    """
+    if not config.PUBSUB_TASK_EVENTS_TOPIC:
+      return None
+    try:
+      return task_events.PubSubTaskEventSubscriber(
+          config.PUBSUB_TASK_EVENTS_TOPIC, instance, request_id)
+    except exceptions.GoogleCloudError as e:
+      log.warning(
+          'Could not subscribe to Task events, falling back to polling: '
+          '{0!s}'.format(e))
+      return None
+
+  @staticmethod
+  def _update_tasks(tasks, updates, user=None):
+    """Updates the known Tasks with new Task data or events.
+
+    Args:
+      tasks (dict): The known Task dicts keyed by Task id.
+      updates (list(dict)): Task dicts or Task state change events.
+      user (string): Only use updates for Tasks of this user.
+
+    Returns:
+      list(dict): The Tasks that changed state.
+    """
+    changed = []
+    for update in updates:
+      if user and update.get('requester') != user:
+        continue
+      task = tasks.setdefault(update['id'], {})
+      if task_events.get_state(task) != task_events.get_state(update):
+        changed.append(task)
+      task.update(update)
+    return changed
+
   def wait_for_request(
       self, instance, project, region, request_id=None, user=None,
-      poll_interval=60):
-    """Polls and waits for Turbinia Request to complete.
+      poll_interval=60, callback=None):
+    """Waits for Turbinia Request to complete.
+
+    If the state manager pushes Task state changes, the Tasks are fetched once
+    and then updated from the received events.  Otherwise the Tasks are polled,
+    with the interval between polls doubling from MIN_POLL_INTERVAL up to
+    poll_interval while nothing changes.
 
     Args:
       instance (string): The Turbinia instance name (by default the same as the
@@ -286,48 +391,179 @@ class TurbiniaClient(object):
       region (string): The name of the region to execute in.
       request_id (string): The Id of the request we want tasks for.
       user (string): The user of the request we want tasks for.
-      poll_interval (int): Interval of seconds between polling cycles.
+      poll_interval (int): Maximum interval of seconds between polling cycles,
+          or between full updates when receiving events.
+      callback (function): Called with each Task dict that changed state.
     """
+    # Subscribe before fetching the Tasks so that no events are missed.
+    subscriber = self.get_task_event_subscriber(instance, request_id)
+    interval = min(MIN_POLL_INTERVAL, poll_interval)
+    tasks = {}
     last_completed_count = -1
     last_uncompleted_count = -1
-    while True:
-      task_results = self.get_task_data(
-          instance, project, region, request_id=request_id, user=user)
-      completed_tasks = []
-      uncompleted_tasks = []
-      for task in task_results:
-        if task.get('successful') is not None:
-          completed_tasks.append(task)
+    refresh = True
+    try:
+      while True:
+        if refresh:
+          task_results = self.get_task_data(
+              instance, project, region, request_id=request_id, user=user,
+              fields=task_events.EVENT_FIELDS)
+          changed = self._update_tasks(tasks, task_results)
+        if callback:
+          for task in changed:
+            callback(task)
+
+        completed_tasks = []
+        uncompleted_tasks = []
+        for task in tasks.values():
+          if task.get('successful') is not None:
+            completed_tasks.append(task)
+          else:
+            uncompleted_tasks.append(task)
+
+        if completed_tasks and not uncompleted_tasks:
+          break
+
+        completed_names = [t.get('name') for t in completed_tasks]
+        completed_names = ', '.join(sorted(completed_names))
+        uncompleted_names = [t.get('name') for t in uncompleted_tasks]
+        uncompleted_names = ', '.join(sorted(uncompleted_names))
+        total_count = len(completed_tasks) + len(uncompleted_tasks)
+        msg = (
+            'Tasks completed ({0:d}/{1:d}): [{2:s}], waiting for [{3:s}].'
+            .format(
+                len(completed_tasks), total_count, completed_names,
+                uncompleted_names))
+        if (len(completed_tasks) > last_completed_count or
+            len(uncompleted_tasks) > last_uncompleted_count):
+          log.info(msg)
         else:
-          uncompleted_tasks.append(task)
-
-      if completed_tasks and len(completed_tasks) == len(task_results):
-        break
-
-      completed_names = [t.get('name') for t in completed_tasks]
-      completed_names = ', '.join(sorted(completed_names))
-      uncompleted_names = [t.get('name') for t in uncompleted_tasks]
-      uncompleted_names = ', '.join(sorted(uncompleted_names))
-      total_count = len(completed_tasks) + len(uncompleted_tasks)
-      msg = (
-          'Tasks completed ({0:d}/{1:d}): [{2:s}], waiting for [{3:s}].'.format(
-              len(completed_tasks), total_count, completed_names,
-              uncompleted_names))
-      if (len(completed_tasks) > last_completed_count or
-          len(uncompleted_tasks) > last_uncompleted_count):
-        log.info(msg)
-      else:
-        log.debug(msg)
+          log.debug(msg)
+
+        last_completed_count = len(completed_tasks)
+        last_uncompleted_count = len(uncompleted_tasks)
+        if subscriber:
+          changed = self._update_tasks(
+              tasks, subscriber.get_events(poll_interval), user=user)
+          # Refresh all Tasks if no events arrived in case any were missed.
+          refresh = not changed
+        else:
+          interval = MIN_POLL_INTERVAL if changed else min(
+              interval * 2, poll_interval)
+          time.sleep(interval)
+    finally:
+      if subscriber:
+        subscriber.close()
+
+    log.info('All {0:d} Tasks completed'.format(len(tasks)))
 
-      last_completed_count = len(completed_tasks)
-      last_uncompleted_count = len(uncompleted_tasks)
-      time.sleep(poll_interval)
+  def format_task_event(self, task):
+    """Formats a Task state change as a single line.
 
-    log.info('All {0:d} Tasks completed'.format(len(task_results)))
+    Args:
+      task (dict): The Task dict or event.
+
+    Returns:
+      str: The formatted Task state.
+    """
+    last_update = task.get('last_update')
+    if isinstance(last_update, datetime):
+      last_update = last_update.strftime(DATETIME_FORMAT)
+    if task.get('successful') is None:
+      state = 'Running'
+    elif task.get('successful'):
+      state = 'Successful'
+    else:
+      state = 'Failed'
+    worker_name = task.get('worker_name') or 'unknown worker'
+    status = task.get('status') or 'No task status'
+    return '{0:s} {1:s} ({2:s}) on {3:s}: {4:s}: {5:s}'.format(
+        last_update or 'Unknown time',
+        task.get('name') or 'Unknown task',
+        task.get('id') or 'Unknown id', worker_name, state, status)
 
   def get_task_data(
       self, instance, project, region, days=0, task_id=None, request_id=None,
-      user=None, function_name='gettasks'):
+      user=None, function_name='gettasks', archived=False, fields=None):
+    """Gets task data.
+
+    The Tasks of a request are kept in the Task cache if it is enabled, so that
+    only the Tasks that changed since the last call are fetched again.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the region to execute in.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      function_name (string): The GCF function we want to call
+      archived (bool): Whether to include archived Task records.
+      fields (list(string)): The Task fields to get from the status API, or
+          None for all fields.  Other sources and the Task cache always return
+          all fields.
+
+    Returns:
+      List of Task dict objects.
+    """
+    if self.task_cache and request_id and not (days or task_id):
+
+      def fetch_tasks(since):
+        """Fetches the Tasks of the request updated since a time."""
+        return self._get_task_data(
+            instance, project, region, request_id=request_id,
+            function_name=function_name, since=since)
+
+      task_data = self.task_cache.get_task_data(
+          instance, request_id, fetch_tasks)
+      if user:
+        task_data = [
+            task for task in task_data if task.get('requester') == user
+        ]
+    else:
+      task_data = self._get_task_data(
+          instance, project, region, days, task_id, request_id, user,
+          function_name, fields)
+
+    if archived:
+      task_data = self._add_archived_task_data(
+          task_data, instance, days, task_id, request_id, user)
+    return task_data
+
+  def _get_task_data(
+      self, instance, project, region, days=0, task_id=None, request_id=None,
+      user=None, function_name='gettasks', fields=None, since=None):
+    """Gets task data from the status API or Google Cloud Functions.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the region to execute in.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      function_name (string): The GCF function we want to call
+      fields (list(string)): The Task fields to get from the status API, or
+          None for all fields.
+      since (datetime): Only get Tasks last updated at or after this time.
+
+    Returns:
+      List of Task dict objects.
+    """
+    if self.status_api:
+      return self.status_api.get_task_data(
+          instance, days, task_id, request_id, user, fields=fields, since=since)
+    return self._get_cloud_function_task_data(
+        instance, project, region, days, task_id, request_id, user,
+        function_name, since)
+
+  def _get_cloud_function_task_data(
+      self, instance, project, region, days=0, task_id=None, request_id=None,
+      user=None, function_name='gettasks', since=None):
     """Gets task data from Google Cloud Functions.
 
     Args:
@@ -340,6 +576,7 @@ class TurbiniaClient(object):
       request_id (string): The Id of the request we want tasks for.
       user (string): The user of the request we want tasks for.
       function_name (string): The GCF function we want to call
+      since (datetime): Only get Tasks last updated at or after this time.
 
     Returns:
       List of Task dict objects.
@@ -347,16 +584,18 @@ class TurbiniaClient(object):
     cloud_function = GoogleCloudFunction(project_id=project, region=region)
     func_args = {'instance': instance, 'kind': 'TurbiniaTask'}
 
+    start_time = since
     if days:
       start_time = datetime.now() - timedelta(days=days)
-      # Format this like '1990-01-01T00:00:00z' so we can cast it directly to a
-      # javascript Date() object in the cloud function.
-      start_string = start_time.strftime(DATETIME_FORMAT)
-      func_args.update({'start_time': start_string})
     elif task_id:
       func_args.update({'task_id': task_id})
     elif request_id:
       func_args.update({'request_id': request_id})
+    if start_time:
+      # Format this like '1990-01-01T00:00:00z' so we can cast it directly to a
+      # javascript Date() object in the cloud function.
+      start_string = start_time.strftime(DATETIME_FORMAT)
+      func_args.update({'start_time': start_string})
 
     if user:
       func_args.update({'user': user})
@@ -387,9 +626,76 @@ class TurbiniaClient(object):
       if task.get('last_update'):
         task['last_update'] = datetime.strptime(
             task['last_update'], DATETIME_FORMAT)
-
     return task_data
 
+  @staticmethod
+  def _add_archived_task_data(
+      task_data, instance, days=0, task_id=None, request_id=None, user=None):
+    """Adds the matching archived Task records to the current Task data.
+
+    Args:
+      task_data (list(dict)): The Task dicts from the state manager.
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+
+    Returns:
+      List of Task dict objects.
+    """
+    archived_tasks = task_retention.TaskArchive().get_task_data(
+        instance, days, task_id, request_id, user)
+    task_ids = set(task.get('id') for task in task_data)
+    return task_data + [
+        task for task in archived_tasks if task.get('id') not in task_ids
+    ]
+
+  def get_task_rollups(self, instance, project, region, days=0):
+    """Gets the statistics rollups of completed Tasks.
+
+    The rollups are read from the status API if it is configured, and from
+    Cloud Functions otherwise.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the region to execute in.
+      days (int): The number of days we want statistics for.
+
+    Returns:
+      dict: The merged StatsRollup objects keyed by rollup name, or None if the
+          rollups can not be retrieved.
+    """
+    if self.status_api:
+      try:
+        return self.status_api.get_task_rollups(instance, days)
+      except TurbiniaException as e:
+        log.info(
+            'Could not get statistics rollups, falling back to Task data: '
+            '{0!s}'.format(e))
+        return None
+
+    cloud_function = GoogleCloudFunction(project_id=project, region=region)
+    func_args = {'instance': instance}
+    start_day = stats_rollup.get_start_day(days)
+    if start_day:
+      func_args.update({'start_day': start_day})
+
+    try:
+      response = cloud_function.ExecuteFunction('getrollups', func_args)
+      results = json.loads(response['result'])
+    except (KeyError, TypeError, ValueError, TurbiniaException) as e:
+      log.info(
+          'Could not get statistics rollups, falling back to Task data: '
+          '{0!s}'.format(e))
+      return None
+
+    return stats_rollup.decode_rollups(
+        (entity['name'], entity['data']) for entity in results[0])
+
   def format_task_detail(self, task, show_files=False):
     """Formats a single task in detail.
 
@@ -400,27 +706,7 @@ class TurbiniaClient(object):
     Returns:
       list: Formatted task data
     """
-    report = []
-    saved_paths = task.get('saved_paths') or []
-    status = task.get('status') or 'No task status'
-
-    report.append(fmt.heading2(task.get('name')))
-    line = '{0:s} {1:s}'.format(fmt.bold('Status:'), status)
-    report.append(fmt.bullet(line))
-    report.append(fmt.bullet('Task Id: {0:s}'.format(task.get('id'))))
-    report.append(
-        fmt.bullet('Executed on worker {0:s}'.format(task.get('worker_name'))))
-    if task.get('report_data'):
-      report.append('')
-      report.append(fmt.heading3('Task Reported Data'))
-      report.extend(task.get('report_data').splitlines())
-    if show_files:
-      report.append('')
-      report.append(fmt.heading3('Saved Task Files:'))
-      for path in saved_paths:
-        report.append(fmt.bullet(fmt.code(path)))
-      report.append('')
-    return report
+    return task_report.format_task_detail(task, show_files=show_files)
 
   def format_task(self, task, show_files=False):
     """Formats a single task in short form.
@@ -432,19 +718,11 @@ class TurbiniaClient(object):
     Returns:
       list: Formatted task data
     """
-    report = []
-    saved_paths = task.get('saved_paths') or []
-    status = task.get('status') or 'No task status'
-    report.append(fmt.bullet('{0:s}: {1:s}'.format(task.get('name'), status)))
-    if show_files:
-      for path in saved_paths:
-        report.append(fmt.bullet(fmt.code(path), level=2))
-      report.append('')
-    return report
+    return task_report.format_task(task, show_files=show_files)
 
   def get_task_statistics(
       self, instance, project, region, days=0, task_id=None, request_id=None,
-      user=None):
+      user=None, archived=False):
     """Gathers statistics for Turbinia execution data.
 
     Args:
@@ -456,29 +734,26 @@ class TurbiniaClient(object):
       task_id (string): The Id of the task.
       request_id (string): The Id of the request we want tasks for.
       user (string): The user of the request we want tasks for.
+      archived (bool): Whether to include archived Task records.  The rollups
+          always include archived Tasks.
 
     Returns:
       task_stats(dict): Mapping of statistic names to values
     """
+    # The rollups maintained by the state manager cover all tasks, so they can
+    # only be used when the statistics are not filtered.
+    if not (task_id or request_id or user):
+      rollups = self.get_task_rollups(instance, project, region, days)
+      if rollups:
+        return self._get_rollup_statistics(rollups)
+
     task_results = self.get_task_data(
-        instance, project, region, days, task_id, request_id, user)
+        instance, project, region, days, task_id, request_id, user,
+        archived=archived, fields=STATISTICS_FIELDS)
     if not task_results:
       return {}
 
-    task_stats = {
-        'all_tasks': TurbiniaStats('All Tasks'),
-        'successful_tasks': TurbiniaStats('Successful Tasks'),
-        'failed_tasks': TurbiniaStats('Failed Tasks'),
-        'requests': TurbiniaStats('Total Request Time'),
-        # The following are dicts mapping the user/worker/type names to their
-        # respective TurbiniaStats() objects.
-        # Total wall-time for all tasks of a given type
-        'tasks_per_type': {},
-        # Total wall-time for all tasks per Worker
-        'tasks_per_worker': {},
-        # Total wall-time for all tasks per User
-        'tasks_per_user': {},
-    }
+    task_stats = self._new_task_statistics()
 
     # map of request ids to [min time, max time]
     requests = {}
@@ -547,7 +822,38 @@ class TurbiniaClient(object):
       task['run_time'] = max_time - min_time
       task_stats['requests'].add_task(task)
 
-    # Go over all stat objects and calculate them
+    self._calculate_task_statistics(task_stats)
+    return task_stats
+
+  @staticmethod
+  def _new_task_statistics():
+    """Creates the empty statistics objects for get_task_statistics().
+
+    Returns:
+      task_stats(dict): Mapping of statistic names to values
+    """
+    return {
+        'all_tasks': TurbiniaStats('All Tasks'),
+        'successful_tasks': TurbiniaStats('Successful Tasks'),
+        'failed_tasks': TurbiniaStats('Failed Tasks'),
+        'requests': TurbiniaStats('Total Request Time'),
+        # The following are dicts mapping the user/worker/type names to their
+        # respective TurbiniaStats() objects.
+        # Total wall-time for all tasks of a given type
+        'tasks_per_type': {},
+        # Total wall-time for all tasks per Worker
+        'tasks_per_worker': {},
+        # Total wall-time for all tasks per User
+        'tasks_per_user': {},
+    }
+
+  @staticmethod
+  def _calculate_task_statistics(task_stats):
+    """Calculates all statistics objects created by get_task_statistics().
+
+    Args:
+      task_stats(dict): Mapping of statistic names to values
+    """
     for stat_obj in task_stats.values():
       if isinstance(stat_obj, dict):
         for inner_stat_obj in stat_obj.values():
@@ -555,11 +861,43 @@ class TurbiniaClient(object):
       else:
         stat_obj.calculate_stats()
 
+  def _get_rollup_statistics(self, rollups):
+    """Creates the task statistics from statistics rollups.
+
+    Args:
+      rollups (dict): The StatsRollup objects keyed by rollup name.
+
+    Returns:
+      task_stats(dict): Mapping of statistic names to values
+    """
+    task_stats = self._new_task_statistics()
+    prefixes = [
+        (stats_rollup.TYPE_PREFIX, 'tasks_per_type', 'Task type {0:s}'),
+        (stats_rollup.WORKER_PREFIX, 'tasks_per_worker', 'Worker {0:s}'),
+        (stats_rollup.USER_PREFIX, 'tasks_per_user', 'User {0:s}'),
+    ]
+    for name, rollup in rollups.items():
+      if name == stats_rollup.ROLLUP_ALL:
+        task_stats['all_tasks'].rollup = rollup
+      elif name == stats_rollup.ROLLUP_SUCCESSFUL:
+        task_stats['successful_tasks'].rollup = rollup
+      elif name == stats_rollup.ROLLUP_FAILED:
+        task_stats['failed_tasks'].rollup = rollup
+      elif name == stats_rollup.ROLLUP_REQUESTS:
+        task_stats['requests'].rollup = rollup
+      else:
+        for prefix, stats_name, description in prefixes:
+          if name.startswith(prefix):
+            key = name[len(prefix):]
+            task_stats[stats_name][key] = TurbiniaStats(
+                description.format(key), rollup)
+
+    self._calculate_task_statistics(task_stats)
     return task_stats
 
   def format_task_statistics(
       self, instance, project, region, days=0, task_id=None, request_id=None,
-      user=None, csv=False):
+      user=None, csv=False, archived=False):
     """Formats statistics for Turbinia execution data.
 
     Args:
@@ -572,12 +910,14 @@ class TurbiniaClient(object):
       request_id (string): The Id of the request we want tasks for.
       user (string): The user of the request we want tasks for.
       csv (bool): Whether we want the output in CSV format.
+      archived (bool): Whether to include archived Task records.
 
     Returns:
       String of task statistics report
     """
     task_stats = self.get_task_statistics(
-        instance, project, region, days, task_id, request_id, user)
+        instance, project, region, days, task_id, request_id, user,
+        archived=archived)
     if not task_stats:
       return 'No tasks found'
 
@@ -587,7 +927,7 @@ class TurbiniaClient(object):
     ]
 
     if csv:
-      report = ['stat_type, count, min, mean, max']
+      report = ['stat_type, count, min, mean, max, p50, p90, p99']
     else:
       report = ['Execution time statistics for Turbinia:', '']
     for stat_name in stats_order:
@@ -613,7 +953,7 @@ class TurbiniaClient(object):
   def format_task_status(
       self, instance, project, region, days=0, task_id=None, request_id=None,
       user=None, all_fields=False, full_report=False,
-      priority_filter=Priority.HIGH):
+      priority_filter=Priority.HIGH, archived=False):
     """Formats the recent history for Turbinia Tasks.
 
     Args:
@@ -631,64 +971,90 @@ class TurbiniaClient(object):
           summary.
       priority_filter (int): Output only a summary for Tasks with a value
           greater than the priority_filter.
+      archived (bool): Whether to include archived Task records.
 
     Returns:
       String of task status
     """
-    task_results = self.get_task_data(
-        instance, project, region, days, task_id, request_id, user)
-    if not task_results:
-      return ''
-    # Sort all tasks by the report_priority so that tasks with a higher
-    # priority are listed first in the report.
-    for result in task_results:
-      # 0 is a valid value, so checking against specific values
-      if result.get('report_priority') in (None, ''):
-        result['report_priority'] = Priority.LOW
-    task_results = sorted(task_results, key=itemgetter('report_priority'))
-    num_results = len(task_results)
-    if not num_results:
-      msg = 'No Turbinia Tasks found.'
-      log.info(msg)
-      return '\n{0:s}'.format(msg)
-
-    # Build up data
-    report = []
-    requester = task_results[0].get('requester')
-    request_id = task_results[0].get('request_id')
-    success_types = ['Successful', 'Failed', 'Scheduled or Running']
-    success_values = [True, False, None]
-    # Reverse mapping values to types
-    success_map = dict(zip(success_values, success_types))
-    task_map = defaultdict(list)
-    success_types.insert(0, 'High Priority')
-    for task in task_results:
-      if task.get('report_priority') <= priority_filter:
-        task_map['High Priority'].append(task)
-      else:
-        task_map[success_map[task.get('successful')]].append(task)
-
-    # Generate report header
-    report.append('\n')
-    report.append(fmt.heading1('Turbinia report {0:s}'.format(request_id)))
-    report.append(
-        fmt.bullet(
-            'Processed {0:d} Tasks for user {1:s}'.format(
-                num_results, requester)))
-
-    # Print report data for tasks
-    for success_type in success_types:
-      report.append('')
-      report.append(fmt.heading1('{0:s} Tasks'.format(success_type)))
-      if not task_map[success_type]:
-        report.append(fmt.bullet('None'))
-      for task in task_map[success_type]:
-        if full_report and success_type == success_types[0]:
-          report.extend(self.format_task_detail(task, show_files=all_fields))
-        else:
-          report.extend(self.format_task(task, show_files=all_fields))
+    output = io.StringIO()
+    self.write_task_status(
+        output, instance, project, region, days, task_id, request_id, user,
+        all_fields, full_report, priority_filter, archived)
+    return output.getvalue()
+
+  def write_task_status(
+      self, output, instance, project, region, days=0, task_id=None,
+      request_id=None, user=None, all_fields=False, full_report=False,
+      priority_filter=Priority.HIGH, archived=False):
+    """Writes the markdown report of Turbinia Tasks incrementally.
+
+    This writes the same report as format_task_status, but without building
+    the whole report in memory first, and long sections and reported data are
+    cut off according to REPORT_MAX_SECTION_TASKS and REPORT_MAX_DATA_LINES.
 
-    return '\n'.join(report)
+    Args:
+      output (file): The text file-like object to write the report to.
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the zone to execute in.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      all_fields (bool): Include all fields for the task, including task,
+          request ids and saved file paths.
+      full_report (bool): Generate a full markdown report instead of just a
+          summary.
+      priority_filter (int): Output only a summary for Tasks with a value
+          greater than the priority_filter.
+      archived (bool): Whether to include archived Task records.
+
+    Returns:
+      int: The number of Tasks in the report.
+    """
+    writer = task_report.TaskReportWriter(
+        output, priority_filter=priority_filter, full_report=full_report,
+        all_fields=all_fields,
+        max_section_tasks=config.REPORT_MAX_SECTION_TASKS,
+        max_report_lines=config.REPORT_MAX_DATA_LINES)
+    tasks, get_tasks = self._get_report_tasks(
+        instance, project, region, days, task_id, request_id, user, all_fields,
+        full_report, archived)
+    return writer.write(tasks, get_tasks)
+
+  def _get_report_tasks(
+      self, instance, project, region, days=0, task_id=None, request_id=None,
+      user=None, all_fields=False, full_report=False, archived=False):
+    """Gets the Tasks to write a report for.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the zone to execute in.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      all_fields (bool): Whether the saved file paths are needed.
+      full_report (bool): Whether the reported data is needed.
+      archived (bool): Whether to include archived Task records.
+
+    Returns:
+      tuple(iterable(dict), function): The Task dicts, and a function to get
+          the full Task dicts by their ids, or None if the Task dicts are
+          complete.
+    """
+    fields = list(STATUS_FIELDS)
+    if full_report:
+      fields.append('report_data')
+    if all_fields:
+      fields.append('saved_paths')
+    tasks = self.get_task_data(
+        instance, project, region, days, task_id, request_id, user,
+        archived=archived, fields=fields)
+    return tasks, None
 
   def run_local_task(self, task_name, request):
     """Runs a Turbinia Task locally.
@@ -718,6 +1084,14 @@ class TurbiniaClient(object):
     """
     self.task_manager.server_pubsub.send_request(request)
 
+  def send_requests(self, requests):
+    """Sends multiple TurbiniaRequest messages.
+
+    Args:
+      requests (list(TurbiniaRequest)): The requests to send.
+    """
+    self.task_manager.server_pubsub.send_requests(requests)
+
   def close_tasks(
       self, instance, project, region, request_id=None, task_id=None, user=None,
       requester=None):
@@ -754,12 +1128,12 @@ class TurbiniaCeleryClient(TurbiniaClient):
   Overriding some things specific to Celery operation.
 
   Attributes:
-    redis (RedisStateManager): Redis datastore object
+    state_manager (BaseStateManager): Redis or SQLite state manager object
   """
 
   def __init__(self, *_, **__):
     super(TurbiniaCeleryClient, self).__init__()
-    self.redis = RedisStateManager()
+    self.state_manager = state_manager.get_state_manager()
 
   def send_request(self, request):
     """Sends a TurbiniaRequest message.
@@ -769,11 +1143,19 @@ class TurbiniaCeleryClient(TurbiniaClient):
     """
     self.task_manager.kombu.send_request(request)
 
+  def send_requests(self, requests):
+    """Sends multiple TurbiniaRequest messages.
+
+    Args:
+      requests (list(TurbiniaRequest)): The requests to send.
+    """
+    self.task_manager.kombu.send_requests(requests)
+
   # pylint: disable=arguments-differ
-  def get_task_data(
-      self, instance, _, __, days=0, task_id=None, request_id=None,
-      function_name=None):
-    """Gets task data from Redis.
+  def _get_task_data(
+      self, instance, _, __, days=0, task_id=None, request_id=None, user=None,
+      function_name=None, fields=None, since=None):
+    """Gets task data from the status API or the state manager.
 
     We keep the same function signature, but ignore arguments passed for GCP.
 
@@ -783,17 +1165,93 @@ class TurbiniaCeleryClient(TurbiniaClient):
       days (int): The number of days we want history for.
       task_id (string): The Id of the task.
       request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      fields (list(string)): The Task fields to get from the status API, or
+          None for all fields.  The state manager always returns all fields.
+      since (datetime): Only get Tasks last updated at or after this time.
 
     Returns:
       List of Task dict objects.
     """
-    return self.redis.get_task_data(instance, days, task_id, request_id)
+    if self.status_api:
+      return self.status_api.get_task_data(
+          instance, days, task_id, request_id, user, fields=fields, since=since)
+    return self.state_manager.get_task_data(
+        instance, days, task_id, request_id, user, since)
+
+  def _get_report_tasks(
+      self, instance, project, region, days=0, task_id=None, request_id=None,
+      user=None, all_fields=False, full_report=False, archived=False):
+    """Gets the Tasks to write a report for.
+
+    The Tasks of a single request are read from the state manager a page at a
+    time, and the Tasks reported in detail are read again by their ids while
+    they are written, so that the whole request is never held in memory.
+    Other queries are handled like in TurbiniaClient.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      project (string): The name of the project.
+      region (string): The name of the zone to execute in.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      all_fields (bool): Whether the saved file paths are needed.
+      full_report (bool): Whether the reported data is needed.
+      archived (bool): Whether to include archived Task records.
+
+    Returns:
+      tuple(iterable(dict), function): The Task dicts, and a function to get
+          the full Task dicts by their ids, or None if the Task dicts are
+          complete.
+    """
+    if self.status_api or not request_id or days or task_id or archived:
+      return super(TurbiniaCeleryClient, self)._get_report_tasks(
+          instance, project, region, days, task_id, request_id, user,
+          all_fields, full_report, archived)
+
+    tasks = task_report.iter_request_tasks(
+        self.state_manager, instance, request_id)
+    if user:
+      tasks = (task for task in tasks if task.get('requester') == user)
+
+    def get_tasks(task_ids):
+      """Gets the full Task dicts by their ids."""
+      return self.state_manager.get_tasks(instance, task_ids)
+
+    return tasks, get_tasks
+
+  # pylint: disable=arguments-differ
+  def get_task_rollups(self, instance, _, __, days=0):
+    """Gets the statistics rollups of completed Tasks.
+
+    The rollups are read from the status API if it is configured, and from the
+    state manager otherwise.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want statistics for.
+
+    Returns:
+      dict: The merged StatsRollup objects keyed by rollup name.
+    """
+    if self.status_api:
+      return self.status_api.get_task_rollups(instance, days)
+    return self.state_manager.get_task_rollups(instance, days)
+
+  def get_task_event_subscriber(self, instance, request_id=None):
+    return self.state_manager.get_task_event_subscriber(instance, request_id)
 
 
 class TurbiniaServer(object):
   """Turbinia Server class.
 
   Attributes:
+    status_api_server (StatusAPIServer): The status API server, or None if
+        STATUS_API_PORT is not set.
     task_manager (TaskManager): An object to manage turbinia tasks.
   """
 
@@ -807,9 +1265,15 @@ class TurbiniaServer(object):
     config.LoadConfig()
     self.task_manager = task_manager.get_task_manager()
     self.task_manager.setup(jobs_blacklist, jobs_whitelist)
+    self.status_api_server = None
 
   def start(self):
     """Start Turbinia Server."""
+    self.task_manager.state_manager.migrate()
+    if config.STATUS_API_PORT:
+      self.status_api_server = status_api.StatusAPIServer(
+          self.task_manager.state_manager)
+      self.status_api_server.start()
     log.info('Running Turbinia Server.')
     self.task_manager.run()
 
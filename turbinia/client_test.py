@@ -33,6 +33,7 @@ from turbinia.client import TurbiniaServer
 from turbinia.client import TurbiniaStats
 from turbinia.client import TurbiniaPsqWorker
 from turbinia.client import check_dependencies
+from turbinia.lib import stats_rollup
 from turbinia import TurbiniaException
 
 SHORT_REPORT = textwrap.dedent(
@@ -118,33 +119,33 @@ STATISTICS_REPORT = textwrap.dedent(
     """\
     Execution time statistics for Turbinia:
 
-    All Tasks: Count: 3, Min: 0:01:00, Mean: 0:03:00, Max: 0:05:00
-    Successful Tasks: Count: 2, Min: 0:01:00, Mean: 0:05:00, Max: 0:05:00
-    Failed Tasks: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00
-    Total Request Time: Count: 2, Min: 0:03:00, Mean: 0:21:00, Max: 0:21:00
-    Task type TaskName: Count: 1, Min: 0:01:00, Mean: 0:01:00, Max: 0:01:00
-    Task type TaskName2: Count: 1, Min: 0:05:00, Mean: 0:05:00, Max: 0:05:00
-    Task type TaskName3: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00
-    Worker fake_worker: Count: 2, Min: 0:01:00, Mean: 0:03:00, Max: 0:03:00
-    Worker fake_worker2: Count: 1, Min: 0:05:00, Mean: 0:05:00, Max: 0:05:00
-    User myuser: Count: 2, Min: 0:01:00, Mean: 0:05:00, Max: 0:05:00
-    User myuser2: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00
+    All Tasks: Count: 3, Min: 0:01:00, Mean: 0:03:00, Max: 0:05:00, P50: 0:03:00, P90: 0:05:00, P99: 0:05:00
+    Successful Tasks: Count: 2, Min: 0:01:00, Mean: 0:03:00, Max: 0:05:00, P50: 0:01:00, P90: 0:05:00, P99: 0:05:00
+    Failed Tasks: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00, P50: 0:03:00, P90: 0:03:00, P99: 0:03:00
+    Total Request Time: Count: 2, Min: 0:03:00, Mean: 0:12:00, Max: 0:21:00, P50: 0:03:00, P90: 0:21:00, P99: 0:21:00
+    Task type TaskName: Count: 1, Min: 0:01:00, Mean: 0:01:00, Max: 0:01:00, P50: 0:01:00, P90: 0:01:00, P99: 0:01:00
+    Task type TaskName2: Count: 1, Min: 0:05:00, Mean: 0:05:00, Max: 0:05:00, P50: 0:05:00, P90: 0:05:00, P99: 0:05:00
+    Task type TaskName3: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00, P50: 0:03:00, P90: 0:03:00, P99: 0:03:00
+    Worker fake_worker: Count: 2, Min: 0:01:00, Mean: 0:02:00, Max: 0:03:00, P50: 0:01:00, P90: 0:03:00, P99: 0:03:00
+    Worker fake_worker2: Count: 1, Min: 0:05:00, Mean: 0:05:00, Max: 0:05:00, P50: 0:05:00, P90: 0:05:00, P99: 0:05:00
+    User myuser: Count: 2, Min: 0:01:00, Mean: 0:03:00, Max: 0:05:00, P50: 0:01:00, P90: 0:05:00, P99: 0:05:00
+    User myuser2: Count: 1, Min: 0:03:00, Mean: 0:03:00, Max: 0:03:00, P50: 0:03:00, P90: 0:03:00, P99: 0:03:00
 """)
 
 STATISTICS_REPORT_CSV = textwrap.dedent(
     """\
-    stat_type, count, min, mean, max
-    All Tasks, 3, 0:01:00, 0:03:00, 0:05:00
-    Successful Tasks, 2, 0:01:00, 0:05:00, 0:05:00
-    Failed Tasks, 1, 0:03:00, 0:03:00, 0:03:00
-    Total Request Time, 2, 0:03:00, 0:21:00, 0:21:00
-    Task type TaskName, 1, 0:01:00, 0:01:00, 0:01:00
-    Task type TaskName2, 1, 0:05:00, 0:05:00, 0:05:00
-    Task type TaskName3, 1, 0:03:00, 0:03:00, 0:03:00
-    Worker fake_worker, 2, 0:01:00, 0:03:00, 0:03:00
-    Worker fake_worker2, 1, 0:05:00, 0:05:00, 0:05:00
-    User myuser, 2, 0:01:00, 0:05:00, 0:05:00
-    User myuser2, 1, 0:03:00, 0:03:00, 0:03:00
+    stat_type, count, min, mean, max, p50, p90, p99
+    All Tasks, 3, 0:01:00, 0:03:00, 0:05:00, 0:03:00, 0:05:00, 0:05:00
+    Successful Tasks, 2, 0:01:00, 0:03:00, 0:05:00, 0:01:00, 0:05:00, 0:05:00
+    Failed Tasks, 1, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00
+    Total Request Time, 2, 0:03:00, 0:12:00, 0:21:00, 0:03:00, 0:21:00, 0:21:00
+    Task type TaskName, 1, 0:01:00, 0:01:00, 0:01:00, 0:01:00, 0:01:00, 0:01:00
+    Task type TaskName2, 1, 0:05:00, 0:05:00, 0:05:00, 0:05:00, 0:05:00, 0:05:00
+    Task type TaskName3, 1, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00
+    Worker fake_worker, 2, 0:01:00, 0:02:00, 0:03:00, 0:01:00, 0:03:00, 0:03:00
+    Worker fake_worker2, 1, 0:05:00, 0:05:00, 0:05:00, 0:05:00, 0:05:00, 0:05:00
+    User myuser, 2, 0:01:00, 0:03:00, 0:05:00, 0:01:00, 0:05:00, 0:05:00
+    User myuser2, 1, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00
 """)
 
 
@@ -250,12 +251,55 @@ class TestTurbiniaClient(unittest.TestCase):
     self.assertRaises(
         TurbiniaException, client.get_task_data, "inst", "proj", "reg")
 
+  @mock.patch('turbinia.client.time.sleep')
+  @mock.patch('turbinia.client.task_manager.PSQTaskManager._backend_setup')
+  @mock.patch('turbinia.state_manager.get_state_manager')
+  def testClientWaitForRequestPolling(self, _, __, mock_sleep):
+    """Tests wait_for_request() polling with backoff."""
+    client = TurbiniaClient()
+    client.get_task_event_subscriber = mock.MagicMock(return_value=None)
+    running = [dict(task, successful=None) for task in self.task_data]
+    client.get_task_data = mock.MagicMock(
+        side_effect=[running, running, running, self.task_data])
+    callback = mock.MagicMock()
+    client.wait_for_request(
+        'inst', 'proj', 'reg', request_id='0xFakeRequestId', poll_interval=60,
+        callback=callback)
+    self.assertEqual(client.get_task_data.call_count, 4)
+    self.assertEqual([call[0][0] for call in mock_sleep.call_args_list],
+                     [5, 10, 20])
+    # Each Task is reported once when found and once when it completed.
+    self.assertEqual(callback.call_count, 6)
+
+  @mock.patch('turbinia.client.time.sleep')
+  @mock.patch('turbinia.client.task_manager.PSQTaskManager._backend_setup')
+  @mock.patch('turbinia.state_manager.get_state_manager')
+  def testClientWaitForRequestEvents(self, _, __, mock_sleep):
+    """Tests wait_for_request() with pushed Task state changes."""
+    client = TurbiniaClient()
+    subscriber = mock.MagicMock()
+    client.get_task_event_subscriber = mock.MagicMock(return_value=subscriber)
+    running = [dict(task, successful=None) for task in self.task_data]
+    client.get_task_data = mock.MagicMock(return_value=running)
+    subscriber.get_events.side_effect = [[{
+        'id': task['id'],
+        'successful': task['successful'],
+        'status': task['status']
+    }] for task in self.task_data]
+    client.wait_for_request(
+        'inst', 'proj', 'reg', request_id='0xFakeRequestId', poll_interval=60)
+    client.get_task_data.assert_called_once()
+    self.assertEqual(subscriber.get_events.call_count, 3)
+    subscriber.close.assert_called_once()
+    mock_sleep.assert_not_called()
+
   @mock.patch('turbinia.client.GoogleCloudFunction.ExecuteFunction')
   @mock.patch('turbinia.client.task_manager.PSQTaskManager._backend_setup')
   @mock.patch('turbinia.state_manager.get_state_manager')
   def testClientFormatTaskStatistics(self, _, __, ___):
     """Tests format_task_statistics() report output."""
     client = TurbiniaClient()
+    client.get_task_rollups = mock.MagicMock(return_value=None)
     client.get_task_data = mock.MagicMock()
     client.get_task_data.return_value = self.task_data
     stats_report = client.format_task_statistics('inst', 'proj', 'reg')
@@ -268,6 +312,7 @@ class TestTurbiniaClient(unittest.TestCase):
   def testClientFormatTaskStatisticsCsv(self, _, __, ___):
     """Tests format_task_statistics() CSV report output."""
     client = TurbiniaClient()
+    client.get_task_rollups = mock.MagicMock(return_value=None)
     client.get_task_data = mock.MagicMock()
     client.get_task_data.return_value = self.task_data
     stats_report = client.format_task_statistics(
@@ -275,12 +320,50 @@ class TestTurbiniaClient(unittest.TestCase):
     self.maxDiff = None
     self.assertEqual(stats_report, STATISTICS_REPORT_CSV)
 
+  @mock.patch('turbinia.client.GoogleCloudFunction.ExecuteFunction')
+  @mock.patch('turbinia.client.task_manager.PSQTaskManager._backend_setup')
+  @mock.patch('turbinia.state_manager.get_state_manager')
+  def testClientFormatTaskStatisticsRollups(self, _, __, ___):
+    """Tests format_task_statistics() output from statistics rollups."""
+    rollups = {}
+    spans = {}
+    for task in self.task_data:
+      task = dict(task, run_time=task['run_time'].total_seconds())
+      for name, rollup in stats_rollup.get_task_rollups(
+          task, task['last_update']).items():
+        if name in rollups:
+          rollups[name].merge(rollup)
+        else:
+          rollups[name] = rollup
+      span = stats_rollup.get_task_span(task, task['last_update'])
+      if task['request_id'] in spans:
+        spans[task['request_id']].merge(span)
+      else:
+        spans[task['request_id']] = span
+    rollups[stats_rollup.ROLLUP_REQUESTS] = stats_rollup.StatsRollup()
+    for span in spans.values():
+      rollups[stats_rollup.ROLLUP_REQUESTS].add(span.max - span.min)
+    client = TurbiniaClient()
+    client.get_task_rollups = mock.MagicMock(return_value=rollups)
+    client.get_task_data = mock.MagicMock()
+    stats_report = client.format_task_statistics('inst', 'proj', 'reg')
+    self.maxDiff = None
+    self.assertEqual(stats_report, STATISTICS_REPORT)
+    client.get_task_data.assert_not_called()
+
+    # Filtered statistics are calculated from the task data.
+    client.get_task_data.return_value = self.task_data
+    client.format_task_statistics('inst', 'proj', 'reg', user='myuser')
+    client.get_task_rollups.assert_called_once_with('inst', 'proj', 'reg', 0)
+    client.get_task_data.assert_called_once()
+
   @mock.patch('turbinia.client.GoogleCloudFunction.ExecuteFunction')
   @mock.patch('turbinia.client.task_manager.PSQTaskManager._backend_setup')
   @mock.patch('turbinia.state_manager.get_state_manager')
   def testClientGetTaskStatistics(self, _, __, ___):
     """Tests get_task_statistics() basic functionality."""
     client = TurbiniaClient()
+    client.get_task_rollups = mock.MagicMock(return_value=None)
     client.get_task_data = mock.MagicMock()
     client.get_task_data.return_value = self.task_data
     task_stats = client.get_task_statistics('inst', 'proj', 'reg')
@@ -362,10 +445,10 @@ class TestTurbiniaStats(unittest.TestCase):
 
   def testTurbiniaStatsAddTask(self):
     """Tests TurbiniaStats.add_task() method."""
-    test_task = {'run_time': None, 'last_update': None}
+    test_task = {'run_time': timedelta(minutes=3), 'last_update': None}
     stats = TurbiniaStats()
     stats.add_task(test_task)
-    self.assertIn(test_task, stats.tasks)
+    self.assertEqual(stats.rollup.sum, 180)
     self.assertEqual(stats.count, 1)
 
   def testTurbiniaStatsCalculateStats(self):
@@ -384,8 +467,19 @@ class TestTurbiniaStats(unittest.TestCase):
     self.assertEqual(stats.min, timedelta(minutes=1))
     self.assertEqual(stats.mean, timedelta(minutes=3))
     self.assertEqual(stats.max, timedelta(minutes=5))
+    self.assertEqual(stats.p50, timedelta(minutes=3))
+    self.assertEqual(stats.p99, timedelta(minutes=5))
     self.assertEqual(stats.count, 3)
 
+  def testTurbiniaStatsCalculateTrueMean(self):
+    """Tests that calculate_stats() calculates the mean, not the median."""
+    stats = TurbiniaStats()
+    for minutes in (1, 2, 9):
+      stats.add_task({'run_time': timedelta(minutes=minutes)})
+    stats.calculate_stats()
+    self.assertEqual(stats.mean, timedelta(minutes=4))
+    self.assertEqual(stats.p50, timedelta(minutes=2))
+
   def testTurbiniaStatsCalculateStatsEmpty(self):
     """Tests that calculate_stats() works when no tasks are added."""
     stats = TurbiniaStats()
@@ -397,7 +491,7 @@ class TestTurbiniaStats(unittest.TestCase):
     """Tests TurbiniaStats.format_stats() returns valid output."""
     test_output = (
         'Test Task Results: Count: 1, Min: 0:03:00, Mean: 0:03:00, '
-        'Max: 0:03:00')
+        'Max: 0:03:00, P50: 0:03:00, P90: 0:03:00, P99: 0:03:00')
     test_task1 = {
         'run_time': timedelta(minutes=3),
         'last_update': datetime.now()
@@ -410,7 +504,9 @@ class TestTurbiniaStats(unittest.TestCase):
 
   def testTurbiniaStatsFormatStatsCsv(self):
     """Tests TurbiniaStats.format_stats() returns valid CSV output."""
-    test_output = ('Test Task Results, 1, 0:03:00, 0:03:00, 0:03:00')
+    test_output = (
+        'Test Task Results, 1, 0:03:00, 0:03:00, 0:03:00, 0:03:00, 0:03:00, '
+        '0:03:00')
     test_task1 = {
         'run_time': timedelta(minutes=3),
         'last_update': datetime.now()
@@ -73,12 +73,35 @@ OPTIONAL_VARS = [
     'BUCKET_NAME',
     'PSQ_TOPIC',
     'PUBSUB_TOPIC',
+    'PUBSUB_TASK_EVENTS_TOPIC',
     'GCS_OUTPUT_PATH',
+    'GCS_PARALLEL_THRESHOLD',
+    'GCS_PART_SIZE',
+    'GCS_TRANSFER_THREADS',
+    'GCS_OUTPUT_DEDUP',
+    'OUTPUT_UPLOAD_THREADS',
+    'EVIDENCE_CACHE_DIR',
+    'EVIDENCE_CACHE_SIZE',
+    'OUTPUT_DIR_LAYOUT',
+    'OUTPUT_RETENTION_DAYS',
+    'OUTPUT_ARCHIVE_DIR',
     'RECIPE_FILE_DIR',
     # REDIS CONFIG
     'REDIS_HOST',
     'REDIS_PORT',
     'REDIS_DB',
+    # SQLite config
+    'SQLITE_DB_PATH',
+    # Task record retention
+    'TASK_RETENTION_DAYS',
+    'TASK_ARCHIVE_PATH',
+    # Status API config
+    'STATUS_API_HOST',
+    'STATUS_API_PORT',
+    'STATUS_API_URL',
+    'TASK_CACHE_DIR',
+    'REPORT_MAX_SECTION_TASKS',
+    'REPORT_MAX_DATA_LINES',
     # Celery config
     'CELERY_BROKER',
     'CELERY_BACKEND',
@@ -93,6 +116,8 @@ OPTIONAL_VARS = [
     'EMAIL_PASSWORD',
     # Recipe Config
     'BASE_TASK_CONFIG_FILE',
+    # Docker config
+    'DOCKER_CONTAINER_BATCH_SIZE',
 ]
 
 # Environment variable to look for path data in
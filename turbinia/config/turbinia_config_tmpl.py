@@ -26,9 +26,9 @@ from __future__ import unicode_literals
 # separate when running with the same Cloud projects or backend servers.
 INSTANCE_ID = 'turbinia-instance1'
 
-# Which state manager to use. Valid options are 'Datastore' or 'Redis'.  Use
-# 'Datastore' for Cloud (GCP) or hybrid installations, and 'Redis' for local
-# installations.
+# Which state manager to use. Valid options are 'Datastore', 'Redis' or
+# 'SQLite'.  Use 'Datastore' for Cloud (GCP) or hybrid installations, 'Redis'
+# for local installations, and 'SQLite' for single node installations.
 STATE_MANAGER = 'Datastore'
 
 # Which Task manager to use. Valid options are 'PSQ' and 'Celery'.  Use 'PSQ'
@@ -39,6 +39,20 @@ TASK_MANAGER = 'PSQ'
 # Default base output directory for worker results and evidence.
 OUTPUT_DIR = '/var/tmp'
 
+# Layout of the Task output directories in OUTPUT_DIR and TMP_DIR.  By default
+# ('flat') every Task gets a directory directly in the base directory.  Set this
+# to 'hierarchical' to opt in to creating the Task directories under
+# <INSTANCE_ID>/<request shard>/<request id>/<job name>/, which keeps the
+# directories small and is required for removing expired request output with
+# OUTPUT_RETENTION_DAYS.
+OUTPUT_DIR_LAYOUT = 'flat'
+
+# Number of days to keep the local output of completed requests for when
+# running 'turbiniactl cleanupoutput'.  Expired output is archived into
+# OUTPUT_ARCHIVE_DIR if it is set, or deleted otherwise.
+OUTPUT_RETENTION_DAYS = None
+OUTPUT_ARCHIVE_DIR = None
+
 # Directory for temporary files.  Some temporary files can be quite large (e.g.
 # Plaso files can easily be multiple gigabytes), so make sure there is enough
 # space.  Nothing from this directory will be saved.  This directory should be
@@ -57,6 +71,29 @@ SLEEP_TIME = 10
 # Whether to run as a single run, or to keep server running indefinitely
 SINGLE_RUN = False
 
+# Port the server serves the HTTP status API on, for clients to query Tasks,
+# requests and statistics directly from the state manager.  The API is not
+# authenticated, so only listen on addresses trusted clients can reach.  Set
+# STATUS_API_PORT to None to disable the API.  Clients use the API instead of
+# Cloud Functions or the state manager when STATUS_API_URL is set, e.g.
+# STATUS_API_URL = 'http://turbinia-server:8008'
+STATUS_API_HOST = 'localhost'
+STATUS_API_PORT = None
+STATUS_API_URL = None
+
+# Directory clients cache the Task records of requests in, so that repeated
+# status queries for a request only fetch the Tasks that changed since the last
+# query.  Set to None to disable the cache.
+TASK_CACHE_DIR = '~/.turbinia/task-cache'
+
+# Limits for markdown reports of Tasks, so that reports of very large requests
+# stay readable.  REPORT_MAX_SECTION_TASKS is the number of Tasks listed in each
+# report section before the remaining Tasks are summarized by name, and
+# REPORT_MAX_DATA_LINES is the number of lines of reported data included per
+# Task.  Set to None for no limit.
+REPORT_MAX_SECTION_TASKS = None
+REPORT_MAX_DATA_LINES = None
+
 # Local directory in the worker to put other mount directories for locally
 # mounting images/disks
 MOUNT_DIR_PREFIX = '/mnt/turbinia-mounts'
@@ -95,6 +132,12 @@ RECIPE_FILE_DIR = ''
 # This will enable the usage of docker containers for the worker.
 DOCKER_ENABLED = False
 
+# When set, Docker containers found by the DockerContainersEnumerationJob are
+# grouped into batches of this many containers, which are then processed by a
+# single Task each, instead of creating one Task per container.  All Jobs that
+# process DockerContainer evidence also accept these batches.
+DOCKER_CONTAINER_BATCH_SIZE = None
+
 # Any jobs added to this list will disable it from being used.
 DISABLED_JOBS = []
 
@@ -168,11 +211,42 @@ PSQ_TOPIC = 'turbinia-psq'
 # different than the PSQ_TOPIC variable.
 PUBSUB_TOPIC = INSTANCE_ID
 
+# The PubSub topic the server relays Task state changes to when using the
+# Datastore state manager, so that clients waiting for requests do not need to
+# poll.  Set to None to disable.
+PUBSUB_TASK_EVENTS_TOPIC = '%s-task-events' % INSTANCE_ID
+
 # GCS Path to copy worker results and Evidence output to.
 # Otherwise, set this as 'None' if output will be stored in shared storage.
 # GCS_OUTPUT_PATH = 'gs://%s/output' % BUCKET_NAME
 GCS_OUTPUT_PATH = None
 
+# Files of at least this many bytes are transferred to and from GCS as
+# multiple parts in parallel.  The size of each part and the number of parts
+# transferred concurrently can also be set.  Set these to None to use the
+# default values.
+GCS_PARALLEL_THRESHOLD = 256 * 1024 * 1024
+GCS_PART_SIZE = 64 * 1024 * 1024
+GCS_TRANSFER_THREADS = 8
+
+# Store files saved to GCS by the hash of their content so that identical files
+# are only uploaded and stored once.  The Task output directories will then
+# contain a manifest.json file mapping the file names to the content objects
+# stored in the 'blobs' directory under GCS_OUTPUT_PATH.
+GCS_OUTPUT_DEDUP = False
+
+# Number of threads on each worker used to save Task output in the background
+# while Tasks are still running.
+OUTPUT_UPLOAD_THREADS = 4
+
+# Local directory to cache Evidence files retrieved from GCS in, so that Tasks
+# running on the same worker only download the same file once.  Cached files
+# are linked into the Task output directories, so this should be on the same
+# filesystem as OUTPUT_DIR.  Set this to None to disable the cache.  The
+# maximum size of the cache is in bytes.
+EVIDENCE_CACHE_DIR = None
+EVIDENCE_CACHE_SIZE = 50 * 1024 * 1024 * 1024
+
 ################################################################################
 #                           Celery / Redis / Kombu
 #
@@ -200,6 +274,20 @@ REDIS_HOST = 'localhost'
 REDIS_PORT = '6379'
 REDIS_DB = '0'
 
+# Use SQLite for state management.  The database file is shared by the server
+# and the clients, so it needs to be on the local filesystem of the node.
+SQLITE_DB_PATH = '/var/lib/turbinia/turbinia.db'
+
+# Number of days to keep Task records in the state manager when running
+# 'turbiniactl maintenance compact', keyed by Task state ('successful',
+# 'failed' or 'running').  Records that were not updated for longer are moved
+# into compressed per day archive files in TASK_ARCHIVE_PATH, which can be a
+# local directory or a gs:// path, and can still be queried with
+# 'turbiniactl status --archived'.  For example:
+# TASK_RETENTION_DAYS = {'successful': 30, 'failed': 30, 'running': 90}
+TASK_RETENTION_DAYS = None
+TASK_ARCHIVE_PATH = '%s/turbinia-task-archive' % OUTPUT_DIR
+
 ################################################################################
 #                           Email Config
 #
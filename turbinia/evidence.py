@@ -17,8 +17,10 @@
 from __future__ import unicode_literals
 
 import json
+import logging
 import os
 import sys
+import uuid
 
 from turbinia import config
 from turbinia import TurbiniaException
@@ -32,6 +34,8 @@ config.LoadConfig()
 if config.TASK_MANAGER.lower() == 'psq':
   from turbinia.processors import google_cloud
 
+log = logging.getLogger('turbinia')
+
 
 def evidence_decode(evidence_dict):
   """Decode JSON into appropriate Evidence object.
@@ -92,6 +96,7 @@ class Evidence(object):
         PlasoFile, but not RawDisk).
     name (str): Name of evidence.
     description (str): Description of evidence.
+    id (str): Unique Id of the evidence (string of hex).
     saved_path (str): Path to secondary location evidence is saved for later
         retrieval (e.g. GCS).
     saved_path_type (str): The name of the output writer that saved evidence
@@ -125,6 +130,7 @@ class Evidence(object):
     self.context_dependent = False
     self.cloud_only = False
     self.description = description
+    self.id = uuid.uuid4().hex
     self.mount_path = None
     self.source = source
     self.source_path = source_path
@@ -141,6 +147,7 @@ class Evidence(object):
     self.name = name if name else self.type
     self.saved_path = None
     self.saved_path_type = None
+    self._remote_opener = None
 
     if self.copyable and not self.local_path:
       raise TurbiniaException(
@@ -174,9 +181,20 @@ class Evidence(object):
     new_object.__dict__.update(dictionary)
     return new_object
 
+  def __getstate__(self):
+    """Returns the state to pickle, without the remote opener.
+
+    The remote opener is bound to the worker's Output Manager, which can not be
+    pickled and is only meaningful on the worker that set it up.
+    """
+    state = self.__dict__.copy()
+    state.pop('_remote_opener', None)
+    return state
+
   def serialize(self):
     """Return JSON serializable object."""
     serialized_evidence = self.__dict__.copy()
+    serialized_evidence.pop('_remote_opener', None)
     if self.parent_evidence:
       serialized_evidence['parent_evidence'] = self.parent_evidence.serialize()
     return serialized_evidence
@@ -217,6 +235,37 @@ class Evidence(object):
     """
     pass
 
+  def set_remote_opener(self, opener):
+    """Sets up streaming access to the saved copy of the Evidence data.
+
+    Args:
+      opener (function): Function taking this Evidence object and returning a
+          file-like object reading the saved Evidence data on demand.
+    """
+    self._remote_opener = opener
+
+  def open(self):
+    """Opens the Evidence data for reading.
+
+    The local copy of the data is used if it exists, otherwise the saved copy is
+    read on demand if streaming access has been set up with
+    set_remote_opener().
+
+    Returns:
+      A read-only binary file-like object.
+
+    Raises:
+      TurbiniaException: If the Evidence data is not available.
+    """
+    if self.local_path and os.path.isfile(self.local_path):
+      return open(self.local_path, 'rb')
+    opener = getattr(self, '_remote_opener', None)
+    if opener:
+      return opener(self)
+    raise TurbiniaException(
+        'Data for evidence {0:s} is not available locally at {1!s}'.format(
+            self.name, self.local_path))
+
   def preprocess(self, tmp_dir=None):
     """Runs the possible parent's evidence preprocessing code, then ours.
 
@@ -272,18 +321,33 @@ class Evidence(object):
 class EvidenceCollection(Evidence):
   """A Collection of Evidence objects.
 
+  Besides full Evidence objects, a collection can hold lightweight references
+  to Evidence that has been written to the state manager, which are only
+  resolved when get_evidence() is called.  This keeps the serialized collection
+  small when it is sent to the workers.
+
   Attributes:
     collection(list): The underlying Evidence objects
+    references(list(dict)): References to Evidence objects, with the id, type
+        and saved_path of the Evidence.
+    resolve_request_evidence(bool): Whether all the Evidence stored for the
+        request_id of this collection should be included when resolving it.
   """
 
-  def __init__(self, collection=None, *args, **kwargs):
+  def __init__(
+      self, collection=None, references=None, resolve_request_evidence=False,
+      *args, **kwargs):
     """Initialization for Evidence Collection object."""
     super(EvidenceCollection, self).__init__(*args, **kwargs)
     self.collection = collection if collection else []
+    self.references = references if references else []
+    self.resolve_request_evidence = resolve_request_evidence
+    self._resolved_evidence = None
 
   def serialize(self):
     """Return JSON serializable object."""
     serialized_evidence = super(EvidenceCollection, self).serialize()
+    serialized_evidence.pop('_resolved_evidence', None)
     serialized_evidence['collection'] = [e.serialize() for e in self.collection]
     return serialized_evidence
 
@@ -295,6 +359,71 @@ class EvidenceCollection(Evidence):
     """
     self.collection.append(evidence)
 
+  def add_evidence_reference(self, evidence):
+    """Adds a reference to evidence to the collection.
+
+    The evidence itself needs to be written to the state manager so that the
+    reference can be resolved later.
+
+    Args:
+      evidence (Evidence): The evidence to add a reference to.
+    """
+    self.references.append({
+        'id': evidence.id,
+        'type': evidence.type,
+        'saved_path': evidence.saved_path
+    })
+    self._resolved_evidence = None
+
+  def get_evidence(self, state_manager_=None):
+    """Gets all Evidence in the collection, resolving any references.
+
+    Args:
+      state_manager_ (BaseStateManager): The state manager to resolve the
+          references with.  If not set, a new one will be created.
+
+    Returns:
+      list(Evidence): The Evidence objects in the collection.
+    """
+    if self._resolved_evidence is not None:
+      return self._resolved_evidence
+    if not self.references and not self.resolve_request_evidence:
+      return self.collection
+
+    if not state_manager_:
+      # Doing a delayed import to avoid circular dependencies.
+      from turbinia import state_manager
+      state_manager_ = state_manager.get_state_manager()
+
+    evidence_ids = [evidence.id for evidence in self.collection]
+    references = list(self.references)
+    if self.resolve_request_evidence and self.request_id:
+      references.extend(
+          {'id': evidence_id}
+          for evidence_id in state_manager_.get_request_evidence_ids(
+              self.request_id))
+
+    resolved_evidence = list(self.collection)
+    for reference in references:
+      if reference['id'] in evidence_ids:
+        continue
+      evidence_ids.append(reference['id'])
+      evidence_dict = state_manager_.get_evidence(reference['id'])
+      if not evidence_dict and reference.get('type'):
+        log.warning(
+            'Evidence {0:s} not found in state manager, using reference '
+            'only'.format(reference['id']))
+        # Copyable evidence needs a source_path, so point it to the saved copy.
+        evidence_dict = dict(reference, source_path=reference['saved_path'])
+      if not evidence_dict:
+        log.warning(
+            'Evidence {0:s} not found in state manager'.format(reference['id']))
+        continue
+      resolved_evidence.append(evidence_decode(evidence_dict))
+
+    self._resolved_evidence = resolved_evidence
+    return self._resolved_evidence
+
 
 class Directory(Evidence):
   """Filesystem directory evidence."""
@@ -307,23 +436,43 @@ class CompressedDirectory(Evidence):
   Attributes:
     compressed_directory: The path to the compressed directory.
     uncompressed_directory: The path to the uncompressed directory.
+    lazy_extraction (bool): Whether to skip uncompressing the archive during
+        pre-processing when it has a member index.  The archive contents can
+        then be read with open_archive() instead of from local_path.
   """
 
   def __init__(
-      self, compressed_directory=None, uncompressed_directory=None, *args,
-      **kwargs):
+      self, compressed_directory=None, uncompressed_directory=None,
+      lazy_extraction=False, *args, **kwargs):
     """Initialization for CompressedDirectory evidence object."""
     super(CompressedDirectory, self).__init__(*args, **kwargs)
     self.compressed_directory = compressed_directory
     self.uncompressed_directory = uncompressed_directory
+    self.lazy_extraction = lazy_extraction
     self.copyable = True
 
   def _preprocess(self, tmp_dir):
+    if self.lazy_extraction and archive.ReadArchiveIndex(self.local_path):
+      self.compressed_directory = self.local_path
+      return
+
     # Uncompress a given tar file and return the uncompressed path.
     self.uncompressed_directory = archive.UncompressTarFile(
         self.local_path, tmp_dir)
     self.local_path = self.uncompressed_directory
 
+  def open_archive(self):
+    """Opens the compressed directory for random access without extraction.
+
+    Returns:
+      archive.IndexedArchive: The read-only view of the archive contents.
+
+    Raises:
+      TurbiniaException: If the archive has no index.
+    """
+    path = self.compressed_directory or self.local_path
+    return archive.IndexedArchive(path)
+
   def compress(self):
     """ Compresses a file or directory."""
     # Compress a given directory and return the compressed path.
@@ -653,3 +802,50 @@ class DockerContainer(Evidence):
   def _postprocess(self):
     # Unmount the container's filesystem
     mount_local.PostprocessUnmountPath(self._container_fs_path)
+
+
+class DockerContainerCollection(Evidence):
+  """Evidence object for a set of DockerContainer filesystems.
+
+  All the containers are mounted under a single mount of the parent evidence,
+  so that container level analysis can run over many containers in one Task.
+
+  Attributes:
+    container_ids(list(str)): The IDs of the containers to mount.
+    mount_paths(dict): Full paths to the mounted container filesystems, keyed
+      by container ID.
+    _docker_root_directory(str): Full path to the docker root directory.
+  """
+
+  def __init__(self, container_ids=None, *args, **kwargs):
+    """Initialization for Docker Container Collection."""
+    super(DockerContainerCollection, self).__init__(*args, **kwargs)
+    self.container_ids = container_ids if container_ids else []
+    self.mount_paths = {}
+    self._docker_root_directory = None
+    self._mount_manager = None
+
+    self.context_dependent = True
+
+  def serialize(self):
+    """Return JSON serializable object."""
+    serialized_evidence = super(DockerContainerCollection, self).serialize()
+    serialized_evidence.pop('_mount_manager', None)
+    return serialized_evidence
+
+  def _preprocess(self, _):
+    self._docker_root_directory = os.path.join(
+        self.parent_evidence.mount_path,
+        DockerContainer.DEFAULT_DOCKER_DIRECTORY_PATH)
+    self._mount_manager = docker.DockerContainerMountManager(
+        self._docker_root_directory)
+    try:
+      self.mount_paths = self._mount_manager.mount_all(self.container_ids)
+    except TurbiniaException:
+      self._mount_manager.unmount_all()
+      raise
+
+  def _postprocess(self):
+    if self._mount_manager:
+      self._mount_manager.unmount_all()
+    self.mount_paths = {}
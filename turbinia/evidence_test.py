@@ -19,6 +19,8 @@ from __future__ import unicode_literals
 import json
 import unittest
 
+import mock
+
 from turbinia import evidence
 from turbinia import TurbiniaException
 
@@ -66,6 +68,49 @@ class TestTurbiniaEvidence(unittest.TestCase):
     self.assertIsInstance(serialized_evidence, dict)
     self.assertEqual(collection_evidence['name'], 'My Evidence')
 
+  def testEvidenceCollectionReferences(self):
+    """Test that EvidenceCollection references are resolved lazily."""
+    rawdisk = evidence.RawDisk(name='My Evidence', source_path='/tmp/foo.img')
+    plaso_file = evidence.PlasoFile(source_path='/tmp/foo.plaso')
+    plaso_file.saved_path = 'gs://bucket/foo.plaso'
+    collection = evidence.EvidenceCollection(resolve_request_evidence=True)
+    collection.request_id = 'testRequestId'
+    collection.add_evidence_reference(rawdisk)
+    collection.add_evidence_reference(plaso_file)
+    collection_new = evidence.evidence_decode(json.loads(collection.to_json()))
+    self.assertEqual(collection_new.collection, [])
+    self.assertEqual(len(collection_new.references), 2)
+
+    state_manager = mock.MagicMock()
+    state_manager.get_evidence.side_effect = (
+        lambda evidence_id: rawdisk.serialize()
+        if evidence_id == rawdisk.id else None)
+    state_manager.get_request_evidence_ids.return_value = [
+        rawdisk.id, plaso_file.id
+    ]
+    resolved = collection_new.get_evidence(state_manager)
+    self.assertEqual(len(resolved), 2)
+    self.assertIsInstance(resolved[0], evidence.RawDisk)
+    self.assertEqual(resolved[0].name, 'My Evidence')
+    # Evidence that is not stored is created from the reference.
+    self.assertIsInstance(resolved[1], evidence.PlasoFile)
+    self.assertEqual(resolved[1].id, plaso_file.id)
+    self.assertEqual(resolved[1].saved_path, 'gs://bucket/foo.plaso')
+    # Resolved evidence is cached.
+    self.assertIs(collection_new.get_evidence(state_manager), resolved)
+    state_manager.get_request_evidence_ids.assert_called_once_with(
+        'testRequestId')
+
+  def testEvidenceOpen(self):
+    """Test opening evidence data locally or from a remote opener."""
+    plaso_file = evidence.PlasoFile(source_path='/nonexistent/file.plaso')
+    self.assertRaises(TurbiniaException, plaso_file.open)
+
+    remote_file = mock.MagicMock()
+    plaso_file.set_remote_opener(lambda evidence_: remote_file)
+    self.assertEqual(plaso_file.open(), remote_file)
+    self.assertNotIn('_remote_opener', plaso_file.serialize())
+
   def testEvidenceSerializationBadType(self):
     """Test that evidence_decode throws error on non-dict type."""
     self.assertRaises(TurbiniaException, evidence.evidence_decode, [1, 2])
@@ -17,6 +17,7 @@
 from __future__ import unicode_literals
 
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
 from turbinia.evidence import RawDisk
@@ -30,7 +31,7 @@ class DockerContainersEnumerationJob(interface.TurbiniaJob):
 
   # Types of evidence that this Job will process.
   evidence_input = [GoogleCloudDisk, GoogleCloudDiskRawEmbedded, RawDisk]
-  evidence_output = [DockerContainer]
+  evidence_output = [DockerContainer, DockerContainerCollection]
 
   NAME = 'DockerContainersEnumerationJob'
 
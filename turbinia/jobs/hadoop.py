@@ -17,6 +17,7 @@
 from __future__ import unicode_literals
 
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
 from turbinia.evidence import RawDisk
@@ -30,7 +31,8 @@ class HadoopAnalysisJob(interface.TurbiniaJob):
   """Analyzes Hadoop AppRoot files."""
 
   evidence_input = [
-      DockerContainer, GoogleCloudDisk, GoogleCloudDiskRawEmbedded, RawDisk
+      DockerContainer, DockerContainerCollection, GoogleCloudDisk,
+      GoogleCloudDiskRawEmbedded, RawDisk
   ]
   evidence_output = [ReportText]
 
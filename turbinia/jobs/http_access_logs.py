@@ -19,6 +19,7 @@ from turbinia.workers import artifact
 
 from turbinia.evidence import Directory
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import RawDisk
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
@@ -37,8 +38,8 @@ class HTTPAccessLogExtractionJob(interface.TurbiniaJob):
   """HTTP Access log extraction job."""
 
   evidence_input = [
-      Directory, DockerContainer, RawDisk, GoogleCloudDisk,
-      GoogleCloudDiskRawEmbedded
+      Directory, DockerContainer, DockerContainerCollection, RawDisk,
+      GoogleCloudDisk, GoogleCloudDiskRawEmbedded
   ]
 
   evidence_output = [ExportedFileArtifact]
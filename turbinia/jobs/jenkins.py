@@ -18,6 +18,7 @@ from __future__ import unicode_literals
 
 from turbinia.evidence import Directory
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import RawDisk
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
@@ -31,8 +32,8 @@ class JenkinsAnalysisJob(interface.TurbiniaJob):
   """Jenkins analysis job."""
 
   evidence_input = [
-      Directory, DockerContainer, RawDisk, GoogleCloudDisk,
-      GoogleCloudDiskRawEmbedded
+      Directory, DockerContainer, DockerContainerCollection, RawDisk,
+      GoogleCloudDisk, GoogleCloudDiskRawEmbedded
   ]
   evidence_output = [ReportText]
 
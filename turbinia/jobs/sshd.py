@@ -20,6 +20,7 @@ from turbinia.workers import artifact
 from turbinia.workers import sshd
 from turbinia.evidence import Directory
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
 from turbinia.evidence import ExportedFileArtifact
@@ -34,8 +35,8 @@ class SSHDExtractionJob(interface.TurbiniaJob):
 
   # The types of evidence that this Job will process
   evidence_input = [
-      Directory, DockerContainer, RawDisk, GoogleCloudDisk,
-      GoogleCloudDiskRawEmbedded
+      Directory, DockerContainer, DockerContainerCollection, RawDisk,
+      GoogleCloudDisk, GoogleCloudDiskRawEmbedded
   ]
 
   evidence_output = [ExportedFileArtifact]
@@ -18,6 +18,7 @@ from turbinia.workers import artifact
 from turbinia.workers import tomcat
 from turbinia.evidence import Directory
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
 from turbinia.evidence import GoogleCloudDisk
 from turbinia.evidence import GoogleCloudDiskRawEmbedded
 from turbinia.evidence import ExportedFileArtifact
@@ -32,8 +33,8 @@ class TomcatExtractionJob(interface.TurbiniaJob):
 
   # The types of evidence that this Job will process
   evidence_input = [
-      Directory, DockerContainer, RawDisk, GoogleCloudDisk,
-      GoogleCloudDiskRawEmbedded
+      Directory, DockerContainer, DockerContainerCollection, RawDisk,
+      GoogleCloudDisk, GoogleCloudDiskRawEmbedded
   ]
 
   evidence_output = [ExportedFileArtifact]
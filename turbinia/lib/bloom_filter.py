@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A simple bloom filter for string keys."""
+
+from __future__ import unicode_literals
+
+import hashlib
+import math
+import struct
+import threading
+
+
+class BloomFilter(object):
+  """A fixed size bloom filter.
+
+  Lookups can return false positives at roughly the configured error rate once
+  the filter holds its capacity, but never false negatives.
+
+  Attributes:
+    capacity (int): The number of keys the filter is sized for.
+    error_rate (float): The false positive rate at capacity.
+    num_bits (int): The size of the filter in bits.
+    num_hashes (int): The number of bits set for each key.
+  """
+
+  def __init__(self, capacity=1000000, error_rate=0.001):
+    """Initialization for BloomFilter.
+
+    Args:
+      capacity (int): The number of keys the filter is sized for.
+      error_rate (float): The false positive rate at capacity.
+    """
+    self.capacity = capacity
+    self.error_rate = error_rate
+    self.num_bits = int(
+        math.ceil(-capacity * math.log(error_rate) / (math.log(2)**2)))
+    self.num_hashes = max(
+        1, int(round(self.num_bits / float(capacity) * math.log(2))))
+    self._bits = bytearray((self.num_bits + 7) // 8)
+    self._lock = threading.Lock()
+
+  def _get_indexes(self, key):
+    """Gets the bit indexes for a key using double hashing.
+
+    Args:
+      key (str): The key to get the indexes for.
+
+    Returns:
+      list(int): The bit indexes.
+    """
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    first, second = struct.unpack('<QQ', digest[:16])
+    second |= 1
+    return [
+        (first + i * second) % self.num_bits for i in range(self.num_hashes)
+    ]
+
+  def add(self, key):
+    """Adds a key to the filter.
+
+    Args:
+      key (str): The key to add.
+    """
+    with self._lock:
+      for index in self._get_indexes(key):
+        self._bits[index // 8] |= 1 << (index % 8)
+
+  def __contains__(self, key):
+    return all(
+        self._bits[index // 8] & (1 << (index % 8))
+        for index in self._get_indexes(key))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the bloom_filter module."""
+
+from __future__ import unicode_literals
+
+import unittest
+
+from turbinia.lib import bloom_filter
+
+
+class BloomFilterTest(unittest.TestCase):
+  """Tests for the BloomFilter class."""
+
+  def testBloomFilter(self):
+    """Tests adding and looking up keys."""
+    test_filter = bloom_filter.BloomFilter(capacity=1000, error_rate=0.01)
+    self.assertEqual(test_filter.num_hashes, 7)
+    keys = ['key{0:d}'.format(i) for i in range(1000)]
+    for key in keys:
+      test_filter.add(key)
+
+    self.assertTrue(all(key in test_filter for key in keys))
+    false_positives = sum(
+        'other{0:d}'.format(i) in test_filter for i in range(1000))
+    self.assertLess(false_positives, 50)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Size bounded, disk backed LRU cache of files shared between processes."""
+
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import filelock
+
+from turbinia import TurbiniaException
+from turbinia.lib import file_copy
+
+log = logging.getLogger('turbinia')
+
+
+class FileCache(object):
+  """LRU cache of files stored in a local directory.
+
+  Cached files are stored by the hash of their key and are linked (or copied
+  if that is not possible) in and out of the cache.  The modification time of
+  the cached files is used to track when they were last used, and the least
+  recently used files are removed when the cache grows larger than its maximum
+  size.  Lookups, statistics and evictions are done while holding a lock file
+  in the cache directory, so the cache can be shared by multiple processes.
+  Files are copied outside of the lock into temporary files that are renamed
+  into place, and a file that is copied out of the cache is pinned by a
+  hardlink so that it can not be evicted while it is copied.
+
+  Cached files must not be modified, because they can share their data with
+  the files that were copied out of the cache.
+
+  Attributes:
+    cache_dir (str): The directory the files are cached in.
+    max_size (int): The maximum total size of the cached files in bytes.
+  """
+
+  LOCK_NAME = '.lock'
+  STATS_NAME = '.stats.json'
+  DATA_SUFFIX = '.data'
+
+  def __init__(self, cache_dir, max_size):
+    """Initialization for FileCache.
+
+    Args:
+      cache_dir (str): The directory to cache files in.
+      max_size (int): The maximum total size of the cached files in bytes.
+
+    Raises:
+      TurbiniaException: If the cache directory can not be created.
+    """
+    self.cache_dir = cache_dir
+    self.max_size = max_size
+    if not os.path.exists(cache_dir):
+      try:
+        os.makedirs(cache_dir)
+      except OSError as exception:
+        if not os.path.isdir(cache_dir):
+          raise TurbiniaException(
+              'Could not create cache directory {0:s}: {1!s}'.format(
+                  cache_dir, exception))
+    self._lock = filelock.FileLock(os.path.join(cache_dir, self.LOCK_NAME))
+    self._stats_path = os.path.join(cache_dir, self.STATS_NAME)
+
+  def _get_path(self, key):
+    """Gets the path of the cached file for a key.
+
+    Args:
+      key (str): The cache key.
+
+    Returns:
+      str: The path of the cached file.
+    """
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(self.cache_dir, digest + self.DATA_SUFFIX)
+
+  @staticmethod
+  def _get_temp_path(path, suffix):
+    """Gets a temporary path next to a file unique to the current thread.
+
+    Args:
+      path (str): The path of the file.
+      suffix (str): The suffix of the temporary path.
+
+    Returns:
+      str: The temporary path.
+    """
+    thread_id = threading.current_thread().ident
+    return '{0:s}.{1:d}.{2:d}.{3:s}'.format(
+        path, os.getpid(), thread_id, suffix)
+
+  def _read_stats(self):
+    """Reads the cache statistics.  Must be called with the lock held.
+
+    Returns:
+      dict: The number of hits and misses and the bytes saved by cache hits.
+    """
+    stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+    try:
+      with open(self._stats_path, 'rb') as file_object:
+        stats.update(json.loads(file_object.read().decode('utf-8')))
+    except (IOError, OSError, ValueError):
+      pass
+    return stats
+
+  def _update_stats(self, hits=0, misses=0, bytes_saved=0):
+    """Updates the cache statistics.  Must be called with the lock held.
+
+    Args:
+      hits (int): The number of hits to add.
+      misses (int): The number of misses to add.
+      bytes_saved (int): The number of bytes saved to add.
+    """
+    stats = self._read_stats()
+    stats['hits'] += hits
+    stats['misses'] += misses
+    stats['bytes_saved'] += bytes_saved
+    try:
+      with open(self._stats_path, 'wb') as file_object:
+        file_object.write(json.dumps(stats).encode('utf-8'))
+    except (IOError, OSError) as exception:
+      log.warning('Could not write cache statistics: {0!s}'.format(exception))
+
+  def _evict(self):
+    """Removes least recently used files until the cache fits its maximum size.
+
+    Must be called with the lock held.
+    """
+    entries = []
+    total_size = 0
+    for name in os.listdir(self.cache_dir):
+      if not name.endswith(self.DATA_SUFFIX):
+        continue
+      path = os.path.join(self.cache_dir, name)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      entries.append((stat.st_mtime, stat.st_size, path))
+      total_size += stat.st_size
+
+    for _, size, path in sorted(entries):
+      if total_size <= self.max_size:
+        break
+      log.debug('Evicting {0:s} from the file cache'.format(path))
+      os.remove(path)
+      total_size -= size
+
+  def get(self, key, destination_path):
+    """Copies a cached file out of the cache.
+
+    Args:
+      key (str): The cache key.
+      destination_path (str): The path to copy the cached file to.  Any
+          existing file at this path is replaced.
+
+    Returns:
+      bool: True if the file was cached, otherwise False.
+    """
+    cache_path = self._get_path(key)
+    pin_path = self._get_temp_path(cache_path, 'pin')
+    temp_path = self._get_temp_path(destination_path, 'tmp')
+    with self._lock:
+      if not os.path.exists(cache_path):
+        self._update_stats(misses=1)
+        return False
+      try:
+        os.link(cache_path, pin_path)
+      except OSError as exception:
+        if exception.errno not in file_copy.UNSUPPORTED_ERRNOS:
+          raise
+        # Without hardlinks the file is copied while evictions are blocked.
+        file_copy.copy_file(cache_path, temp_path, allow_hardlink=False)
+        pin_path = None
+      os.utime(cache_path, None)
+      size = os.path.getsize(cache_path)
+      self._update_stats(hits=1, bytes_saved=size)
+
+    try:
+      if pin_path:
+        file_copy.copy_file(pin_path, temp_path)
+      os.rename(temp_path, destination_path)
+    finally:
+      if pin_path:
+        os.remove(pin_path)
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+    log.info(
+        'Retrieved {0:s} from the file cache ({1:d} bytes)'.format(key, size))
+    return True
+
+  def put(self, key, source_path):
+    """Adds a file to the cache.
+
+    Args:
+      key (str): The cache key.
+      source_path (str): The path of the file to cache.
+    """
+    if os.path.getsize(source_path) > self.max_size:
+      log.debug('Not caching {0:s} as it is larger than the cache'.format(key))
+      return
+    cache_path = self._get_path(key)
+    if os.path.exists(cache_path):
+      return
+    temp_path = self._get_temp_path(cache_path, 'tmp')
+    try:
+      file_copy.copy_file(source_path, temp_path)
+      with self._lock:
+        if not os.path.exists(cache_path):
+          os.rename(temp_path, cache_path)
+          os.utime(cache_path, (time.time(), time.time()))
+          self._evict()
+    finally:
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+  def get_stats(self):
+    """Gets the cache statistics.
+
+    Returns:
+      dict: The number of hits and misses, the hit rate, the bytes saved by
+          cache hits and the current size of the cache in bytes.
+    """
+    with self._lock:
+      stats = self._read_stats()
+    stats['size'] = 0
+    for name in os.listdir(self.cache_dir):
+      if name.endswith(self.DATA_SUFFIX):
+        try:
+          stats['size'] += os.path.getsize(os.path.join(self.cache_dir, name))
+        except OSError:
+          # The file was evicted in the meantime.
+          continue
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / float(lookups) if lookups else 0.0
+    return stats
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the file_cache module."""
+
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import unittest
+
+from shutil import rmtree
+
+import mock
+
+from turbinia.lib import file_cache
+from turbinia.lib import file_copy
+
+
+class FileCacheTest(unittest.TestCase):
+  """Tests for the FileCache class."""
+
+  def setUp(self):
+    self.base_output_dir = tempfile.mkdtemp(prefix='turbinia-test-file-cache')
+    self.cache = file_cache.FileCache(
+        os.path.join(self.base_output_dir, 'cache'), 250)
+
+  def tearDown(self):
+    rmtree(self.base_output_dir)
+
+  def _WriteFile(self, name, size):
+    """Writes a test file of the given size."""
+    path = os.path.join(self.base_output_dir, name)
+    with open(path, 'wb') as file_object:
+      file_object.write(name.encode('utf-8') * size)
+    return path
+
+  def testGetPut(self):
+    """Tests adding and retrieving files."""
+    source_path = self._WriteFile('a', 100)
+    destination_path = os.path.join(self.base_output_dir, 'a.copy')
+    self.assertFalse(self.cache.get('key-a', destination_path))
+    self.cache.put('key-a', source_path)
+    os.remove(source_path)
+
+    self.assertTrue(self.cache.get('key-a', destination_path))
+    with open(destination_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), b'a' * 100)
+
+    stats = self.cache.get_stats()
+    self.assertEqual(stats['hits'], 1)
+    self.assertEqual(stats['misses'], 1)
+    self.assertEqual(stats['bytes_saved'], 100)
+    self.assertEqual(stats['hit_rate'], 0.5)
+    self.assertEqual(stats['size'], 100)
+
+  def testEviction(self):
+    """Tests that the least recently used files are evicted."""
+    destination_path = os.path.join(self.base_output_dir, 'copy')
+    self.cache.put('key-a', self._WriteFile('a', 100))
+    self.cache.put('key-b', self._WriteFile('b', 100))
+    os.utime(self.cache._get_path('key-a'), (1000, 1000))
+    os.utime(self.cache._get_path('key-b'), (2000, 2000))
+    self.assertTrue(self.cache.get('key-a', destination_path))
+
+    self.cache.put('key-c', self._WriteFile('c', 100))
+    self.assertTrue(self.cache.get('key-a', destination_path))
+    self.assertFalse(self.cache.get('key-b', destination_path))
+    self.assertTrue(self.cache.get('key-c', destination_path))
+
+    # Files larger than the cache are not cached.
+    self.cache.put('key-d', self._WriteFile('d', 300))
+    self.assertFalse(self.cache.get('key-d', destination_path))
+
+  def testCopyWithoutLock(self):
+    """Tests that files are copied without holding the cache lock."""
+    copy_file = file_copy.copy_file
+    # pylint: disable=protected-access
+    lock = self.cache._lock
+
+    def _CopyFile(source_path, destination_path, **kwargs):
+      self.assertFalse(lock.is_locked)
+      # Evicting the cached file does not affect a copy in progress.
+      for name in os.listdir(self.cache.cache_dir):
+        if name.endswith(self.cache.DATA_SUFFIX):
+          os.remove(os.path.join(self.cache.cache_dir, name))
+      return copy_file(source_path, destination_path, **kwargs)
+
+    destination_path = os.path.join(self.base_output_dir, 'copy')
+    with mock.patch.object(file_copy, 'copy_file', side_effect=_CopyFile):
+      self.cache.put('key-a', self._WriteFile('a', 100))
+      self.assertTrue(self.cache.get('key-a', destination_path))
+    with open(destination_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), b'a' * 100)
+    # No temporary files are left behind.
+    names = os.listdir(self.cache.cache_dir)
+    self.assertEqual([name for name in names if not name.startswith('.')], [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Copies local files using the cheapest method the file system supports."""
+
+from __future__ import unicode_literals
+
+import errno
+import logging
+import os
+import shutil
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+
+log = logging.getLogger('turbinia')
+
+# The FICLONE ioctl from linux/fs.h, which shares the data blocks of two files
+# on file systems that support reflinks (e.g. btrfs and xfs).
+FICLONE = 0x40049409
+
+# Maximum number of bytes to copy with a single system call.
+MAX_COPY_SIZE = 1024 * 1024 * 1024
+
+# Errors that mean a copy method is not supported for the given files, so that
+# the next method should be tried.
+UNSUPPORTED_ERRNOS = (
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOSYS, errno.ENOTTY,
+    errno.EOPNOTSUPP, errno.EBADF, errno.EMLINK)
+
+METHOD_HARDLINK = 'hardlink'
+METHOD_REFLINK = 'reflink'
+METHOD_COPY_FILE_RANGE = 'copy_file_range'
+METHOD_SENDFILE = 'sendfile'
+METHOD_COPY = 'copy'
+
+
+def _get_data_segments(file_descriptor, size):
+  """Gets the data segments of a possibly sparse file.
+
+  Args:
+    file_descriptor (int): The file descriptor of the file.
+    size (int): The size of the file.
+
+  Returns:
+    list(tuple(int, int)): The offset and size of each segment of data.  Holes
+        in the file are skipped if the file system supports SEEK_DATA and
+        SEEK_HOLE, otherwise this is the whole file.
+  """
+  if not hasattr(os, 'SEEK_DATA'):
+    return [(0, size)]
+
+  segments = []
+  offset = 0
+  try:
+    while offset < size:
+      try:
+        data_offset = os.lseek(file_descriptor, offset, os.SEEK_DATA)
+      except OSError as exception:
+        # ENXIO means there is no more data after the offset.
+        if exception.errno == errno.ENXIO:
+          break
+        raise
+      hole_offset = os.lseek(file_descriptor, data_offset, os.SEEK_HOLE)
+      segments.append((data_offset, hole_offset - data_offset))
+      offset = hole_offset
+  except OSError as exception:
+    if exception.errno not in UNSUPPORTED_ERRNOS:
+      raise
+    return [(0, size)]
+  return segments
+
+
+def _copy_segments(source_fd, destination_fd, segments, method):
+  """Copies data segments between files with copy_file_range or sendfile.
+
+  Args:
+    source_fd (int): The file descriptor of the source file.
+    destination_fd (int): The file descriptor of the destination file.
+    segments (list(tuple(int, int))): The offset and size of each segment.
+    method (str): Either METHOD_COPY_FILE_RANGE or METHOD_SENDFILE.
+
+  Raises:
+    OSError: If the data could not be copied, including when nothing is copied
+        before the end of a segment.
+  """
+  for offset, size in segments:
+    end = offset + size
+    while offset < end:
+      count = min(end - offset, MAX_COPY_SIZE)
+      if method == METHOD_COPY_FILE_RANGE:
+        copied = os.copy_file_range(
+            source_fd, destination_fd, count, offset, offset)
+      else:
+        os.lseek(destination_fd, offset, os.SEEK_SET)
+        copied = os.sendfile(destination_fd, source_fd, offset, count)
+      if not copied:
+        # Some file systems copy nothing rather than failing, which would
+        # otherwise leave a zero filled hole in the destination.
+        raise OSError(
+            errno.EOPNOTSUPP,
+            'No data copied at offset {0:d} with {1:s}'.format(offset, method))
+      offset += copied
+
+
+def _copy_data(source_path, destination_path):
+  """Copies the file data using the cheapest method available.
+
+  Args:
+    source_path (str): The file to copy.
+    destination_path (str): The new file to create.
+
+  Returns:
+    str: The method used to copy the data.
+  """
+  methods = [METHOD_COPY_FILE_RANGE, METHOD_SENDFILE]
+  if fcntl:
+    methods.insert(0, METHOD_REFLINK)
+
+  with open(source_path, 'rb') as source, open(destination_path,
+                                               'wb') as destination:
+    source_fd = source.fileno()
+    destination_fd = destination.fileno()
+    size = os.fstat(source_fd).st_size
+    segments = None
+    for method in methods:
+      try:
+        if method == METHOD_REFLINK:
+          fcntl.ioctl(destination_fd, FICLONE, source_fd)
+          return method
+        if not hasattr(os, method):
+          continue
+        if segments is None:
+          segments = _get_data_segments(source_fd, size)
+        _copy_segments(source_fd, destination_fd, segments, method)
+        # Extend the file to its full size in case it ends with a hole.
+        os.ftruncate(destination_fd, size)
+        return method
+      except (IOError, OSError) as exception:
+        if exception.errno not in UNSUPPORTED_ERRNOS:
+          raise
+        log.debug(
+            'Could not copy {0:s} with {1:s}: {2!s}'.format(
+                source_path, method, exception))
+        destination.truncate(0)
+
+    source.seek(0)
+    destination.seek(0)
+    shutil.copyfileobj(source, destination)
+  return METHOD_COPY
+
+
+def copy_file(source_path, destination_path, allow_hardlink=True):
+  """Copies a file using the cheapest method supported by the file system.
+
+  The methods are tried in the order of hardlink (if allowed), FICLONE reflink,
+  copy_file_range, sendfile and finally a regular copy.  Holes in sparse files
+  are preserved by the copy_file_range and sendfile methods.
+
+  A hardlink shares the data with the source file, so it should only be used
+  when the source file will not be modified after it has been copied.
+
+  Args:
+    source_path (str): The file to copy.
+    destination_path (str): The new file to create.
+    allow_hardlink (bool): Whether the destination can be a hardlink to the
+        source.
+
+  Returns:
+    str: The method used to copy the file.
+  """
+  method = None
+  if allow_hardlink and hasattr(os, 'link'):
+    try:
+      os.link(source_path, destination_path)
+      method = METHOD_HARDLINK
+    except OSError as exception:
+      if exception.errno not in UNSUPPORTED_ERRNOS:
+        raise
+
+  if not method:
+    method = _copy_data(source_path, destination_path)
+    shutil.copymode(source_path, destination_path)
+  return method
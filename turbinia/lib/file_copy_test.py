@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the file_copy module."""
+
+from __future__ import unicode_literals
+
+import errno
+import os
+import tempfile
+import unittest
+
+from shutil import rmtree
+
+import mock
+
+from turbinia.lib import file_copy
+
+
+class FileCopyTest(unittest.TestCase):
+  """Tests for the file_copy module."""
+
+  def setUp(self):
+    self.base_output_dir = tempfile.mkdtemp(prefix='turbinia-test-file-copy')
+    self.source_path = os.path.join(self.base_output_dir, 'source.bin')
+    self.destination_path = os.path.join(self.base_output_dir, 'dest.bin')
+
+  def tearDown(self):
+    rmtree(self.base_output_dir)
+
+  def _WriteSparseFile(self):
+    """Writes a file with data at the start and middle and a hole at the end."""
+    with open(self.source_path, 'wb') as file_object:
+      file_object.write(b'a' * 4096)
+      file_object.seek(2**20)
+      file_object.write(b'b' * 4096)
+      file_object.truncate(4 * 2**20)
+    os.chmod(self.source_path, 0o640)
+
+  def _ReadFile(self, path):
+    """Reads the contents of a file."""
+    with open(path, 'rb') as file_object:
+      return file_object.read()
+
+  def testCopyFileHardlink(self):
+    """Tests copy_file creating a hardlink."""
+    self._WriteSparseFile()
+    method = file_copy.copy_file(self.source_path, self.destination_path)
+    self.assertEqual(method, file_copy.METHOD_HARDLINK)
+    self.assertEqual(
+        os.stat(self.source_path).st_ino,
+        os.stat(self.destination_path).st_ino)
+
+  @mock.patch('turbinia.lib.file_copy.fcntl')
+  def testCopyFileSparse(self, mock_fcntl):
+    """Tests copy_file copying a sparse file without hardlinks or reflinks."""
+    mock_fcntl.ioctl.side_effect = OSError(errno.EOPNOTSUPP, 'Not supported')
+    self._WriteSparseFile()
+    method = file_copy.copy_file(
+        self.source_path, self.destination_path, allow_hardlink=False)
+    self.assertIn(
+        method, (file_copy.METHOD_COPY_FILE_RANGE, file_copy.METHOD_SENDFILE))
+    self.assertEqual(
+        self._ReadFile(self.source_path), self._ReadFile(self.destination_path))
+    self.assertEqual(os.stat(self.destination_path).st_mode & 0o777, 0o640)
+    self.assertLessEqual(
+        os.stat(self.destination_path).st_blocks,
+        os.stat(self.source_path).st_blocks)
+
+  @mock.patch('turbinia.lib.file_copy.fcntl', None)
+  def testCopyFileFallback(self):
+    """Tests copy_file falling back to a regular copy."""
+    self._WriteSparseFile()
+    with mock.patch('turbinia.lib.file_copy._copy_segments') as mock_copy:
+      mock_copy.side_effect = OSError(errno.ENOSYS, 'Not implemented')
+      method = file_copy.copy_file(
+          self.source_path, self.destination_path, allow_hardlink=False)
+    self.assertEqual(method, file_copy.METHOD_COPY)
+    self.assertEqual(
+        self._ReadFile(self.source_path), self._ReadFile(self.destination_path))
+
+  @mock.patch('turbinia.lib.file_copy.fcntl', None)
+  def testCopyFileShortCopy(self):
+    """Tests copy_file falling back when copy_file_range copies nothing."""
+    self._WriteSparseFile()
+    with mock.patch.object(os, 'copy_file_range', create=True) as mock_copy:
+      mock_copy.return_value = 0
+      method = file_copy.copy_file(
+          self.source_path, self.destination_path, allow_hardlink=False)
+    mock_copy.assert_called()
+    self.assertIn(method, (file_copy.METHOD_SENDFILE, file_copy.METHOD_COPY))
+    self.assertEqual(
+        self._ReadFile(self.source_path), self._ReadFile(self.destination_path))
+
+  def testGetDataSegments(self):
+    """Tests _get_data_segments."""
+    self._WriteSparseFile()
+    size = os.stat(self.source_path).st_size
+    with open(self.source_path, 'rb') as file_object:
+      segments = file_copy._get_data_segments(file_object.fileno(), size)
+    self.assertTrue(segments)
+    self.assertEqual(segments[0][0], 0)
+    self.assertLess(segments[-1][0] + segments[-1][1], size + 1)
+    copied = bytearray(size)
+    with open(self.source_path, 'rb') as file_object:
+      for offset, length in segments:
+        file_object.seek(offset)
+        copied[offset:offset + length] = file_object.read(length)
+    self.assertEqual(bytes(copied), self._ReadFile(self.source_path))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Mergeable summary statistics for Task run times."""
+
+from __future__ import unicode_literals
+
+import json
+import math
+from datetime import datetime
+from datetime import timedelta
+
+import six
+
+# Rollups are kept per day, and days are compared as strings in this format.
+DAY_FORMAT = '%Y-%m-%d'
+
+# Names of the rollups kept for completed Tasks.  The prefixed rollups are kept
+# per Task type, worker and requesting user.  The requests rollup holds the run
+# time of each completed request, from the start of its earliest Task to the
+# completion of its latest Task, so the number of rollups per day does not grow
+# with the number of requests.
+ROLLUP_ALL = 'all'
+ROLLUP_SUCCESSFUL = 'successful'
+ROLLUP_FAILED = 'failed'
+ROLLUP_REQUESTS = 'requests'
+TYPE_PREFIX = 'type:'
+WORKER_PREFIX = 'worker:'
+USER_PREFIX = 'user:'
+
+
+def get_day(timestamp):
+  """Gets the day bucket of a time.
+
+  Args:
+    timestamp (datetime): The time.
+
+  Returns:
+    str: The day in DAY_FORMAT.
+  """
+  return timestamp.strftime(DAY_FORMAT)
+
+
+def get_start_day(days):
+  """Gets the first day bucket of a time window.
+
+  Args:
+    days (int): The number of days in the window, or 0 for all history.
+
+  Returns:
+    str: The first day in DAY_FORMAT, or None for all history.
+  """
+  if not days:
+    return None
+  return get_day(datetime.now() - timedelta(days=days))
+
+
+def get_task_rollups(task_data, last_update):
+  """Creates the rollups of a single completed Task.
+
+  Args:
+    task_data (dict): The Task dict with the run_time in seconds.
+    last_update (datetime): The time the Task completed.
+
+  Returns:
+    dict: The StatsRollup objects keyed by rollup name, which is empty if the
+        Task has no run time.
+  """
+  run_time = task_data.get('run_time')
+  if not run_time:
+    return {}
+  names = [
+      ROLLUP_ALL,
+      ROLLUP_SUCCESSFUL if task_data.get('successful') else ROLLUP_FAILED
+  ]
+  for prefix, field in ((TYPE_PREFIX, 'name'), (WORKER_PREFIX, 'worker_name'),
+                        (USER_PREFIX, 'requester')):
+    names.append('{0:s}{1!s}'.format(prefix, task_data.get(field)))
+  rollups = {}
+  for name in names:
+    rollups[name] = StatsRollup()
+    rollups[name].add(run_time)
+  return rollups
+
+
+def get_task_span(task_data, last_update):
+  """Gets the start and stop time of a single completed Task.
+
+  The spans of the Tasks of a request are merged to get the run time of the
+  request.
+
+  Args:
+    task_data (dict): The Task dict with the run_time in seconds.
+    last_update (datetime): The time the Task completed.
+
+  Returns:
+    StatsRollup: The rollup with the start and stop time in seconds since the
+        epoch as its minimum and maximum, or None if the Task has no run time.
+  """
+  run_time = task_data.get('run_time')
+  if not run_time:
+    return None
+  stop_time = (last_update - datetime(1970, 1, 1)).total_seconds()
+  span = StatsRollup(track_quantiles=False)
+  span.add(stop_time - run_time)
+  span.add(stop_time)
+  return span
+
+
+def decode_rollups(rows):
+  """Decodes and merges stored rollups.
+
+  Args:
+    rows (iterable(tuple(str, str))): The rollup names and JSON encoded
+        rollups.  The same name can occur multiple times, e.g. for different
+        days.
+
+  Returns:
+    dict: The merged StatsRollup objects keyed by rollup name.
+  """
+  rollups = {}
+  for name, data in rows:
+    rollup = StatsRollup.from_dict(json.loads(six.ensure_text(data)))
+    name = six.ensure_text(name)
+    if name in rollups:
+      rollups[name].merge(rollup)
+    else:
+      rollups[name] = rollup
+  return rollups
+
+
+def merge_encoded_rollup(data, rollup):
+  """Merges a rollup into a JSON encoded rollup.
+
+  Args:
+    data (str): The JSON encoded rollup, or None if there is none yet.
+    rollup (StatsRollup): The rollup to merge.
+
+  Returns:
+    str: The JSON encoded merged rollup.
+  """
+  if data:
+    merged = StatsRollup.from_dict(json.loads(six.ensure_text(data)))
+    merged.merge(rollup)
+  else:
+    merged = rollup
+  return json.dumps(merged.to_dict())
+
+
+class QuantileSketch(object):
+  """A mergeable sketch to estimate quantiles of positive values.
+
+  Small sketches keep the exact values.  Once a sketch holds more than
+  MAX_EXACT_VALUES values, they are moved into logarithmically sized bins
+  (as in DDSketch), so that quantiles are estimated with a bounded relative
+  error while the size of the sketch only grows with the logarithm of the
+  range of the values.
+
+  Attributes:
+    bins (dict): The number of values in each bin, keyed by bin index.
+    relative_accuracy (float): The maximum relative error of the estimated
+        quantiles once the values are binned.
+    values (list(float)): The exact values, or None once they are binned.
+    zero_count (int): The number of values too small to be binned.
+  """
+
+  MAX_EXACT_VALUES = 100
+  # Values below this are counted as zero once the values are binned.
+  MIN_VALUE = 1e-3
+
+  def __init__(self, relative_accuracy=0.01):
+    """Initialization for QuantileSketch.
+
+    Args:
+      relative_accuracy (float): The relative error of binned quantiles.
+    """
+    self.relative_accuracy = relative_accuracy
+    self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    self._log_gamma = math.log(self._gamma)
+    self.values = []
+    self.bins = {}
+    self.zero_count = 0
+
+  @property
+  def count(self):
+    """The number of values in the sketch."""
+    if self.values is not None:
+      return len(self.values)
+    return self.zero_count + sum(self.bins.values())
+
+  def _add_binned(self, value, count=1):
+    """Adds a value to the bins.
+
+    Args:
+      value (float): The value to add.
+      count (int): The number of times to add the value.
+    """
+    if value < self.MIN_VALUE:
+      self.zero_count += count
+      return
+    index = int(math.ceil(math.log(value) / self._log_gamma))
+    self.bins[index] = self.bins.get(index, 0) + count
+
+  def _compact(self):
+    """Moves the exact values into bins if there are too many of them."""
+    if self.values is None or len(self.values) <= self.MAX_EXACT_VALUES:
+      return
+    values = self.values
+    self.values = None
+    for value in values:
+      self._add_binned(value)
+
+  def add(self, value):
+    """Adds a value to the sketch.
+
+    Args:
+      value (float): The value to add.
+    """
+    if self.values is not None:
+      self.values.append(value)
+      self._compact()
+    else:
+      self._add_binned(value)
+
+  def merge(self, other):
+    """Merges another sketch with the same relative accuracy into this one.
+
+    Args:
+      other (QuantileSketch): The sketch to merge.
+    """
+    if self.values is not None and other.values is not None:
+      self.values.extend(other.values)
+      self._compact()
+      return
+    if self.values is not None:
+      values = self.values
+      self.values = None
+      for value in values:
+        self._add_binned(value)
+    if other.values is not None:
+      for value in other.values:
+        self._add_binned(value)
+    else:
+      self.zero_count += other.zero_count
+      for index, count in other.bins.items():
+        self.bins[index] = self.bins.get(index, 0) + count
+
+  def quantile(self, quantile):
+    """Gets the value at a quantile using the nearest rank.
+
+    Args:
+      quantile (float): The quantile between 0 and 1.
+
+    Returns:
+      float: The value at the quantile, or None if the sketch is empty.
+    """
+    count = self.count
+    if not count:
+      return None
+    rank = max(1, int(math.ceil(quantile * count)))
+    if self.values is not None:
+      return sorted(self.values)[rank - 1]
+
+    seen = self.zero_count
+    if rank <= seen:
+      return 0.0
+    for index in sorted(self.bins):
+      seen += self.bins[index]
+      if seen >= rank:
+        return 2 * self._gamma**index / (self._gamma + 1)
+    return None
+
+  def to_dict(self):
+    """Serializes the sketch.
+
+    Returns:
+      dict: The serialized sketch.
+    """
+    if self.values is not None:
+      return {'values': self.values}
+    return {
+        'bins': {str(index): count for index, count in self.bins.items()},
+        'zero_count': self.zero_count
+    }
+
+  @classmethod
+  def from_dict(cls, data, relative_accuracy=0.01):
+    """Deserializes a sketch.
+
+    Args:
+      data (dict): The serialized sketch.
+      relative_accuracy (float): The relative accuracy of the sketch.
+
+    Returns:
+      QuantileSketch: The sketch.
+    """
+    sketch = cls(relative_accuracy=relative_accuracy)
+    if 'values' in data:
+      sketch.values = list(data['values'])
+    else:
+      sketch.values = None
+      sketch.bins = {int(index): count for index, count in data['bins'].items()}
+      sketch.zero_count = data.get('zero_count', 0)
+    return sketch
+
+
+class StatsRollup(object):
+  """The count, sum, minimum, maximum and quantiles of a set of values.
+
+  Rollups can be merged, so rollups of small time buckets can be combined into
+  the statistics of a longer time window.
+
+  Attributes:
+    count (int): The number of values.
+    max (float): The maximum value.
+    min (float): The minimum value.
+    sketch (QuantileSketch): The quantile sketch, or None if quantiles are not
+        tracked.
+    sum (float): The sum of the values.
+  """
+
+  def __init__(self, track_quantiles=True):
+    """Initialization for StatsRollup.
+
+    Args:
+      track_quantiles (bool): Whether to keep a quantile sketch.
+    """
+    self.count = 0
+    self.sum = 0.0
+    self.min = None
+    self.max = None
+    self.sketch = QuantileSketch() if track_quantiles else None
+
+  @property
+  def mean(self):
+    """The mean of the values, or None if there are no values."""
+    if not self.count:
+      return None
+    return self.sum / self.count
+
+  def add(self, value):
+    """Adds a value.
+
+    Args:
+      value (float): The value to add.
+    """
+    self.count += 1
+    self.sum += value
+    self.min = value if self.min is None else min(self.min, value)
+    self.max = value if self.max is None else max(self.max, value)
+    if self.sketch:
+      self.sketch.add(value)
+
+  def merge(self, other):
+    """Merges another rollup into this one.
+
+    Args:
+      other (StatsRollup): The rollup to merge.
+    """
+    if not other.count:
+      return
+    self.count += other.count
+    self.sum += other.sum
+    self.min = other.min if self.min is None else min(self.min, other.min)
+    self.max = other.max if self.max is None else max(self.max, other.max)
+    if self.sketch and other.sketch:
+      self.sketch.merge(other.sketch)
+
+  def quantile(self, quantile):
+    """Gets the estimated value at a quantile.
+
+    Args:
+      quantile (float): The quantile between 0 and 1.
+
+    Returns:
+      float: The value, or None if there are no values or no quantile sketch.
+    """
+    if not self.sketch:
+      return None
+    value = self.sketch.quantile(quantile)
+    if value is None:
+      return None
+    # Binned estimates can be slightly outside of the actual range.
+    return min(max(value, self.min), self.max)
+
+  def to_dict(self):
+    """Serializes the rollup.
+
+    Returns:
+      dict: The serialized rollup.
+    """
+    data = {
+        'count': self.count,
+        'sum': self.sum,
+        'min': self.min,
+        'max': self.max
+    }
+    if self.sketch:
+      data['sketch'] = self.sketch.to_dict()
+    return data
+
+  @classmethod
+  def from_dict(cls, data):
+    """Deserializes a rollup.
+
+    Args:
+      data (dict): The serialized rollup.
+
+    Returns:
+      StatsRollup: The rollup.
+    """
+    rollup = cls(track_quantiles=False)
+    rollup.count = data['count']
+    rollup.sum = data['sum']
+    rollup.min = data['min']
+    rollup.max = data['max']
+    if data.get('sketch'):
+      rollup.sketch = QuantileSketch.from_dict(data['sketch'])
+    return rollup
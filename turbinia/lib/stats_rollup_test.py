@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the stats_rollup module."""
+
+from __future__ import unicode_literals
+
+import json
+import unittest
+from datetime import datetime
+
+from turbinia.lib import stats_rollup
+
+
+class QuantileSketchTest(unittest.TestCase):
+  """Tests for the QuantileSketch class."""
+
+  def testExactQuantiles(self):
+    """Tests that small sketches return exact quantiles."""
+    sketch = stats_rollup.QuantileSketch()
+    for value in (5, 1, 3):
+      sketch.add(value)
+    self.assertEqual(sketch.quantile(0), 1)
+    self.assertEqual(sketch.quantile(0.5), 3)
+    self.assertEqual(sketch.quantile(0.9), 5)
+    self.assertIsNone(stats_rollup.QuantileSketch().quantile(0.5))
+
+  def testBinnedQuantiles(self):
+    """Tests the relative error of quantiles after the values are binned."""
+    sketch = stats_rollup.QuantileSketch()
+    for value in range(1, 10001):
+      sketch.add(value)
+    self.assertIsNone(sketch.values)
+    self.assertEqual(sketch.count, 10000)
+    # The size only grows with the logarithm of the range of the values.
+    self.assertLess(len(sketch.bins), 500)
+    for quantile in (0.5, 0.9, 0.99):
+      expected = quantile * 10000
+      self.assertLessEqual(
+          abs(sketch.quantile(quantile) - expected), expected * 0.01)
+
+  def testMerge(self):
+    """Tests merging exact and binned sketches."""
+    sketch1 = stats_rollup.QuantileSketch()
+    sketch2 = stats_rollup.QuantileSketch()
+    for value in range(1, 51):
+      sketch1.add(value)
+      sketch2.add(value + 50)
+    sketch1.merge(sketch2)
+    self.assertEqual(sketch1.quantile(0.5), 50)
+
+    sketch3 = stats_rollup.QuantileSketch()
+    for value in range(101, 1001):
+      sketch3.add(value)
+    sketch1.merge(sketch3)
+    self.assertIsNone(sketch1.values)
+    self.assertEqual(sketch1.count, 1000)
+    self.assertLessEqual(abs(sketch1.quantile(0.9) - 900), 9)
+
+  def testSerialization(self):
+    """Tests that serialized sketches give the same quantiles."""
+    sketch = stats_rollup.QuantileSketch()
+    for value in range(200):
+      sketch.add(value)
+    data = json.loads(json.dumps(sketch.to_dict()))
+    copy = stats_rollup.QuantileSketch.from_dict(data)
+    self.assertEqual(copy.count, 200)
+    self.assertEqual(copy.quantile(0.99), sketch.quantile(0.99))
+
+
+class StatsRollupTest(unittest.TestCase):
+  """Tests for the StatsRollup class and helper functions."""
+
+  def testAddAndMerge(self):
+    """Tests the count, mean, min and max of merged rollups."""
+    rollup1 = stats_rollup.StatsRollup()
+    rollup1.add(60)
+    rollup1.add(300)
+    rollup2 = stats_rollup.StatsRollup()
+    rollup2.add(180)
+    rollup1.merge(rollup2)
+    rollup1.merge(stats_rollup.StatsRollup())
+    self.assertEqual(rollup1.count, 3)
+    self.assertEqual(rollup1.mean, 180)
+    self.assertEqual(rollup1.min, 60)
+    self.assertEqual(rollup1.max, 300)
+    self.assertEqual(rollup1.quantile(0.5), 180)
+    self.assertIsNone(stats_rollup.StatsRollup().mean)
+
+  def testGetTaskRollups(self):
+    """Tests the rollups created for a completed task."""
+    task_data = {
+        'name': 'PlasoTask',
+        'request_id': 'request1',
+        'requester': 'user1',
+        'run_time': 60,
+        'successful': False,
+        'worker_name': 'worker1'
+    }
+    last_update = datetime(1970, 1, 1, 0, 10)
+    rollups = stats_rollup.get_task_rollups(task_data, last_update)
+    self.assertEqual(
+        sorted(rollups),
+        ['all', 'failed', 'type:PlasoTask', 'user:user1', 'worker:worker1'])
+    span = stats_rollup.get_task_span(task_data, last_update)
+    self.assertEqual(span.min, 540)
+    self.assertEqual(span.max, 600)
+    self.assertIsNone(span.sketch)
+
+    task_data['run_time'] = None
+    self.assertEqual(
+        stats_rollup.get_task_rollups(task_data, datetime.now()), {})
+    self.assertIsNone(stats_rollup.get_task_span(task_data, datetime.now()))
+
+  def testEncodedRollups(self):
+    """Tests merging and decoding stored rollups."""
+    rollup = stats_rollup.StatsRollup()
+    rollup.add(10)
+    data = stats_rollup.merge_encoded_rollup(None, rollup)
+    data = stats_rollup.merge_encoded_rollup(data, rollup)
+    rollups = stats_rollup.decode_rollups([('all', data), ('all', data)])
+    self.assertEqual(rollups['all'].count, 4)
+    self.assertEqual(rollups['all'].sum, 40)
+
+
+if __name__ == '__main__':
+  unittest.main()
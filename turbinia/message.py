@@ -152,3 +152,13 @@ class TurbiniaMessageBase(object):
     """
 
     self.send_message(request.to_json())
+
+  def send_requests(self, requests):
+    """Send multiple TurbiniaRequests to the server.
+
+    Args:
+      requests (list(TurbiniaRequest)): The requests to send.
+    """
+
+    for request in requests:
+      self.send_request(request)
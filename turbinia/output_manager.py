@@ -16,16 +16,25 @@
 
 from __future__ import unicode_literals
 
+import collections
 import errno
+import hashlib
+import io
 import json
 import logging
 import os
 import re
-import shutil
+import threading
 import time
+import uuid
+
+from multiprocessing.pool import ThreadPool
 
 from turbinia import config
 from turbinia import TurbiniaException
+from turbinia.lib import bloom_filter
+from turbinia.lib import file_cache
+from turbinia.lib import file_copy
 
 config.LoadConfig()
 if config.GCS_OUTPUT_PATH and config.GCS_OUTPUT_PATH.lower() is not 'none':
@@ -34,6 +43,240 @@ if config.GCS_OUTPUT_PATH and config.GCS_OUTPUT_PATH.lower() is not 'none':
 
 log = logging.getLogger('turbinia')
 
+# Process wide GCS clients and bucket handles, keyed by project and by
+# (project, bucket name), so they can be reused across tasks.
+_GCS_CLIENTS = {}
+_GCS_BUCKETS = {}
+_GCS_LOCK = threading.Lock()
+
+# Bloom filters of the content hashes stored in each deduplicated GCS output
+# location, keyed by (bucket name, blob directory), along with the set of hash
+# prefixes that have already been listed into each filter and a lock per hash
+# prefix that is held while it is listed.
+_GCS_BLOB_INDEXES = {}
+_GCS_BLOB_INDEX_LOCK = threading.Lock()
+
+# Output directory layouts that can be set with OUTPUT_DIR_LAYOUT.
+LAYOUT_FLAT = 'flat'
+LAYOUT_HIERARCHICAL = 'hierarchical'
+# Number of leading request id characters used to shard request directories.
+REQUEST_SHARD_LENGTH = 2
+# Request ids are client supplied, so only these are used in output paths.
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+# Directory names used when a task has no request id or job name.
+NO_REQUEST_DIR = 'no-request'
+NO_JOB_DIR = 'no-job'
+
+# Default number of threads used to save output in the background.
+UPLOAD_THREADS = 4
+
+# Process wide thread pool used to save output in the background.
+_UPLOAD_POOL = None
+_UPLOAD_POOL_LOCK = threading.Lock()
+
+
+def get_gcs_bucket(project, bucket_name):
+  """Gets a cached GCS client and bucket handle.
+
+  The bucket handle is created without an API request, so no round-trip is
+  made to look up the bucket metadata.
+
+  Args:
+    project (str): The project to create the client for.
+    bucket_name (str): The name of the bucket.
+
+  Returns:
+    Tuple(google.cloud.storage.Client, google.cloud.storage.Bucket): The client
+        and bucket handle.
+  """
+  with _GCS_LOCK:
+    client = _GCS_CLIENTS.get(project)
+    if not client:
+      client = storage.Client(project=project)
+      _GCS_CLIENTS[project] = client
+    bucket = _GCS_BUCKETS.get((project, bucket_name))
+    if not bucket:
+      bucket = client.bucket(bucket_name)
+      _GCS_BUCKETS[(project, bucket_name)] = bucket
+  return client, bucket
+
+
+def get_request_output_path(request_id, instance=None):
+  """Gets the relative output path of a request for the hierarchical layout.
+
+  Request directories are sharded by the first characters of the request id so
+  that no single directory grows too large.
+
+  Args:
+    request_id (str): The id of the request.
+    instance (str): The Turbinia instance name, by default the configured
+        INSTANCE_ID.
+
+  Returns:
+    str: The path relative to the base output directory.
+
+  Raises:
+    TurbiniaException: If the request id can not be used as a directory name.
+  """
+  if not REQUEST_ID_PATTERN.match(request_id):
+    raise TurbiniaException(
+        'Request id {0:s} contains characters that are not allowed in output '
+        'paths'.format(request_id))
+  if not instance:
+    config.LoadConfig()
+    instance = config.INSTANCE_ID
+  return os.path.join(instance, request_id[:REQUEST_SHARD_LENGTH], request_id)
+
+
+def get_task_output_path(task):
+  """Gets the unique relative output path for a task.
+
+  With the default 'flat' OUTPUT_DIR_LAYOUT this is a single directory named
+  after the task.  With the 'hierarchical' layout, the task directory is
+  created under <instance>/<request shard>/<request_id>/<job name>/.
+
+  Args:
+    task: A TurbiniaTask object
+
+  Returns:
+    str: The path relative to the base output directory.
+  """
+  epoch = str(int(time.time()))
+  task_dir = '{0:s}-{1:s}-{2:s}'.format(epoch, str(task.id), task.name)
+  config.LoadConfig()
+  if config.OUTPUT_DIR_LAYOUT != LAYOUT_HIERARCHICAL:
+    return task_dir
+  request_id = task.request_id or NO_REQUEST_DIR
+  job_name = task.job_name or NO_JOB_DIR
+  return os.path.join(get_request_output_path(request_id), job_name, task_dir)
+
+
+def _get_upload_pool():
+  """Gets the thread pool used to save output in the background.
+
+  Returns:
+    ThreadPool: The upload thread pool.
+  """
+  global _UPLOAD_POOL  # pylint: disable=global-statement
+  with _UPLOAD_POOL_LOCK:
+    if _UPLOAD_POOL is None:
+      config.LoadConfig()
+      _UPLOAD_POOL = ThreadPool(config.OUTPUT_UPLOAD_THREADS or UPLOAD_THREADS)
+  return _UPLOAD_POOL
+
+
+class GCSRemoteFile(io.RawIOBase):
+  """Read-only file-like object reading a GCS object on demand.
+
+  Data is fetched with ranged reads in fixed size blocks, which are kept in a
+  small LRU cache.  Sequential reads fetch an increasing number of blocks ahead
+  of the current offset, so that streaming a file needs few requests while
+  random reads only fetch the blocks they need.
+
+  Attributes:
+    name (str): The name of the GCS object.
+    size (int): The size of the object in bytes.
+  """
+
+  BLOCK_SIZE = 2**20
+  CACHE_BLOCKS = 64
+  MAX_READ_AHEAD_BLOCKS = 16
+
+  def __init__(self, blob, client):
+    """Initialization for GCSRemoteFile.
+
+    Args:
+      blob (google.cloud.storage.Blob): The object to read, with its metadata
+          loaded.
+      client (google.cloud.storage.Client): The client to read with.
+    """
+    super(GCSRemoteFile, self).__init__()
+    self.name = blob.name
+    self.size = blob.size or 0
+    self._blob = blob
+    self._client = client
+    self._blocks = collections.OrderedDict()
+    self._next_block = None
+    self._read_ahead = 0
+    self._offset = 0
+
+  def _fetch_blocks(self, first_block, count):
+    """Fetches blocks with a single ranged read and adds them to the cache.
+
+    Args:
+      first_block (int): The index of the first block to fetch.
+      count (int): The number of blocks to fetch.
+    """
+    start = first_block * self.BLOCK_SIZE
+    end = min(self.size, (first_block + count) * self.BLOCK_SIZE) - 1
+    data = self._blob.download_as_string(
+        client=self._client, start=start, end=end)
+    for index in range(count):
+      block = data[index * self.BLOCK_SIZE:(index + 1) * self.BLOCK_SIZE]
+      if not block:
+        break
+      self._blocks[first_block + index] = block
+    while len(self._blocks) > self.CACHE_BLOCKS:
+      self._blocks.popitem(last=False)
+
+  def _get_block(self, index):
+    """Gets a block from the cache, fetching it if needed.
+
+    Args:
+      index (int): The index of the block.
+
+    Returns:
+      bytes: The block data.
+    """
+    if index in self._blocks:
+      block = self._blocks.pop(index)
+    else:
+      if index == self._next_block:
+        self._read_ahead = min(
+            self.MAX_READ_AHEAD_BLOCKS, max(1, self._read_ahead * 2))
+      else:
+        self._read_ahead = 0
+      last_block = (self.size - 1) // self.BLOCK_SIZE
+      count = min(1 + self._read_ahead, last_block - index + 1)
+      self._fetch_blocks(index, count)
+      block = self._blocks.pop(index)
+    self._blocks[index] = block
+    self._next_block = index + 1
+    return block
+
+  def readable(self):
+    return True
+
+  def seekable(self):
+    return True
+
+  def tell(self):
+    return self._offset
+
+  def seek(self, offset, whence=io.SEEK_SET):
+    if whence == io.SEEK_CUR:
+      offset += self._offset
+    elif whence == io.SEEK_END:
+      offset += self.size
+    if offset < 0:
+      raise ValueError('Negative seek position {0:d}'.format(offset))
+    self._offset = offset
+    return self._offset
+
+  def readinto(self, buffer_):
+    length = min(len(buffer_), max(0, self.size - self._offset))
+    read = 0
+    while read < length:
+      index, block_offset = divmod(self._offset, self.BLOCK_SIZE)
+      block = self._get_block(index)
+      count = min(length - read, len(block) - block_offset)
+      if count <= 0:
+        break
+      buffer_[read:read + count] = block[block_offset:block_offset + count]
+      read += count
+      self._offset += count
+    return read
+
 
 class OutputManager(object):
   """Manages output data.
@@ -41,13 +284,25 @@ class OutputManager(object):
   Manages the configured output writers.  Also saves and retrieves evidence data
   as well as other files that are created when running tasks.
 
+  Files can also be saved in the background with queue_local_file(),
+  queue_evidence() and queue_evidence_batch(), so that saving output overlaps
+  with the Task execution.  wait_for_uploads() must be called before the
+  results are reported.
+
   Attributes:
     _output_writers (list): The configured output writers
+    _pending_uploads (list): Tuples of the path being saved and the
+        AsyncResult of the background upload.
     is_setup (bool): Whether this object has been setup or not.
   """
 
+  # Number of files saved together above which the saved paths are written to
+  # a manifest rather than added to the result individually.
+  SAVED_PATHS_MANIFEST_THRESHOLD = 100
+
   def __init__(self):
     self._output_writers = None
+    self._pending_uploads = []
     self.is_setup = False
 
   @staticmethod
@@ -60,8 +315,7 @@ class OutputManager(object):
     Returns:
       A list of OutputWriter objects.
     """
-    epoch = str(int(time.time()))
-    unique_dir = '{0:s}-{1:s}-{2:s}'.format(epoch, str(task.id), task.name)
+    unique_dir = get_task_output_path(task)
 
     writers = [
         LocalOutputWriter(
@@ -125,6 +379,62 @@ class OutputManager(object):
         evidence_.local_path = writer.copy_from(evidence_.saved_path)
     return evidence_
 
+  def open_evidence(self, evidence_):
+    """Opens saved evidence data for reading without retrieving all of it.
+
+    Args:
+      evidence_: Evidence object
+
+    Returns:
+      A file-like object to read the evidence data from.
+
+    Raises:
+      TurbiniaException: If the evidence data can not be opened.
+    """
+    for writer in self._output_writers:
+      if writer.name == evidence_.saved_path_type:
+        log.info(
+            'Opening copyable evidence data from {0:s}'.format(
+                evidence_.saved_path))
+        return writer.open_remote(evidence_.saved_path)
+    raise TurbiniaException(
+        'No output writer of type {0!s} to open evidence {1:s} from'.format(
+            evidence_.saved_path_type, evidence_.name))
+
+  @staticmethod
+  def _write_metadata(evidence_, path):
+    """Writes the metadata file for evidence.
+
+    Args:
+      evidence_ (Evidence): Evidence to write the metadata for.
+      path (string): Path of the evidence data the metadata file is written
+          next to.
+
+    Returns:
+      The path of the metadata file.
+
+    Raises:
+      TurbiniaException: If serialization or writing of evidence config fails
+    """
+    metadata = evidence_.config.copy()
+    metadata_path = '{0:s}.metadata.json'.format(path)
+    try:
+      json_str = json.dumps(metadata)
+    except TypeError as exception:
+      raise TurbiniaException(
+          'Could not serialize Evidence config for {0:s}: {1!s}'.format(
+              evidence_.name, exception))
+
+    try:
+      log.debug('Writing metadata file to {0:s}'.format(metadata_path))
+      with open(metadata_path, 'wb') as file_handle:
+        file_handle.write(json_str.encode('utf-8'))
+    except IOError as exception:
+      raise TurbiniaException(
+          'Could not write metadata file {0:s}: {1!s}'.format(
+              metadata_path, exception))
+    return metadata_path
+
   def save_evidence(self, evidence_, result):
     """Saves local evidence data to remote location.
 
@@ -142,24 +452,7 @@ class OutputManager(object):
         evidence_.local_path, result)
 
     if evidence_.save_metadata:
-      metadata = evidence_.config.copy()
-      metadata_path = '{0:s}.metadata.json'.format(local_path)
-      try:
-        json_str = json.dumps(metadata)
-      except TypeError as exception:
-        raise TurbiniaException(
-            'Could not serialize Evidence config for {0:s}: {1:s}'.format(
-                evidence_.name, exception))
-
-      try:
-        log.debug('Writing metadata file to {0:s}'.format(metadata_path))
-        with open(metadata_path, 'wb') as file_handle:
-          file_handle.write(json_str.encode('utf-8'))
-      except IOError as exception:
-        raise TurbiniaException(
-            'Could not write metadata file {0:s}: {1:s}'.format(
-                metadata_path, exception))
-
+      metadata_path = self._write_metadata(evidence_, local_path)
       self.save_local_file(metadata_path, result)
 
     # Set the evidence local_path from the saved path info so that in cases
@@ -209,6 +502,230 @@ class OutputManager(object):
 
     return saved_path, saved_path_type, local_path
 
+  def save_local_files(self, files, result):
+    """Saves many local files at once by writing to all output writers.
+
+    See _save_local_files() for details.
+
+    Args:
+      files (list(string)): Paths to the files to save.
+      result (TurbiniaTaskResult): Result object to save path data to
+
+    Returns:
+      Dict mapping each file path to a tuple of (String of last written file
+      path, String of last written file destination output type, Local path if
+      saved locally, else None)
+
+    Raises:
+      TurbiniaException: If any of the files could not be saved.
+    """
+    saved, errors = self._save_local_files(files, result)
+    self._raise_save_errors(errors, len(files))
+    return saved
+
+  @staticmethod
+  def _raise_save_errors(errors, total):
+    """Raises an exception listing the files that could not be saved.
+
+    Args:
+      errors (dict): Mapping of file paths to the exception saving them.
+      total (int): The number of files that were saved.
+
+    Raises:
+      TurbiniaException: If there are any errors.
+    """
+    if errors:
+      raise TurbiniaException(
+          'Could not save {0:d} of {1:d} output files: {2:s}'.format(
+              len(errors), total, ', '.join(
+                  '{0:s}: {1!s}'.format(file_, error)
+                  for file_, error in sorted(errors.items()))))
+
+  def _save_local_files(self, files, result):
+    """Saves many local files at once by writing to all output writers.
+
+    The output writers save the files concurrently where they can.  When more
+    than SAVED_PATHS_MANIFEST_THRESHOLD files are saved, the saved paths are
+    written to a manifest file which is saved instead of adding every path to
+    the result.
+
+    Args:
+      files (list(string)): Paths to the files to save.
+      result (TurbiniaTaskResult): Result object to save path data to
+
+    Returns:
+      Tuple of (dict mapping each file path to a tuple of (String of last
+      written file path, String of last written file destination output type,
+      Local path if saved locally, else None), dict mapping file paths that
+      could not be saved to the exception).
+    """
+    sizes = {}
+    for file_ in files:
+      try:
+        sizes[file_] = os.stat(file_).st_size
+      except OSError:
+        sizes[file_] = 0
+    saved = {file_: [None, None, None] for file_ in files}
+    saved_paths = {file_: [] for file_ in files}
+    errors = {}
+
+    for writer in self._output_writers:
+      new_paths, writer_errors = writer.copy_to_batch(files)
+      errors.update(writer_errors)
+      for file_ in files:
+        new_path = new_paths.get(file_)
+        if new_path:
+          saved_paths[file_].append(new_path)
+          saved[file_][0] = new_path
+          saved[file_][1] = writer.name
+        elif sizes[file_] > 0 and file_ not in saved_paths[file_]:
+          # We want to save the old path if the path is still valid.
+          saved_paths[file_].append(file_)
+        if writer.name == LocalOutputWriter.NAME:
+          saved[file_][2] = new_path
+
+    if result:
+      if len(files) > self.SAVED_PATHS_MANIFEST_THRESHOLD:
+        manifest_path = self._write_saved_paths_manifest(saved_paths)
+        self.save_local_file(manifest_path, result)
+      else:
+        for file_ in files:
+          result.saved_paths.extend(saved_paths[file_])
+
+    saved = {file_: tuple(paths) for file_, paths in saved.items()}
+    return saved, errors
+
+  def _write_saved_paths_manifest(self, saved_paths):
+    """Writes a manifest of saved paths into the local output directory.
+
+    Args:
+      saved_paths (dict): Mapping of local file paths to the list of paths
+          each file was saved to.
+
+    Returns:
+      The path of the manifest file.
+
+    Raises:
+      TurbiniaException: If the manifest can not be written.
+    """
+    _, local_output_dir = self.get_local_output_dirs()
+    manifest_path = os.path.join(
+        local_output_dir, 'saved-paths-{0:s}.json'.format(uuid.uuid4().hex))
+    try:
+      with open(manifest_path, 'wb') as file_handle:
+        file_handle.write(
+            json.dumps(saved_paths, indent=2, sort_keys=True).encode('utf-8'))
+    except IOError as exception:
+      raise TurbiniaException(
+          'Could not write saved paths manifest {0:s}: {1!s}'.format(
+              manifest_path, exception))
+    log.info(
+        'Wrote saved paths of {0:d} files to {1:s}'.format(
+            len(saved_paths), manifest_path))
+    return manifest_path
+
+  def save_evidence_batch(self, evidence_list, result):
+    """Saves the local data of many evidence objects at once.
+
+    Args:
+      evidence_list (list(Evidence)): Evidence to save data from.
+      result (TurbiniaTaskResult): Result object to save path data to
+
+    Returns:
+      The list of evidence objects.
+
+    Raises:
+      TurbiniaException: If writing any of the evidence fails.
+    """
+    files = []
+    for evidence_ in evidence_list:
+      files.append(evidence_.local_path)
+      if evidence_.save_metadata:
+        files.append(self._write_metadata(evidence_, evidence_.local_path))
+
+    saved, errors = self._save_local_files(files, result)
+    for evidence_ in evidence_list:
+      path, path_type, local_path = saved[evidence_.local_path]
+      if local_path:
+        evidence_.local_path = local_path
+      evidence_.saved_path = path
+      evidence_.saved_path_type = path_type
+    self._raise_save_errors(errors, len(files))
+    log.info(
+        'Saved copyable evidence data for {0:d} evidence objects'.format(
+            len(evidence_list)))
+    return evidence_list
+
+  def queue_local_file(self, file_, result):
+    """Saves a local file in the background.
+
+    Args:
+      file_ (string): Path to the file to save.  The file must not be changed
+          after it has been queued.
+      result (TurbiniaTaskResult): Result object to save path data to
+    """
+    log.debug('Queueing {0:s} to be saved'.format(file_))
+    upload = _get_upload_pool().apply_async(
+        self.save_local_file, (file_, result))
+    self._pending_uploads.append((file_, upload))
+
+  def queue_evidence(self, evidence_, result):
+    """Saves local evidence data in the background.
+
+    Args:
+      evidence_ (Evidence): Evidence to save data from.  The saved_path of the
+          Evidence is set once it has been saved.
+      result (TurbiniaTaskResult): Result object to save path data to
+    """
+    log.debug('Queueing evidence {0:s} to be saved'.format(evidence_.name))
+    upload = _get_upload_pool().apply_async(
+        self.save_evidence, (evidence_, result))
+    self._pending_uploads.append((evidence_.local_path, upload))
+
+  def queue_evidence_batch(self, evidence_list, result):
+    """Saves the local data of many evidence objects in the background.
+
+    Args:
+      evidence_list (list(Evidence)): Evidence to save data from.  The
+          saved_path of each Evidence is set once they have been saved.
+      result (TurbiniaTaskResult): Result object to save path data to
+    """
+    log.debug(
+        'Queueing {0:d} evidence objects to be saved'.format(
+            len(evidence_list)))
+    upload = _get_upload_pool().apply_async(
+        self.save_evidence_batch, (evidence_list, result))
+    self._pending_uploads.append(
+        ('{0:d} evidence files'.format(len(evidence_list)), upload))
+
+  def wait_for_uploads(self):
+    """Waits for all files queued to be saved in the background.
+
+    The output writers are then closed, so that any pending metadata of the
+    saved files is written.
+
+    Raises:
+      TurbiniaException: If any of the files could not be saved.
+    """
+    errors = []
+    pending_uploads, self._pending_uploads = self._pending_uploads, []
+    for path, upload in pending_uploads:
+      try:
+        upload.get()
+      # Any exception from the writers needs to be reported here, as it would
+      # otherwise be lost in the upload thread.
+      # pylint: disable=broad-except
+      except Exception as exception:
+        errors.append('{0:s}: {1!s}'.format(path, exception))
+    for writer in self._output_writers or []:
+      try:
+        writer.close()
+      except TurbiniaException as exception:
+        errors.append('{0:s}: {1!s}'.format(writer.name, exception))
+    if errors:
+      raise TurbiniaException(
+          'Could not save output files: {0:s}'.format(', '.join(errors)))
+
   def setup(self, task):
     """Setup OutputManager object."""
     self._output_writers = self.get_output_writers(task)
@@ -291,6 +808,27 @@ class OutputWriter(object):
     """
     raise NotImplementedError
 
+  def copy_to_batch(self, source_files):
+    """Copies many files to the managed location.
+
+    By default the files are copied one at a time with copy_to().
+
+    Args:
+      source_files (list(string)): Paths to local source files.
+
+    Returns:
+      Tuple of (dict mapping source files to the paths they were saved to,
+      dict mapping source files that could not be saved to the exception).
+    """
+    saved_paths = {}
+    errors = {}
+    for source_file in source_files:
+      try:
+        saved_paths[source_file] = self.copy_to(source_file)
+      except (IOError, OSError, TurbiniaException) as exception:
+        errors[source_file] = exception
+    return saved_paths, errors
+
   def copy_from(self, source_file):
     """Copies output file from the managed location to the local output dir.
 
@@ -308,6 +846,33 @@ class OutputWriter(object):
     """
     raise NotImplementedError
 
+  def close(self):
+    """Writes any metadata of the saved files that is still pending.
+
+    Output writers that write everything in copy_to() do not need to implement
+    this.
+
+    Raises:
+      TurbiniaException: When the metadata can not be written.
+    """
+
+  def open_remote(self, source_file):
+    """Opens an output file in the managed location for reading.
+
+    Unlike copy_from(), the data is only read from storage as it is used.
+
+    Args:
+      source_file (string): A path to a source file in the managed storage
+          location, in the same format as for copy_from().
+
+    Returns:
+      A read-only binary file-like object.
+
+    Raises:
+      TurbiniaException: When the file can not be opened.
+    """
+    raise NotImplementedError
+
 
 class LocalOutputWriter(OutputWriter):
   """Class for writing to local filesystem output.
@@ -368,8 +933,13 @@ class LocalOutputWriter(OutputWriter):
               destination_file))
       return None
 
-    shutil.copy(file_path, destination_file)
-    log.debug('Copied file {0:s} to {1:s}'.format(file_path, destination_file))
+    # The source file stays in place, because other output writers and the
+    # Evidence objects still reference it, so this links or clones the file
+    # rather than renaming it.
+    method = file_copy.copy_file(file_path, destination_file)
+    log.debug(
+        'Copied file {0:s} to {1:s} using {2:s}'.format(
+            file_path, destination_file, method))
     return destination_file
 
   def copy_to(self, source_file):
@@ -378,17 +948,67 @@ class LocalOutputWriter(OutputWriter):
   def copy_from(self, source_file):
     return self._copy(source_file)
 
+  def open_remote(self, source_file):
+    try:
+      return open(source_file, 'rb')
+    except IOError as exception:
+      raise TurbiniaException(
+          'Could not open {0:s}: {1!s}'.format(source_file, exception))
+
 
 class GCSOutputWriter(OutputWriter):
   """Output writer for Google Cloud Storage.
 
+  Files larger than the parallel transfer threshold are uploaded as multiple
+  parts in parallel which are then composed into the destination object, and
+  downloaded as parallel byte range requests.
+
+  When GCS_OUTPUT_DEDUP is set, files are stored once per unique content in
+  the blob directory, named by their SHA-256 hash.  The output directory for
+  each Task then only contains a manifest mapping the file names to the blobs,
+  and copy_from() resolves the saved paths through this manifest.  The manifest
+  is written once per copy_to_batch() and when the writer is closed.
+
+  When EVIDENCE_CACHE_DIR is set, retrieved files are kept in a local LRU cache
+  so that Tasks on the same worker using the same file only download it once.
+
   attributes:
     bucket (string): Storage bucket to put output results into.
     client (google.cloud.storage.Client): GCS Client
+    cache (FileCache): Cache of retrieved files shared by the Tasks on this
+        worker, or None if EVIDENCE_CACHE_DIR is not set.
+    dedup (bool): Whether to store files by the hash of their content.
+    parallel_threshold (int): Minimum file size in bytes to use parallel
+        transfers for.
+    part_size (int): Size in bytes of each part of a parallel transfer.
+    transfer_threads (int): Number of parts to transfer concurrently.
   """
 
   CHUNK_SIZE = 10 * (2**20)  # 10MB by default
 
+  # Defaults for parallel transfers, which can be changed in the config with
+  # GCS_PARALLEL_THRESHOLD, GCS_PART_SIZE and GCS_TRANSFER_THREADS.
+  PARALLEL_THRESHOLD = 256 * (2**20)
+  PART_SIZE = 64 * (2**20)
+  TRANSFER_THREADS = 8
+
+  # Maximum number of objects that can be composed in a single request.
+  MAX_COMPOSE_COMPONENTS = 32
+
+  # Directory under the base output path that deduplicated files are stored
+  # in, and the name of the manifest written into each Task output directory.
+  BLOB_DIR = 'blobs'
+  MANIFEST_NAME = 'manifest.json'
+
+  # Expected number of unique files and false positive rate for the bloom
+  # filters of stored blobs.
+  BLOB_INDEX_CAPACITY = 1000000
+  BLOB_INDEX_ERROR_RATE = 0.001
+
+  # Default maximum size of the cache of retrieved files if EVIDENCE_CACHE_DIR
+  # is set.
+  CACHE_SIZE = 50 * (2**30)
+
   NAME = 'GCSWriter'
 
   def __init__(self, gcs_path, *args, **kwargs):
@@ -399,9 +1019,28 @@ class GCSOutputWriter(OutputWriter):
     """
     super(GCSOutputWriter, self).__init__(*args, **kwargs)
     config.LoadConfig()
-    self.client = storage.Client(project=config.TURBINIA_PROJECT)
-
     self.bucket, self.base_output_dir = self._parse_gcs_path(gcs_path)
+    self.client, self._bucket = get_gcs_bucket(
+        config.TURBINIA_PROJECT, self.bucket)
+
+    self.parallel_threshold = (
+        config.GCS_PARALLEL_THRESHOLD or self.PARALLEL_THRESHOLD)
+    self.part_size = config.GCS_PART_SIZE or self.PART_SIZE
+    self.transfer_threads = (
+        config.GCS_TRANSFER_THREADS or self.TRANSFER_THREADS)
+    self.dedup = bool(config.GCS_OUTPUT_DEDUP)
+    self.cache = None
+    if config.EVIDENCE_CACHE_DIR:
+      self.cache = file_cache.FileCache(
+          config.EVIDENCE_CACHE_DIR, config.EVIDENCE_CACHE_SIZE or
+          self.CACHE_SIZE)
+    # Whether files were looked up in the cache, so its statistics are logged
+    # when the writer is closed.
+    self._cache_used = False
+    self._manifest = {}
+    self._manifest_changed = False
+    self._manifest_lock = threading.Lock()
+    self._manifest_write_lock = threading.Lock()
 
   @staticmethod
   def _parse_gcs_path(file_):
@@ -419,27 +1058,418 @@ class GCSOutputWriter(OutputWriter):
           'Cannot find bucket and path from GCS config {0:s}'.format(file_))
     return match.group(1), match.group(2)
 
+  def _get_parts(self, size):
+    """Splits a file into parts for a parallel transfer.
+
+    Args:
+      size (int): The size of the file in bytes.
+
+    Returns:
+      list(tuple(int, int)): The offset and size of each part.
+    """
+    return [(offset, min(self.part_size, size - offset))
+            for offset in range(0, size, self.part_size)]
+
+  def _run_parallel(self, function, arguments):
+    """Runs a function over a list of arguments in a thread pool.
+
+    Args:
+      function (function): The function to run.
+      arguments (list): The arguments to call the function with.
+
+    Returns:
+      list: The return values of the function.
+    """
+    pool = ThreadPool(min(self.transfer_threads, len(arguments)))
+    try:
+      return pool.map(function, arguments)
+    finally:
+      pool.close()
+      pool.join()
+
+  def _upload_part(self, part):
+    """Uploads part of a file as a temporary object.
+
+    Args:
+      part (tuple(str, int, int, str)): The local path, offset and size of the
+          part, and the name of the object to upload it to.
+
+    Returns:
+      google.cloud.storage.Blob: The uploaded part.
+    """
+    source_path, offset, size, part_path = part
+    blob = self._bucket.blob(part_path, chunk_size=self.CHUNK_SIZE)
+    with open(source_path, 'rb') as file_object:
+      file_object.seek(offset)
+      blob.upload_from_file(file_object, size=size, client=self.client)
+    return blob
+
+  def _parallel_upload(self, source_path, destination_path):
+    """Uploads a file as parallel parts composed into a single object.
+
+    Args:
+      source_path (string): The local path of the file to upload.
+      destination_path (string): The name of the object to create.
+    """
+    parts = []
+    for index, (offset, size) in enumerate(self._get_parts(
+        os.path.getsize(source_path))):
+      part_path = '{0:s}.part-{1:05d}'.format(destination_path, index)
+      parts.append((source_path, offset, size, part_path))
+    log.info(
+        'Uploading {0:s} in {1:d} parts with {2:d} threads'.format(
+            source_path, len(parts), self.transfer_threads))
+    # The parts are tracked as they complete, so that the parts uploaded
+    # before a failure are deleted as well.
+    uploaded_blobs = []
+
+    def _upload_tracked_part(part):
+      blob = self._upload_part(part)
+      uploaded_blobs.append(blob)
+      return blob
+
+    try:
+      part_blobs = self._run_parallel(_upload_tracked_part, parts)
+      # Composing is limited in the number of source objects, so the parts are
+      # appended to the destination object in batches.
+      destination = self._bucket.blob(destination_path)
+      components = []
+      remaining = list(part_blobs)
+      while remaining:
+        count = self.MAX_COMPOSE_COMPONENTS - len(components)
+        components.extend(remaining[:count])
+        remaining = remaining[count:]
+        destination.compose(components, client=self.client)
+        components = [destination]
+    finally:
+      for blob in uploaded_blobs:
+        try:
+          blob.delete(client=self.client)
+        except exceptions.GoogleCloudError as exception:
+          log.warning(
+              'Could not delete temporary object {0:s}: {1!s}'.format(
+                  blob.name, exception))
+
+  def _download_part(self, part):
+    """Downloads a byte range of an object into a local file.
+
+    Args:
+      part (tuple(google.cloud.storage.Blob, int, int, str)): The object,
+          offset and size of the range to download, and the local path to write
+          it to.
+    """
+    blob, offset, size, destination_path = part
+    with open(destination_path, 'r+b') as file_object:
+      file_object.seek(offset)
+      blob.download_to_file(
+          file_object, client=self.client, start=offset, end=offset + size - 1)
+
+  def _parallel_download(self, blob, size, destination_path):
+    """Downloads an object as parallel byte ranges.
+
+    Args:
+      blob (google.cloud.storage.Blob): The object to download.
+      size (int): The size of the object in bytes.
+      destination_path (string): The local path to write the object to.
+    """
+    parts = [(blob, offset, part_size, destination_path)
+             for offset, part_size in self._get_parts(size)]
+    log.info(
+        'Downloading {0:s} in {1:d} parts with {2:d} threads'.format(
+            blob.name, len(parts), self.transfer_threads))
+    # Pre-allocate the file so each part can be written at its offset.
+    with open(destination_path, 'wb') as file_object:
+      file_object.truncate(size)
+    self._run_parallel(self._download_part, parts)
+
   def create_output_dir(self, base_path=None):
     # Directories in GCS are artificial, so any path can be written as part of
     # the object name.
     pass
 
+  def _upload(self, source_path, destination_path, size):
+    """Uploads a file, in parallel parts if it is large enough.
+
+    Args:
+      source_path (string): The local path of the file to upload.
+      destination_path (string): The name of the object to create.
+      size (int): The size of the file in bytes.
+    """
+    if size >= self.parallel_threshold:
+      self._parallel_upload(source_path, destination_path)
+    else:
+      blob = self._bucket.blob(destination_path, chunk_size=self.CHUNK_SIZE)
+      blob.upload_from_filename(source_path, client=self.client)
+
+  @staticmethod
+  def _hash_file(source_path):
+    """Calculates the SHA-256 hash of a file.
+
+    Args:
+      source_path (string): The local path of the file.
+
+    Returns:
+      string: The hex digest of the file content.
+    """
+    sha256 = hashlib.sha256()
+    with open(source_path, 'rb') as file_object:
+      for chunk in iter(lambda: file_object.read(2**20), b''):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+  def _get_blob_path(self, digest):
+    """Gets the name of the object storing the content with the given hash.
+
+    Args:
+      digest (string): The SHA-256 hex digest of the content.
+
+    Returns:
+      string: The object name.
+    """
+    return os.path.join(self.base_output_dir, self.BLOB_DIR, digest[:2], digest)
+
+  def _get_blob_index(self, digest):
+    """Gets the bloom filter of stored blobs that can contain the given hash.
+
+    The first time a hash prefix is looked up, the stored blobs with that
+    prefix are listed into the filter, so that new content can be uploaded
+    without first checking whether it exists.
+
+    Args:
+      digest (string): The SHA-256 hex digest of the content.
+
+    Returns:
+      BloomFilter: The filter of stored blob hashes.
+    """
+    key = (self.bucket, os.path.join(self.base_output_dir, self.BLOB_DIR))
+    prefix = digest[:2]
+    with _GCS_BLOB_INDEX_LOCK:
+      if key not in _GCS_BLOB_INDEXES:
+        index = bloom_filter.BloomFilter(
+            self.BLOB_INDEX_CAPACITY, self.BLOB_INDEX_ERROR_RATE)
+        _GCS_BLOB_INDEXES[key] = (index, set(), {})
+      index, listed_prefixes, prefix_locks = _GCS_BLOB_INDEXES[key]
+      if prefix in listed_prefixes:
+        return index
+      prefix_lock = prefix_locks.setdefault(prefix, threading.Lock())
+
+    # Listing a prefix can take a while, so only lookups of the same prefix
+    # wait for it.
+    with prefix_lock:
+      if prefix not in listed_prefixes:
+        blob_prefix = os.path.dirname(self._get_blob_path(digest)) + '/'
+        names = [
+            os.path.basename(blob.name) for blob in self._bucket.list_blobs(
+                prefix=blob_prefix, client=self.client)
+        ]
+        with _GCS_BLOB_INDEX_LOCK:
+          for name in names:
+            index.add(name)
+          listed_prefixes.add(prefix)
+    return index
+
+  def _add_to_blob_index(self, digest):
+    """Adds a newly stored blob to the bloom filter of stored blobs.
+
+    Args:
+      digest (string): The SHA-256 hex digest of the content.
+    """
+    index = self._get_blob_index(digest)
+    with _GCS_BLOB_INDEX_LOCK:
+      index.add(digest)
+
+  def _blob_exists(self, digest):
+    """Checks whether the content with the given hash is already stored.
+
+    Args:
+      digest (string): The SHA-256 hex digest of the content.
+
+    Returns:
+      bool: True if the content is stored.
+    """
+    if digest not in self._get_blob_index(digest):
+      return False
+    # The bloom filter can have false positives, so the object is checked too.
+    blob = self._bucket.blob(self._get_blob_path(digest))
+    return blob.exists(client=self.client)
+
+  def _dedup_upload(self, source_path, size):
+    """Uploads a file by its content hash and adds it to the Task manifest.
+
+    Args:
+      source_path (string): The local path of the file to upload.
+      size (int): The size of the file in bytes.
+
+    Returns:
+      string: The GCS path the file was saved to.
+    """
+    digest = self._hash_file(source_path)
+    blob_path = self._get_blob_path(digest)
+    if self._blob_exists(digest):
+      log.info(
+          'Content of {0:s} already stored in {1:s}, skipping upload'.format(
+              source_path, blob_path))
+    else:
+      log.info('Writing {0:s} to GCS path {1:s}'.format(source_path, blob_path))
+      self._upload(source_path, blob_path, size)
+      self._add_to_blob_index(digest)
+
+    name = os.path.basename(source_path)
+    with self._manifest_lock:
+      self._manifest[name] = {'blob': blob_path, 'sha256': digest, 'size': size}
+      self._manifest_changed = True
+    return os.path.join(
+        'gs://', self.bucket, self.base_output_dir, self.unique_dir, name)
+
+  def _write_manifest(self):
+    """Uploads the Task manifest if files were added since it was last written.
+
+    Raises:
+      TurbiniaException: If the manifest can not be uploaded.
+    """
+    manifest_path = os.path.join(
+        self.base_output_dir, self.unique_dir, self.MANIFEST_NAME)
+    # Uploads are serialized so that an older manifest can not overwrite a
+    # newer one, while files can still be added to the manifest meanwhile.
+    with self._manifest_write_lock:
+      with self._manifest_lock:
+        if not self._manifest_changed:
+          return
+        manifest = json.dumps(self._manifest, indent=2, sort_keys=True)
+        self._manifest_changed = False
+      try:
+        self._bucket.blob(manifest_path).upload_from_string(
+            manifest, content_type='application/json', client=self.client)
+      except exceptions.GoogleCloudError as exception:
+        with self._manifest_lock:
+          self._manifest_changed = True
+        message = 'Could not write manifest {0:s}: {1!s}'.format(
+            manifest_path, exception)
+        log.error(message)
+        raise TurbiniaException(message)
+    log.info(
+        'Wrote manifest of {0:d} files to {1:s}'.format(
+            len(self._manifest), manifest_path))
+
+  def _get_manifest_blob(self, gcs_path):
+    """Gets the content object for a file saved with deduplication.
+
+    Args:
+      gcs_path (string): The object name the file was saved as.
+
+    Returns:
+      google.cloud.storage.Blob: The object with the file content, or None if
+          the file is not in a manifest.
+    """
+    manifest_path = os.path.join(os.path.dirname(gcs_path), self.MANIFEST_NAME)
+    manifest_blob = self._bucket.get_blob(manifest_path, client=self.client)
+    if not manifest_blob:
+      return None
+    manifest = json.loads(
+        manifest_blob.download_as_string(client=self.client).decode('utf-8'))
+    entry = manifest.get(os.path.basename(gcs_path))
+    if not entry:
+      return None
+    log.debug(
+        'Resolved {0:s} to content object {1:s}'.format(
+            gcs_path, entry['blob']))
+    return self._bucket.get_blob(entry['blob'], client=self.client)
+
+  def _copy_to_safe(self, source_path):
+    """Copies a file to GCS, returning any error rather than raising it.
+
+    Args:
+      source_path (string): The local path of the file to upload.
+
+    Returns:
+      Tuple of (the GCS path the file was saved to, the exception if the file
+      could not be saved).
+    """
+    try:
+      return self.copy_to(source_path), None
+    except (IOError, OSError, TurbiniaException) as exception:
+      return None, exception
+
+  def copy_to_batch(self, source_files):
+    """Copies many files to GCS concurrently.
+
+    Args:
+      source_files (list(string)): Paths to local source files.
+
+    Returns:
+      Tuple of (dict mapping source files to the paths they were saved to,
+      dict mapping source files that could not be saved to the exception).
+    """
+    saved_paths = {}
+    errors = {}
+    if not source_files:
+      return saved_paths, errors
+    log.info(
+        'Writing {0:d} files to GCS with {1:d} threads'.format(
+            len(source_files), self.transfer_threads))
+    results = self._run_parallel(self._copy_to_safe, source_files)
+    for source_file, (saved_path, error) in zip(source_files, results):
+      if error:
+        errors[source_file] = error
+      else:
+        saved_paths[source_file] = saved_path
+
+    if self.dedup and saved_paths:
+      # The files can only be found through the manifest, which is written
+      # once for the whole batch.
+      try:
+        self._write_manifest()
+      except TurbiniaException as exception:
+        errors.update({source_file: exception for source_file in saved_paths})
+        saved_paths = {}
+    return saved_paths, errors
+
+  def close(self):
+    if self._cache_used:
+      stats = self.cache.get_stats()
+      log.debug(
+          'Evidence cache: {0:d} hits, {1:d} misses ({2:.0%} hit rate), '
+          '{3:d} bytes saved, {4:d} bytes cached'.format(
+              stats['hits'], stats['misses'], stats['hit_rate'],
+              stats['bytes_saved'], stats['size']))
+    if self.dedup:
+      self._write_manifest()
+
+  def open_remote(self, source_path):
+    gcs_path = self._parse_gcs_path(source_path)[1]
+    try:
+      blob = self._bucket.get_blob(gcs_path, client=self.client)
+      if not blob:
+        blob = self._get_manifest_blob(gcs_path)
+    except exceptions.GoogleCloudError as exception:
+      message = 'Could not open GCS file {0:s}: {1!s}'.format(
+          source_path, exception)
+      log.error(message)
+      raise TurbiniaException(message)
+    if not blob:
+      raise TurbiniaException(
+          'GCS file {0:s} does not exist'.format(source_path))
+    return GCSRemoteFile(blob, self.client)
+
   def copy_to(self, source_path):
-    if os.path.getsize(source_path) == 0:
+    size = os.path.getsize(source_path)
+    if size == 0:
       message = (
           'Local source file {0:s} is empty.  Not uploading to GCS'.format(
               source_path))
       log.error(message)
       raise TurbiniaException(message)
 
-    bucket = self.client.get_bucket(self.bucket)
-    destination_path = os.path.join(
-        self.base_output_dir, self.unique_dir, os.path.basename(source_path))
-    log.info(
-        'Writing {0:s} to GCS path {1:s}'.format(source_path, destination_path))
     try:
-      blob = storage.Blob(destination_path, bucket, chunk_size=self.CHUNK_SIZE)
-      blob.upload_from_filename(source_path, client=self.client)
+      if self.dedup:
+        return self._dedup_upload(source_path, size)
+
+      destination_path = os.path.join(
+          self.base_output_dir, self.unique_dir, os.path.basename(source_path))
+      log.info(
+          'Writing {0:s} to GCS path {1:s}'.format(
+              source_path, destination_path))
+      self._upload(source_path, destination_path, size)
     except exceptions.GoogleCloudError as exception:
       message = 'File upload to GCS failed: {0!s}'.format(exception)
       log.error(message)
@@ -461,7 +1491,6 @@ class GCSOutputWriter(OutputWriter):
     Raises:
       TurbiniaException: If file retrieval fails.
     """
-    bucket = self.client.get_bucket(self.bucket)
     gcs_path = self._parse_gcs_path(source_path)[1]
     destination_path = os.path.join(
         self.local_output_dir, os.path.basename(source_path))
@@ -469,8 +1498,32 @@ class GCSOutputWriter(OutputWriter):
         'Writing GCS file {0:s} to local path {1:s}'.format(
             source_path, destination_path))
     try:
-      blob = storage.Blob(gcs_path, bucket, chunk_size=self.CHUNK_SIZE)
-      blob.download_to_filename(destination_path, client=self.client)
+      blob = self._bucket.get_blob(gcs_path, client=self.client)
+      if not blob:
+        blob = self._get_manifest_blob(gcs_path)
+      if not blob:
+        raise exceptions.NotFound(
+            'Object {0:s} does not exist'.format(source_path))
+      # The generation changes whenever an object is overwritten, so it is
+      # part of the cache key to avoid returning stale content.
+      cache_key = 'gs://{0:s}/{1:s}#{2!s}'.format(
+          self.bucket, blob.name, blob.generation or blob.md5_hash)
+      if self.cache:
+        self._cache_used = True
+        if self.cache.get(cache_key, destination_path):
+          return destination_path
+        # An existing file can share its data with a cached file, so it is
+        # removed rather than overwritten.
+        if os.path.exists(destination_path):
+          os.remove(destination_path)
+
+      blob.chunk_size = self.CHUNK_SIZE
+      if blob.size and blob.size >= self.parallel_threshold:
+        self._parallel_download(blob, blob.size, destination_path)
+      else:
+        blob.download_to_filename(destination_path, client=self.client)
+      if self.cache and os.path.exists(destination_path):
+        self.cache.put(cache_key, destination_path)
     except exceptions.RequestRangeNotSatisfiable as exception:
       message = (
           'File retrieval from GCS failed, file may be empty: {0!s}'.format(
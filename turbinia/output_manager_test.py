@@ -16,17 +16,24 @@
 
 from __future__ import unicode_literals
 
+import io
+import json
 import unittest
 import os
 import shutil
 import tempfile
 
 import mock
+import six
+
+from google.cloud import exceptions
 
 from turbinia import config
+from turbinia import TurbiniaException
 from turbinia import evidence
 from turbinia import output_manager
 from turbinia import workers
+from turbinia.lib import file_cache
 
 
 class TestLocalOutputManager(unittest.TestCase):
@@ -65,6 +72,38 @@ class TestLocalOutputManager(unittest.TestCase):
     for writer in writers:
       self.assertIsInstance(writer, output_manager.OutputWriter)
 
+  @mock.patch('turbinia.output_manager.time.time')
+  def testGetTaskOutputPath(self, mock_time):
+    """Tests the task output path for each output layout."""
+    mock_time.return_value = 1000
+    layout_save = config.OUTPUT_DIR_LAYOUT
+    self.task.id = 'abc'
+    self.task.name = 'TestTask'
+    self.task.request_id = 'f00ba4'
+    self.task.job_name = 'TestJob'
+    try:
+      config.OUTPUT_DIR_LAYOUT = output_manager.LAYOUT_FLAT
+      self.assertEqual(
+          output_manager.get_task_output_path(self.task), '1000-abc-TestTask')
+      config.OUTPUT_DIR_LAYOUT = output_manager.LAYOUT_HIERARCHICAL
+      self.assertEqual(
+          output_manager.get_task_output_path(self.task),
+          os.path.join(
+              config.INSTANCE_ID, 'f0', 'f00ba4', 'TestJob',
+              '1000-abc-TestTask'))
+    finally:
+      config.OUTPUT_DIR_LAYOUT = layout_save
+
+  def testGetRequestOutputPathInvalid(self):
+    """Tests that request ids that escape the request directory are rejected."""
+    for request_id in ('..', 'a/../..', '/tmp', 'f00.ba4', ''):
+      self.assertRaises(
+          TurbiniaException, output_manager.get_request_output_path, request_id,
+          'instance')
+    self.assertEqual(
+        output_manager.get_request_output_path('f00ba4-1_2', 'instance'),
+        os.path.join('instance', 'f0', 'f00ba4-1_2'))
+
   def testGetLocalOutputDirs(self):
     """Tests get_local_output_dirs function for valid response."""
     output_manager.storage = mock.MagicMock()
@@ -128,6 +167,91 @@ class TestLocalOutputManager(unittest.TestCase):
     # metadata file
     self.assertFalse(os.path.exists('{0:s}.metadata.json'.format(dst_file)))
 
+  def testQueueLocalFile(self):
+    """Test saving files in the background."""
+    # Set path to None so we don't try to initialize GCS outout writer.
+    config.GCS_OUTPUT_PATH = None
+    self.task.output_manager.setup(self.task)
+    tmp_dir, local_dir = self.task.output_manager.get_local_output_dirs()
+    self.task.result = mock.MagicMock()
+    self.task.result.saved_paths = []
+    src_file = os.path.join(tmp_dir, 'test-file.out')
+    dst_file = os.path.join(local_dir, 'test-file.out')
+    with open(src_file, 'w') as fh:
+      fh.write('test_contents')
+
+    self.task.output_manager.queue_local_file(src_file, self.task.result)
+    self.task.output_manager.wait_for_uploads()
+    self.assertTrue(os.path.exists(dst_file))
+    self.assertIn(dst_file, self.task.result.saved_paths)
+
+    self.task.output_manager.save_local_file = mock.MagicMock(
+        side_effect=IOError('disk full'))
+    self.task.output_manager.queue_local_file(src_file, self.task.result)
+    self.assertRaisesRegexp(
+        TurbiniaException, 'disk full',
+        self.task.output_manager.wait_for_uploads)
+    # Failed uploads are only reported once.
+    self.task.output_manager.wait_for_uploads()
+
+    # The output writers are closed to write any pending metadata.
+    writer = mock.MagicMock()
+    writer.name = 'TestWriter'
+    writer.close.side_effect = TurbiniaException('manifest failed')
+    # pylint: disable=protected-access
+    self.task.output_manager._output_writers.append(writer)
+    self.assertRaisesRegexp(
+        TurbiniaException, 'TestWriter: manifest failed',
+        self.task.output_manager.wait_for_uploads)
+
+  def testSaveEvidenceBatch(self):
+    """Test saving many evidence objects at once."""
+    # Set path to None so we don't try to initialize GCS outout writer.
+    config.GCS_OUTPUT_PATH = None
+    self.task.output_manager.setup(self.task)
+    self.task.output_manager.SAVED_PATHS_MANIFEST_THRESHOLD = 3
+    tmp_dir, local_dir = self.task.output_manager.get_local_output_dirs()
+    self.task.result = mock.MagicMock()
+    self.task.result.saved_paths = []
+    evidence_list = []
+    for index in range(5):
+      src_file = os.path.join(tmp_dir, 'test-file-{0:d}.out'.format(index))
+      with open(src_file, 'w') as fh:
+        fh.write('test_contents')
+      evidence_list.append(evidence.Evidence(source_path=src_file))
+
+    self.task.output_manager.queue_evidence_batch(
+        evidence_list, self.task.result)
+    self.task.output_manager.wait_for_uploads()
+    for index, test_evidence in enumerate(evidence_list):
+      dst_file = os.path.join(local_dir, 'test-file-{0:d}.out'.format(index))
+      self.assertTrue(os.path.exists(dst_file))
+      self.assertEqual(test_evidence.saved_path, dst_file)
+      self.assertEqual(test_evidence.local_path, dst_file)
+
+    # The saved paths are written to a manifest instead of the result.
+    self.assertEqual(len(self.task.result.saved_paths), 1)
+    manifest_path = self.task.result.saved_paths[0]
+    self.assertTrue(os.path.basename(manifest_path).startswith('saved-paths'))
+    with open(manifest_path, 'rb') as fh:
+      manifest = json.loads(fh.read().decode('utf-8'))
+    self.assertEqual(len(manifest), 5)
+    self.assertEqual(
+        manifest[evidence_list[0].source_path], [evidence_list[0].saved_path])
+
+    # Failures are reported after all other files have been saved.
+    bad_evidence = evidence.Evidence(source_path=os.path.join(tmp_dir, 'bad'))
+    writer = self.task.output_manager._output_writers[0]
+    writer.copy_to = mock.MagicMock(
+        side_effect=[None, TurbiniaException('Not saved')])
+    self.task.result.saved_paths = []
+    self.assertRaisesRegexp(
+        TurbiniaException, 'Could not save 1 of 2 output files',
+        self.task.output_manager.save_evidence_batch,
+        [evidence_list[1], bad_evidence], self.task.result)
+    self.assertEqual(
+        self.task.result.saved_paths, [evidence_list[1].local_path])
+
   def testSaveEvidenceWithMetadata(self):
     """Test the save_evidence method with metadata file."""
     # Set path to None so we don't try to initialize GCS outout writer.
@@ -235,3 +359,304 @@ class TestLocalOutputWriter(unittest.TestCase):
 
     self.assertFalse(writer.copy_to(src))
     self.assertEqual(other_contents, open(dst).read())
+
+
+class FakeBlob(object):
+  """Fake GCS blob storing its contents in a FakeBucket."""
+
+  def __init__(self, bucket, name):
+    self.bucket = bucket
+    self.name = name
+    self.chunk_size = None
+    self.md5_hash = None
+
+  @property
+  def generation(self):
+    return self.bucket.generations.get(self.name, 1)
+
+  @property
+  def size(self):
+    return len(self.bucket.objects[self.name])
+
+  def upload_from_file(self, file_object, size=None, client=None):
+    self.bucket.objects[self.name] = file_object.read(size)
+
+  def upload_from_filename(self, filename, client=None):
+    self.bucket.uploads.append(self.name)
+    with open(filename, 'rb') as file_object:
+      self.upload_from_file(file_object)
+
+  def upload_from_string(self, data, content_type=None, client=None):
+    self.bucket.string_uploads.append(self.name)
+    self.bucket.objects[self.name] = six.ensure_binary(data)
+
+  def download_as_string(self, client=None, start=None, end=None):
+    if start is None:
+      return self.bucket.objects[self.name]
+    self.bucket.range_reads.append((start, end))
+    return self.bucket.objects[self.name][start:end + 1]
+
+  def exists(self, client=None):
+    return self.name in self.bucket.objects
+
+  def compose(self, sources, client=None):
+    self.bucket.compose_calls.append([source.name for source in sources])
+    self.bucket.objects[self.name] = b''.join(
+        self.bucket.objects[source.name] for source in sources)
+
+  def delete(self, client=None):
+    del self.bucket.objects[self.name]
+
+  def download_to_file(self, file_object, client=None, start=None, end=None):
+    file_object.write(self.bucket.objects[self.name][start:end + 1])
+
+  def download_to_filename(self, filename, client=None):
+    with open(filename, 'wb') as file_object:
+      file_object.write(self.bucket.objects[self.name])
+
+
+class FakeBucket(object):
+  """Fake in-memory GCS bucket."""
+
+  def __init__(self):
+    self.objects = {}
+    self.compose_calls = []
+    self.uploads = []
+    self.string_uploads = []
+    self.generations = {}
+    self.range_reads = []
+
+  def blob(self, name, chunk_size=None):
+    return FakeBlob(self, name)
+
+  def get_blob(self, name, client=None):
+    return FakeBlob(self, name) if name in self.objects else None
+
+  def list_blobs(self, prefix=None, client=None):
+    return [
+        FakeBlob(self, name)
+        for name in sorted(self.objects)
+        if name.startswith(prefix)
+    ]
+
+
+class TestGCSOutputWriter(unittest.TestCase):
+  """Test GCSOutputWriter module."""
+
+  def setUp(self):
+    self.local_output_dir = tempfile.mkdtemp(prefix='turbinia-test-gcs')
+    self.bucket = FakeBucket()
+    output_manager.storage = mock.MagicMock()
+    output_manager.exceptions = exceptions
+    output_manager._GCS_BUCKETS.clear()
+    output_manager._GCS_BLOB_INDEXES.clear()
+    with mock.patch('turbinia.output_manager.get_gcs_bucket') as get_bucket:
+      get_bucket.return_value = (mock.MagicMock(), self.bucket)
+      self.writer = output_manager.GCSOutputWriter(
+          'gs://bucket/output', unique_dir='unique',
+          local_output_dir=self.local_output_dir)
+    self.writer.parallel_threshold = 100
+    self.writer.part_size = 10
+    self.writer.MAX_COMPOSE_COMPONENTS = 4
+    self.source_path = os.path.join(self.local_output_dir, 'source.plaso')
+    self.contents = os.urandom(105)
+    with open(self.source_path, 'wb') as file_object:
+      file_object.write(self.contents)
+
+  def tearDown(self):
+    shutil.rmtree(self.local_output_dir)
+
+  def testGetGCSBucketCached(self):
+    """Test that GCS clients and buckets are reused."""
+    client, bucket = output_manager.get_gcs_bucket('project', 'bucket')
+    self.assertEqual(
+        output_manager.get_gcs_bucket('project', 'bucket'), (client, bucket))
+    output_manager.storage.Client.assert_called_once_with(project='project')
+
+  def testParallelCopy(self):
+    """Test parallel composite upload and sliced download."""
+    gcs_path = self.writer.copy_to(self.source_path)
+    self.assertEqual(gcs_path, 'gs://bucket/output/unique/source.plaso')
+    # Only the composed object remains, composed in batches of up to 4 objects.
+    self.assertEqual(list(self.bucket.objects), ['output/unique/source.plaso'])
+    self.assertEqual(len(self.bucket.compose_calls), 4)
+    self.assertEqual(
+        self.bucket.objects['output/unique/source.plaso'], self.contents)
+
+    os.remove(self.source_path)
+    local_path = self.writer.copy_from(gcs_path)
+    self.assertEqual(local_path, self.source_path)
+    with open(local_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), self.contents)
+
+  def testParallelCopyFailure(self):
+    """Test that uploaded parts are deleted when another part fails."""
+    upload_from_file = FakeBlob.upload_from_file
+
+    def _upload_from_file(blob, file_object, size=None, client=None):
+      if blob.name.endswith('part-00003'):
+        raise exceptions.GoogleCloudError('Upload failed')
+      upload_from_file(blob, file_object, size=size, client=client)
+
+    with mock.patch.object(FakeBlob, 'upload_from_file', _upload_from_file):
+      self.assertRaises(
+          TurbiniaException, self.writer.copy_to, self.source_path)
+    self.assertEqual(self.bucket.objects, {})
+
+  def testDedupCopy(self):
+    """Test that identical files are stored once by their content hash."""
+    self.writer.dedup = True
+    self.writer.parallel_threshold = 1000
+    other_path = os.path.join(self.local_output_dir, 'other.plaso')
+    shutil.copy(self.source_path, other_path)
+
+    gcs_path = self.writer.copy_to(self.source_path)
+    other_gcs_path = self.writer.copy_to(other_path)
+    self.assertEqual(gcs_path, 'gs://bucket/output/unique/source.plaso')
+    self.assertEqual(other_gcs_path, 'gs://bucket/output/unique/other.plaso')
+
+    blob_names = [
+        name for name in self.bucket.objects
+        if name.startswith('output/blobs/')
+    ]
+    self.assertEqual(len(blob_names), 1)
+    self.assertEqual(self.bucket.uploads, blob_names)
+    self.assertEqual(self.bucket.objects[blob_names[0]], self.contents)
+    # The manifest is only written when the writer is closed.
+    self.assertNotIn('output/unique/manifest.json', self.bucket.objects)
+    self.writer.close()
+    manifest = json.loads(
+        self.bucket.objects['output/unique/manifest.json'].decode('utf-8'))
+    self.assertEqual(sorted(manifest), ['other.plaso', 'source.plaso'])
+    self.assertEqual(manifest['other.plaso']['blob'], blob_names[0])
+
+    os.remove(self.source_path)
+    local_path = self.writer.copy_from(gcs_path)
+    self.assertEqual(local_path, self.source_path)
+    with open(local_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), self.contents)
+
+  def testDedupCopyExistingBlob(self):
+    """Test that content already in the bucket is not uploaded again."""
+    self.writer.dedup = True
+    self.writer.parallel_threshold = 1000
+    digest = self.writer._hash_file(self.source_path)
+    blob_path = 'output/blobs/{0:s}/{1:s}'.format(digest[:2], digest)
+    self.bucket.objects[blob_path] = self.contents
+
+    self.writer.copy_to(self.source_path)
+    self.assertEqual(self.bucket.uploads, [])
+
+    # A bloom filter false positive still uploads the file.
+    del self.bucket.objects[blob_path]
+    self.writer.copy_to(self.source_path)
+    self.assertEqual(self.bucket.uploads, [blob_path])
+
+  def testDedupCopyToBatch(self):
+    """Test that the manifest is written once per batch."""
+    self.writer.dedup = True
+    self.writer.parallel_threshold = 1000
+    source_paths = []
+    for index in range(3):
+      source_path = os.path.join(
+          self.local_output_dir, 'file-{0:d}.txt'.format(index))
+      with open(source_path, 'wb') as file_object:
+        file_object.write('contents {0:d}'.format(index).encode('utf-8'))
+      source_paths.append(source_path)
+
+    saved_paths, errors = self.writer.copy_to_batch(source_paths)
+    self.assertEqual(errors, {})
+    self.assertEqual(len(saved_paths), 3)
+    self.assertEqual(
+        self.bucket.string_uploads, ['output/unique/manifest.json'])
+    manifest = json.loads(
+        self.bucket.objects['output/unique/manifest.json'].decode('utf-8'))
+    self.assertEqual(
+        sorted(manifest), ['file-0.txt', 'file-1.txt', 'file-2.txt'])
+
+    # Closing the writer does not write the unchanged manifest again.
+    self.writer.close()
+    self.assertEqual(len(self.bucket.string_uploads), 1)
+
+  def testCopyFromCache(self):
+    """Test that retrieved files are cached by object generation."""
+    self.writer.parallel_threshold = 1000
+    self.writer.cache = file_cache.FileCache(
+        os.path.join(self.local_output_dir, 'cache'), 1000)
+    gcs_path = self.writer.copy_to(self.source_path)
+    os.remove(self.source_path)
+    local_path = self.writer.copy_from(gcs_path)
+    os.remove(local_path)
+
+    # The object is changed without a new generation, so the cached copy is
+    # returned.
+    self.bucket.objects['output/unique/source.plaso'] = b'new contents'
+    self.assertEqual(self.writer.copy_from(gcs_path), local_path)
+    with open(local_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), self.contents)
+    self.assertEqual(self.writer.cache.get_stats()['hits'], 1)
+
+    self.bucket.generations['output/unique/source.plaso'] = 2
+    self.writer.copy_from(gcs_path)
+    with open(local_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), b'new contents')
+    # The previously cached generation was not changed by the new download.
+    self.bucket.generations['output/unique/source.plaso'] = 1
+    self.writer.copy_from(gcs_path)
+    with open(local_path, 'rb') as file_object:
+      self.assertEqual(file_object.read(), self.contents)
+
+    # The cache statistics are logged when the writer is closed.
+    with self.assertLogs('turbinia', level='DEBUG') as logs:
+      self.writer.close()
+    self.assertIn('Evidence cache: 2 hits, 2 misses', logs.output[0])
+
+  def testOpenRemote(self):
+    """Test reading a GCS file on demand."""
+    gcs_path = self.writer.copy_to(self.source_path)
+    with mock.patch.object(output_manager.GCSRemoteFile, 'BLOCK_SIZE', 10):
+      remote_file = self.writer.open_remote(gcs_path)
+      self.assertEqual(remote_file.size, 105)
+      self.assertEqual(remote_file.read(5), self.contents[:5])
+      self.assertEqual(self.bucket.range_reads, [(0, 9)])
+
+      # Sequential reads fetch an increasing number of blocks ahead.
+      self.assertEqual(remote_file.read(20), self.contents[5:25])
+      self.assertEqual(self.bucket.range_reads, [(0, 9), (10, 29)])
+      self.assertEqual(remote_file.read(10), self.contents[25:35])
+      self.assertEqual(self.bucket.range_reads[-1], (30, 59))
+
+      # Random reads only fetch the block needed, and cached blocks are reused.
+      remote_file.seek(-3, io.SEEK_END)
+      self.assertEqual(remote_file.read(), self.contents[102:])
+      self.assertEqual(self.bucket.range_reads[-1], (100, 104))
+      remote_file.seek(12)
+      self.assertEqual(remote_file.read(3), self.contents[12:15])
+      self.assertEqual(len(self.bucket.range_reads), 4)
+      self.assertEqual(remote_file.read(1000), self.contents[15:])
+
+    self.assertRaises(
+        TurbiniaException, self.writer.open_remote,
+        'gs://bucket/output/unique/nonexistent')
+
+  def testCopyToBatch(self):
+    """Test uploading many files concurrently."""
+    self.writer.parallel_threshold = 1000
+    source_paths = [self.source_path]
+    for index in range(4):
+      source_path = os.path.join(
+          self.local_output_dir, 'file-{0:d}.txt'.format(index))
+      with open(source_path, 'wb') as file_object:
+        file_object.write(b'contents')
+      source_paths.append(source_path)
+    empty_path = os.path.join(self.local_output_dir, 'empty.txt')
+    open(empty_path, 'wb').close()
+    source_paths.append(empty_path)
+
+    saved_paths, errors = self.writer.copy_to_batch(source_paths)
+    self.assertEqual(len(saved_paths), 5)
+    self.assertEqual(
+        saved_paths[self.source_path], 'gs://bucket/output/unique/source.plaso')
+    self.assertEqual(list(errors), [empty_path])
+    self.assertIsInstance(errors[empty_path], TurbiniaException)
+    self.assertEqual(len(self.bucket.objects), 5)
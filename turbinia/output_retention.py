@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Retention and garbage collection of local request output directories."""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import shutil
+
+from turbinia import config
+from turbinia import output_manager
+from turbinia import task_retention
+from turbinia import TurbiniaException
+from turbinia.processors import archive
+
+log = logging.getLogger('turbinia')
+
+ACTION_ARCHIVE = 'archived'
+ACTION_DELETE = 'deleted'
+
+
+def get_directory_size(path):
+  """Gets the total size of the files in a directory tree.
+
+  Args:
+    path (str): The directory to get the size of.
+
+  Returns:
+    int: The size of all files in bytes.
+  """
+  size = 0
+  for dirpath, _, filenames in os.walk(path):
+    for filename in filenames:
+      try:
+        size += os.lstat(os.path.join(dirpath, filename)).st_size
+      except OSError:
+        pass
+  return size
+
+
+def get_output_usage(base_dir, instance=None):
+  """Gets the output size of each request in the hierarchical output layout.
+
+  Args:
+    base_dir (str): The base output directory (e.g. OUTPUT_DIR).
+    instance (str): The Turbinia instance name, by default the configured
+        INSTANCE_ID.
+
+  Returns:
+    dict: The output size in bytes keyed by request id.
+  """
+  if not instance:
+    config.LoadConfig()
+    instance = config.INSTANCE_ID
+  usage = {}
+  instance_dir = os.path.join(base_dir, instance)
+  if not os.path.isdir(instance_dir):
+    return usage
+  for shard in sorted(os.listdir(instance_dir)):
+    shard_dir = os.path.join(instance_dir, shard)
+    if not os.path.isdir(shard_dir):
+      continue
+    for request_id in sorted(os.listdir(shard_dir)):
+      usage[request_id] = get_directory_size(
+          os.path.join(shard_dir, request_id))
+  return usage
+
+
+def is_subdirectory(path, base_dir):
+  """Checks whether a path is inside of a base directory.
+
+  Symbolic links are resolved first, so a link pointing outside of the base
+  directory is not considered to be inside of it.
+
+  Args:
+    path (str): The path to check.
+    base_dir (str): The base directory.
+
+  Returns:
+    bool: True if the path is below the base directory.
+  """
+  path = os.path.realpath(path)
+  base_dir = os.path.realpath(base_dir)
+  return path != base_dir and os.path.commonpath([path, base_dir]) == base_dir
+
+
+class OutputRetentionManager(object):
+  """Removes the local output of requests that are past their retention time.
+
+  This requires the 'hierarchical' OUTPUT_DIR_LAYOUT so that the output of a
+  request can be found and removed as a single directory tree.  Expired request
+  trees in OUTPUT_DIR are either deleted or, if an archive directory is set,
+  compressed into that directory first.  Request trees in TMP_DIR are always
+  deleted.  When TASK_ARCHIVE_PATH is set, the requests of Task records that
+  were moved into the Task archive are found there.
+
+  Attributes:
+    archive_dir (str): Directory to archive expired output into, or None to
+        delete it.
+    output_dirs (list(str)): The base output directories to remove request
+        output from.
+    retention_days (int): Number of days to keep request output for after the
+        request has completed.
+    task_archive (TaskArchive): The archive of compacted Task records, or None
+        if Task records are not archived.
+    tmp_dirs (list(str)): The base temporary directories to remove request
+        output from.
+  """
+
+  def __init__(
+      self, state_manager, retention_days=None, archive_dir=None,
+      output_dirs=None, tmp_dirs=None, task_archive=None):
+    """Initialization for OutputRetentionManager.
+
+    Args:
+      state_manager (BaseStateManager): State manager to find completed
+          requests with.
+      retention_days (int): Number of days to keep request output for,
+          by default the configured OUTPUT_RETENTION_DAYS.
+      archive_dir (str): Directory to archive expired output into, by default
+          the configured OUTPUT_ARCHIVE_DIR.
+      output_dirs (list(str)): Base output directories, by default OUTPUT_DIR.
+      tmp_dirs (list(str)): Base temporary directories, by default TMP_DIR.
+      task_archive (TaskArchive): The archive of compacted Task records, by
+          default one at the configured TASK_ARCHIVE_PATH if it is set.
+
+    Raises:
+      TurbiniaException: If no retention time is set or the output layout is
+          not hierarchical.
+    """
+    config.LoadConfig()
+    self.state_manager = state_manager
+    self.retention_days = retention_days or config.OUTPUT_RETENTION_DAYS
+    self.archive_dir = archive_dir or config.OUTPUT_ARCHIVE_DIR
+    self.output_dirs = output_dirs or [config.OUTPUT_DIR]
+    self.tmp_dirs = tmp_dirs or [config.TMP_DIR]
+    self.task_archive = task_archive
+    if not self.task_archive and config.TASK_ARCHIVE_PATH:
+      self.task_archive = task_retention.TaskArchive()
+    if not self.retention_days:
+      raise TurbiniaException(
+          'OUTPUT_RETENTION_DAYS needs to be set to remove expired output.')
+    if config.OUTPUT_DIR_LAYOUT != output_manager.LAYOUT_HIERARCHICAL:
+      raise TurbiniaException(
+          'Expired output can only be removed with the {0:s} '
+          'OUTPUT_DIR_LAYOUT.'.format(output_manager.LAYOUT_HIERARCHICAL))
+
+  def _archive(self, request_dir, request_id):
+    """Archives a request output directory and then removes it.
+
+    Args:
+      request_dir (str): The request output directory.
+      request_id (str): The id of the request.
+
+    Returns:
+      str: The path of the archive.
+    """
+    archive_path = archive.CompressDirectory(request_dir)
+    if not os.path.isdir(self.archive_dir):
+      os.makedirs(self.archive_dir)
+    destination = os.path.join(
+        self.archive_dir, '{0:s}.tar.gz'.format(request_id))
+    shutil.move(archive_path, destination)
+    shutil.rmtree(request_dir)
+    return destination
+
+  def _get_expired_requests(self):
+    """Gets the expired requests from the state manager and the Task archive.
+
+    Returns:
+      list(str): The ids of the expired requests.
+    """
+    request_ids = set(
+        self.state_manager.get_expired_requests(self.retention_days))
+    if self.task_archive:
+      request_ids.update(
+          self.task_archive.get_expired_requests(
+              self.state_manager, config.INSTANCE_ID, self.retention_days))
+    return sorted(request_ids)
+
+  def run(self, dry_run=False):
+    """Removes the output of all expired requests.
+
+    Args:
+      dry_run (bool): Only report what would be removed.
+
+    Returns:
+      list(tuple(str, str, int, str)): The request id, directory, size in bytes
+          and action taken (or that would be taken) for each removed directory.
+    """
+    request_ids = self._get_expired_requests()
+    log.info(
+        'Found {0:d} requests completed more than {1:d} days ago'.format(
+            len(request_ids), self.retention_days))
+
+    removed = []
+    base_dirs = [(base_dir, True) for base_dir in self.output_dirs]
+    base_dirs.extend((base_dir, False) for base_dir in self.tmp_dirs)
+    for request_id in request_ids:
+      try:
+        relative_path = output_manager.get_request_output_path(request_id)
+      except TurbiniaException as exception:
+        log.warning(
+            'Not removing output of request {0:s}: {1!s}'.format(
+                request_id, exception))
+        continue
+      for base_dir, is_output in base_dirs:
+        request_dir = os.path.join(base_dir, relative_path)
+        if not os.path.isdir(request_dir):
+          continue
+        if not is_subdirectory(request_dir, base_dir):
+          log.warning(
+              'Not removing output directory {0:s} outside of {1:s}'.format(
+                  request_dir, base_dir))
+          continue
+        size = get_directory_size(request_dir)
+        action = ACTION_DELETE
+        if is_output and self.archive_dir:
+          action = ACTION_ARCHIVE
+        removed.append((request_id, request_dir, size, action))
+        if dry_run:
+          continue
+
+        try:
+          if action == ACTION_ARCHIVE:
+            self._archive(request_dir, request_id)
+          else:
+            shutil.rmtree(request_dir)
+        except (IOError, OSError, TurbiniaException) as exception:
+          log.error(
+              'Could not remove output directory {0:s}: {1!s}'.format(
+                  request_dir, exception))
+          removed.pop()
+          continue
+        message = 'Output directory {0:s} of request {1:s} ({2:d} bytes) {3:s}'
+        log.info(message.format(request_dir, request_id, size, action))
+    return removed
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the output retention module."""
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from turbinia import config
+from turbinia import output_manager
+from turbinia import output_retention
+from turbinia import TurbiniaException
+
+
+class TestOutputRetentionManager(unittest.TestCase):
+  """Tests for the OutputRetentionManager class."""
+
+  def setUp(self):
+    config.LoadConfig()
+    self.layout_save = config.OUTPUT_DIR_LAYOUT
+    config.OUTPUT_DIR_LAYOUT = output_manager.LAYOUT_HIERARCHICAL
+    self.base_dir = tempfile.mkdtemp(prefix='turbinia-test-retention')
+    self.output_dir = os.path.join(self.base_dir, 'output')
+    self.tmp_dir = os.path.join(self.base_dir, 'tmp')
+    self.archive_dir = os.path.join(self.base_dir, 'archive')
+    self.state_manager = mock.MagicMock()
+    self.state_manager.get_expired_requests.return_value = ['aa11']
+
+    for request_id in ('aa11', 'bb22'):
+      for base_dir in (self.output_dir, self.tmp_dir):
+        task_dir = os.path.join(
+            base_dir, output_manager.get_request_output_path(request_id),
+            'TestJob', '1000-abc-TestTask')
+        os.makedirs(task_dir)
+        with open(os.path.join(task_dir, 'output.txt'), 'wb') as fh:
+          fh.write(b'x' * 10)
+
+  def tearDown(self):
+    config.OUTPUT_DIR_LAYOUT = self.layout_save
+    shutil.rmtree(self.base_dir)
+
+  def _get_manager(self, archive_dir=None):
+    """Gets an OutputRetentionManager for the test directories."""
+    return output_retention.OutputRetentionManager(
+        self.state_manager, retention_days=7, archive_dir=archive_dir,
+        output_dirs=[self.output_dir], tmp_dirs=[self.tmp_dir])
+
+  def _request_dir(self, base_dir, request_id):
+    """Gets the output directory of a request."""
+    return os.path.join(
+        base_dir, output_manager.get_request_output_path(request_id))
+
+  def testGetOutputUsage(self):
+    """Tests getting the output size of each request."""
+    self.assertEqual(
+        output_retention.get_output_usage(self.output_dir), {
+            'aa11': 10,
+            'bb22': 10
+        })
+
+  def testRequiresHierarchicalLayout(self):
+    """Tests that the flat layout is rejected."""
+    config.OUTPUT_DIR_LAYOUT = output_manager.LAYOUT_FLAT
+    self.assertRaises(TurbiniaException, self._get_manager)
+
+  def testRunDryRun(self):
+    """Tests that a dry run does not remove anything."""
+    removed = self._get_manager().run(dry_run=True)
+    self.assertEqual(len(removed), 2)
+    self.assertTrue(os.path.isdir(self._request_dir(self.output_dir, 'aa11')))
+    self.assertTrue(os.path.isdir(self._request_dir(self.tmp_dir, 'aa11')))
+
+  def testRunDelete(self):
+    """Tests deleting expired request output."""
+    removed = self._get_manager().run()
+    self.assertEqual(
+        removed,
+        [(
+            'aa11', self._request_dir(
+                self.output_dir, 'aa11'), 10, output_retention.ACTION_DELETE),
+         (
+             'aa11', self._request_dir(
+                 self.tmp_dir, 'aa11'), 10, output_retention.ACTION_DELETE)])
+    self.assertFalse(os.path.exists(self._request_dir(self.output_dir, 'aa11')))
+    self.assertFalse(os.path.exists(self._request_dir(self.tmp_dir, 'aa11')))
+    self.assertTrue(os.path.isdir(self._request_dir(self.output_dir, 'bb22')))
+    self.state_manager.get_expired_requests.assert_called_with(7)
+
+  def testRunArchive(self):
+    """Tests archiving expired request output."""
+    removed = self._get_manager(archive_dir=self.archive_dir).run()
+    self.assertEqual(
+        [action for _, _, _, action in removed],
+        [output_retention.ACTION_ARCHIVE, output_retention.ACTION_DELETE])
+    self.assertTrue(
+        os.path.isfile(os.path.join(self.archive_dir, 'aa11.tar.gz')))
+    self.assertFalse(os.path.exists(self._request_dir(self.output_dir, 'aa11')))
+
+  def testRunInvalidRequestId(self):
+    """Tests that request ids that escape the output directory are skipped."""
+    self.state_manager.get_expired_requests.return_value = ['..', 'aa11/..']
+    self.assertEqual(self._get_manager().run(), [])
+    self.assertTrue(os.path.isdir(self._request_dir(self.output_dir, 'aa11')))
+    self.assertTrue(os.path.isdir(self._request_dir(self.output_dir, 'bb22')))
+
+  def testRunSymlinkOutsideOutputDir(self):
+    """Tests that request directories linking elsewhere are not removed."""
+    outside_dir = os.path.join(self.base_dir, 'outside')
+    os.makedirs(outside_dir)
+    request_dir = self._request_dir(self.output_dir, 'aa11')
+    shutil.rmtree(request_dir)
+    os.symlink(outside_dir, request_dir)
+    removed = self._get_manager().run()
+    removed_dirs = [removed_dir for _, removed_dir, _, _ in removed]
+    self.assertEqual(removed_dirs, [self._request_dir(self.tmp_dir, 'aa11')])
+    self.assertTrue(os.path.isdir(outside_dir))
+
+  def testIsSubdirectory(self):
+    """Tests is_subdirectory."""
+    self.assertTrue(
+        output_retention.is_subdirectory(
+            os.path.join(self.output_dir, 'a', 'b'), self.output_dir))
+    self.assertFalse(
+        output_retention.is_subdirectory(self.output_dir, self.output_dir))
+    self.assertFalse(
+        output_retention.is_subdirectory(
+            os.path.join(self.output_dir, '..', 'tmp'), self.output_dir))
+
+
+if __name__ == '__main__':
+  unittest.main()
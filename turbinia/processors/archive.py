@@ -16,15 +16,202 @@
 
 from __future__ import unicode_literals
 
+import bisect
+import io
+import json
 import os
+import posixpath
+import struct
 import tarfile
 import logging
+import zlib
 
+from collections import namedtuple
 from time import time
 from turbinia import TurbiniaException
 
 log = logging.getLogger('turbinia')
 
+# Amount of uncompressed archive data between two seekable checkpoints.  Each
+# checkpoint starts a new gzip member, so random reads never need to decompress
+# more than this amount of data before reaching the requested offset.
+CHECKPOINT_SIZE = 4 * (2**20)
+
+# Compression level used for the archive data members.
+COMPRESSION_LEVEL = 6
+
+# The archive index is stored as a gzip member following the tar data, and
+# located through a fixed size, uncompressed gzip trailer member at the very
+# end of the file.  Regular tar/gzip tools ignore both since they come after
+# the tar end-of-archive marker.
+INDEX_MAGIC = b'TURBIDX1'
+INDEX_VERSION = 1
+_TRAILER_FORMAT = '>8sQQ'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def _CompressGzipMember(data, level=COMPRESSION_LEVEL):
+  """Compresses data into a complete, standalone gzip member.
+
+  Args:
+    data(bytes): The data to compress.
+    level(int): The zlib compression level.
+
+  Returns:
+    bytes: The gzip member.
+  """
+  compressor = zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+  return compressor.compress(data) + compressor.flush()
+
+
+# The trailer is stored uncompressed so that it always has the same size.
+_TRAILER_SIZE = len(
+    _CompressGzipMember(
+        struct.pack(_TRAILER_FORMAT, INDEX_MAGIC, 0, 0), level=0))
+
+# An entry in the archive index.
+ArchiveMember = namedtuple(
+    'ArchiveMember', ['name', 'type', 'offset_data', 'size'])
+
+
+class _CheckpointedGzipWriter(object):
+  """File-like object writing a gzip file made of independent members.
+
+  Attributes:
+    checkpoints(list): Pairs of (uncompressed offset, compressed offset) for
+        the start of every gzip member written.
+  """
+
+  def __init__(self, file_object, checkpoint_size=CHECKPOINT_SIZE):
+    """Initialization for the gzip writer.
+
+    Args:
+      file_object(file): The file object to write the compressed data to.
+      checkpoint_size(int): Amount of uncompressed data per gzip member.
+    """
+    self._file_object = file_object
+    self._checkpoint_size = checkpoint_size
+    self._buffer = []
+    self._buffer_size = 0
+    self._uncompressed_offset = 0
+    self._compressed_offset = 0
+    self.checkpoints = []
+
+  def _write_member(self, data):
+    """Writes data as a new gzip member and records its checkpoint."""
+    member = _CompressGzipMember(data)
+    self.checkpoints.append(
+        [self._uncompressed_offset, self._compressed_offset])
+    self._file_object.write(member)
+    self._uncompressed_offset += len(data)
+    self._compressed_offset += len(member)
+
+  def write(self, data):
+    """Buffers data and writes out full gzip members.
+
+    Args:
+      data(bytes): The data to write.
+    """
+    self._buffer.append(data)
+    self._buffer_size += len(data)
+    if self._buffer_size < self._checkpoint_size:
+      return
+
+    data = b''.join(self._buffer)
+    position = 0
+    while len(data) - position >= self._checkpoint_size:
+      self._write_member(data[position:position + self._checkpoint_size])
+      position += self._checkpoint_size
+    self._buffer = [data[position:]]
+    self._buffer_size = len(data) - position
+
+  def flush(self):
+    """Writes out any buffered data as a final gzip member."""
+    if self._buffer_size:
+      self._write_member(b''.join(self._buffer))
+    self._buffer = []
+    self._buffer_size = 0
+
+  def write_index(self, members):
+    """Writes the archive index and trailer after the archive data.
+
+    Args:
+      members(list(ArchiveMember)): The archive members to index.
+    """
+    self.flush()
+    index = {
+        'version': INDEX_VERSION,
+        'size': self._uncompressed_offset,
+        'checkpoints': self.checkpoints,
+        'members': [list(member) for member in members]
+    }
+    index_member = _CompressGzipMember(json.dumps(index).encode('utf-8'))
+    trailer = _CompressGzipMember(
+        struct.pack(
+            _TRAILER_FORMAT, INDEX_MAGIC, self._compressed_offset,
+            len(index_member)), level=0)
+    self._file_object.write(index_member)
+    self._file_object.write(trailer)
+
+
+def _GetMemberType(tarinfo):
+  """Gets a short type string for a tar member.
+
+  Args:
+    tarinfo(tarfile.TarInfo): The tar member.
+
+  Returns:
+    str: One of 'file', 'directory', 'symlink', 'link' or 'other'.
+  """
+  # pylint: disable=no-else-return
+  if tarinfo.isreg():
+    return 'file'
+  elif tarinfo.isdir():
+    return 'directory'
+  elif tarinfo.issym():
+    return 'symlink'
+  elif tarinfo.islnk():
+    return 'link'
+  return 'other'
+
+
+def _AddToTar(tar, path, arcname, members):
+  """Recursively adds a path to a tar file and records member offsets.
+
+  This follows the same ordering as tarfile.TarFile.add().
+
+  Args:
+    tar(tarfile.TarFile): The tar file opened in stream write mode.
+    path(str): The path to add.
+    arcname(str): The name of the path inside of the archive.
+    members(list): A list to append the ArchiveMember entries to.
+  """
+  tarinfo = tar.gettarinfo(path, arcname)
+  if tarinfo is None:
+    log.warning('Not archiving unsupported file type {0:s}'.format(path))
+    return
+
+  if tarinfo.isreg():
+    with open(path, 'rb') as file_object:
+      tar.addfile(tarinfo, file_object)
+  else:
+    tar.addfile(tarinfo)
+
+  # The data of a member is padded to full blocks and immediately precedes the
+  # current offset of the tar stream.
+  blocks, remainder = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+  if remainder:
+    blocks += 1
+  offset_data = tar.offset - blocks * tarfile.BLOCKSIZE
+  members.append(
+      ArchiveMember(
+          tarinfo.name, _GetMemberType(tarinfo), offset_data, tarinfo.size))
+
+  if tarinfo.isdir():
+    for name in sorted(os.listdir(path)):
+      _AddToTar(
+          tar, os.path.join(path, name), os.path.join(arcname, name), members)
+
 
 def ValidateTarFile(compressed_directory):
   """ Validates a given compressed directory path.
@@ -68,12 +255,17 @@ def CompressDirectory(uncompressed_directory):
         'The File or Directory does not exist: {0:s}'.format(
             uncompressed_directory))
 
-  # Iterate through a given list of files and compress them.
+  # Iterate through a given list of files and compress them.  The archive is
+  # written as a series of gzip members with an index of all members so that
+  # it can later be read without being fully uncompressed (see IndexedArchive).
   compressed_directory = uncompressed_directory + '.tar.gz'
+  members = []
   try:
-    with tarfile.TarFile.open(compressed_directory, 'w:gz') as tar:
-      tar.add(uncompressed_directory, arcname='')
-      tar.close()
+    with open(compressed_directory, 'wb') as file_object:
+      writer = _CheckpointedGzipWriter(file_object)
+      with tarfile.TarFile.open(fileobj=writer, mode='w|') as tar:
+        _AddToTar(tar, uncompressed_directory, '', members)
+      writer.write_index(members)
       log.info(
           'The tar file has been created and '
           'can be found at: {0:s}'.format(compressed_directory))
@@ -118,3 +310,364 @@ def UncompressTarFile(compressed_directory, output_tmp):
         'An error has occured while uncompressing the tar '
         'file: {0:s}'.format(exception))
   return uncompressed_directory
+
+
+def ReadArchiveIndex(compressed_directory):
+  """Reads the member index of an archive created by CompressDirectory.
+
+  A corrupt or truncated index is ignored, so that the archive is extracted
+  sequentially like an archive without an index.
+
+  Args:
+    compressed_directory(str): The path to the tar file.
+
+  Returns:
+    dict: The archive index, or None if the archive has no valid index.
+  """
+  with open(compressed_directory, 'rb') as file_object:
+    return _ReadArchiveIndex(file_object)
+
+
+def _ReadArchiveIndex(file_object):
+  """Reads the archive index from an open archive file object.
+
+  Args:
+    file_object(file): The archive file object.
+
+  Returns:
+    dict: The archive index, or None if the archive has no valid index.
+  """
+  file_object.seek(0, os.SEEK_END)
+  if file_object.tell() < _TRAILER_SIZE:
+    return None
+  file_object.seek(-_TRAILER_SIZE, os.SEEK_END)
+  try:
+    trailer = zlib.decompress(file_object.read(_TRAILER_SIZE), _GZIP_WBITS)
+    magic, index_offset, index_size = struct.unpack(_TRAILER_FORMAT, trailer)
+  except (zlib.error, struct.error):
+    return None
+  if magic != INDEX_MAGIC:
+    return None
+
+  file_object.seek(index_offset)
+  try:
+    index = json.loads(
+        zlib.decompress(file_object.read(index_size),
+                        _GZIP_WBITS).decode('utf-8'))
+  except (zlib.error, ValueError) as exception:
+    log.warning('Ignoring corrupt archive index: {0!s}'.format(exception))
+    return None
+  if not isinstance(index, dict):
+    log.warning('Ignoring corrupt archive index')
+    return None
+  if index.get('version') != INDEX_VERSION:
+    log.warning(
+        'Unsupported archive index version {0!s}'.format(index.get('version')))
+    return None
+  checkpoints = index.get('checkpoints')
+  members = index.get('members')
+  valid_members = isinstance(members, list) and all(
+      isinstance(entry, list) and len(entry) == len(ArchiveMember._fields)
+      for entry in members)
+  if not (valid_members and isinstance(checkpoints, list) and checkpoints):
+    log.warning('Ignoring archive index without valid members or checkpoints')
+    return None
+  return index
+
+
+class _ArchiveMemberIO(io.RawIOBase):
+  """Read-only file-like object for a single member of an indexed archive."""
+
+  def __init__(self, file_object, checkpoints, member):
+    """Initialization for the member reader.
+
+    Args:
+      file_object(file): The archive file object.
+      checkpoints(list): Pairs of (uncompressed offset, compressed offset).
+      member(ArchiveMember): The member to read.
+    """
+    super(_ArchiveMemberIO, self).__init__()
+    self._file_object = file_object
+    self._checkpoints = checkpoints
+    self._checkpoint_offsets = [checkpoint[0] for checkpoint in checkpoints]
+    self._member = member
+    self._position = 0
+    self._decompressor = None
+    self._compressed = b''
+    # Most recently decompressed data, and its offset in the archive stream.
+    self._data = b''
+    self._data_offset = None
+
+  def readable(self):
+    return True
+
+  def seekable(self):
+    return True
+
+  def tell(self):
+    return self._position
+
+  def seek(self, offset, whence=os.SEEK_SET):
+    if whence == os.SEEK_SET:
+      position = offset
+    elif whence == os.SEEK_CUR:
+      position = self._position + offset
+    elif whence == os.SEEK_END:
+      position = self._member.size + offset
+    else:
+      raise ValueError('Invalid whence value {0!s}'.format(whence))
+    if position < 0:
+      raise ValueError('Negative seek position {0:d}'.format(position))
+    self._position = position
+    return self._position
+
+  def _get_checkpoint(self, offset):
+    """Gets the nearest checkpoint at or before an offset.
+
+    Args:
+      offset(int): The uncompressed archive offset.
+
+    Returns:
+      list: The uncompressed and compressed offset of the checkpoint.
+    """
+    index = bisect.bisect_right(self._checkpoint_offsets, offset)
+    return self._checkpoints[max(index - 1, 0)]
+
+  def _restart(self, checkpoint):
+    """Positions the decompressor at a checkpoint.
+
+    Args:
+      checkpoint(list): The uncompressed and compressed offset to read from.
+    """
+    self._data_offset, compressed_offset = checkpoint
+    self._data = b''
+    self._file_object.seek(compressed_offset)
+    self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+    self._compressed = b''
+
+  def _read_next(self):
+    """Decompresses the next chunk of the archive stream.
+
+    Returns:
+      bool: False when the end of the archive data was reached.
+    """
+    self._data_offset += len(self._data)
+    self._data = b''
+    while not self._data:
+      if self._decompressor.eof:
+        # Every checkpoint starts a separate gzip member.
+        self._compressed = self._decompressor.unused_data
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+      if not self._compressed:
+        self._compressed = self._file_object.read(io.DEFAULT_BUFFER_SIZE * 8)
+        if not self._compressed:
+          return False
+      self._data = self._decompressor.decompress(self._compressed)
+      self._compressed = self._decompressor.unconsumed_tail
+    return True
+
+  def readinto(self, buffer_):
+    size = min(len(buffer_), self._member.size - self._position)
+    if size <= 0:
+      return 0
+
+    target = self._member.offset_data + self._position
+    checkpoint = self._get_checkpoint(target)
+    # Restart at the checkpoint when reading backwards, or when it is ahead of
+    # the data decompressed so far, so that the data in between is skipped.
+    if (self._data_offset is None or target < self._data_offset or
+        checkpoint[0] > self._data_offset + len(self._data)):
+      self._restart(checkpoint)
+
+    written = 0
+    while written < size:
+      while target >= self._data_offset + len(self._data):
+        if not self._read_next():
+          raise TurbiniaException(
+              'Unexpected end of archive while reading {0:s}'.format(
+                  self._member.name))
+      start = target - self._data_offset
+      data = self._data[start:start + size - written]
+      buffer_[written:written + len(data)] = data
+      written += len(data)
+      target += len(data)
+
+    self._position += written
+    return written
+
+
+class IndexedArchive(object):
+  """Read-only, random access file system view of an indexed archive.
+
+  This allows individual members of archives created by CompressDirectory to be
+  listed and read without uncompressing the whole archive.
+
+  Attributes:
+    path(str): The path to the archive.
+    members(dict): Mapping of member names to ArchiveMember objects.
+  """
+
+  def __init__(self, path):
+    """Initialization for IndexedArchive.
+
+    Args:
+      path(str): The path to the archive.
+
+    Raises:
+      TurbiniaException: If the archive does not exist or has no index.
+    """
+    ValidateTarFile(path)
+    self.path = path
+    self._file_object = open(path, 'rb')
+    index = _ReadArchiveIndex(self._file_object)
+    if not index:
+      self._file_object.close()
+      raise TurbiniaException(
+          'Archive {0:s} does not have an index, it needs to be '
+          'uncompressed before use.'.format(path))
+    self._checkpoints = index['checkpoints']
+    self.members = {}
+    self._children = {}
+    for entry in index['members']:
+      member = ArchiveMember(*entry)
+      name = self._normalize(member.name)
+      self.members[name] = member
+      if name:
+        parent = posixpath.dirname(name)
+        self._children.setdefault(parent, []).append(posixpath.basename(name))
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *_):
+    self.close()
+
+  @staticmethod
+  def _normalize(path):
+    """Normalizes a path to the format of the archive member names."""
+    path = posixpath.normpath('/' + path).lstrip('/')
+    return path
+
+  def close(self):
+    """Closes the underlying archive file."""
+    self._file_object.close()
+
+  def _get_member(self, path):
+    """Gets the archive member for a path.
+
+    Raises:
+      TurbiniaException: If the path does not exist in the archive.
+    """
+    member = self.members.get(self._normalize(path))
+    if not member:
+      raise TurbiniaException(
+          'Path {0:s} does not exist in archive {1:s}'.format(path, self.path))
+    return member
+
+  def exists(self, path):
+    """Checks whether a path exists in the archive."""
+    return self._normalize(path) in self.members
+
+  def isdir(self, path):
+    """Checks whether a path is a directory in the archive."""
+    member = self.members.get(self._normalize(path))
+    return bool(member) and member.type == 'directory'
+
+  def isfile(self, path):
+    """Checks whether a path is a regular file in the archive."""
+    member = self.members.get(self._normalize(path))
+    return bool(member) and member.type == 'file'
+
+  def getsize(self, path):
+    """Gets the size of a member in the archive."""
+    return self._get_member(path).size
+
+  def listdir(self, path=''):
+    """Lists the entries of a directory in the archive.
+
+    Args:
+      path(str): The directory path inside of the archive.
+
+    Returns:
+      list(str): The names of the directory entries.
+    """
+    if not self.isdir(path):
+      raise TurbiniaException(
+          'Path {0:s} is not a directory in archive {1:s}'.format(
+              path, self.path))
+    return list(self._children.get(self._normalize(path), []))
+
+  def walk(self, path=''):
+    """Walks the archive like os.walk().
+
+    Args:
+      path(str): The directory path inside of the archive to start from.
+
+    Yields:
+      tuple(str, list(str), list(str)): The directory path, sub-directory names
+          and file names.
+    """
+    path = self._normalize(path)
+    directories = []
+    files = []
+    for name in self.listdir(path):
+      if self.isdir(posixpath.join(path, name)):
+        directories.append(name)
+      else:
+        files.append(name)
+    yield path, directories, files
+    for name in directories:
+      for entry in self.walk(posixpath.join(path, name)):
+        yield entry
+
+  def open(self, path):
+    """Opens a file in the archive for reading.
+
+    Args:
+      path(str): The file path inside of the archive.
+
+    Returns:
+      io.BufferedReader: A read-only, seekable file object.
+
+    Raises:
+      TurbiniaException: If the path is not a regular file in the archive.
+    """
+    member = self._get_member(path)
+    if member.type != 'file':
+      raise TurbiniaException(
+          'Path {0:s} is not a regular file in archive {1:s}'.format(
+              path, self.path))
+    # Every opened member gets its own file object so that readers don't
+    # interfere with each other's position.
+    file_object = open(self.path, 'rb')
+    raw = _ArchiveMemberIO(file_object, self._checkpoints, member)
+    reader = io.BufferedReader(raw)
+    raw_close = raw.close
+
+    def _close():
+      raw_close()
+      file_object.close()
+
+    raw.close = _close
+    return reader
+
+  def extract(self, path, output_dir):
+    """Extracts a single file from the archive.
+
+    Args:
+      path(str): The file path inside of the archive.
+      output_dir(str): The directory to write the file into.
+
+    Returns:
+      str: The path to the extracted file.
+    """
+    destination = os.path.join(output_dir, self._normalize(path))
+    if not os.path.exists(os.path.dirname(destination)):
+      os.makedirs(os.path.dirname(destination))
+    with self.open(path) as source, open(destination, 'wb') as target:
+      while True:
+        data = source.read(io.DEFAULT_BUFFER_SIZE * 8)
+        if not data:
+          break
+        target.write(data)
+    return destination
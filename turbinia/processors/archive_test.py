@@ -21,6 +21,8 @@ import tarfile
 import unittest
 import tempfile
 
+import mock
+
 from random import randint
 from shutil import rmtree
 from turbinia.processors import archive
@@ -83,6 +85,92 @@ class ArchiveProcessorTest(unittest.TestCase):
     with self.assertRaises(TurbiniaException):
       archive.ValidateTarFile(self.tmp_files_dir)
 
+  def test_archive_index(self):
+    """Tests that the archive index matches the tar file members."""
+    index = archive.ReadArchiveIndex(self.tmp_archive)
+    self.assertIsNotNone(index)
+    indexed_members = {entry[0]: entry for entry in index['members']}
+    with tarfile.open(self.tmp_archive) as tar:
+      for member in tar.getmembers():
+        name, _, offset_data, size = indexed_members[member.name]
+        self.assertEqual(name, member.name)
+        self.assertEqual(offset_data, member.offset_data)
+        self.assertEqual(size, member.size)
+
+  def test_indexed_archive(self):
+    """Tests random access reads of archive members."""
+    big_file = os.path.join(self.tmp_files_dir, 'subdir', 'big.bin')
+    os.makedirs(os.path.dirname(big_file))
+    # Write more data than a single checkpoint.
+    with open(big_file, 'wb') as file_handle:
+      for i in range(archive.CHECKPOINT_SIZE // 1000 + 100):
+        file_handle.write('{0:0999d}\n'.format(i).encode('utf-8'))
+    archive.CompressDirectory(self.tmp_files_dir)
+
+    with archive.IndexedArchive(self.tmp_archive) as indexed_archive:
+      self.assertTrue(indexed_archive.isdir('subdir'))
+      self.assertTrue(indexed_archive.isfile('subdir/big.bin'))
+      self.assertFalse(indexed_archive.exists('blah'))
+      self.assertEqual(
+          sorted(indexed_archive.listdir('')),
+          sorted(self.test_files + ['subdir']))
+
+      with open(os.path.join(self.tmp_files_dir, 'file3.txt'), 'rb') as fh:
+        expected = fh.read()
+      with indexed_archive.open('file3.txt') as fh:
+        self.assertEqual(fh.read(), expected)
+
+      with open(big_file, 'rb') as fh:
+        expected = fh.read()
+      offset = archive.CHECKPOINT_SIZE + 10
+      with indexed_archive.open('subdir/big.bin') as fh:
+        fh.seek(offset)
+        self.assertEqual(fh.read(2000), expected[offset:offset + 2000])
+        fh.seek(0)
+        self.assertEqual(fh.read(), expected)
+
+      with self.assertRaises(TurbiniaException):
+        indexed_archive.open('subdir')
+
+  def test_indexed_archive_forward_seek(self):
+    """Tests that forward seeks restart at the nearest checkpoint."""
+    random_file = os.path.join(self.tmp_files_dir, 'random.bin')
+    expected = os.urandom(archive.CHECKPOINT_SIZE * 2 + 1000)
+    with open(random_file, 'wb') as file_handle:
+      file_handle.write(expected)
+    archive.CompressDirectory(self.tmp_files_dir)
+
+    offset = archive.CHECKPOINT_SIZE * 2 - 10
+    with archive.IndexedArchive(self.tmp_archive) as indexed_archive:
+      with indexed_archive.open('random.bin') as fh:
+        self.assertEqual(fh.read(10), expected[:10])
+        # pylint: disable=protected-access
+        restart = mock.MagicMock(side_effect=fh.raw._restart)
+        fh.raw._restart = restart
+        fh.seek(offset)
+        self.assertEqual(fh.read(10), expected[offset:offset + 10])
+    # The data between the first read and the checkpoint was skipped.
+    restart.assert_called_once()
+    self.assertLessEqual(
+        restart.call_args[0][0][0], archive.CHECKPOINT_SIZE * 2)
+    self.assertGreaterEqual(restart.call_args[0][0][0], archive.CHECKPOINT_SIZE)
+
+  def test_corrupt_archive_index(self):
+    """Tests that a corrupt archive index is ignored."""
+    archive.CompressDirectory(self.tmp_files_dir)
+    with open(self.tmp_archive, 'rb') as file_handle:
+      data = file_handle.read()
+    # Overwrite the end of the index member that precedes the trailer.
+    # pylint: disable=protected-access
+    index_end = len(data) - archive._TRAILER_SIZE
+    data = data[:index_end - 20] + b'\x00' * 20 + data[index_end:]
+    with open(self.tmp_archive, 'wb') as file_handle:
+      file_handle.write(data)
+
+    self.assertIsNone(archive.ReadArchiveIndex(self.tmp_archive))
+    with self.assertRaises(TurbiniaException):
+      archive.IndexedArchive(self.tmp_archive)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -16,6 +16,7 @@
 
 from __future__ import unicode_literals
 
+import json
 import logging
 import os
 import subprocess
@@ -23,29 +24,46 @@ import tempfile
 
 from turbinia import config
 from turbinia import TurbiniaException
+from turbinia.processors import mount_local
 
 log = logging.getLogger('turbinia')
 
+# Cached path to the docker-explorer script, so PATH is only searched once.
+_DE_BINARY = None
 
-def PreprocessMountDockerFS(docker_dir, container_id):
-  """Mounts a Docker container Filesystem locally.
 
-  We use subprocess to run the DockerExplorer script, instead of using the
-  Python module, because we need to make sure all DockerExplorer code runs
-  as root.
+def _GetDockerExplorerPath():
+  """Finds the docker-explorer script in PATH.
 
-  Args:
-    docker_dir(str): the root Docker directory.
-    container_id(str): the complete ID of the container.
+  Returns:
+    str: The full path to the de.py script.
+
+  Raises:
+    TurbiniaException: if the script could not be found.
+  """
+  global _DE_BINARY  # pylint: disable=global-statement
+  if _DE_BINARY:
+    return _DE_BINARY
+
+  for path in os.environ['PATH'].split(os.pathsep):
+    tentative_path = os.path.join(path, 'de.py')
+    if os.path.exists(tentative_path):
+      _DE_BINARY = tentative_path
+      return _DE_BINARY
+
+  raise TurbiniaException('Could not find docker-explorer script: de.py')
+
+
+def _CreateMountPath():
+  """Creates a new directory to mount a container file system on.
 
   Returns:
-    The path to the mounted container file system, as a string.
+    str: The path to the new mount point.
 
   Raises:
-    TurbiniaException: if there was an error trying to mount the filesystem.
+    TurbiniaException: if the mount parent directory could not be created.
   """
   # Most of the code is copied from PreprocessMountDisk
-  # Only the mount command changes
   config.LoadConfig()
   mount_prefix = config.MOUNT_DIR_PREFIX
 
@@ -61,20 +79,32 @@ def PreprocessMountDockerFS(docker_dir, container_id):
           'Could not create mount directory {0:s}: {1!s}'.format(
               mount_prefix, e))
 
-  container_mount_path = tempfile.mkdtemp(prefix='turbinia', dir=mount_prefix)
+  return tempfile.mkdtemp(prefix='turbinia', dir=mount_prefix)
+
+
+def PreprocessMountDockerFS(docker_dir, container_id):
+  """Mounts a Docker container Filesystem locally.
+
+  We use subprocess to run the DockerExplorer script, instead of using the
+  Python module, because we need to make sure all DockerExplorer code runs
+  as root.
+
+  Args:
+    docker_dir(str): the root Docker directory.
+    container_id(str): the complete ID of the container.
+
+  Returns:
+    The path to the mounted container file system, as a string.
+
+  Raises:
+    TurbiniaException: if there was an error trying to mount the filesystem.
+  """
+  container_mount_path = _CreateMountPath()
 
   log.info(
       'Using docker_explorer to mount container {0:s} on {1:s}'.format(
           container_id, container_mount_path))
-  de_binary = None
-  for path in os.environ['PATH'].split(os.pathsep):
-    tentative_path = os.path.join(path, 'de.py')
-    if os.path.exists(tentative_path):
-      de_binary = tentative_path
-      break
-
-  if not de_binary:
-    raise TurbiniaException('Could not find docker-explorer script: de.py')
+  de_binary = _GetDockerExplorerPath()
 
   # TODO(aarontp): Remove hard-coded sudo in commands:
   # https://github.com/google/turbinia/issues/73
@@ -91,3 +121,118 @@ def PreprocessMountDockerFS(docker_dir, container_id):
         'Could not mount container {0:s}: {1!s}'.format(container_id, e))
 
   return container_mount_path
+
+
+def ListDockerContainers(docker_dir):
+  """Lists all the containers in a Docker directory.
+
+  Args:
+    docker_dir(str): the root Docker directory.
+
+  Returns:
+    list(dict): information about each of the containers found, as returned by
+        docker-explorer.
+
+  Raises:
+    TurbiniaException: when the docker-explorer tool failed to run.
+  """
+  de_binary = _GetDockerExplorerPath()
+
+  # TODO(rgayon): use docker-explorer exposed constant when
+  # https://github.com/google/docker-explorer/issues/80 is in.
+  docker_explorer_command = [
+      'sudo', de_binary, '-r', docker_dir, 'list', 'all_containers'
+  ]
+  log.info('Running {0:s}'.format(' '.join(docker_explorer_command)))
+  try:
+    json_string = subprocess.check_output(docker_explorer_command).decode(
+        'utf-8')
+    return json.loads(json_string)
+  except ValueError as e:
+    raise TurbiniaException(
+        'Error decoding JSON output from de.py: {0!s}'.format(e))
+  except subprocess.CalledProcessError as e:
+    raise TurbiniaException('de.py returned an error: {0!s}'.format(e))
+
+
+class DockerContainerMountManager(object):
+  """Enumerates and mounts the containers of a single Docker directory.
+
+  The container list and the container mounts are cached, so that many
+  containers can be processed under a single mount of the parent disk, and
+  each container is only mounted once.
+
+  Attributes:
+    docker_dir (str): The root Docker directory.
+    mount_paths (dict): Paths to the mounted container file systems, keyed by
+        container ID.
+  """
+
+  def __init__(self, docker_dir):
+    """Initialization for DockerContainerMountManager.
+
+    Args:
+      docker_dir (str): The root Docker directory.
+    """
+    self.docker_dir = docker_dir
+    self.mount_paths = {}
+    self._containers = None
+
+  def list_containers(self):
+    """Lists the containers in the Docker directory.
+
+    Returns:
+      list(dict): information about each of the containers found.
+    """
+    if self._containers is None:
+      self._containers = ListDockerContainers(self.docker_dir)
+    return self._containers
+
+  def mount(self, container_id):
+    """Mounts a container, unless it is already mounted.
+
+    Args:
+      container_id (str): The complete ID of the container.
+
+    Returns:
+      str: The path to the mounted container file system.
+    """
+    if container_id not in self.mount_paths:
+      self.mount_paths[container_id] = PreprocessMountDockerFS(
+          self.docker_dir, container_id)
+    return self.mount_paths[container_id]
+
+  def mount_all(self, container_ids=None):
+    """Mounts multiple containers.
+
+    Args:
+      container_ids (list(str)): The IDs of the containers to mount.  If not
+          set, all containers in the Docker directory will be mounted.
+
+    Returns:
+      dict: Paths to the mounted container file systems, keyed by container ID.
+    """
+    if container_ids is None:
+      container_ids = [
+          container.get('container_id') for container in self.list_containers()
+      ]
+    return {
+        container_id: self.mount(container_id) for container_id in container_ids
+    }
+
+  def unmount_all(self):
+    """Unmounts all containers mounted by this manager.
+
+    Raises:
+      TurbiniaException: if any of the containers could not be unmounted.
+    """
+    errors = []
+    for container_id, mount_path in list(self.mount_paths.items()):
+      try:
+        mount_local.PostprocessUnmountPath(mount_path)
+        del self.mount_paths[container_id]
+      except TurbiniaException as e:
+        errors.append(str(e))
+    if errors:
+      raise TurbiniaException(
+          'Could not unmount all containers: {0:s}'.format(', '.join(errors)))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the Docker container mount manager."""
+
+from __future__ import unicode_literals
+
+import unittest
+
+import mock
+
+from turbinia.processors import docker
+from turbinia import TurbiniaException
+
+
+class DockerContainerMountManagerTest(unittest.TestCase):
+  """Tests for DockerContainerMountManager."""
+
+  @mock.patch('turbinia.processors.docker.ListDockerContainers')
+  @mock.patch('turbinia.processors.docker.PreprocessMountDockerFS')
+  def testMountAll(self, mount_mock, list_mock):
+    """Tests mounting all containers only enumerates and mounts once."""
+    list_mock.return_value = [{'container_id': '12'}, {'container_id': '3a'}]
+    mount_mock.side_effect = lambda _, container_id: '/mnt/' + container_id
+    manager = docker.DockerContainerMountManager('/docker')
+
+    mount_paths = manager.mount_all()
+    self.assertEqual(mount_paths, {'12': '/mnt/12', '3a': '/mnt/3a'})
+    self.assertEqual(manager.mount('12'), '/mnt/12')
+    self.assertEqual(manager.mount_all(['3a']), {'3a': '/mnt/3a'})
+    list_mock.assert_called_once_with('/docker')
+    self.assertEqual(mount_mock.call_count, 2)
+
+  @mock.patch('turbinia.processors.mount_local.PostprocessUnmountPath')
+  def testUnmountAll(self, unmount_mock):
+    """Tests unmounting all containers."""
+    manager = docker.DockerContainerMountManager('/docker')
+    manager.mount_paths = {'12': '/mnt/12', '3a': '/mnt/3a'}
+    unmount_mock.side_effect = [None, TurbiniaException('busy')]
+
+    self.assertRaises(TurbiniaException, manager.unmount_all)
+    self.assertEqual(unmount_mock.call_count, 2)
+    self.assertEqual(len(manager.mount_paths), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -25,6 +25,7 @@ import time
 
 from turbinia import config
 from turbinia import TurbiniaException
+from turbinia.processors import partitions as partitions_lib
 
 log = logging.getLogger('turbinia')
 
@@ -32,6 +33,10 @@ log = logging.getLogger('turbinia')
 def PreprocessLosetup(source_path):
   """Runs Losetup on a target block device or image file.
 
+  The partition table is parsed directly from the source when it is readable,
+  so there is no need to wait for partition block devices to be created by the
+  kernel and udev.  Otherwise the partitions are set up by losetup.
+
   Args:
     source_path(str): the source path to run losetup on.
 
@@ -40,9 +45,10 @@ def PreprocessLosetup(source_path):
       failed to run in anyway.
 
   Returns:
-    (str, list(str)): a tuple consisting of the path to the 'disk' block device
-      and a list of paths to partition block devices. For example:
-      ('/dev/loop0', ['/dev/loop0p1', '/dev/loop0p2'])
+    (str, list(str|partitions.Partition)): a tuple consisting of the path to the
+      'disk' block device and a list of the partitions in the source, or of
+      paths to partition block devices if the source could not be parsed. For
+      example: ('/dev/loop0', ['/dev/loop0p1', '/dev/loop0p2'])
   """
   losetup_device = None
 
@@ -50,15 +56,19 @@ def PreprocessLosetup(source_path):
     raise TurbiniaException(
         'Cannot process non-existing source_path {0!s}'.format(source_path))
 
+  try:
+    partitions = partitions_lib.GetPartitions(source_path)
+  except TurbiniaException as exception:
+    log.warning(
+        'Could not parse partitions, falling back to losetup: {0!s}'.format(
+            exception))
+    partitions = None
+
   # TODO(aarontp): Remove hard-coded sudo in commands:
   # https://github.com/google/turbinia/issues/73
-  if not os.path.exists(source_path):
-    raise TurbiniaException(
-        'Cannot mount non-existing source_path {0!s}'.format(source_path))
-
-  losetup_command = [
-      'sudo', 'losetup', '--show', '--find', '-P', '-r', source_path
-  ]
+  losetup_command = ['sudo', 'losetup', '--show', '--find', '-r', source_path]
+  if partitions is None:
+    losetup_command.insert(4, '-P')
   log.info('Running command {0:s}'.format(' '.join(losetup_command)))
   try:
     losetup_device = subprocess.check_output(
@@ -66,7 +76,8 @@ def PreprocessLosetup(source_path):
   except subprocess.CalledProcessError as e:
     raise TurbiniaException('Could not set losetup devices {0!s}'.format(e))
 
-  partitions = glob.glob('{0:s}p*'.format(losetup_device))
+  if partitions is None:
+    partitions = sorted(glob.glob('{0:s}p*'.format(losetup_device)))
   if not partitions:
     # In this case, the image was of a partition, and not a full disk with a
     # partition table
@@ -79,7 +90,9 @@ def PreprocessMountDisk(partition_paths, partition_number):
   """Locally mounts disk in an instance.
 
   Args:
-    partition_paths(list(str)): A list of paths to partition block devices;
+    partition_paths(list(str|partitions.Partition)): A list of paths to
+      partition block devices, or of partitions to mount by offset from their
+      disk image.
     partition_number(int): the number of the partition to mount. Remember these
       are 1-indexed (first partition is 1).
 
@@ -104,6 +117,10 @@ def PreprocessMountDisk(partition_paths, partition_number):
             partition_number))
 
   partition_path = partition_paths[partition_number - 1]
+  partition = None
+  if isinstance(partition_path, partitions_lib.Partition):
+    partition = partition_path
+    partition_path = partition.path
 
   if not os.path.exists(partition_path):
     raise TurbiniaException(
@@ -125,7 +142,16 @@ def PreprocessMountDisk(partition_paths, partition_number):
   mount_path = tempfile.mkdtemp(prefix='turbinia', dir=mount_prefix)
 
   mount_cmd = ['sudo', 'mount', '-o', 'ro']
-  fstype = GetFilesystem(partition_path)
+  if partition:
+    # Mounting by offset sets up a loop device that is automatically removed
+    # again when the file system is unmounted.
+    mount_cmd.extend([
+        '-o', 'loop,offset={0:d},sizelimit={1:d}'.format(
+            partition.offset, partition.size)
+    ])
+    fstype = partition.fstype
+  else:
+    fstype = GetFilesystem(partition_path)
   if fstype in ['ext3', 'ext4']:
     # This is in case the underlying filesystem is dirty, as we want to mount
     # everything read-only.
@@ -142,13 +168,26 @@ def PreprocessMountDisk(partition_paths, partition_number):
 
 
 def GetFilesystem(path):
-  """Uses lsblk to detect the filesystem of a partition block device.
+  """Detects the filesystem of a partition block device.
+
+  The file system superblock is read directly if the device is readable, and
+  lsblk is used as a fallback.
 
   Args:
     path(str): the full path to the block device.
   Returns:
     str: the filesystem detected (for example: 'ext4')
   """
+  try:
+    with open(path, 'rb') as file_object:
+      fstype = partitions_lib.DetectFilesystem(file_object)
+    if fstype:
+      return fstype
+  except (IOError, OSError) as exception:
+    log.debug(
+        'Could not read {0:s} to detect filesystem: {1!s}'.format(
+            path, exception))
+
   cmd = ['lsblk', path, '-f', '-o', 'FSTYPE', '-n']
   log.info('Running {0!s}'.format(cmd))
   fstype = subprocess.check_output(cmd).split()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Partition table parser and file system detection for disk images."""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import struct
+import uuid
+
+from collections import namedtuple
+
+from turbinia import TurbiniaException
+
+log = logging.getLogger('turbinia')
+
+SECTOR_SIZE = 512
+
+# Sector sizes to look for a GPT header with.
+GPT_SECTOR_SIZES = [512, 4096]
+
+MBR_SIGNATURE = b'\x55\xaa'
+MBR_PARTITION_TABLE_OFFSET = 446
+MBR_ENTRY_FORMAT = '<B3sB3sII'
+MBR_ENTRY_SIZE = 16
+MBR_TYPE_EMPTY = 0x00
+MBR_TYPE_GPT_PROTECTIVE = 0xee
+MBR_TYPES_EXTENDED = (0x05, 0x0f, 0x85)
+# Maximum number of logical partitions, to avoid loops in broken EBR chains.
+MBR_MAX_LOGICAL_PARTITIONS = 128
+
+GPT_SIGNATURE = b'EFI PART'
+GPT_HEADER_FORMAT = '<8s4sII4sQQQQ16sQII'
+GPT_ENTRY_FORMAT = '<16s16sQQQ72s'
+
+# A partition in a disk image.
+#
+# Attributes:
+#   number (int): The partition number, as used by the kernel (logical MBR
+#       partitions start at 5).
+#   path (str): The path to the disk image or device containing the partition.
+#   offset (int): The offset of the partition in bytes.
+#   size (int): The size of the partition in bytes.
+#   type (str): The MBR partition type (e.g. '0x83') or GPT type GUID.
+#   fstype (str): The file system type, using the same names as lsblk, or None
+#       if it could not be detected.
+Partition = namedtuple(
+    'Partition', ['number', 'path', 'offset', 'size', 'type', 'fstype'])
+
+
+def _ReadAt(file_object, offset, size):
+  """Reads data from a given offset.
+
+  Args:
+    file_object (file): The file object to read from.
+    offset (int): The offset to read from.
+    size (int): The number of bytes to read.
+
+  Returns:
+    bytes: The data read, which can be shorter than size at the end of file.
+  """
+  file_object.seek(offset)
+  return file_object.read(size)
+
+
+def _DetectExtFilesystem(superblock):
+  """Determines the ext file system version from its superblock.
+
+  Args:
+    superblock (bytes): The ext superblock.
+
+  Returns:
+    str: One of 'ext2', 'ext3' or 'ext4'.
+  """
+  feature_compat, feature_incompat, feature_ro_compat = struct.unpack(
+      '<III', superblock[92:104])
+  # Incompatible features other than filetype (0x2), recover (0x4), journal
+  # device (0x8) and meta_bg (0x10) are only supported by ext4.
+  if feature_incompat & ~0x1e:
+    return 'ext4'
+  # Read-only compatible features other than sparse_super (0x1), large_file
+  # (0x2) and btree_dir (0x4) are only supported by ext4.
+  if feature_ro_compat & ~0x7:
+    return 'ext4'
+  # has_journal
+  if feature_compat & 0x4:
+    return 'ext3'
+  return 'ext2'
+
+
+def DetectFilesystem(file_object, offset=0):
+  """Detects the file system at the given offset by its superblock signature.
+
+  Args:
+    file_object (file): A file object of a disk image or block device.
+    offset (int): The offset of the file system in bytes.
+
+  Returns:
+    str: The file system type, using the same names as lsblk (e.g. 'ext4',
+        'ntfs', 'vfat', 'xfs', 'apfs') or None if it is not recognized.
+  """
+  boot_sector = _ReadAt(file_object, offset, SECTOR_SIZE)
+  if len(boot_sector) < SECTOR_SIZE:
+    return None
+
+  if boot_sector[3:11] == b'NTFS    ':
+    return 'ntfs'
+  if boot_sector[3:11] == b'EXFAT   ':
+    return 'exfat'
+  if boot_sector[0:4] == b'XFSB':
+    return 'xfs'
+  if boot_sector[32:36] == b'NXSB':
+    return 'apfs'
+  if boot_sector[510:512] == MBR_SIGNATURE and (
+      boot_sector[82:90] == b'FAT32   ' or
+      boot_sector[54:59] in (b'FAT12', b'FAT16', b'FAT  ')):
+    return 'vfat'
+  if _ReadAt(file_object, offset + 512, 8) == b'LABELONE':
+    return 'LVM2_member'
+
+  superblock = _ReadAt(file_object, offset + 1024, 1024)
+  if len(superblock) == 1024 and superblock[56:58] == b'\x53\xef':
+    return _DetectExtFilesystem(superblock)
+
+  if _ReadAt(file_object, offset + 0x10040, 8) == b'_BHRfS_M':
+    return 'btrfs'
+
+  return None
+
+
+def _ParseGPT(file_object, path):
+  """Parses a GUID partition table.
+
+  Args:
+    file_object (file): A file object of a disk image or block device.
+    path (str): The path of the disk image or block device.
+
+  Returns:
+    list(Partition): The partitions found, or None if there is no GPT.
+  """
+  for sector_size in GPT_SECTOR_SIZES:
+    header = _ReadAt(
+        file_object, sector_size, struct.calcsize(GPT_HEADER_FORMAT))
+    if len(header) < struct.calcsize(GPT_HEADER_FORMAT):
+      continue
+    fields = struct.unpack(GPT_HEADER_FORMAT, header)
+    if fields[0] != GPT_SIGNATURE:
+      continue
+
+    entries_lba, number_of_entries, entry_size = fields[10:13]
+    if entry_size < struct.calcsize(GPT_ENTRY_FORMAT):
+      raise TurbiniaException(
+          'Invalid GPT partition entry size {0:d} in {1:s}'.format(
+              entry_size, path))
+    entries = _ReadAt(
+        file_object, entries_lba * sector_size, number_of_entries * entry_size)
+
+    partitions = []
+    for index in range(number_of_entries):
+      entry = entries[index * entry_size:(index + 1) * entry_size]
+      if len(entry) < entry_size:
+        break
+      type_guid, _, first_lba, last_lba, _, _ = struct.unpack(
+          GPT_ENTRY_FORMAT, entry[:struct.calcsize(GPT_ENTRY_FORMAT)])
+      if type_guid == b'\x00' * 16:
+        continue
+      offset = first_lba * sector_size
+      size = (last_lba - first_lba + 1) * sector_size
+      partition_type = str(uuid.UUID(bytes_le=type_guid))
+      fstype = DetectFilesystem(file_object, offset)
+      partitions.append(
+          Partition(
+              number=index + 1, path=path, offset=offset, size=size,
+              type=partition_type, fstype=fstype))
+    return partitions
+
+  return None
+
+
+def _ParseMBREntries(sector):
+  """Parses the four partition entries of an MBR or EBR.
+
+  Args:
+    sector (bytes): The MBR or EBR sector.
+
+  Returns:
+    list(tuple(int, int, int)): Partition type, start sector and number of
+        sectors for each of the four entries.
+  """
+  entries = []
+  for index in range(4):
+    start = MBR_PARTITION_TABLE_OFFSET + index * MBR_ENTRY_SIZE
+    _, _, partition_type, _, first_sector, sectors = struct.unpack(
+        MBR_ENTRY_FORMAT, sector[start:start + MBR_ENTRY_SIZE])
+    entries.append((partition_type, first_sector, sectors))
+  return entries
+
+
+def _ParseMBR(file_object, path, mbr):
+  """Parses an MBR partition table including logical partitions.
+
+  Args:
+    file_object (file): A file object of a disk image or block device.
+    path (str): The path of the disk image or block device.
+    mbr (bytes): The first sector of the disk.
+
+  Returns:
+    list(Partition): The partitions found.
+  """
+  partitions = []
+  extended_start = None
+  for index, entry in enumerate(_ParseMBREntries(mbr)):
+    partition_type, first_sector, sectors = entry
+    if partition_type == MBR_TYPE_EMPTY or not sectors:
+      continue
+    if partition_type in MBR_TYPES_EXTENDED:
+      extended_start = first_sector
+      continue
+    offset = first_sector * SECTOR_SIZE
+    fstype = DetectFilesystem(file_object, offset)
+    partitions.append(
+        Partition(
+            number=index + 1, path=path, offset=offset,
+            size=sectors * SECTOR_SIZE, type='0x{0:02x}'.format(partition_type),
+            fstype=fstype))
+
+  # Logical partitions are stored in a chain of extended boot records, with
+  # offsets relative to either the EBR or the start of the extended partition.
+  number = 5
+  ebr_start = extended_start
+  while ebr_start is not None and number < 5 + MBR_MAX_LOGICAL_PARTITIONS:
+    ebr = _ReadAt(file_object, ebr_start * SECTOR_SIZE, SECTOR_SIZE)
+    if len(ebr) < SECTOR_SIZE or ebr[510:512] != MBR_SIGNATURE:
+      log.warning(
+          'Invalid extended boot record at sector {0:d} in {1:s}'.format(
+              ebr_start, path))
+      break
+    entries = _ParseMBREntries(ebr)
+    partition_type, first_sector, sectors = entries[0]
+    if partition_type != MBR_TYPE_EMPTY and sectors:
+      offset = (ebr_start + first_sector) * SECTOR_SIZE
+      fstype = DetectFilesystem(file_object, offset)
+      partitions.append(
+          Partition(
+              number=number, path=path, offset=offset,
+              size=sectors * SECTOR_SIZE,
+              type='0x{0:02x}'.format(partition_type), fstype=fstype))
+      number += 1
+    next_type, next_sector, _ = entries[1]
+    if next_type in MBR_TYPES_EXTENDED and next_sector:
+      ebr_start = extended_start + next_sector
+    else:
+      ebr_start = None
+
+  return partitions
+
+
+def GetPartitions(path):
+  """Gets the partitions and their file systems from a disk image or device.
+
+  Args:
+    path (str): The path to a disk image or block device.
+
+  Returns:
+    list(Partition): The partitions sorted by partition number.  If the image
+        has no partition table, this contains a single partition covering the
+        whole image.
+
+  Raises:
+    TurbiniaException: If the image can not be read.
+  """
+  try:
+    with open(path, 'rb') as file_object:
+      mbr = _ReadAt(file_object, 0, SECTOR_SIZE)
+      partitions = None
+      if len(mbr) == SECTOR_SIZE and mbr[510:512] == MBR_SIGNATURE:
+        entries = _ParseMBREntries(mbr)
+        if any(entry[0] == MBR_TYPE_GPT_PROTECTIVE for entry in entries):
+          partitions = _ParseGPT(file_object, path)
+        # A FAT or NTFS boot sector has the same signature as an MBR, so make
+        # sure this is not a file system without a partition table.
+        if partitions is None and not DetectFilesystem(file_object):
+          partitions = _ParseMBR(file_object, path, mbr)
+
+      if not partitions:
+        file_object.seek(0, os.SEEK_END)
+        partitions = [
+            Partition(
+                number=1, path=path, offset=0, size=file_object.tell(),
+                type=None, fstype=DetectFilesystem(file_object))
+        ]
+  except (IOError, OSError) as exception:
+    raise TurbiniaException(
+        'Could not read partitions from {0:s}: {1!s}'.format(path, exception))
+
+  partitions = sorted(partitions, key=lambda partition: partition.number)
+  log.info(
+      'Found {0:d} partition(s) in {1:s}: {2:s}'.format(
+          len(partitions), path, ', '.join(
+              '{0:d}:{1!s}'.format(p.number, p.fstype) for p in partitions)))
+  return partitions
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the partition table parser."""
+
+from __future__ import unicode_literals
+
+import os
+import struct
+import tempfile
+import unittest
+import uuid
+
+from shutil import rmtree
+
+from turbinia.processors import partitions
+from turbinia import TurbiniaException
+
+LINUX_GUID = uuid.UUID('0fc63daf-8483-4772-8e79-3d69e47d7de4')
+
+
+class PartitionsTest(unittest.TestCase):
+  """Tests for the partition table parser."""
+
+  def setUp(self):
+    self.base_output_dir = tempfile.mkdtemp(prefix='turbinia-test-partitions')
+    self.image_path = os.path.join(self.base_output_dir, 'disk.raw')
+
+  def tearDown(self):
+    rmtree(self.base_output_dir)
+
+  def _WriteAt(self, image, offset, data):
+    """Writes data into a bytearray disk image."""
+    image[offset:offset + len(data)] = data
+
+  def _WriteExt(self, image, offset, has_journal=True):
+    """Writes a minimal ext superblock."""
+    superblock = bytearray(1024)
+    superblock[56:58] = b'\x53\xef'
+    superblock[92:96] = struct.pack('<I', 0x4 if has_journal else 0)
+    self._WriteAt(image, offset + 1024, superblock)
+
+  def _WriteMBREntry(self, sector, index, partition_type, first, sectors):
+    """Writes a partition entry into an MBR or EBR."""
+    entry = struct.pack(
+        partitions.MBR_ENTRY_FORMAT, 0, b'\x00' * 3, partition_type,
+        b'\x00' * 3, first, sectors)
+    self._WriteAt(
+        sector, partitions.MBR_PARTITION_TABLE_OFFSET +
+        index * partitions.MBR_ENTRY_SIZE, entry)
+    sector[510:512] = partitions.MBR_SIGNATURE
+
+  def _SaveImage(self, image):
+    """Writes the disk image to the test path."""
+    with open(self.image_path, 'wb') as image_file:
+      image_file.write(image)
+
+  def testDetectFilesystem(self):
+    """Tests DetectFilesystem."""
+    image = bytearray(8192)
+    self._WriteExt(image, 0)
+    self._SaveImage(image)
+    with open(self.image_path, 'rb') as file_object:
+      self.assertEqual(partitions.DetectFilesystem(file_object), 'ext3')
+
+    image = bytearray(8192)
+    self._WriteExt(image, 0, has_journal=False)
+    image[1024 + 96:1024 + 100] = struct.pack('<I', 0x40)
+    self._SaveImage(image)
+    with open(self.image_path, 'rb') as file_object:
+      self.assertEqual(partitions.DetectFilesystem(file_object), 'ext4')
+
+    image = bytearray(8192)
+    self._WriteAt(image, 4096 + 3, b'NTFS    ')
+    self._SaveImage(image)
+    with open(self.image_path, 'rb') as file_object:
+      self.assertEqual(partitions.DetectFilesystem(file_object, 4096), 'ntfs')
+      self.assertIsNone(partitions.DetectFilesystem(file_object))
+
+  def testGetPartitionsMBR(self):
+    """Tests GetPartitions with primary and logical MBR partitions."""
+    image = bytearray(64 * 512)
+    self._WriteMBREntry(image, 0, 0x83, 8, 8)
+    self._WriteMBREntry(image, 1, 0x05, 16, 48)
+    # First logical partition, with the next EBR at sector 16 + 16.
+    ebr = bytearray(512)
+    self._WriteMBREntry(ebr, 0, 0x83, 4, 8)
+    self._WriteMBREntry(ebr, 1, 0x05, 16, 16)
+    self._WriteAt(image, 16 * 512, ebr)
+    ebr = bytearray(512)
+    self._WriteMBREntry(ebr, 0, 0x07, 4, 8)
+    self._WriteAt(image, 32 * 512, ebr)
+    self._WriteExt(image, 8 * 512)
+    self._WriteAt(image, 36 * 512 + 3, b'NTFS    ')
+    self._SaveImage(image)
+
+    result = partitions.GetPartitions(self.image_path)
+    self.assertEqual([p.number for p in result], [1, 5, 6])
+    self.assertEqual([p.offset for p in result], [4096, 10240, 18432])
+    self.assertEqual([p.size for p in result], [4096, 4096, 4096])
+    self.assertEqual([p.fstype for p in result], ['ext3', None, 'ntfs'])
+    self.assertEqual(result[2].type, '0x07')
+    self.assertEqual(result[0].path, self.image_path)
+
+  def testGetPartitionsGPT(self):
+    """Tests GetPartitions with a GUID partition table."""
+    image = bytearray(128 * 512)
+    self._WriteMBREntry(image, 0, partitions.MBR_TYPE_GPT_PROTECTIVE, 1, 127)
+    header = struct.pack(
+        partitions.GPT_HEADER_FORMAT, partitions.GPT_SIGNATURE, b'\x00' * 4, 92,
+        0, b'\x00' * 4, 1, 127, 34, 126, b'\x00' * 16, 2, 4, 128)
+    self._WriteAt(image, 512, header)
+    entry = struct.pack(
+        partitions.GPT_ENTRY_FORMAT, LINUX_GUID.bytes_le, b'\x00' * 16, 64, 95,
+        0, b'\x00' * 72)
+    self._WriteAt(image, 2 * 512 + 128, entry)
+    self._WriteExt(image, 64 * 512)
+    self._SaveImage(image)
+
+    result = partitions.GetPartitions(self.image_path)
+    self.assertEqual(len(result), 1)
+    self.assertEqual(result[0].number, 2)
+    self.assertEqual(result[0].offset, 64 * 512)
+    self.assertEqual(result[0].size, 32 * 512)
+    self.assertEqual(result[0].type, str(LINUX_GUID))
+    self.assertEqual(result[0].fstype, 'ext3')
+
+  def testGetPartitionsNoPartitionTable(self):
+    """Tests GetPartitions with a file system image."""
+    image = bytearray(8192)
+    self._WriteAt(image, 3, b'NTFS    ')
+    image[510:512] = partitions.MBR_SIGNATURE
+    self._SaveImage(image)
+
+    result = partitions.GetPartitions(self.image_path)
+    self.assertEqual(len(result), 1)
+    self.assertEqual(result[0].offset, 0)
+    self.assertEqual(result[0].size, 8192)
+    self.assertEqual(result[0].fstype, 'ntfs')
+
+    self.assertRaises(
+        TurbiniaException, partitions.GetPartitions,
+        os.path.join(self.base_output_dir, 'nonexistent'))
+
+
+if __name__ == '__main__':
+  unittest.main()
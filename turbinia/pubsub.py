@@ -141,3 +141,22 @@ class TurbiniaPubSub(TurbiniaMessageBase):
       request: A TurbiniaRequest object.
     """
     self.send_message(request.to_json())
+
+  def send_requests(self, requests):
+    """Sends multiple TurbiniaRequest messages.
+
+    All messages are handed to the publisher before waiting for any of them, so
+    that the publisher can send them in batches.
+
+    Args:
+      requests (list(TurbiniaRequest)): The requests to send.
+    """
+    futures = [
+        self.publisher.publish(
+            self.topic_path,
+            request.to_json().encode('utf-8')) for request in requests
+    ]
+    msg_ids = [future.result() for future in futures]
+    log.info(
+        'Published {0:d} messages to topic {1!s}'.format(
+            len(msg_ids), self.topic_name))
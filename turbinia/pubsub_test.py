@@ -127,6 +127,17 @@ class TestTurbiniaPubSub(unittest.TestCase):
     self.pubsub.publisher.publish.assert_called_with(
         'faketopicpath', b'test message text')
 
+  def testSendRequests(self):
+    """Test sending multiple requests before waiting for them."""
+    self.pubsub.publisher = mock.MagicMock()
+    future = self.pubsub.publisher.publish.return_value
+    requests = [getTurbiniaRequest(), getTurbiniaRequest()]
+    self.pubsub.send_requests(requests)
+    self.assertEqual(self.pubsub.publisher.publish.call_count, 2)
+    self.pubsub.publisher.publish.assert_called_with(
+        'faketopicpath', requests[1].to_json().encode('utf-8'))
+    self.assertEqual(future.result.call_count, 2)
+
 
 class TestTurbiniaKombu(unittest.TestCase):
   """Test turbinia.pubsub Kombu module."""
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Building and submitting many Turbinia requests from a single process."""
+
+from __future__ import unicode_literals
+
+import copy
+import glob
+import io
+import json
+import logging
+import os
+import time
+
+from turbinia import config
+from turbinia import evidence
+from turbinia import TurbiniaException
+from turbinia.lib import libcloudforensics
+from turbinia.message import TurbiniaRequest
+
+log = logging.getLogger('turbinia')
+
+# Number of requests published at a time.
+DEFAULT_BATCH_SIZE = 100
+
+
+def _prepare_cloud_disk(attributes):
+  """Sets the Google Cloud disk defaults, copying the disk if needed.
+
+  The zone and project default to TURBINIA_ZONE and TURBINIA_PROJECT like for
+  the googleclouddisk commands of turbiniactl, and disks in other projects are
+  copied into the Turbinia project so that the workers can attach them.
+
+  Args:
+    attributes (dict): The Evidence attributes, which are updated in place.
+
+  Raises:
+    TurbiniaException: If the zone or project is not set or the disk can not
+        be copied.
+  """
+  config.LoadConfig()
+  attributes['zone'] = attributes.get('zone') or config.TURBINIA_ZONE
+  attributes['project'] = attributes.get('project') or config.TURBINIA_PROJECT
+  if not attributes['zone']:
+    raise TurbiniaException(
+        'Turbinia zone must be set for disk {0!s} or in config'.format(
+            attributes.get('disk_name')))
+  if not attributes['project']:
+    raise TurbiniaException(
+        'Turbinia project must be set for disk {0!s} or in config'.format(
+            attributes.get('disk_name')))
+
+  if attributes['project'] != config.TURBINIA_PROJECT:
+    try:
+      new_disk = libcloudforensics.create_disk_copy(
+          attributes['project'], config.TURBINIA_PROJECT, None,
+          config.TURBINIA_ZONE, attributes.get('disk_name'))
+    except RuntimeError as e:
+      raise TurbiniaException(
+          'Could not copy disk {0!s} from project {1:s}: {2!s}'.format(
+              attributes.get('disk_name'), attributes['project'], e))
+    attributes['disk_name'] = new_disk.name
+    attributes['project'] = config.TURBINIA_PROJECT
+    attributes['zone'] = config.TURBINIA_ZONE
+
+
+def create_evidence(attributes):
+  """Creates an Evidence object from a dict of attributes.
+
+  Args:
+    attributes (dict): The Evidence attributes, including a type attribute with
+        the name of the Evidence class, e.g. {'type': 'RawDisk',
+        'source_path': '/evidence/disk.dd'}.  Google Cloud disks in other
+        projects are copied into the Turbinia project.
+
+  Returns:
+    Evidence: The Evidence object.
+
+  Raises:
+    TurbiniaException: If the type or the attributes are invalid.
+  """
+  if not isinstance(attributes, dict):
+    raise TurbiniaException(
+        'Evidence attributes are not a dictionary: {0!s}'.format(attributes))
+  attributes = dict(attributes)
+  type_ = attributes.pop('type', None)
+  evidence_class = getattr(evidence, type_ or '', None)
+  if not (isinstance(evidence_class, type) and
+          issubclass(evidence_class, evidence.Evidence)):
+    raise TurbiniaException('Invalid Evidence type {0!s}'.format(type_))
+
+  # Use the same defaults as the single evidence commands of turbiniactl.
+  if attributes.get('source_path'):
+    attributes['source_path'] = os.path.abspath(attributes['source_path'])
+  if not attributes.get('name'):
+    default_name = attributes.get('source_path') or attributes.get('disk_name')
+    attributes['name'] = default_name
+  if issubclass(evidence_class, evidence.GoogleCloudDisk):
+    _prepare_cloud_disk(attributes)
+  try:
+    return evidence_class(**attributes)
+  except TypeError as e:
+    raise TurbiniaException(
+        'Invalid attributes for {0:s} Evidence: {1!s}'.format(type_, e))
+
+
+def load_manifest(path):
+  """Loads Evidence from a manifest file.
+
+  The manifest is a JSON list with the attributes of each piece of Evidence,
+  as accepted by create_evidence().
+
+  Args:
+    path (str): The path of the manifest file.
+
+  Returns:
+    list(Evidence): The Evidence objects.
+
+  Raises:
+    TurbiniaException: If the manifest can not be read or is invalid.
+  """
+  try:
+    with io.open(path, 'r', encoding='utf-8') as manifest_file:
+      entries = json.load(manifest_file)
+  except (IOError, OSError, ValueError) as e:
+    raise TurbiniaException(
+        'Could not load manifest {0:s}: {1!s}'.format(path, e))
+  if not isinstance(entries, list):
+    raise TurbiniaException(
+        'Manifest {0:s} does not contain a list of Evidence'.format(path))
+  return [create_evidence(entry) for entry in entries]
+
+
+def glob_evidence(pattern, type_='RawDisk'):
+  """Creates Evidence for all local paths matching a glob pattern.
+
+  Args:
+    pattern (str): The glob pattern, e.g. '/evidence/case1/*.dd'.
+    type_ (str): The name of the Evidence class to create.
+
+  Returns:
+    list(Evidence): The Evidence objects, sorted by path.
+
+  Raises:
+    TurbiniaException: If no paths match the pattern.
+  """
+  paths = sorted(glob.glob(os.path.expanduser(pattern)))
+  if not paths:
+    raise TurbiniaException('No paths match {0:s}'.format(pattern))
+  return [create_evidence(dict(type=type_, source_path=path)) for path in paths]
+
+
+def create_requests(
+    evidence_list, requester=None, recipe=None, evidence_per_request=1):
+  """Groups Evidence into new requests.
+
+  Args:
+    evidence_list (list(Evidence)): The Evidence to process.
+    requester (str): The user making the requests.
+    recipe (dict): The recipe for all requests.
+    evidence_per_request (int): The maximum number of Evidence objects in each
+        request.
+
+  Returns:
+    list(TurbiniaRequest): The requests.
+  """
+  evidence_per_request = max(evidence_per_request or 1, 1)
+  requests = []
+  for index in range(0, len(evidence_list), evidence_per_request):
+    request = TurbiniaRequest(
+        requester=requester, recipe=copy.deepcopy(recipe),
+        evidence_=evidence_list[index:index + evidence_per_request])
+    requests.append(request)
+  return requests
+
+
+class BatchSubmitter(object):
+  """Publishes requests in batches.
+
+  Attributes:
+    batch_size (int): The number of requests published at a time.
+    rate (float): The maximum number of requests published per second, or None
+        to publish as fast as possible.
+  """
+
+  def __init__(self, send_requests, batch_size=None, rate=None):
+    """Initialization for BatchSubmitter.
+
+    Args:
+      send_requests (function): Called with a list of TurbiniaRequest objects
+          to publish them, e.g. TurbiniaClient.send_requests.
+      batch_size (int): The number of requests published at a time, by default
+          DEFAULT_BATCH_SIZE.
+      rate (float): The maximum number of requests published per second.
+    """
+    self._send_requests = send_requests
+    self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+    self.rate = rate
+    if self.rate:
+      # Smaller batches keep the publishing rate even.
+      self.batch_size = max(min(self.batch_size, int(self.rate)), 1)
+
+  def submit(self, requests, callback=None):
+    """Publishes requests.
+
+    Args:
+      requests (list(TurbiniaRequest)): The requests to publish.
+      callback (function): Called with each list of requests right after it has
+          been published.
+
+    Returns:
+      list(str): The ids of the published requests.
+    """
+    request_ids = []
+    start_time = time.time()
+    for index in range(0, len(requests), self.batch_size):
+      batch = requests[index:index + self.batch_size]
+      self._send_requests(batch)
+      request_ids.extend(request.request_id for request in batch)
+      if callback:
+        callback(batch)
+      log.info(
+          'Submitted {0:d} of {1:d} requests'.format(
+              len(request_ids), len(requests)))
+      if self.rate and len(request_ids) < len(requests):
+        delay = len(request_ids) / float(self.rate) - (time.time() - start_time)
+        if delay > 0:
+          time.sleep(delay)
+    return request_ids
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the request batch module."""
+
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from turbinia import evidence
+from turbinia import request_batch
+from turbinia import TurbiniaException
+
+
+class TestRequestBatch(unittest.TestCase):
+  """Tests for creating and submitting batches of requests."""
+
+  def setUp(self):
+    self.tmp_dir = tempfile.mkdtemp(prefix='turbinia-test-request-batch')
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def testLoadManifest(self):
+    """Tests loading Evidence from a manifest."""
+    manifest_path = os.path.join(self.tmp_dir, 'manifest.json')
+    manifest = [
+        dict(type='RawDisk', source_path='disk1.dd', mount_partition=2),
+        dict(type='Directory', source_path='/evidence/dir', name='Directory')
+    ]
+    with open(manifest_path, 'w') as manifest_file:
+      json.dump(manifest, manifest_file)
+
+    evidence_list = request_batch.load_manifest(manifest_path)
+    self.assertIsInstance(evidence_list[0], evidence.RawDisk)
+    self.assertEqual(evidence_list[0].source_path, os.path.abspath('disk1.dd'))
+    self.assertEqual(evidence_list[0].name, os.path.abspath('disk1.dd'))
+    self.assertEqual(evidence_list[0].mount_partition, 2)
+    self.assertIsInstance(evidence_list[1], evidence.Directory)
+    self.assertEqual(evidence_list[1].name, 'Directory')
+
+  def testCreateEvidenceInvalid(self):
+    """Tests that invalid Evidence attributes are rejected."""
+    self.assertRaises(
+        TurbiniaException, request_batch.create_evidence, {'type': 'Unknown'})
+    self.assertRaises(
+        TurbiniaException, request_batch.create_evidence, {'type': 'log'})
+    self.assertRaises(
+        TurbiniaException, request_batch.create_evidence,
+        dict(type='RawDisk', invalid=True))
+    self.assertRaises(
+        TurbiniaException, request_batch.load_manifest,
+        os.path.join(self.tmp_dir, 'missing.json'))
+
+  @mock.patch('turbinia.request_batch.libcloudforensics.create_disk_copy')
+  @mock.patch('turbinia.request_batch.config')
+  def testCreateEvidenceCloudDisk(self, mock_config, mock_create_disk_copy):
+    """Tests the Google Cloud disk defaults and copies."""
+    mock_config.TURBINIA_ZONE = 'turbinia-zone'
+    mock_config.TURBINIA_PROJECT = 'turbinia-project'
+    mock_create_disk_copy.return_value.name = 'disk1-copy'
+
+    disk = request_batch.create_evidence(
+        dict(type='GoogleCloudDisk', disk_name='disk1'))
+    self.assertEqual(disk.zone, 'turbinia-zone')
+    self.assertEqual(disk.project, 'turbinia-project')
+    self.assertEqual(disk.disk_name, 'disk1')
+    mock_create_disk_copy.assert_not_called()
+
+    disk = request_batch.create_evidence(
+        dict(
+            type='GoogleCloudDiskRawEmbedded', disk_name='disk1',
+            project='other-project', zone='other-zone',
+            embedded_path='/disk.dd'))
+    mock_create_disk_copy.assert_called_once_with(
+        'other-project', 'turbinia-project', None, 'turbinia-zone', 'disk1')
+    self.assertEqual(disk.disk_name, 'disk1-copy')
+    self.assertEqual(disk.project, 'turbinia-project')
+    self.assertEqual(disk.zone, 'turbinia-zone')
+    self.assertEqual(disk.name, 'disk1')
+
+    mock_config.TURBINIA_ZONE = None
+    self.assertRaises(
+        TurbiniaException, request_batch.create_evidence,
+        dict(type='GoogleCloudDisk', disk_name='disk1'))
+
+  def testGlobEvidence(self):
+    """Tests creating Evidence for paths matching a glob."""
+    for name in ('b.dd', 'a.dd', 'c.txt'):
+      open(os.path.join(self.tmp_dir, name), 'w').close()
+    evidence_list = request_batch.glob_evidence(
+        os.path.join(self.tmp_dir, '*.dd'))
+    names = [os.path.basename(item.source_path) for item in evidence_list]
+    self.assertEqual(names, ['a.dd', 'b.dd'])
+    self.assertRaises(
+        TurbiniaException, request_batch.glob_evidence,
+        os.path.join(self.tmp_dir, '*.raw'))
+
+  def testCreateRequests(self):
+    """Tests grouping Evidence into requests."""
+    evidence_list = [
+        evidence.RawDisk(source_path='/evidence/{0:d}.dd'.format(index))
+        for index in range(5)
+    ]
+    recipe = {'jobs_blacklist': ['StringsJob']}
+    requests = request_batch.create_requests(
+        evidence_list, requester='testUser', recipe=recipe,
+        evidence_per_request=2)
+    self.assertEqual([len(request.evidence) for request in requests], [2, 2, 1])
+    self.assertEqual(len(set(request.request_id for request in requests)), 3)
+    self.assertEqual(requests[2].recipe, recipe)
+    self.assertIsNot(requests[2].recipe, recipe)
+    self.assertEqual(requests[2].requester, 'testUser')
+
+  @mock.patch('turbinia.request_batch.time.sleep')
+  def testBatchSubmitter(self, mock_sleep):
+    """Tests publishing requests in throttled batches."""
+    requests = request_batch.create_requests(
+        [evidence.RawDisk(source_path='/evidence/disk.dd')] * 5)
+    send_requests = mock.MagicMock()
+    submitter = request_batch.BatchSubmitter(
+        send_requests, batch_size=10, rate=2)
+    callback = mock.MagicMock()
+    request_ids = submitter.submit(requests, callback=callback)
+    self.assertEqual(request_ids, [request.request_id for request in requests])
+    batch_sizes = [len(call[0][0]) for call in send_requests.call_args_list]
+    self.assertEqual(batch_sizes, [2, 2, 1])
+    self.assertEqual(
+        callback.call_args_list, [
+            mock.call(requests[0:2]),
+            mock.call(requests[2:4]),
+            mock.call(requests[4:])
+        ])
+    self.assertEqual(mock_sleep.call_count, 2)
+
+    send_requests.reset_mock()
+    request_batch.BatchSubmitter(send_requests).submit(requests)
+    send_requests.assert_called_once_with(requests)
+
+
+if __name__ == '__main__':
+  unittest.main()
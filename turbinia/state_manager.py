@@ -21,8 +21,13 @@ storage.
 from __future__ import unicode_literals
 
 import codecs
+from collections import OrderedDict
 import json
 import logging
+import os
+import random
+import threading
+import time
 from datetime import datetime
 from datetime import timedelta
 
@@ -31,6 +36,8 @@ import six
 from turbinia import config
 from turbinia.config import DATETIME_FORMAT
 from turbinia import TurbiniaException
+from turbinia import task_events
+from turbinia.lib import stats_rollup
 from turbinia.workers import TurbiniaTask
 from turbinia.workers import TurbiniaTaskResult
 
@@ -40,6 +47,8 @@ if config.STATE_MANAGER.lower() == 'datastore':
   from google.cloud import exceptions
 elif config.STATE_MANAGER.lower() == 'redis':
   import redis
+elif config.STATE_MANAGER.lower() == 'sqlite':
+  import sqlite3
 else:
   msg = 'State Manager type "{0:s}" not implemented'.format(
       config.STATE_MANAGER)
@@ -64,6 +73,8 @@ def get_state_manager():
     return DatastoreStateManager()
   elif config.STATE_MANAGER.lower() == 'redis':
     return RedisStateManager()
+  elif config.STATE_MANAGER.lower() == 'sqlite':
+    return SQLiteStateManager()
   else:
     msg = 'State Manager type "{0:s}" not implemented'.format(
         config.STATE_MANAGER)
@@ -71,7 +82,28 @@ def get_state_manager():
 
 
 class BaseStateManager(object):
-  """Class to manage Turbinia state persistence."""
+  """Class to manage Turbinia state persistence.
+
+  The state manager also maintains statistics rollups of the run time of
+  completed Tasks per day.  Rollups are accumulated in memory as Tasks
+  complete and merged into the stored rollups by flush().  The run time of a
+  request is added to the requests rollup once complete_request() is called.
+  """
+
+  # Number of completed Task ids to remember, so that a Task that is updated
+  # again after it completed is not counted twice.
+  MAX_RECORDED_TASKS = 10000
+  # Number of requests to track the span of until they complete.
+  MAX_REQUEST_SPANS = 10000
+
+  def __init__(self):
+    # Rollups that have not been written yet, keyed by (instance, day, name).
+    self._pending_rollups = {}
+    self._recorded_tasks = OrderedDict()
+    # Start and stop time of the requests with completed Tasks, keyed by
+    # (instance, request id).
+    self._request_spans = OrderedDict()
+    self._rollups_lock = threading.Lock()
 
   def get_task_dict(self, task):
     """Creates a dict of the fields we want to persist into storage.
@@ -157,15 +189,437 @@ class BaseStateManager(object):
     """
     raise NotImplementedError
 
+  def get_task_event_subscriber(self, instance, request_id=None):
+    """Subscribes to the Task state change events of a request.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The request to receive events for, or None for all
+          requests.
+
+    Returns:
+      TaskEventSubscriber: The subscriber, or None if this state manager does
+          not push Task state changes, in which case clients need to poll.
+    """
+    return None
+
+  def flush(self):
+    """Writes any buffered updates to storage.
+
+    State managers that do not buffer writes do not need to implement this.
+    """
+
+  def migrate(self):
+    """Converts Task records written by older versions of Turbinia.
+
+    State managers that have not changed their storage format do not need to
+    implement this.
+
+    Returns:
+      int: The number of converted records.
+    """
+    return 0
+
+  def _record_task_stats(self, task_data, last_update):
+    """Adds a completed Task to the pending statistics rollups.
+
+    Args:
+      task_data (dict): The Task dict with the run_time in seconds.
+      last_update (datetime): The last update time of the Task.
+    """
+    if task_data.get('successful') is None:
+      return
+    rollups = stats_rollup.get_task_rollups(task_data, last_update)
+    if not rollups:
+      return
+    day = stats_rollup.get_day(last_update)
+    with self._rollups_lock:
+      if task_data['id'] in self._recorded_tasks:
+        return
+      self._recorded_tasks[task_data['id']] = True
+      if len(self._recorded_tasks) > self.MAX_RECORDED_TASKS:
+        self._recorded_tasks.popitem(last=False)
+      for name, rollup in rollups.items():
+        key = (task_data['instance'], day, name)
+        if key in self._pending_rollups:
+          self._pending_rollups[key].merge(rollup)
+        else:
+          self._pending_rollups[key] = rollup
+      if task_data.get('request_id'):
+        key = (task_data['instance'], task_data['request_id'])
+        span = stats_rollup.get_task_span(task_data, last_update)
+        if key in self._request_spans:
+          self._request_spans[key].merge(span)
+        else:
+          self._request_spans[key] = span
+          if len(self._request_spans) > self.MAX_REQUEST_SPANS:
+            self._request_spans.popitem(last=False)
+
+  def complete_request(self, instance, request_id):
+    """Adds the run time of a completed request to the requests rollup.
+
+    The run time spans the Tasks of the request that completed through this
+    state manager since it was created.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The Id of the completed request.
+    """
+    with self._rollups_lock:
+      span = self._request_spans.pop((instance, request_id), None)
+      if not span:
+        return
+      rollup = stats_rollup.StatsRollup()
+      rollup.add(span.max - span.min)
+      stop_time = datetime(1970, 1, 1) + timedelta(seconds=span.max)
+      key = (
+          instance, stats_rollup.get_day(stop_time),
+          stats_rollup.ROLLUP_REQUESTS)
+      if key in self._pending_rollups:
+        self._pending_rollups[key].merge(rollup)
+      else:
+        self._pending_rollups[key] = rollup
+
+  def _take_pending_rollups(self):
+    """Removes and returns the pending statistics rollups.
+
+    Returns:
+      dict: The StatsRollup objects keyed by (instance, day, name).
+    """
+    with self._rollups_lock:
+      rollups = self._pending_rollups
+      self._pending_rollups = {}
+    return rollups
+
+  def _restore_pending_rollups(self, rollups):
+    """Puts rollups that could not be written back into the pending rollups.
+
+    Args:
+      rollups (dict): The StatsRollup objects keyed by (instance, day, name).
+    """
+    with self._rollups_lock:
+      for key, rollup in rollups.items():
+        if key in self._pending_rollups:
+          rollup.merge(self._pending_rollups[key])
+        self._pending_rollups[key] = rollup
+
+  def get_task_rollups(self, instance, days=0):
+    """Gets the statistics rollups of the completed Tasks in a time window.
+
+    The window is rounded to whole days, so it can include Tasks up to a day
+    older than the requested number of days.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      days (int): The number of days we want statistics for, or 0 for all
+          history.
+
+    Returns:
+      dict: The merged StatsRollup objects keyed by rollup name.
+    """
+    raise NotImplementedError
+
+  def write_evidence(self, evidence_):
+    """Writes Evidence so that it can be referenced by its id later.
+
+    Args:
+      evidence_ (Evidence): The Evidence to write.
+    """
+    raise NotImplementedError
+
+  def get_evidence(self, evidence_id):
+    """Gets previously written Evidence.
+
+    Args:
+      evidence_id (str): The id of the Evidence.
+
+    Returns:
+      dict: The serialized Evidence, or None if it was not found.
+    """
+    raise NotImplementedError
+
+  def get_request_evidence_ids(self, request_id):
+    """Gets the ids of all the Evidence written for a request.
+
+    Args:
+      request_id (str): The id of the request.
+
+    Returns:
+      list(str): The Evidence ids.
+    """
+    raise NotImplementedError
+
+  def write_evidence_edge(self, parent_id, child_id, task_id, request_id):
+    """Writes an edge of the evidence lineage graph.
+
+    Args:
+      parent_id (str): The id of the Evidence processed by the Task.
+      child_id (str): The id of the Evidence created by the Task.
+      task_id (str): The id of the Task that created the child Evidence.
+      request_id (str): The id of the request.
+    """
+    raise NotImplementedError
+
+  def get_evidence_children(self, evidence_id):
+    """Gets the Evidence directly created from the given Evidence.
+
+    Args:
+      evidence_id (str): The id of the parent Evidence.
+
+    Returns:
+      dict: The ids of the Tasks that created each child Evidence, keyed by the
+          child Evidence id.
+    """
+    raise NotImplementedError
+
+  def get_evidence_parents(self, evidence_id):
+    """Gets the Evidence the given Evidence was directly created from.
+
+    Args:
+      evidence_id (str): The id of the child Evidence.
+
+    Returns:
+      dict: The ids of the Tasks that created the child Evidence, keyed by the
+          parent Evidence id.
+    """
+    raise NotImplementedError
+
+  def get_expired_requests(self, days):
+    """Gets the completed requests that have not been updated for some time.
+
+    Args:
+      days (int): The number of days since the last update of any of the Tasks
+          in the request.
+
+    Returns:
+      list(str): The ids of the expired requests.
+    """
+    raise NotImplementedError
+
+  def get_task_ids_updated_before(self, instance, last_update):
+    """Gets the ids of the Tasks that were last updated before a time.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      last_update (datetime): The time to compare the last update time with.
+
+    Returns:
+      list(str): The Task ids.
+    """
+    raise NotImplementedError
+
+  def get_request_task_ids(self, instance, request_id):
+    """Gets the ids of the Tasks of a request.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The Id of the request.
+
+    Returns:
+      list(str): The sorted Task ids.
+    """
+    raise NotImplementedError
+
+  def get_tasks(self, instance, task_ids):
+    """Gets Task dicts by their ids.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      task_ids (list(str)): The ids of the Tasks.
+
+    Returns:
+      list(dict): The Task dicts.  Tasks that do not exist are skipped.
+    """
+    raise NotImplementedError
+
+  def delete_tasks(self, tasks):
+    """Deletes Task records and their index entries.
+
+    Args:
+      tasks (list(dict)): The Task dicts of the Tasks to delete.
+    """
+    raise NotImplementedError
+
+  def get_task_page(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None, limit=None, after=None, fields=None):
+    """Gets a page of Tasks in the order of their last update.
+
+    Tasks are ordered by the key returned by _get_sort_key(), so a page
+    continues exactly after the last Task of the previous page even if Tasks
+    are added or updated in between.  This implementation reads all matching
+    Tasks with get_task_data(); subclasses limit the query itself.
+
+    Args:
+      instance (string): The Turbinia instance name.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
+      limit (int): The maximum number of Tasks to return, or None for all.
+      after (tuple(float, str)): Only get Tasks with a sort key greater than
+          this one, usually the key of the last Task of the previous page.
+      fields (list(str)): The Task fields to return, or None for all fields.
+          The id and last_update fields are always returned.
+
+    Returns:
+      list(dict): The Task dicts.
+    """
+    tasks = self.get_task_data(
+        instance, days=days, task_id=task_id, request_id=request_id, user=user,
+        since=since)
+    tasks.sort(key=self._get_sort_key)
+    if after:
+      after = tuple(after)
+      tasks = [task for task in tasks if self._get_sort_key(task) > after]
+    if limit is not None:
+      tasks = tasks[:limit]
+    return [self._select_fields(task, fields) for task in tasks]
+
+  @staticmethod
+  def _get_expired_requests(tasks, days):
+    """Gets the expired requests from a list of Task dicts.
+
+    A request is expired when all of its Tasks have completed, and none of them
+    have been updated within the given number of days.
+
+    Args:
+      tasks (list(dict)): The Task dicts of the Turbinia instance.
+      days (int): The number of days since the last update of a request.
+
+    Returns:
+      list(str): The ids of the expired requests.
+    """
+    cutoff = datetime.now() - timedelta(days=days)
+    requests = {}
+    for task in tasks:
+      request_id = task.get('request_id')
+      if not request_id:
+        continue
+      last_update = task.get('last_update')
+      if isinstance(last_update, six.string_types):
+        last_update = datetime.strptime(last_update, DATETIME_FORMAT)
+      elif last_update and last_update.tzinfo:
+        last_update = last_update.replace(tzinfo=None)
+      expired = requests.get(request_id, True)
+      requests[request_id] = bool(
+          expired and last_update and last_update < cutoff and
+          task.get('successful') is not None)
+    return sorted(
+        request_id for request_id, expired in requests.items() if expired)
+
+  @staticmethod
+  def _get_timestamp(last_update):
+    """Gets a last_update time as a number for range queries.
+
+    Args:
+      last_update (datetime): The last update time of a Task.
+
+    Returns:
+      float: The number of seconds since the epoch.
+    """
+    return (last_update - datetime(1970, 1, 1)).total_seconds()
+
+  @classmethod
+  def _get_sort_key(cls, task):
+    """Gets the key Tasks are ordered and paginated by.
+
+    Args:
+      task (dict): The Task dict.
+
+    Returns:
+      tuple(float, str): The last update time in seconds since the epoch and
+          the Task id.
+    """
+    last_update = task.get('last_update')
+    timestamp = cls._get_timestamp(last_update) if last_update else 0.0
+    return (timestamp, task.get('id') or '')
+
+  @staticmethod
+  def _select_fields(task, fields):
+    """Selects fields of a Task dict.
+
+    Args:
+      task (dict): The Task dict.
+      fields (list(str)): The Task fields to select, or None for all fields.
+          The id and last_update fields are always selected.
+
+    Returns:
+      dict: The Task dict with the selected fields.
+    """
+    if not fields:
+      return task
+    fields = set(fields) | {'id', 'last_update'}
+    return {name: value for name, value in task.items() if name in fields}
+
+  def _walk_evidence_graph(self, evidence_id, get_neighbours):
+    """Walks the evidence lineage graph breadth first.
+
+    Args:
+      evidence_id (str): The id of the Evidence to start from.
+      get_neighbours (function): Returns the neighbours of an Evidence id.
+
+    Returns:
+      list(tuple(str, str, str)): The (neighbour_id, task_id, evidence_id)
+          edges that were traversed, in breadth first order.
+    """
+    edges = []
+    seen = set([evidence_id])
+    queue = [evidence_id]
+    while queue:
+      current_id = queue.pop(0)
+      for neighbour_id, task_id in sorted(get_neighbours(current_id).items()):
+        edges.append((neighbour_id, task_id, current_id))
+        if neighbour_id not in seen:
+          seen.add(neighbour_id)
+          queue.append(neighbour_id)
+    return edges
+
+  def get_evidence_descendants(self, evidence_id):
+    """Gets all Evidence that was derived from the given Evidence.
+
+    Args:
+      evidence_id (str): The id of the Evidence.
+
+    Returns:
+      list(tuple(str, str, str)): A (descendant_id, task_id, parent_id) tuple
+          for each Task that created derived Evidence.
+    """
+    return self._walk_evidence_graph(evidence_id, self.get_evidence_children)
+
+  def get_evidence_ancestors(self, evidence_id):
+    """Gets all Evidence that the given Evidence was derived from.
+
+    Args:
+      evidence_id (str): The id of the Evidence.
+
+    Returns:
+      list(tuple(str, str, str)): An (ancestor_id, task_id, child_id) tuple
+          for each Task in the provenance of the Evidence.
+    """
+    return self._walk_evidence_graph(evidence_id, self.get_evidence_parents)
+
 
 class DatastoreStateManager(BaseStateManager):
   """Datastore State Manager.
 
+  Writes are buffered and coalesced per entity, and then written with
+  put_multi() when the buffer is full or flush() is called.  Entities are
+  always written in full, so no read or transaction is needed to update them.
+
   Attributes:
     client: A Datastore client object.
   """
 
+  # Maximum number of entities in a single put_multi() call.
+  MAX_BATCH_SIZE = 500
+  # Number of times and initial delay in seconds to retry failed writes.
+  WRITE_RETRIES = 5
+  WRITE_RETRY_DELAY = 0.5
+
   def __init__(self):
+    super(DatastoreStateManager, self).__init__()
     config.LoadConfig()
     try:
       self.client = datastore.Client(project=config.TURBINIA_PROJECT)
@@ -174,6 +628,11 @@ class DatastoreStateManager(BaseStateManager):
           'Could not create Datastore client: {0!s}\n'
           'Have you run $ gcloud auth application-default login?'.format(e))
       raise TurbiniaException(message)
+    self._pending = OrderedDict()
+    self._pending_lock = threading.Lock()
+    # The last published state of each running Task.
+    self._task_states = {}
+    self._event_publisher = None
 
   def _validate_data(self, data):
     for key, value in iter(data.items()):
@@ -188,120 +647,1411 @@ class DatastoreStateManager(BaseStateManager):
 
     return data
 
-  def update_task(self, task):
-    task.touch()
+  def _put(self, entity):
+    """Buffers an entity to be written, replacing any pending write of it.
+
+    Args:
+      entity (datastore.Entity): The entity to write.
+    """
+    with self._pending_lock:
+      self._pending.pop(entity.key, None)
+      self._pending[entity.key] = entity
+      full = len(self._pending) >= self.MAX_BATCH_SIZE
+    if full:
+      self.flush()
+
+  def _put_multi(self, entities):
+    """Writes a batch of entities, retrying with jittered backoff.
+
+    Args:
+      entities (list(datastore.Entity)): The entities to write.
+
+    Raises:
+      GoogleCloudError: If the entities could not be written.
+    """
+    for attempt in range(self.WRITE_RETRIES + 1):
+      try:
+        self.client.put_multi(entities)
+        return
+      except exceptions.GoogleCloudError as e:
+        if attempt == self.WRITE_RETRIES:
+          raise
+        delay = random.uniform(0, self.WRITE_RETRY_DELAY * 2**attempt)
+        log.warning(
+            'Failed to write {0:d} entities to Datastore, retrying in '
+            '{1:.1f} seconds: {2!s}'.format(len(entities), delay, e))
+        time.sleep(delay)
+
+  def flush(self):
+    with self._pending_lock:
+      entities = list(self._pending.values())
+      self._pending.clear()
+
+    for index in range(0, len(entities), self.MAX_BATCH_SIZE):
+      batch = entities[index:index + self.MAX_BATCH_SIZE]
+      try:
+        self._put_multi(batch)
+        log.debug('Wrote {0:d} entities to Datastore'.format(len(batch)))
+      except exceptions.GoogleCloudError as e:
+        log.error(
+            'Failed to write {0:d} entities to Datastore: {1!s}'.format(
+                len(batch), e))
+        # Keep the failed entities for the next flush, unless they have been
+        # updated again in the meantime.
+        with self._pending_lock:
+          for entity in batch:
+            if entity.key not in self._pending:
+              self._pending[entity.key] = entity
+    self._flush_rollups()
+
+  def _flush_rollups(self):
+    """Merges the pending statistics rollups into the stored rollups.
+
+    Each rollup is stored as a TurbiniaStatsRollup entity per instance, day
+    and rollup name, which is read and written back in a transaction.
+    """
+    rollups = self._take_pending_rollups()
+    items = sorted(rollups.items())
+    for index in range(0, len(items), self.MAX_BATCH_SIZE):
+      batch = items[index:index + self.MAX_BATCH_SIZE]
+      keys = [
+          self.client.key('TurbiniaStatsRollup', ':'.join(key))
+          for key, _ in batch
+      ]
+      try:
+        with self.client.transaction():
+          stored = {
+              entity.key.name: entity for entity in self.client.get_multi(keys)
+          }
+          entities = []
+          for key, ((instance, day, name), rollup) in zip(keys, batch):
+            entity = stored.get(key.name)
+            data = entity.get('data') if entity else None
+            entity = datastore.Entity(key, exclude_from_indexes=['data'])
+            entity.update({
+                'instance': instance,
+                'day': day,
+                'name': name,
+                'data': stats_rollup.merge_encoded_rollup(data, rollup)
+            })
+            entities.append(entity)
+          self.client.put_multi(entities)
+      except exceptions.GoogleCloudError as e:
+        log.error(
+            'Failed to write {0:d} statistics rollups to Datastore: '
+            '{1!s}'.format(len(batch), e))
+        self._restore_pending_rollups(dict(batch))
+
+  def get_task_rollups(self, instance, days=0):
+    query = self.client.query(kind='TurbiniaStatsRollup')
+    query.add_filter('instance', '=', instance)
+    start_day = stats_rollup.get_start_day(days)
+    if start_day:
+      query.add_filter('day', '>=', start_day)
+    return stats_rollup.decode_rollups(
+        (entity['name'], entity['data']) for entity in query.fetch())
+
+  def _put_task(self, task):
+    """Buffers a write of the full Task entity.
+
+    Args:
+      task: A TurbiniaTask object
+
+    Returns:
+      Key for written object
+    """
+    key = self.client.key('TurbiniaTask', task.id)
+    entity = datastore.Entity(key)
+    task_data = self.get_task_dict(task)
+    entity.update(task_data)
+    self._put(entity)
+    self._record_task_stats(task_data, task_data['last_update'])
+    task.state_key = key
+    if config.PUBSUB_TASK_EVENTS_TOPIC:
+      self._publish_task_event(task_data)
+    return key
+
+  def _publish_task_event(self, task_data):
+    """Relays a Task state change to the Pub/Sub task events topic.
+
+    Args:
+      task_data (dict): The Task dict.
+    """
+    state = task_events.get_state(task_data)
+    if self._task_states.get(task_data['id']) == state:
+      return
+    if task_data.get('successful') is not None:
+      self._task_states.pop(task_data['id'], None)
+    else:
+      self._task_states[task_data['id']] = state
     try:
-      with self.client.transaction():
-        entity = self.client.get(task.state_key)
-        if not entity:
-          self.write_new_task(task)
-          return
-        entity.update(self.get_task_dict(task))
-        log.debug('Updating Task {0:s} in Datastore'.format(task.name))
-        self.client.put(entity)
+      if not self._event_publisher:
+        self._event_publisher = task_events.PubSubTaskEventPublisher(
+            config.PUBSUB_TASK_EVENTS_TOPIC)
+      self._event_publisher.publish(task_events.get_task_event(task_data))
     except exceptions.GoogleCloudError as e:
-      log.error(
-          'Failed to update task {0:s} in datastore: {1!s}'.format(
-              task.name, e))
+      log.warning(
+          'Failed to publish event for task {0:s}: {1!s}'.format(
+              task_data['id'], e))
+
+  def update_task(self, task):
+    task.touch()
+    log.debug('Updating Task {0:s} in Datastore'.format(task.name))
+    self._put_task(task)
 
   def write_new_task(self, task):
-    key = self.client.key('TurbiniaTask', task.id)
+    log.info('Writing new task {0:s} into Datastore'.format(task.name))
+    return self._put_task(task)
+
+  def write_evidence(self, evidence_):
+    key = self.client.key('TurbiniaEvidence', evidence_.id)
     try:
-      entity = datastore.Entity(key)
-      entity.update(self.get_task_dict(task))
-      log.info('Writing new task {0:s} into Datastore'.format(task.name))
-      self.client.put(entity)
-      task.state_key = key
-    except exceptions.GoogleCloudError as e:
+      # The serialized Evidence can be larger than the maximum size of an
+      # indexed property.
+      entity = datastore.Entity(key, exclude_from_indexes=['evidence_data'])
+      entity.update({
+          'instance': config.INSTANCE_ID,
+          'request_id': evidence_.request_id,
+          'type': evidence_.type,
+          'evidence_data': evidence_.to_json()
+      })
+      log.debug('Writing evidence {0:s} into Datastore'.format(evidence_.id))
+      self._put(entity)
+    except TurbiniaException as e:
       log.error(
-          'Failed to update task {0:s} in datastore: {1!s}'.format(
-              task.name, e))
-    return key
+          'Failed to write evidence {0:s} into datastore: {1!s}'.format(
+              evidence_.id, e))
+
+  def get_evidence(self, evidence_id):
+    entity = self.client.get(self.client.key('TurbiniaEvidence', evidence_id))
+    if not entity:
+      return None
+    return json.loads(entity['evidence_data'])
+
+  def get_request_evidence_ids(self, request_id):
+    query = self.client.query(kind='TurbiniaEvidence')
+    query.add_filter('instance', '=', config.INSTANCE_ID)
+    query.add_filter('request_id', '=', request_id)
+    query.keys_only()
+    return [entity.key.name for entity in query.fetch()]
+
+  def write_evidence_edge(self, parent_id, child_id, task_id, request_id):
+    key = self.client.key(
+        'TurbiniaEvidenceEdge', ':'.join([parent_id, child_id]))
+    entity = datastore.Entity(key)
+    entity.update({
+        'instance': config.INSTANCE_ID,
+        'parent_id': parent_id,
+        'child_id': child_id,
+        'task_id': task_id,
+        'request_id': request_id
+    })
+    self._put(entity)
+
+  def _get_evidence_edges(self, property_name, evidence_id):
+    """Queries evidence edges by the parent or child id.
+
+    Args:
+      property_name (str): Either 'parent_id' or 'child_id'.
+      evidence_id (str): The Evidence id to query for.
+
+    Returns:
+      list(Entity): The matching edge entities.
+    """
+    query = self.client.query(kind='TurbiniaEvidenceEdge')
+    query.add_filter('instance', '=', config.INSTANCE_ID)
+    query.add_filter(property_name, '=', evidence_id)
+    return list(query.fetch())
+
+  def get_evidence_children(self, evidence_id):
+    return {
+        edge['child_id']: edge['task_id']
+        for edge in self._get_evidence_edges('parent_id', evidence_id)
+    }
+
+  def get_task_data(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None):
+    """Gets task data from Datastore.
+
+    This runs the same indexed queries as the gettasks Cloud Function.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
+
+    Returns:
+      List of Task dict objects.
+    """
+    query = self._get_task_query(
+        instance, days, task_id, request_id, user, since)
+    return [self._decode_task(entity) for entity in query.fetch()]
+
+  def get_task_page(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None, limit=None, after=None, fields=None):
+    """Gets a page of Tasks with a query ordered by the last update time.
+
+    Entities with the same last update time are ordered by their key, the
+    Task id, so the query starts at the time of the after key and only skips
+    the Tasks with that same time that were already returned.  Results are
+    fetched in batches as they are iterated, so only about one page of
+    entities is read.  Fields are selected after the entities are read, as
+    projection queries can not return unindexed fields like report_data.
+    """
+    if task_id and not days:
+      return super(DatastoreStateManager, self).get_task_page(
+          instance, task_id=task_id, user=user, since=since, limit=limit,
+          after=after, fields=fields)
+
+    query = self._get_task_query(instance, days, None, request_id, user, since)
+    if after:
+      after = tuple(after)
+      query.add_filter(
+          'last_update', '>=',
+          datetime(1970, 1, 1) + timedelta(seconds=after[0]))
+    query.order = ['last_update']
+    tasks = []
+    for entity in query.fetch():
+      task = self._decode_task(entity)
+      if after and self._get_sort_key(task) <= after:
+        continue
+      tasks.append(self._select_fields(task, fields))
+      if limit is not None and len(tasks) >= limit:
+        break
+    return tasks
+
+  def _get_task_query(self, instance, days, task_id, request_id, user, since):
+    """Creates a Task query.
+
+    Args:
+      instance (string): The Turbinia instance name.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
+
+    Returns:
+      google.cloud.datastore.query.Query: The query.
+    """
+    query = self.client.query(kind='TurbiniaTask')
+    query.add_filter('instance', '=', instance)
+    if days:
+      start_time = datetime.now() - timedelta(days=days)
+      query.add_filter('last_update', '>=', start_time)
+    elif task_id:
+      query.add_filter('id', '=', task_id)
+    elif request_id:
+      query.add_filter('request_id', '=', request_id)
+    if user:
+      query.add_filter('requester', '=', user)
+    if since:
+      query.add_filter('last_update', '>=', since)
+    return query
+
+  @staticmethod
+  def _decode_task(entity):
+    """Decodes a Task entity into a Task dict.
+
+    Args:
+      entity (Entity): The Task entity.
+
+    Returns:
+      dict: The Task dict.
+    """
+    task = dict(entity)
+    if task.get('last_update') and task['last_update'].tzinfo:
+      task['last_update'] = task['last_update'].replace(tzinfo=None)
+    if task.get('run_time'):
+      task['run_time'] = timedelta(seconds=task['run_time'])
+    return task
+
+  def get_expired_requests(self, days):
+    query = self.client.query(kind='TurbiniaTask')
+    query.add_filter('instance', '=', config.INSTANCE_ID)
+    tasks = [dict(entity) for entity in query.fetch()]
+    return self._get_expired_requests(tasks, days)
+
+  def get_evidence_parents(self, evidence_id):
+    return {
+        edge['parent_id']: edge['task_id']
+        for edge in self._get_evidence_edges('child_id', evidence_id)
+    }
+
+  def get_task_ids_updated_before(self, instance, last_update):
+    query = self.client.query(kind='TurbiniaTask')
+    query.add_filter('instance', '=', instance)
+    query.add_filter('last_update', '<', last_update)
+    query.keys_only()
+    return [entity.key.name for entity in query.fetch()]
+
+  def get_request_task_ids(self, instance, request_id):
+    query = self.client.query(kind='TurbiniaTask')
+    query.add_filter('instance', '=', instance)
+    query.add_filter('request_id', '=', request_id)
+    query.keys_only()
+    return sorted(entity.key.name for entity in query.fetch())
+
+  def get_tasks(self, instance, task_ids):
+    tasks = []
+    for index in range(0, len(task_ids), self.MAX_BATCH_SIZE):
+      keys = [
+          self.client.key('TurbiniaTask', task_id)
+          for task_id in task_ids[index:index + self.MAX_BATCH_SIZE]
+      ]
+      entities = self.client.get_multi(keys)
+      tasks.extend(self._decode_task(entity) for entity in entities if entity)
+    return tasks
+
+  def delete_tasks(self, tasks):
+    self.flush()
+    keys = [self.client.key('TurbiniaTask', task['id']) for task in tasks]
+    for index in range(0, len(keys), self.MAX_BATCH_SIZE):
+      self.client.delete_multi(keys[index:index + self.MAX_BATCH_SIZE])
+
+
+# Writes Task fields to the Task hashes only if the Task hash exists
+# (ARGV[1] == 1) or does not exist yet (ARGV[1] == 0).  ARGV[2] is the number
+# of arguments for the main hash, which are followed by the field/value pairs
+# of the main hash and then those of the hash for the large text fields.
+_REDIS_WRITE_TASK_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) ~= tonumber(ARGV[1]) then
+  return 0
+end
+local count = tonumber(ARGV[2])
+if count > 0 then
+  redis.call('HSET', KEYS[1], unpack(ARGV, 3, 2 + count))
+end
+if #ARGV > 2 + count then
+  redis.call('HSET', KEYS[2], unpack(ARGV, 3 + count, #ARGV))
+end
+return 1
+"""
 
 
 class RedisStateManager(BaseStateManager):
   """Use redis for task state storage.
 
+  Tasks are stored as hashes under TurbiniaTask:<instance>:<task id> keys with
+  one JSON encoded value per field, so numeric fields are stored as plain
+  numbers.  Large text fields are kept in a separate TurbiniaTaskText hash so
+  that they are not rewritten on every update.  Tasks are indexed by request,
+  by requester and by last update time per instance.
+
   Attributes:
     client: Redis database object.
   """
 
+  # Maximum number of Tasks fetched with a single pipeline.
+  READ_BATCH_SIZE = 1000
+  # Task fields that are kept out of the main Task hash.
+  LARGE_FIELDS = ('report_data', 'saved_paths')
+  # Version of the storage format.  Version 1 stored each Task as a JSON string
+  # under a TurbiniaTask:<task id> key without any indexes.
+  SCHEMA_VERSION = 2
+  SCHEMA_VERSION_KEY = 'TurbiniaSchemaVersion'
+
   def __init__(self):
+    super(RedisStateManager, self).__init__()
     config.LoadConfig()
     self.client = redis.StrictRedis(
         host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB)
+    self._write_script = self.client.register_script(_REDIS_WRITE_TASK_SCRIPT)
+    # The encoded fields last written for each Task key, used to only write
+    # the fields that changed.
+    self._written_fields = {}
+    # Whether all legacy Task records are known to have been migrated.
+    self._migrated = False
 
   def _validate_data(self, data):
     return data
 
-  def get_task_data(self, instance, days=0, task_id=None, request_id=None):
+  @staticmethod
+  def _get_task_key(instance, task_id):
+    """Gets the key of a Task record.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      task_id (str): The id of the Task.
+
+    Returns:
+      str: The Redis key of the Task.
+    """
+    return ':'.join(['TurbiniaTask', instance, task_id])
+
+  @staticmethod
+  def _get_text_key(key):
+    """Gets the key of the large text fields of a Task.
+
+    Args:
+      key (str): The Redis key of the Task.
+
+    Returns:
+      str: The Redis key of the large text fields of the Task.
+    """
+    return 'TurbiniaTaskText' + key[len('TurbiniaTask'):]
+
+  def _write_task_indexes(self, pipeline, task_data, last_update):
+    """Adds the index entries of a Task to a pipeline.
+
+    The indexes are a set of Task ids per request and per requester, and a
+    sorted set of all Task ids per instance scored by their last update time.
+
+    Args:
+      pipeline (redis.client.Pipeline): The pipeline to add the commands to.
+      task_data (dict): The Task dict to index.
+      last_update (datetime): The last update time of the Task.
+    """
+    instance = task_data['instance']
+    task_id = task_data['id']
+    if task_data.get('request_id'):
+      pipeline.sadd(
+          ':'.join(['TurbiniaRequestTasks', instance, task_data['request_id']]),
+          task_id)
+    if task_data.get('requester'):
+      requester = task_data['requester']
+      pipeline.sadd(
+          ':'.join(['TurbiniaRequesterTasks', instance, requester]), task_id)
+    pipeline.zadd(
+        ':'.join(['TurbiniaInstanceTasks', instance]),
+        {task_id: self._get_timestamp(last_update)})
+
+  def _migrate_legacy_task(self, key):
+    """Converts a version 1 Task record into a Task hash and index entries.
+
+    Args:
+      key (str): The TurbiniaTask:<task id> key of the legacy record.
+
+    Returns:
+      bool: Whether a legacy record was converted.
+    """
+    if self.client.type(key) not in (b'string', 'string'):
+      return False
+    data = self.client.get(key)
+    try:
+      task_data = json.loads(six.ensure_text(data))
+      last_update = datetime.strptime(task_data['last_update'], DATETIME_FORMAT)
+      new_key = self._get_task_key(task_data['instance'], task_data['id'])
+    except (TypeError, ValueError, KeyError) as e:
+      log.warning(
+          'Skipping invalid legacy Task record {0!s}: {1!s}'.format(key, e))
+      return False
+
+    pipeline = self.client.pipeline()
+    if not self.client.exists(new_key):
+      fields = {name: json.dumps(value) for name, value in task_data.items()}
+      text_fields = {
+          name: fields.pop(name) for name in self.LARGE_FIELDS if name in fields
+      }
+      pipeline.hset(new_key, mapping=fields)
+      if text_fields:
+        pipeline.hset(self._get_text_key(new_key), mapping=text_fields)
+      self._write_task_indexes(pipeline, task_data, last_update)
+    pipeline.delete(key)
+    pipeline.execute()
+    return True
+
+  def _is_migrated(self):
+    """Checks whether the legacy Task records have been migrated.
+
+    Returns:
+      bool: Whether the stored schema version is current.
+    """
+    if not self._migrated:
+      version = self.client.get(self.SCHEMA_VERSION_KEY)
+      self._migrated = bool(version) and int(version) >= self.SCHEMA_VERSION
+    return self._migrated
+
+  def migrate(self):
+    """Converts version 1 Task records into Task hashes and index entries.
+
+    The TurbiniaTask:* keys are only scanned once, after which the schema
+    version is stored so that later calls return immediately.
+
+    Returns:
+      int: The number of converted records.
+    """
+    if self._is_migrated():
+      return 0
+    count = 0
+    for key in self.client.scan_iter('TurbiniaTask:*', count=1000):
+      if self._migrate_legacy_task(six.ensure_text(key)):
+        count += 1
+    self.client.set(self.SCHEMA_VERSION_KEY, self.SCHEMA_VERSION)
+    self._migrated = True
+    if count:
+      log.info('Converted {0:d} legacy Task records in Redis'.format(count))
+    return count
+
+  def _get_task_hash_keys(self, keys):
+    """Filters out keys that are not Task hashes.
+
+    Args:
+      keys (list(str)): The keys to filter.
+
+    Returns:
+      list(str): The keys of Task hashes.
+    """
+    hash_keys = []
+    for index in range(0, len(keys), self.READ_BATCH_SIZE):
+      batch = keys[index:index + self.READ_BATCH_SIZE]
+      pipeline = self.client.pipeline(transaction=False)
+      for key in batch:
+        pipeline.type(key)
+      for key, type_ in zip(batch, pipeline.execute()):
+        if six.ensure_text(type_) == 'hash':
+          hash_keys.append(key)
+        else:
+          log.warning(
+              'Skipping Task record {0:s} that has not been migrated, run '
+              'turbiniactl maintenance migrate to convert it'.format(key))
+    return hash_keys
+
+  def _decode_task(self, fields):
+    """Decodes a Task hash into a Task dict.
+
+    Args:
+      fields (dict): The raw fields of the Task hashes.
+
+    Returns:
+      dict: The Task dict.
+    """
+    task = {
+        six.ensure_text(name): json.loads(six.ensure_text(value))
+        for name, value in fields.items()
+    }
+    # Redis only supports strings; we convert back to datetime here.
+    if task.get('last_update'):
+      task['last_update'] = datetime.strptime(
+          task.get('last_update'), DATETIME_FORMAT)
+    if task.get('run_time'):
+      task['run_time'] = timedelta(seconds=task['run_time'])
+    return task
+
+  def _get_tasks(self, keys, fields=None):
+    """Gets Task dicts with pipelined batches of HGETALL or HMGET.
+
+    Args:
+      keys (list(str)): The keys of the Tasks to get.
+      fields (list(str)): The Task fields to get, or None for all fields.  The
+          id and last_update fields are always read, and the hash with the
+          large text fields is only read if one of them is selected.
+
+    Returns:
+      list(dict): The Task dicts.  Keys that no longer exist are skipped.
+    """
+    if fields:
+      fields = sorted(set(fields) | {'id', 'last_update'})
+      text_names = [name for name in fields if name in self.LARGE_FIELDS]
+      names = [name for name in fields if name not in self.LARGE_FIELDS]
+    tasks = []
+    for index in range(0, len(keys), self.READ_BATCH_SIZE):
+      pipeline = self.client.pipeline(transaction=False)
+      for key in keys[index:index + self.READ_BATCH_SIZE]:
+        if not fields:
+          pipeline.hgetall(key)
+          pipeline.hgetall(self._get_text_key(key))
+          continue
+        pipeline.hmget(key, names)
+        if text_names:
+          pipeline.hmget(self._get_text_key(key), text_names)
+      results = pipeline.execute()
+      step = 1 if fields and not text_names else 2
+      for position in range(0, len(results), step):
+        if not fields:
+          values = results[position]
+          if not values:
+            continue
+          values.update(results[position + 1])
+          tasks.append(self._decode_task(values))
+          continue
+        values = dict(zip(names, results[position]))
+        if text_names:
+          values.update(zip(text_names, results[position + 1]))
+        if values['id'] is None:
+          continue
+        tasks.append(
+            self._decode_task({
+                name: value
+                for name, value in values.items()
+                if value is not None
+            }))
+    return tasks
+
+  def get_task_data(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None):
     """Gets task data from Redis.
 
+    Tasks are looked up through the per instance indexes, so the cost of a
+    query depends on the number of Tasks it returns rather than on the total
+    number of Tasks stored.
+
     Args:
       instance (string): The Turbinia instance name (by default the same as the
           INSTANCE_ID in the config).
       days (int): The number of days we want history for.
       task_id (string): The Id of the task.
       request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
 
     Returns:
       List of Task dict objects.
     """
-    tasks = [
-        json.loads(self.client.get(task))
-        for task in self.client.scan_iter('TurbiniaTask:*')
-        if json.loads(self.client.get(task)).get('instance') == instance or
-        not instance
-    ]
-
-    # Convert relevant date attributes back into dates/timedeltas
-    for task in tasks:
-      if task.get('last_update'):
-        task['last_update'] = datetime.strptime(
-            task.get('last_update'), DATETIME_FORMAT)
-      if task.get('run_time'):
-        task['run_time'] = datetime.timedelta(seconds=task['run_time'])
+    if not instance:
+      # Without an instance there is no index to use, so scan all Tasks.
+      keys = self.client.scan_iter('TurbiniaTask:*', count=1000)
+      tasks = self._get_tasks(
+          self._get_task_hash_keys([six.ensure_text(key) for key in keys]))
+      if user:
+        tasks = [task for task in tasks if task.get('requester') == user]
+      if since:
+        tasks = [
+            task for task in tasks
+            if task.get('last_update') and task['last_update'] >= since
+        ]
+      return tasks
 
     # pylint: disable=no-else-return
     if days:
       start_time = datetime.now() - timedelta(days=days)
-      # Redis only supports strings; we convert to/from datetime here and below
-      return [task for task in tasks if task.get('last_update') > start_time]
+      task_ids = self.client.zrangebyscore(
+          ':'.join(['TurbiniaInstanceTasks', instance]),
+          self._get_timestamp(start_time), '+inf')
     elif task_id:
-      return [task for task in tasks if task.get('task_id') == task_id]
+      task_ids = [task_id]
     elif request_id:
-      return [task for task in tasks if task.get('request_id') == request_id]
+      task_ids = self.client.smembers(
+          ':'.join(['TurbiniaRequestTasks', instance, request_id]))
+    elif user:
+      task_ids = self.client.smembers(
+          ':'.join(['TurbiniaRequesterTasks', instance, user]))
+    else:
+      task_ids = self.client.zrange(
+          ':'.join(['TurbiniaInstanceTasks', instance]), 0, -1)
+    task_ids = [six.ensure_text(task_id_) for task_id_ in task_ids]
+
+    if since:
+      # Only read the Tasks that were updated recently according to the index.
+      updated_ids = self.client.zrangebyscore(
+          ':'.join(['TurbiniaInstanceTasks', instance]),
+          self._get_timestamp(since), '+inf')
+      updated_ids = set(six.ensure_text(task_id_) for task_id_ in updated_ids)
+      task_ids = [task_id_ for task_id_ in task_ids if task_id_ in updated_ids]
+
+    keys = [self._get_task_key(instance, task_id_) for task_id_ in task_ids]
+    tasks = self._get_tasks(keys)
+    if user:
+      tasks = [task for task in tasks if task.get('requester') == user]
     return tasks
 
+  def get_task_page(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None, limit=None, after=None, fields=None):
+    """Gets a page of Tasks through the sorted set of last update times.
+
+    The Task ids of the page are read from the TurbiniaInstanceTasks sorted
+    set, which orders them by score and then by id just like _get_sort_key(),
+    with ZRANGEBYSCORE ... LIMIT starting at the score of the after key.
+    Queries by request, requester or Task id sort the ids of the matching
+    set by their scores.  Only the Tasks of the page, and only the selected
+    fields, are read.
+    """
+    if not instance:
+      return super(RedisStateManager, self).get_task_page(
+          instance, days=days, task_id=task_id, request_id=request_id,
+          user=user, since=since, limit=limit, after=after, fields=fields)
+
+    index_key = ':'.join(['TurbiniaInstanceTasks', instance])
+    min_score = float('-inf')
+    if days:
+      min_score = self._get_timestamp(datetime.now() - timedelta(days=days))
+    if since:
+      min_score = max(min_score, self._get_timestamp(since))
+    after = tuple(after) if after else (min_score, '')
+    min_score = max(min_score, after[0])
+
+    if days or not (task_id or request_id or user):
+      members = None
+    elif task_id:
+      members = [task_id]
+    elif request_id:
+      members = self.client.smembers(
+          ':'.join(['TurbiniaRequestTasks', instance, request_id]))
+    else:
+      members = self.client.smembers(
+          ':'.join(['TurbiniaRequesterTasks', instance, user]))
+    user_ids = None
+    if user and (members is None or task_id or request_id):
+      # The ids were not read from the set of the requester.
+      user_ids = self.client.smembers(
+          ':'.join(['TurbiniaRequesterTasks', instance, user]))
+      user_ids = set(six.ensure_text(task_id_) for task_id_ in user_ids)
+
+    if members is not None:
+      members = [six.ensure_text(task_id_) for task_id_ in members]
+      pipeline = self.client.pipeline(transaction=False)
+      for task_id_ in members:
+        pipeline.zscore(index_key, task_id_)
+      scores = pipeline.execute()
+      entries = [(score, task_id_)
+                 for task_id_, score in zip(members, scores)
+                 if score is not None and score >= min_score]
+      entries.sort()
+      task_ids = [
+          task_id_ for score, task_id_ in entries
+          if (score, task_id_) > after and
+          (user_ids is None or task_id_ in user_ids)
+      ][:limit]
+    else:
+      task_ids = []
+      offset = 0
+      batch_size = min(limit or self.READ_BATCH_SIZE, self.READ_BATCH_SIZE)
+      while limit is None or len(task_ids) < limit:
+        entries = self.client.zrangebyscore(
+            index_key, min_score, '+inf', start=offset, num=batch_size,
+            withscores=True)
+        offset += len(entries)
+        for task_id_, score in entries:
+          task_id_ = six.ensure_text(task_id_)
+          if (score, task_id_) > after and (user_ids is None or
+                                            task_id_ in user_ids):
+            task_ids.append(task_id_)
+        if len(entries) < batch_size:
+          break
+      task_ids = task_ids[:limit]
+
+    keys = [self._get_task_key(instance, task_id_) for task_id_ in task_ids]
+    return self._get_tasks(keys, fields)
+
+  def flush(self):
+    """Merges the pending statistics rollups into the stored rollups.
+
+    The rollups of a day are stored in a TurbiniaStatsRollups:<instance>:<day>
+    hash with a JSON encoded rollup per rollup name, which is updated in a
+    WATCH/MULTI transaction.
+    """
+    days = {}
+    for key, rollup in self._take_pending_rollups().items():
+      days.setdefault(key[:2], {})[key] = rollup
+    for (instance, day), rollups in sorted(days.items()):
+      hash_key = ':'.join(['TurbiniaStatsRollups', instance, day])
+      names = [name for _, _, name in rollups]
+      try:
+        with self.client.pipeline() as pipeline:
+          while True:
+            try:
+              pipeline.watch(hash_key)
+              stored = pipeline.hmget(hash_key, names)
+              fields = {
+                  name: stats_rollup.merge_encoded_rollup(data, rollup)
+                  for name, data, rollup in zip(
+                      names, stored, rollups.values())
+              }
+              pipeline.multi()
+              pipeline.hset(hash_key, mapping=fields)
+              pipeline.sadd(
+                  ':'.join(['TurbiniaStatsRollupDays', instance]), day)
+              pipeline.execute()
+              break
+            except redis.WatchError:
+              continue
+      except redis.RedisError as e:
+        log.error(
+            'Failed to write statistics rollups to Redis: {0!s}'.format(e))
+        self._restore_pending_rollups(rollups)
+
+  def get_task_rollups(self, instance, days=0):
+    start_day = stats_rollup.get_start_day(days)
+    stored_days = sorted(
+        six.ensure_text(day) for day in self.client.smembers(
+            ':'.join(['TurbiniaStatsRollupDays', instance])))
+    pipeline = self.client.pipeline(transaction=False)
+    for day in stored_days:
+      if not start_day or day >= start_day:
+        pipeline.hgetall(':'.join(['TurbiniaStatsRollups', instance, day]))
+    rows = []
+    for fields in pipeline.execute():
+      rows.extend(fields.items())
+    return stats_rollup.decode_rollups(rows)
+
+  def get_task_event_subscriber(self, instance, request_id=None):
+    return task_events.RedisTaskEventSubscriber(
+        self.client, instance, request_id)
+
+  def _write_task(self, task, new=False):
+    """Writes the changed fields of a Task and its index entries.
+
+    The existence check and the write are done atomically in a Lua script, so
+    concurrent writers can not recreate a Task or clobber each other's fields.
+
+    Args:
+      task (TurbiniaTask): The Task to write.
+      new (bool): Whether this is a new Task.  New Tasks are only written if
+          they do not exist yet, and other Tasks only if they already exist.
+
+    Returns:
+      bool: Whether the Task was written.
+    """
+    task_data = self.get_task_dict(task)
+    last_update = task_data['last_update']
+    task_data['last_update'] = last_update.strftime(DATETIME_FORMAT)
+    key = self._get_task_key(task_data['instance'], task_data['id'])
+    task.state_key = key
+    if (not new and key not in self._written_fields and
+        not self._is_migrated()):
+      # The Task may have been written by an older version before the
+      # migration ran, so convert its record before updating it.
+      self._migrate_legacy_task(':'.join(['TurbiniaTask', task_data['id']]))
+
+    # Need to use json.dumps, else redis returns single quoted strings which
+    # are invalid json.
+    fields = {name: json.dumps(value) for name, value in task_data.items()}
+    written = {} if new else self._written_fields.get(key, {})
+    changed = {
+        name: value
+        for name, value in fields.items()
+        if written.get(name) != value
+    }
+    args = [0 if new else 1, 0]
+    text_args = []
+    for name, value in sorted(changed.items()):
+      if name in self.LARGE_FIELDS:
+        text_args.extend([name, value])
+      else:
+        args.extend([name, value])
+    args[1] = len(args) - 2
+
+    pipeline = self.client.pipeline()
+    self._write_script(
+        keys=[key, self._get_text_key(key)], args=args + text_args,
+        client=pipeline)
+    if new:
+      self._write_task_indexes(pipeline, task_data, last_update)
+    elif 'last_update' in changed:
+      pipeline.zadd(
+          ':'.join(['TurbiniaInstanceTasks', task_data['instance']]),
+          {task_data['id']: self._get_timestamp(last_update)})
+    if not pipeline.execute()[0]:
+      return False
+    self._record_task_stats(task_data, last_update)
+
+    if any(field in changed for field in task_events.STATE_FIELDS):
+      self.client.publish(
+          task_events.get_redis_channel(
+              task_data['instance'], task_data['request_id']),
+          json.dumps(task_events.get_task_event(task_data)))
+    if task_data.get('successful') is not None:
+      # Completed Tasks are rarely updated again, so stop tracking them.
+      self._written_fields.pop(key, None)
+    else:
+      self._written_fields[key] = fields
+    return True
+
   def update_task(self, task):
     task.touch()
-    key = task.state_key
-    if not self.client.get(key):
-      self.write_new_task(task)
-      return
     log.info('Updating task {0:s} in Redis'.format(task.name))
-    task_data = self.get_task_dict(task)
-    task_data['last_update'] = task_data['last_update'].strftime(
-        DATETIME_FORMAT)
-    if task_data['run_time']:
-      task_data['run_time'] = task_data['run_time'].total_seconds()
-    # Need to use json.dumps, else redis returns single quoted string which
-    # is invalid json
-    if not self.client.set(key, json.dumps(task_data)):
-      log.error(
-          'Unsuccessful in updating task {0:s} in Redis'.format(task.name))
+    if not self._write_task(task):
+      self.write_new_task(task)
 
   def write_new_task(self, task):
-    key = ':'.join(['TurbiniaTask', task.id])
     log.info('Writing new task {0:s} into Redis'.format(task.name))
-    task_data = self.get_task_dict(task)
-    task_data['last_update'] = task_data['last_update'].strftime(
-        DATETIME_FORMAT)
-    if task_data['run_time']:
-      task_data['run_time'] = task_data['run_time'].total_seconds()
-    # nx=True prevents overwriting (i.e. no unintentional task clobbering)
-    if not self.client.set(key, json.dumps(task_data), nx=True):
+    if not self._write_task(task, new=True):
       log.error(
           'Unsuccessful in writing new task {0:s} into Redis'.format(task.name))
-    task.state_key = key
-    return key
+    return task.state_key
+
+  def write_evidence(self, evidence_):
+    key = ':'.join(['TurbiniaEvidence', evidence_.id])
+    log.debug('Writing evidence {0:s} into Redis'.format(evidence_.id))
+    try:
+      evidence_data = evidence_.to_json()
+    except TurbiniaException as e:
+      log.error(
+          'Failed to write evidence {0:s} into Redis: {1!s}'.format(
+              evidence_.id, e))
+      return
+    pipeline = self.client.pipeline()
+    pipeline.set(key, evidence_data)
+    if evidence_.request_id:
+      pipeline.sadd(
+          ':'.join(['TurbiniaRequestEvidence', evidence_.request_id]),
+          evidence_.id)
+    pipeline.execute()
+
+  def get_evidence(self, evidence_id):
+    evidence_data = self.client.get(':'.join(['TurbiniaEvidence', evidence_id]))
+    if not evidence_data:
+      return None
+    return json.loads(evidence_data)
+
+  def get_request_evidence_ids(self, request_id):
+    evidence_ids = self.client.smembers(
+        ':'.join(['TurbiniaRequestEvidence', request_id]))
+    return sorted(six.ensure_text(evidence_id) for evidence_id in evidence_ids)
+
+  def write_evidence_edge(self, parent_id, child_id, task_id, request_id):
+    log.debug(
+        'Writing evidence edge {0:s} -> {1:s} into Redis'.format(
+            parent_id, child_id))
+    pipeline = self.client.pipeline()
+    pipeline.hset(
+        ':'.join(['TurbiniaEvidenceChildren', parent_id]), child_id, task_id)
+    pipeline.hset(
+        ':'.join(['TurbiniaEvidenceParents', child_id]), parent_id, task_id)
+    pipeline.execute()
+
+  def _get_evidence_edges(self, key):
+    """Gets an evidence adjacency index from Redis.
+
+    Args:
+      key (str): The key of the adjacency index.
+
+    Returns:
+      dict: Task ids keyed by Evidence id.
+    """
+    return {
+        six.ensure_text(evidence_id): six.ensure_text(task_id)
+        for evidence_id, task_id in self.client.hgetall(key).items()
+    }
+
+  def get_evidence_children(self, evidence_id):
+    return self._get_evidence_edges(
+        ':'.join(['TurbiniaEvidenceChildren', evidence_id]))
+
+  def get_evidence_parents(self, evidence_id):
+    return self._get_evidence_edges(
+        ':'.join(['TurbiniaEvidenceParents', evidence_id]))
+
+  def get_expired_requests(self, days):
+    return self._get_expired_requests(
+        self.get_task_data(config.INSTANCE_ID), days)
+
+  def get_task_ids_updated_before(self, instance, last_update):
+    task_ids = self.client.zrangebyscore(
+        ':'.join(['TurbiniaInstanceTasks', instance]), '-inf', '({0!r}'.format(
+            self._get_timestamp(last_update)))
+    return [six.ensure_text(task_id) for task_id in task_ids]
+
+  def get_request_task_ids(self, instance, request_id):
+    task_ids = self.client.smembers(
+        ':'.join(['TurbiniaRequestTasks', instance, request_id]))
+    return sorted(six.ensure_text(task_id) for task_id in task_ids)
+
+  def get_tasks(self, instance, task_ids):
+    return self._get_tasks(
+        [self._get_task_key(instance, task_id) for task_id in task_ids])
+
+  def delete_tasks(self, tasks):
+    pipeline = self.client.pipeline()
+    for task in tasks:
+      instance = task['instance']
+      key = self._get_task_key(instance, task['id'])
+      pipeline.delete(key, self._get_text_key(key))
+      if task.get('request_id'):
+        pipeline.srem(
+            ':'.join(['TurbiniaRequestTasks', instance, task['request_id']]),
+            task['id'])
+      if task.get('requester'):
+        pipeline.srem(
+            ':'.join(['TurbiniaRequesterTasks', instance, task['requester']]),
+            task['id'])
+      pipeline.zrem(':'.join(['TurbiniaInstanceTasks', instance]), task['id'])
+      self._written_fields.pop(key, None)
+    pipeline.execute()
+
+
+class SQLiteStateManager(BaseStateManager):
+  """Use an embedded SQLite database for task state storage.
+
+  This is meant for single node installations that do not want to run a
+  separate database server.  The database uses write-ahead logging so that
+  clients can read while the server writes.  Writes are buffered like in the
+  DatastoreStateManager and written in a single transaction per flush().
+
+  Attributes:
+    db_path (str): The path of the SQLite database file.
+  """
+
+  # Maximum number of buffered writes before they are flushed.
+  MAX_BATCH_SIZE = 500
+
+  SCHEMA = [
+      'CREATE TABLE IF NOT EXISTS tasks ('
+      'id TEXT PRIMARY KEY, instance TEXT NOT NULL, request_id TEXT, '
+      'requester TEXT, last_update REAL, data TEXT NOT NULL)',
+      'CREATE INDEX IF NOT EXISTS tasks_last_update '
+      'ON tasks (instance, last_update)',
+      'CREATE INDEX IF NOT EXISTS tasks_request_id '
+      'ON tasks (instance, request_id)',
+      'CREATE INDEX IF NOT EXISTS tasks_requester '
+      'ON tasks (instance, requester)',
+      'CREATE TABLE IF NOT EXISTS evidence ('
+      'id TEXT PRIMARY KEY, instance TEXT NOT NULL, request_id TEXT, '
+      'data TEXT NOT NULL)',
+      'CREATE INDEX IF NOT EXISTS evidence_request_id '
+      'ON evidence (instance, request_id)',
+      'CREATE TABLE IF NOT EXISTS evidence_edges ('
+      'instance TEXT NOT NULL, parent_id TEXT NOT NULL, '
+      'child_id TEXT NOT NULL, task_id TEXT, request_id TEXT, '
+      'PRIMARY KEY (instance, parent_id, child_id))',
+      'CREATE INDEX IF NOT EXISTS evidence_edges_child_id '
+      'ON evidence_edges (instance, child_id)',
+      'CREATE TABLE IF NOT EXISTS stats_rollups ('
+      'instance TEXT NOT NULL, day TEXT NOT NULL, name TEXT NOT NULL, '
+      'data TEXT NOT NULL, PRIMARY KEY (instance, day, name))',
+  ]
+
+  INSERT_TASK = (
+      'INSERT OR REPLACE INTO tasks '
+      '(id, instance, request_id, requester, last_update, data) '
+      'VALUES (?, ?, ?, ?, ?, ?)')
+  INSERT_EVIDENCE = (
+      'INSERT OR REPLACE INTO evidence (id, instance, request_id, data) '
+      'VALUES (?, ?, ?, ?)')
+  INSERT_EVIDENCE_EDGE = (
+      'INSERT OR REPLACE INTO evidence_edges '
+      '(instance, parent_id, child_id, task_id, request_id) '
+      'VALUES (?, ?, ?, ?, ?)')
+
+  def __init__(self, db_path=None):
+    """Initialization for SQLiteStateManager.
+
+    Args:
+      db_path (str): The path of the database file, by default the configured
+          SQLITE_DB_PATH.
+
+    Raises:
+      TurbiniaException: If the database can not be opened.
+    """
+    super(SQLiteStateManager, self).__init__()
+    config.LoadConfig()
+    self.db_path = db_path or config.SQLITE_DB_PATH
+    if not self.db_path:
+      raise TurbiniaException(
+          'SQLITE_DB_PATH needs to be set to use the SQLite state manager.')
+    db_dir = os.path.dirname(os.path.abspath(self.db_path))
+    try:
+      if not os.path.isdir(db_dir):
+        os.makedirs(db_dir)
+      self._connection = sqlite3.connect(
+          self.db_path, timeout=30, check_same_thread=False)
+      self._connection.execute('PRAGMA journal_mode=WAL')
+      self._connection.execute('PRAGMA synchronous=NORMAL')
+      with self._connection:
+        for statement in self.SCHEMA:
+          self._connection.execute(statement)
+    except (OSError, sqlite3.Error) as e:
+      raise TurbiniaException(
+          'Could not open SQLite database {0:s}: {1!s}'.format(self.db_path, e))
+    self._lock = threading.Lock()
+    # Buffered writes keyed by (statement, primary key) so that repeated
+    # writes of the same row are coalesced.
+    self._pending = OrderedDict()
+
+  def _validate_data(self, data):
+    return data
+
+  def _put(self, statement, key, values):
+    """Buffers a row to be written, replacing any pending write of it.
+
+    Args:
+      statement (str): The INSERT OR REPLACE statement to write the row with.
+      key (tuple): The primary key of the row.
+      values (tuple): The values of the row.
+    """
+    with self._lock:
+      self._pending.pop((statement, key), None)
+      self._pending[(statement, key)] = values
+      full = len(self._pending) >= self.MAX_BATCH_SIZE
+    if full:
+      self.flush()
+
+  def _write_rollups(self, rollups):
+    """Merges statistics rollups into the stored rollups.
+
+    Must be called with the lock held and within a transaction.
+
+    Args:
+      rollups (dict): The StatsRollup objects keyed by (instance, day, name).
+    """
+    for (instance, day, name), rollup in sorted(rollups.items()):
+      row = self._connection.execute(
+          'SELECT data FROM stats_rollups '
+          'WHERE instance = ? AND day = ? AND name = ?',
+          [instance, day, name]).fetchone()
+      data = stats_rollup.merge_encoded_rollup(row[0] if row else None, rollup)
+      self._connection.execute(
+          'INSERT OR REPLACE INTO stats_rollups (instance, day, name, data) '
+          'VALUES (?, ?, ?, ?)', [instance, day, name, data])
+
+  def flush(self):
+    rollups = self._take_pending_rollups()
+    with self._lock:
+      if not self._pending and not rollups:
+        return
+      writes = OrderedDict()
+      for (statement, _), values in self._pending.items():
+        writes.setdefault(statement, []).append(values)
+      try:
+        with self._connection:
+          for statement, rows in writes.items():
+            self._connection.executemany(statement, rows)
+          self._write_rollups(rollups)
+      except sqlite3.Error as e:
+        log.error(
+            'Failed to write {0:d} rows to SQLite: {1!s}'.format(
+                len(self._pending), e))
+        self._restore_pending_rollups(rollups)
+        return
+      log.debug('Wrote {0:d} rows to SQLite'.format(len(self._pending)))
+      self._pending.clear()
+
+  def _query(self, statement, parameters):
+    """Runs a query after writing any buffered writes.
+
+    Args:
+      statement (str): The SQL query.
+      parameters (list): The query parameters.
+
+    Returns:
+      list(tuple): The result rows.
+    """
+    self.flush()
+    with self._lock:
+      return self._connection.execute(statement, parameters).fetchall()
+
+  def get_task_data(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None):
+    """Gets task data from SQLite.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
+
+    Returns:
+      List of Task dict objects.
+    """
+    conditions, parameters = self._get_task_conditions(
+        instance, days, task_id, request_id, user, since)
+    statement = 'SELECT data FROM tasks'
+    if conditions:
+      statement += ' WHERE ' + ' AND '.join(conditions)
+    return [
+        self._decode_task(data)
+        for (data,) in self._query(statement, parameters)
+    ]
+
+  def get_task_page(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      since=None, limit=None, after=None, fields=None):
+    """Gets a page of Tasks with a keyset query.
+
+    The page is selected with an ORDER BY last_update, id query that starts
+    after the given key, so only the rows of the page are read and decoded.
+    """
+    conditions, parameters = self._get_task_conditions(
+        instance, days, task_id, request_id, user, since)
+    if after:
+      timestamp, after_id = after
+      conditions.append('(last_update > ? OR (last_update = ? AND id > ?))')
+      parameters.extend([timestamp, timestamp, after_id])
+    statement = 'SELECT data FROM tasks'
+    if conditions:
+      statement += ' WHERE ' + ' AND '.join(conditions)
+    statement += ' ORDER BY last_update, id'
+    if limit is not None:
+      statement += ' LIMIT ?'
+      parameters.append(limit)
+    return [
+        self._select_fields(self._decode_task(data), fields)
+        for (data,) in self._query(statement, parameters)
+    ]
+
+  def _get_task_conditions(
+      self, instance, days, task_id, request_id, user, since):
+    """Gets the SQL conditions of a Task query.
+
+    Args:
+      instance (string): The Turbinia instance name.
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      since (datetime): Only get Tasks last updated at or after this time.
+
+    Returns:
+      tuple(list(str), list): The conditions and their parameters.
+    """
+    conditions = []
+    parameters = []
+    if instance:
+      conditions.append('instance = ?')
+      parameters.append(instance)
+    if days:
+      start_time = datetime.now() - timedelta(days=days)
+      conditions.append('last_update >= ?')
+      parameters.append(self._get_timestamp(start_time))
+    elif task_id:
+      conditions.append('id = ?')
+      parameters.append(task_id)
+    elif request_id:
+      conditions.append('request_id = ?')
+      parameters.append(request_id)
+    if user:
+      conditions.append('requester = ?')
+      parameters.append(user)
+    if since:
+      conditions.append('last_update >= ?')
+      parameters.append(self._get_timestamp(since))
+    return conditions, parameters
+
+  @staticmethod
+  def _decode_task(data):
+    """Decodes a stored Task row into a Task dict.
+
+    Args:
+      data (str): The JSON encoded Task.
+
+    Returns:
+      dict: The Task dict.
+    """
+    task = json.loads(data)
+    if task.get('last_update'):
+      task['last_update'] = datetime.strptime(
+          task.get('last_update'), DATETIME_FORMAT)
+    if task.get('run_time'):
+      task['run_time'] = timedelta(seconds=task['run_time'])
+    return task
+
+  def _put_task(self, task):
+    """Buffers a write of a Task row.
+
+    Args:
+      task: A TurbiniaTask object
+
+    Returns:
+      Key for written object
+    """
+    task_data = self.get_task_dict(task)
+    last_update = task_data['last_update']
+    task_data['last_update'] = last_update.strftime(DATETIME_FORMAT)
+    row = (
+        task.id, task_data['instance'], task_data['request_id'],
+        task_data['requester'], self._get_timestamp(last_update),
+        json.dumps(task_data))
+    self._put(self.INSERT_TASK, (task.id,), row)
+    self._record_task_stats(task_data, last_update)
+    task.state_key = task.id
+    return task.id
+
+  def get_task_rollups(self, instance, days=0):
+    statement = 'SELECT name, data FROM stats_rollups WHERE instance = ?'
+    parameters = [instance]
+    start_day = stats_rollup.get_start_day(days)
+    if start_day:
+      statement += ' AND day >= ?'
+      parameters.append(start_day)
+    return stats_rollup.decode_rollups(self._query(statement, parameters))
+
+  def update_task(self, task):
+    task.touch()
+    log.debug('Updating Task {0:s} in SQLite'.format(task.name))
+    self._put_task(task)
+
+  def write_new_task(self, task):
+    log.info('Writing new task {0:s} into SQLite'.format(task.name))
+    return self._put_task(task)
+
+  def write_evidence(self, evidence_):
+    log.debug('Writing evidence {0:s} into SQLite'.format(evidence_.id))
+    try:
+      evidence_data = evidence_.to_json()
+    except TurbiniaException as e:
+      log.error(
+          'Failed to write evidence {0:s} into SQLite: {1!s}'.format(
+              evidence_.id, e))
+      return
+    self._put(
+        self.INSERT_EVIDENCE, (evidence_.id,),
+        (evidence_.id, config.INSTANCE_ID, evidence_.request_id, evidence_data))
+
+  def get_evidence(self, evidence_id):
+    rows = self._query('SELECT data FROM evidence WHERE id = ?', [evidence_id])
+    if not rows:
+      return None
+    return json.loads(rows[0][0])
+
+  def get_request_evidence_ids(self, request_id):
+    rows = self._query(
+        'SELECT id FROM evidence WHERE instance = ? AND request_id = ? '
+        'ORDER BY id', [config.INSTANCE_ID, request_id])
+    return [evidence_id for (evidence_id,) in rows]
+
+  def write_evidence_edge(self, parent_id, child_id, task_id, request_id):
+    log.debug(
+        'Writing evidence edge {0:s} -> {1:s} into SQLite'.format(
+            parent_id, child_id))
+    self._put(
+        self.INSERT_EVIDENCE_EDGE, (parent_id, child_id),
+        (config.INSTANCE_ID, parent_id, child_id, task_id, request_id))
+
+  def get_evidence_children(self, evidence_id):
+    rows = self._query(
+        'SELECT child_id, task_id FROM evidence_edges '
+        'WHERE instance = ? AND parent_id = ?',
+        [config.INSTANCE_ID, evidence_id])
+    return dict(rows)
+
+  def get_evidence_parents(self, evidence_id):
+    rows = self._query(
+        'SELECT parent_id, task_id FROM evidence_edges '
+        'WHERE instance = ? AND child_id = ?',
+        [config.INSTANCE_ID, evidence_id])
+    return dict(rows)
+
+  def get_expired_requests(self, days):
+    return self._get_expired_requests(
+        self.get_task_data(config.INSTANCE_ID), days)
+
+  def get_task_ids_updated_before(self, instance, last_update):
+    rows = self._query(
+        'SELECT id FROM tasks WHERE instance = ? AND last_update < ?',
+        [instance, self._get_timestamp(last_update)])
+    return [task_id for (task_id,) in rows]
+
+  def get_request_task_ids(self, instance, request_id):
+    rows = self._query(
+        'SELECT id FROM tasks WHERE instance = ? AND request_id = ? '
+        'ORDER BY id', [instance, request_id])
+    return [task_id for (task_id,) in rows]
+
+  def get_tasks(self, instance, task_ids):
+    tasks = []
+    for index in range(0, len(task_ids), self.MAX_BATCH_SIZE):
+      batch = task_ids[index:index + self.MAX_BATCH_SIZE]
+      statement = 'SELECT data FROM tasks WHERE instance = ? AND id IN ({0:s})'
+      rows = self._query(
+          statement.format(', '.join(['?'] * len(batch))), [instance] + batch)
+      tasks.extend(self._decode_task(data) for (data,) in rows)
+    return tasks
+
+  def delete_tasks(self, tasks):
+    self.flush()
+    with self._lock:
+      with self._connection:
+        self._connection.executemany(
+            'DELETE FROM tasks WHERE id = ?', [(task['id'],) for task in tasks])
@@ -17,7 +17,13 @@
 from __future__ import unicode_literals
 
 import copy
+import json
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
 import os
+import shutil
+import sqlite3
 import tempfile
 import unittest
 import mock
@@ -44,6 +50,8 @@ class TestPSQStateManager(unittest.TestCase):
 
     config.LoadConfig()
     self.state_manager_save = config.STATE_MANAGER
+    self.events_topic_save = config.PUBSUB_TASK_EVENTS_TOPIC
+    config.PUBSUB_TASK_EVENTS_TOPIC = None
 
     self.test_data = {
         'name': 'TestTask',
@@ -70,6 +78,7 @@ class TestPSQStateManager(unittest.TestCase):
 
   def tearDown(self):
     config.STATE_MANAGER = self.state_manager_save
+    config.PUBSUB_TASK_EVENTS_TOPIC = self.events_topic_save
     [os.remove(f) for f in self.remove_files if os.path.exists(f)]
     [os.rmdir(d) for d in self.remove_dirs if os.path.exists(d)]
     os.rmdir(self.base_output_dir)
@@ -109,3 +118,592 @@ class TestPSQStateManager(unittest.TestCase):
     self.assertNotEqual(test_data['status'], self.test_data['status'])
     self.assertLessEqual(
         len(test_data['status']), state_manager.MAX_DATASTORE_STRLEN)
+
+  @mock.patch('turbinia.state_manager.datastore.Client')
+  def testStateManagerGetTaskPage(self, mock_client):
+    """Test that a page of Tasks is read with an ordered query."""
+    self.state_manager = self._get_state_manager()
+    last_update = datetime(2020, 1, 1)
+    query = mock_client.return_value.query.return_value
+    query.fetch.return_value = iter([{
+        'id': task_id,
+        'last_update': last_update,
+        'report_data': 'Report'
+    } for task_id in ('task1', 'task2', 'task3', 'task4')])
+
+    # pylint: disable=protected-access
+    after = (self.state_manager._get_timestamp(last_update), 'task1')
+    tasks = self.state_manager.get_task_page(
+        'inst', limit=2, after=after, fields=['status'])
+    self.assertEqual(query.order, ['last_update'])
+    query.add_filter.assert_any_call('last_update', '>=', last_update)
+    self.assertEqual(
+        tasks, [{
+            'id': 'task2',
+            'last_update': last_update
+        }, {
+            'id': 'task3',
+            'last_update': last_update
+        }])
+
+  @mock.patch('turbinia.state_manager.datastore.Client')
+  def testStateManagerGetTasks(self, mock_client):
+    """Test that Tasks read by id are decoded like the other backends."""
+    self.state_manager = self._get_state_manager()
+    last_update = datetime(2020, 1, 1)
+    mock_client.return_value.get_multi.return_value = [{
+        'id': 'task1',
+        'last_update': last_update.replace(tzinfo=timezone.utc),
+        'run_time': 1.5
+    }, None]
+
+    tasks = self.state_manager.get_tasks('inst', ['task1', 'task2'])
+    self.assertEqual(
+        tasks, [{
+            'id': 'task1',
+            'last_update': last_update,
+            'run_time': timedelta(seconds=1.5)
+        }])
+
+  @mock.patch('turbinia.state_manager.datastore.Client')
+  def testStateManagerBufferedWrites(self, mock_client):
+    """Test that Datastore writes are coalesced and written in batches."""
+    mock_client.return_value.key.side_effect = lambda kind, name: (kind, name)
+    self.state_manager = self._get_state_manager()
+    self.state_manager.MAX_BATCH_SIZE = 2
+    put_multi = self.state_manager.client.put_multi
+
+    self.state_manager.write_new_task(self.task)
+    self.state_manager.update_task(self.task)
+    put_multi.assert_not_called()
+    self.assertEqual(self.task.state_key, ('TurbiniaTask', self.task.id))
+
+    self.state_manager.write_evidence_edge('parent', 'child', 'task', 'req')
+    self.assertEqual(put_multi.call_count, 1)
+    self.assertEqual(len(put_multi.call_args[0][0]), 2)
+
+    self.state_manager.update_task(self.task)
+    self.state_manager.flush()
+    self.assertEqual(put_multi.call_count, 2)
+    self.state_manager.flush()
+    self.assertEqual(put_multi.call_count, 2)
+
+  @mock.patch('turbinia.state_manager.task_events.PubSubTaskEventPublisher')
+  @mock.patch('turbinia.state_manager.datastore.Client')
+  def testStateManagerPublishTaskEvents(self, _, mock_publisher):
+    """Test that Task state changes are relayed to Pub/Sub."""
+    config.PUBSUB_TASK_EVENTS_TOPIC = 'events'
+    self.state_manager = self._get_state_manager()
+    publish = mock_publisher.return_value.publish
+
+    self.state_manager.write_new_task(self.task)
+    self.state_manager.update_task(self.task)
+    self.assertEqual(publish.call_count, 1)
+    self.result.successful = True
+    self.state_manager.update_task(self.task)
+    self.assertEqual(publish.call_count, 2)
+    self.assertTrue(publish.call_args[0][0]['successful'])
+    mock_publisher.assert_called_once_with('events')
+
+  @mock.patch('turbinia.state_manager.time.sleep')
+  @mock.patch('turbinia.state_manager.datastore.Client')
+  def testStateManagerFlushRetries(self, mock_client, mock_sleep):
+    """Test that failed Datastore writes are retried and kept."""
+    mock_client.return_value.key.side_effect = lambda kind, name: (kind, name)
+    self.state_manager = self._get_state_manager()
+    put_multi = self.state_manager.client.put_multi
+    put_multi.side_effect = [
+        state_manager.exceptions.ServiceUnavailable('Unavailable'), None
+    ]
+    self.state_manager.update_task(self.task)
+    self.state_manager.flush()
+    self.assertEqual(put_multi.call_count, 2)
+    mock_sleep.assert_called_once()
+
+    # Writes that still fail are written again on the next flush.
+    self.state_manager.WRITE_RETRIES = 0
+    put_multi.side_effect = [
+        state_manager.exceptions.ServiceUnavailable('Unavailable'), None
+    ]
+    self.state_manager.update_task(self.task)
+    self.state_manager.flush()
+    self.state_manager.flush()
+    self.assertEqual(put_multi.call_count, 4)
+    self.assertEqual(len(put_multi.call_args[0][0]), 1)
+
+
+class TestRedisStateManager(unittest.TestCase):
+  """Test RedisStateManager class."""
+
+  @mock.patch('turbinia.state_manager.redis', create=True)
+  def setUp(self, _):
+    self.state_manager = state_manager.RedisStateManager()
+    self.state_manager.client = mock.MagicMock()
+
+  def testWriteEvidence(self):
+    """Test writing evidence and the request evidence index."""
+    evidence_ = mock.MagicMock()
+    evidence_.id = 'testEvidenceId'
+    evidence_.request_id = 'testRequestId'
+    evidence_.to_json.return_value = '{}'
+    pipeline = self.state_manager.client.pipeline.return_value
+
+    self.state_manager.write_evidence(evidence_)
+    pipeline.set.assert_called_with('TurbiniaEvidence:testEvidenceId', '{}')
+    pipeline.sadd.assert_called_with(
+        'TurbiniaRequestEvidence:testRequestId', 'testEvidenceId')
+    pipeline.execute.assert_called_once()
+
+  def testGetRequestEvidenceIds(self):
+    """Test getting the evidence ids of a request."""
+    self.state_manager.client.smembers.return_value = {b'b', b'a'}
+    self.assertEqual(
+        self.state_manager.get_request_evidence_ids('testRequestId'),
+        ['a', 'b'])
+    self.state_manager.client.get.return_value = None
+    self.assertIsNone(self.state_manager.get_evidence('a'))
+
+  def testEvidenceLineage(self):
+    """Test writing and traversing the evidence lineage graph."""
+    pipeline = self.state_manager.client.pipeline.return_value
+    self.state_manager.write_evidence_edge('disk', 'plaso', 'task1', 'req')
+    pipeline.hset.assert_any_call(
+        'TurbiniaEvidenceChildren:disk', 'plaso', 'task1')
+    pipeline.hset.assert_any_call(
+        'TurbiniaEvidenceParents:plaso', 'disk', 'task1')
+
+    children = {
+        'TurbiniaEvidenceChildren:disk': {
+            b'plaso': b'task1',
+            b'strings': b'task2'
+        },
+        'TurbiniaEvidenceChildren:plaso': {
+            b'report': b'task3'
+        }
+    }
+    self.state_manager.client.hgetall.side_effect = (
+        lambda key: children.get(key, {}))
+    self.assertEqual(
+        self.state_manager.get_evidence_descendants('disk'),
+        [('plaso', 'task1', 'disk'), ('strings', 'task2', 'disk'),
+         ('report', 'task3', 'plaso')])
+
+  def testGetExpiredRequests(self):
+    """Test finding requests that completed before the retention time."""
+    old = (datetime.now() - timedelta(days=10)).strftime(
+        state_manager.DATETIME_FORMAT)
+    new = datetime.now().strftime(state_manager.DATETIME_FORMAT)
+    self.state_manager.get_task_data = mock.MagicMock()
+    self.state_manager.get_task_data.return_value = [
+        {
+            'request_id': 'expired',
+            'last_update': old,
+            'successful': True
+        },
+        {
+            'request_id': 'expired',
+            'last_update': old,
+            'successful': False
+        },
+        {
+            'request_id': 'recent',
+            'last_update': old,
+            'successful': True
+        },
+        {
+            'request_id': 'recent',
+            'last_update': new,
+            'successful': True
+        },
+        {
+            'request_id': 'running',
+            'last_update': old,
+            'successful': None
+        },
+    ]
+    self.assertEqual(self.state_manager.get_expired_requests(7), ['expired'])
+
+  def testWriteNewTask(self):
+    """Test writing a new task and its index entries."""
+    task = TurbiniaTask(request_id='testRequestId', requester='testUser')
+    task.result = TurbiniaTaskResult()
+    task.result.report_data = 'Long report'
+    pipeline = self.state_manager.client.pipeline.return_value
+    pipeline.execute.return_value = [1]
+    instance = config.INSTANCE_ID
+
+    key = self.state_manager.write_new_task(task)
+    self.assertEqual(key, 'TurbiniaTask:{0:s}:{1:s}'.format(instance, task.id))
+    self.assertEqual(task.state_key, key)
+    # pylint: disable=protected-access
+    script_kwargs = self.state_manager._write_script.call_args[1]
+    self.assertEqual(
+        script_kwargs['keys'],
+        [key, 'TurbiniaTaskText:{0:s}:{1:s}'.format(instance, task.id)])
+    args = script_kwargs['args']
+    self.assertEqual(args[0], 0)
+    hot_args = args[2:2 + args[1]]
+    text_args = args[2 + args[1]:]
+    self.assertIn('request_id', hot_args)
+    self.assertNotIn('report_data', hot_args)
+    self.assertEqual(
+        text_args[text_args.index('report_data') + 1],
+        json.dumps('Long report'))
+    pipeline.sadd.assert_any_call(
+        'TurbiniaRequestTasks:{0:s}:testRequestId'.format(instance), task.id)
+    pipeline.sadd.assert_any_call(
+        'TurbiniaRequesterTasks:{0:s}:testUser'.format(instance), task.id)
+    pipeline.zadd.assert_called_once()
+
+  def testUpdateTaskChangedFields(self):
+    """Test that updates only write the fields that changed."""
+    task = TurbiniaTask(request_id='testRequestId')
+    task.result = TurbiniaTaskResult()
+    pipeline = self.state_manager.client.pipeline.return_value
+    pipeline.execute.return_value = [1]
+    self.state_manager.write_new_task(task)
+
+    task.result.status = 'Running'
+    self.state_manager.update_task(task)
+    # pylint: disable=protected-access
+    args = self.state_manager._write_script.call_args[1]['args']
+    self.assertEqual(args[0], 1)
+    changed = args[2::2]
+    self.assertEqual(sorted(changed), ['last_update', 'status'])
+    # The status change is published to the request event channel.
+    channel, event = self.state_manager.client.publish.call_args[0]
+    self.assertEqual(
+        channel, 'TurbiniaTaskEvents:{0:s}:testRequestId'.format(
+            config.INSTANCE_ID))
+    self.assertEqual(json.loads(event)['status'], 'Running')
+    self.state_manager.client.publish.reset_mock()
+    self.state_manager.update_task(task)
+    self.state_manager.client.publish.assert_not_called()
+
+    # The Task does not exist any more, so it is written as a new Task.
+    pipeline.execute.side_effect = [[0], [1]]
+    self.state_manager.update_task(task)
+    args = self.state_manager._write_script.call_args[1]['args']
+    self.assertEqual(args[0], 0)
+
+  def testUpdateLegacyTask(self):
+    """Test that legacy Task records are converted before the first update."""
+    task = TurbiniaTask(request_id='testRequestId')
+    task.result = TurbiniaTaskResult()
+    client = self.state_manager.client
+    legacy_key = 'TurbiniaTask:{0:s}'.format(task.id)
+    legacy_data = self.state_manager.get_task_dict(task)
+    legacy_data['last_update'] = legacy_data['last_update'].strftime(
+        state_manager.DATETIME_FORMAT)
+    client.get.side_effect = lambda key: {
+        legacy_key: json.dumps(legacy_data).encode('utf-8')
+    }.get(key)
+    client.type.return_value = b'string'
+    client.exists.return_value = 0
+    pipeline = client.pipeline.return_value
+    pipeline.execute.return_value = [1]
+
+    self.state_manager.update_task(task)
+    pipeline.delete.assert_called_once_with(legacy_key)
+    pipeline.hset.assert_any_call(
+        'TurbiniaTask:{0:s}:{1:s}'.format(config.INSTANCE_ID, task.id),
+        mapping=mock.ANY)
+    # pylint: disable=protected-access
+    args = self.state_manager._write_script.call_args[1]['args']
+    self.assertEqual(args[0], 1)
+
+    # Later updates do not look for legacy records again.
+    client.type.reset_mock()
+    self.state_manager.update_task(task)
+    client.type.assert_not_called()
+
+    # Nothing is converted once the schema version is current.
+    client.get.side_effect = None
+    client.get.return_value = b'2'
+    other_task = TurbiniaTask(request_id='testRequestId')
+    other_task.result = TurbiniaTaskResult()
+    self.state_manager.update_task(other_task)
+    client.type.assert_not_called()
+
+  def testGetTaskDataByRequest(self):
+    """Test getting the tasks of a request through the request index."""
+    task_data = {
+        'id': 'task1',
+        'request_id': 'testRequestId',
+        'requester': 'testUser',
+        'last_update': '2020-01-01T00:00:00.000000Z',
+        'run_time': 10
+    }
+    fields = {
+        name.encode('utf-8'): json.dumps(value).encode('utf-8')
+        for name, value in task_data.items()
+    }
+    text_fields = {b'report_data': b'"Report"'}
+    self.state_manager.READ_BATCH_SIZE = 1
+    self.state_manager.client.smembers.return_value = {b'task1', b'task2'}
+    pipeline = self.state_manager.client.pipeline.return_value
+    pipeline.execute.side_effect = [[fields, text_fields], [{}, {}]] * 2
+
+    tasks = self.state_manager.get_task_data('inst', request_id='testRequestId')
+    self.state_manager.client.smembers.assert_called_with(
+        'TurbiniaRequestTasks:inst:testRequestId')
+    self.assertEqual(pipeline.hgetall.call_count, 4)
+    self.state_manager.client.scan_iter.assert_not_called()
+    self.assertEqual(len(tasks), 1)
+    self.assertEqual(tasks[0]['run_time'], timedelta(seconds=10))
+    self.assertEqual(tasks[0]['last_update'], datetime(2020, 1, 1))
+    self.assertEqual(tasks[0]['report_data'], 'Report')
+
+    self.assertEqual(
+        self.state_manager.get_task_data(
+            'inst', request_id='testRequestId', user='otherUser'), [])
+
+  def testGetTaskPage(self):
+    """Test reading a page of Tasks through the last update index."""
+    client = self.state_manager.client
+    entries = [(b'task1', 10.0), (b'task2', 10.0), (b'task3', 20.0)]
+    client.zrangebyscore.side_effect = [entries, [(b'task4', 30.0)]]
+    last_update = b'"2020-01-01T00:00:00.000000Z"'
+    pipeline = client.pipeline.return_value
+    pipeline.execute.return_value = [[b'"task2"', last_update, b'"Done"'],
+                                     [b'"task3"', None, None],
+                                     [None, None, None]]
+
+    tasks = self.state_manager.get_task_page(
+        'inst', limit=3, after=(10.0, 'task1'), fields=['status'])
+    client.zrangebyscore.assert_called_with(
+        'TurbiniaInstanceTasks:inst', 10.0, '+inf', start=3, num=3,
+        withscores=True)
+    pipeline.hmget.assert_any_call(
+        'TurbiniaTask:inst:task4', ['id', 'last_update', 'status'])
+    pipeline.hgetall.assert_not_called()
+    self.assertEqual(
+        tasks, [{
+            'id': 'task2',
+            'last_update': datetime(2020, 1, 1),
+            'status': 'Done'
+        }, {
+            'id': 'task3'
+        }])
+
+  def testGetTaskPageByRequest(self):
+    """Test sorting the Tasks of a request by their last update."""
+    client = self.state_manager.client
+    client.smembers.return_value = {b'task1', b'task2', b'task3'}
+    pipeline = client.pipeline.return_value
+    scores = {'task1': 20.0, 'task2': 10.0, 'task3': None}
+    fields = [{b'id': b'"task2"'}, {}]
+    # The scores are returned in the order of the pipelined ZSCORE calls.
+    pipeline.execute.side_effect = lambda: (
+        fields if pipeline.hgetall.called else
+        [scores[call[1][1]] for call in pipeline.zscore.mock_calls])
+
+    tasks = self.state_manager.get_task_page(
+        'inst', request_id='testRequestId', limit=1)
+    pipeline.hgetall.assert_any_call('TurbiniaTask:inst:task2')
+    self.assertEqual(pipeline.hgetall.call_count, 2)
+    self.assertEqual(tasks, [{'id': 'task2'}])
+    client.zrangebyscore.assert_not_called()
+
+  def testGetTaskDataWithoutInstance(self):
+    """Test that unmigrated records are skipped when scanning all Tasks."""
+    self.state_manager.client.scan_iter.return_value = [
+        b'TurbiniaTask:inst:task1', b'TurbiniaTask:task2'
+    ]
+    pipeline = self.state_manager.client.pipeline.return_value
+    fields = {b'id': b'"task1"'}
+    pipeline.execute.side_effect = [[b'hash', b'string'], [fields, {}]]
+
+    tasks = self.state_manager.get_task_data(None)
+    self.assertEqual(tasks, [{'id': 'task1'}])
+    pipeline.hgetall.assert_any_call('TurbiniaTask:inst:task1')
+    self.assertEqual(pipeline.hgetall.call_count, 2)
+
+  def testMigrate(self):
+    """Test converting legacy Task records into Task hashes."""
+    task_data = {
+        'id': 'task1',
+        'instance': 'inst',
+        'request_id': 'testRequestId',
+        'requester': 'testUser',
+        'last_update': '2020-01-01T00:00:00.000000Z',
+        'report_data': 'Report'
+    }
+    client = self.state_manager.client
+    client.get.side_effect = lambda key: {
+        'TurbiniaTask:task1': json.dumps(task_data).encode('utf-8')
+    }.get(key)
+    client.scan_iter.return_value = [b'TurbiniaTask:task1']
+    client.type.return_value = b'string'
+    client.exists.return_value = 0
+    pipeline = client.pipeline.return_value
+
+    self.assertEqual(self.state_manager.migrate(), 1)
+    hash_fields = pipeline.hset.call_args_list[0][1]['mapping']
+    self.assertEqual(
+        pipeline.hset.call_args_list[0][0], ('TurbiniaTask:inst:task1',))
+    self.assertEqual(hash_fields['requester'], '"testUser"')
+    self.assertNotIn('report_data', hash_fields)
+    pipeline.hset.assert_called_with(
+        'TurbiniaTaskText:inst:task1', mapping={'report_data': '"Report"'})
+    pipeline.sadd.assert_any_call(
+        'TurbiniaRequestTasks:inst:testRequestId', 'task1')
+    pipeline.sadd.assert_any_call(
+        'TurbiniaRequesterTasks:inst:testUser', 'task1')
+    pipeline.zadd.assert_called_once()
+    pipeline.delete.assert_called_once_with('TurbiniaTask:task1')
+    client.set.assert_called_once_with(
+        'TurbiniaSchemaVersion', state_manager.RedisStateManager.SCHEMA_VERSION)
+
+    # Once the schema version is stored the keys are not scanned again.
+    client.get.side_effect = None
+    client.get.return_value = b'2'
+    client.scan_iter.reset_mock()
+    self.assertEqual(self.state_manager.migrate(), 0)
+    client.scan_iter.assert_not_called()
+
+
+class TestSQLiteStateManager(unittest.TestCase):
+  """Test SQLiteStateManager class."""
+
+  def setUp(self):
+    patcher = mock.patch('turbinia.state_manager.sqlite3', sqlite3, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.tmp_dir = tempfile.mkdtemp(prefix='turbinia-test-sqlite')
+    self.db_path = os.path.join(self.tmp_dir, 'state', 'turbinia.db')
+    self.state_manager = state_manager.SQLiteStateManager(self.db_path)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+
+  def _get_task(self, request_id, requester='testUser'):
+    """Gets a task with a result for test."""
+    task = TurbiniaTask(request_id=request_id, requester=requester)
+    task.result = TurbiniaTaskResult()
+    task.result.run_time = timedelta(seconds=5)
+    return task
+
+  def testWriteAndGetTasks(self):
+    """Test writing tasks and querying them."""
+    task1 = self._get_task('request1')
+    task2 = self._get_task('request1', requester='otherUser')
+    task3 = self._get_task('request2')
+    for task in (task1, task2, task3):
+      self.state_manager.write_new_task(task)
+    task1.result.status = 'Done'
+    self.state_manager.update_task(task1)
+
+    # Writes are buffered until the next flush or query.
+    connection = sqlite3.connect(self.db_path)
+    self.assertEqual(
+        connection.execute('SELECT COUNT(*) FROM tasks').fetchone()[0], 0)
+
+    instance = config.INSTANCE_ID
+    tasks = self.state_manager.get_task_data(instance, request_id='request1')
+    self.assertEqual(
+        sorted(task['id'] for task in tasks), sorted([task1.id, task2.id]))
+    self.assertEqual(
+        connection.execute('SELECT COUNT(*) FROM tasks').fetchone()[0], 3)
+
+    tasks = self.state_manager.get_task_data(instance, task_id=task1.id)
+    self.assertEqual(len(tasks), 1)
+    self.assertEqual(tasks[0]['status'], 'Done')
+    self.assertEqual(tasks[0]['run_time'], timedelta(seconds=5))
+    self.assertIsInstance(tasks[0]['last_update'], datetime)
+
+    self.assertEqual(len(self.state_manager.get_task_data(instance, days=1)), 3)
+    self.assertEqual(
+        len(self.state_manager.get_task_data(instance, user='testUser')), 2)
+    self.assertEqual(self.state_manager.get_task_data('otherInstance'), [])
+    self.assertEqual(
+        self.state_manager.get_request_task_ids(instance, 'request1'),
+        sorted([task1.id, task2.id]))
+
+  def testGetTaskPage(self):
+    """Test reading Tasks in pages ordered by their last update."""
+    tasks = [self._get_task('request1') for _ in range(5)]
+    for index, task in enumerate(tasks):
+      # Two Tasks have the same last update time, so they are ordered by id.
+      task.last_update = datetime(2020, 1, 1, min(index, 3))
+      self.state_manager.write_new_task(task)
+    expected = sorted(tasks, key=lambda task: (task.last_update, task.id))
+
+    instance = config.INSTANCE_ID
+    page_ids = []
+    after = None
+    while True:
+      page = self.state_manager.get_task_page(
+          instance, request_id='request1', limit=2, after=after,
+          fields=['request_id'])
+      if not page:
+        break
+      self.assertLessEqual(len(page), 2)
+      self.assertEqual(sorted(page[0]), ['id', 'last_update', 'request_id'])
+      page_ids.extend(task['id'] for task in page)
+      # pylint: disable=protected-access
+      after = self.state_manager._get_sort_key(page[-1])
+    self.assertEqual(page_ids, [task.id for task in expected])
+
+    tasks = self.state_manager.get_task_page(instance, user='otherUser')
+    self.assertEqual(tasks, [])
+
+  def testTaskRollups(self):
+    """Test that completed tasks are counted once in the rollups."""
+    task1 = self._get_task('request1')
+    task1.result.successful = True
+    task2 = self._get_task('request1', requester='otherUser')
+    task2.result.successful = False
+    task2.result.run_time = timedelta(seconds=15)
+    task3 = self._get_task('request2')
+    for task in (task1, task2, task3):
+      self.state_manager.write_new_task(task)
+    # Updates after completion and running tasks are not counted.
+    self.state_manager.update_task(task1)
+    self.state_manager.flush()
+
+    # Rollups written by another state manager are merged.
+    other_state_manager = state_manager.SQLiteStateManager(self.db_path)
+    task4 = self._get_task('request3')
+    task4.result.successful = True
+    other_state_manager.write_new_task(task4)
+    other_state_manager.flush()
+
+    rollups = self.state_manager.get_task_rollups(config.INSTANCE_ID, days=1)
+    self.assertEqual(rollups['all'].count, 3)
+    self.assertEqual(rollups['all'].mean, 25 / 3.0)
+    self.assertEqual(rollups['all'].quantile(0.5), 5)
+    self.assertEqual(rollups['successful'].count, 2)
+    self.assertEqual(rollups['failed'].max, 15)
+    self.assertEqual(rollups['user:testUser'].count, 2)
+    self.assertEqual(self.state_manager.get_task_rollups('otherInstance'), {})
+
+    # The run time of a request is only added once it completes.
+    self.assertNotIn('requests', rollups)
+    self.state_manager.complete_request(config.INSTANCE_ID, 'request1')
+    self.state_manager.complete_request(config.INSTANCE_ID, 'request2')
+    rollups = self.state_manager.get_task_rollups(config.INSTANCE_ID, days=1)
+    self.assertEqual(rollups['requests'].count, 1)
+    self.assertAlmostEqual(rollups['requests'].max, 15, delta=1)
+
+  def testEvidence(self):
+    """Test writing evidence and lineage edges."""
+    evidence_ = mock.MagicMock()
+    evidence_.id = 'evidence1'
+    evidence_.request_id = 'request1'
+    evidence_.to_json.return_value = '{"type": "RawDisk"}'
+    self.state_manager.write_evidence(evidence_)
+    self.state_manager.write_evidence_edge(
+        'evidence1', 'evidence2', 'task1', 'request1')
+
+    self.assertEqual(
+        self.state_manager.get_evidence('evidence1'), {'type': 'RawDisk'})
+    self.assertIsNone(self.state_manager.get_evidence('evidence3'))
+    self.assertEqual(
+        self.state_manager.get_request_evidence_ids('request1'), ['evidence1'])
+    self.assertEqual(
+        self.state_manager.get_evidence_children('evidence1'),
+        {'evidence2': 'task1'})
+    self.assertEqual(
+        self.state_manager.get_evidence_ancestors('evidence2'),
+        [('evidence1', 'task1', 'evidence2')])
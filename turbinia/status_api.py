@@ -0,0 +1,634 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""HTTP API to query Task status and statistics from the state manager."""
+
+from __future__ import unicode_literals
+
+import base64
+from collections import OrderedDict
+from email import utils as email_utils
+import gzip
+import hashlib
+import io
+import json
+import logging
+import threading
+from datetime import datetime
+from datetime import timedelta
+
+import six
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse as urlparse
+import urllib3
+
+import turbinia
+from turbinia import config
+from turbinia.config import DATETIME_FORMAT
+from turbinia import task_retention
+from turbinia import TurbiniaException
+from turbinia.lib import stats_rollup
+
+log = logging.getLogger('turbinia')
+
+# Default and maximum number of Tasks returned in a single page.
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+# Responses of at least this many bytes are gzip compressed if the client
+# accepts it.
+GZIP_MIN_SIZE = 1024
+
+
+def get_sort_key(task):
+  """Gets the key Tasks are ordered and paginated by.
+
+  Args:
+    task (dict): The Task dict.
+
+  Returns:
+    tuple(float, str): The last update time in seconds since the epoch and the
+        Task id.
+  """
+  last_update = task.get('last_update')
+  timestamp = 0.0
+  if last_update:
+    timestamp = (last_update - datetime(1970, 1, 1)).total_seconds()
+  return (timestamp, task.get('id') or '')
+
+
+def encode_cursor(task):
+  """Encodes the position after a Task as a pagination cursor.
+
+  Args:
+    task (dict): The last Task of a page.
+
+  Returns:
+    str: The opaque cursor.
+  """
+  data = json.dumps(list(get_sort_key(task))).encode('utf-8')
+  return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+  """Decodes a pagination cursor.
+
+  Args:
+    cursor (str): The cursor returned with the previous page.
+
+  Returns:
+    tuple(float, str): The sort key of the last Task of the previous page.
+
+  Raises:
+    TurbiniaException: If the cursor is not valid.
+  """
+  try:
+    timestamp, task_id = json.loads(
+        base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    return (float(timestamp), task_id)
+  except (TypeError, ValueError) as e:
+    raise TurbiniaException('Invalid cursor {0:s}: {1!s}'.format(cursor, e))
+
+
+def encode_task(task, fields=None):
+  """Encodes a Task dict for a JSON response.
+
+  Args:
+    task (dict): The Task dict.
+    fields (list(str)): The Task fields to include, or None for all fields.
+        The Task id is always included.
+
+  Returns:
+    dict: The JSON serializable Task dict.
+  """
+  if fields:
+    task = {field: task.get(field) for field in set(fields) | {'id'}}
+  else:
+    task = dict(task)
+  if isinstance(task.get('last_update'), datetime):
+    task['last_update'] = task['last_update'].strftime(DATETIME_FORMAT)
+  if isinstance(task.get('run_time'), timedelta):
+    task['run_time'] = task['run_time'].total_seconds()
+  return task
+
+
+def decode_task(task):
+  """Decodes a Task dict from a JSON response.
+
+  Args:
+    task (dict): The JSON decoded Task dict.
+
+  Returns:
+    dict: The Task dict with datetime and timedelta values.
+  """
+  if task.get('last_update'):
+    task['last_update'] = datetime.strptime(
+        task['last_update'], DATETIME_FORMAT)
+  if task.get('run_time'):
+    task['run_time'] = timedelta(seconds=task['run_time'])
+  return task
+
+
+class StatusAPIRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Handles status API requests.
+
+  All endpoints take an optional instance parameter, which defaults to the
+  configured INSTANCE_ID:
+    /tasks: Tasks filtered by days, task_id, request_id or user, in the order
+        of their last update.  The since parameter only selects Tasks updated
+        at or after that time.  Results are paginated with the limit and cursor
+        parameters, and fields selects a comma separated list of Task fields to
+        return.
+    /requests: A summary of each request, filtered by days or user.
+    /rollups: The statistics rollups of the last days.
+
+  Pages of Tasks are read with the get_task_page() method of the state
+  manager, which continues after the sort key encoded in the cursor, so every
+  request only reads one page of Tasks and only the selected fields.
+
+  Responses carry an ETag, and the last page of Tasks and the request
+  summaries a Last-Modified header, so that unchanged results can be
+  revalidated without being sent again.
+  """
+
+  protocol_version = 'HTTP/1.1'
+  server_version = 'TurbiniaStatusAPI/{0:s}'.format(turbinia.__version__)
+
+  # Task fields read for the request summaries.
+  REQUEST_FIELDS = ['request_id', 'requester', 'successful']
+
+  # pylint: disable=redefined-builtin
+  def log_message(self, format, *args):
+    log.debug(
+        'Status API request from {0:s}: {1:s}'.format(
+            self.address_string(), format % args))
+
+  # pylint: disable=invalid-name
+  def do_GET(self):
+    """Handles a GET request."""
+    url = urlparse.urlparse(self.path)
+    params = {
+        key: values[-1] for key, values in urlparse.parse_qs(url.query).items()
+    }
+    handlers = {
+        '/tasks': self._get_tasks,
+        '/requests': self._get_requests,
+        '/rollups': self._get_rollups
+    }
+    handler = handlers.get(url.path.rstrip('/'))
+    if not handler:
+      self._send_error(404, 'Unknown path {0:s}'.format(url.path))
+      return
+
+    try:
+      result, last_update = handler(params)
+    except TurbiniaException as e:
+      self._send_error(400, str(e))
+      return
+    # pylint: disable=broad-except
+    except Exception as e:
+      log.exception(
+          'Status API request {0:s} failed: {1!s}'.format(self.path, e))
+      self._send_error(500, 'Internal error')
+      return
+    self._send_result(result, last_update)
+
+  @staticmethod
+  def _get_int(params, name, default=0):
+    """Gets a non-negative integer request parameter.
+
+    Args:
+      params (dict): The request parameters.
+      name (str): The name of the parameter.
+      default (int): The value to use if the parameter is not set.
+
+    Returns:
+      int: The parameter value.
+
+    Raises:
+      TurbiniaException: If the parameter is not a non-negative integer.
+    """
+    value = params.get(name)
+    if not value:
+      return default
+    try:
+      value = int(value)
+    except ValueError:
+      value = -1
+    if value < 0:
+      raise TurbiniaException(
+          'Parameter {0:s} must be a non-negative integer'.format(name))
+    return value
+
+  @staticmethod
+  def _get_time(params, name):
+    """Gets a time request parameter.
+
+    Args:
+      params (dict): The request parameters.
+      name (str): The name of the parameter.
+
+    Returns:
+      datetime: The parameter value, or None if the parameter is not set.
+
+    Raises:
+      TurbiniaException: If the parameter is not in DATETIME_FORMAT.
+    """
+    value = params.get(name)
+    if not value:
+      return None
+    try:
+      return datetime.strptime(value, DATETIME_FORMAT)
+    except ValueError:
+      raise TurbiniaException(
+          'Parameter {0:s} must be a time in the format {1:s}'.format(
+              name, DATETIME_FORMAT))
+
+  def _get_tasks(self, params):
+    """Gets a page of Tasks.
+
+    Args:
+      params (dict): The request parameters.
+
+    Returns:
+      tuple(dict, float): The result with the Tasks and the cursor of the next
+          page, and for the last page the last update time of the matching
+          Tasks.
+    """
+    limit = self._get_int(params, 'limit', DEFAULT_PAGE_SIZE)
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    fields = [field for field in params.get('fields', '').split(',') if field]
+    cursor = params.get('cursor')
+    instance = params.get('instance') or config.INSTANCE_ID
+    days = self._get_int(params, 'days')
+
+    # One more Task than requested tells whether there is a next page.
+    tasks = self.server.state_manager.get_task_page(
+        instance, days=days, task_id=params.get('task_id'),
+        request_id=params.get('request_id'), user=params.get('user'),
+        since=self._get_time(params, 'since'), limit=limit + 1,
+        after=decode_cursor(cursor) if cursor else None, fields=fields or None)
+    page = tasks[:limit]
+    result = {
+        'tasks': [encode_task(task, fields) for task in page],
+        'next_cursor': encode_cursor(page[-1]) if len(tasks) > limit else None
+    }
+    # An update moves a Task to the last page, so only the last update time
+    # of the last page tells whether any of the matching Tasks changed.
+    last_update = None
+    if page and not result['next_cursor']:
+      last_update = get_sort_key(page[-1])[0]
+    return result, last_update
+
+  def _get_requests(self, params):
+    """Gets a summary of each request.
+
+    Args:
+      params (dict): The request parameters.
+
+    Returns:
+      tuple(dict, float): The result with the request summaries, most recently
+          updated first, and the last update time of the matching Tasks.
+    """
+    instance = params.get('instance') or config.INSTANCE_ID
+    days = self._get_int(params, 'days')
+    tasks = self.server.state_manager.get_task_page(
+        instance, days=days, user=params.get('user'),
+        fields=self.REQUEST_FIELDS)
+    requests = {}
+    for task in tasks:
+      request = requests.setdefault(
+          task.get('request_id'), {
+              'request_id': task.get('request_id'),
+              'requester': task.get('requester'),
+              'task_count': 0,
+              'last_update': None
+          })
+      request['task_count'] += 1
+      state = task_retention.get_task_state(task)
+      request[state] = request.get(state, 0) + 1
+      # Tasks are ordered by their last update.
+      request['last_update'] = task.get('last_update')
+
+    summaries = []
+    for request in sorted(requests.values(), key=get_sort_key, reverse=True):
+      for state in task_retention.STATES:
+        request.setdefault(state, 0)
+      if request['last_update']:
+        request['last_update'] = request['last_update'].strftime(
+            DATETIME_FORMAT)
+      summaries.append(request)
+    last_update = get_sort_key(tasks[-1])[0] if tasks else None
+    return {'requests': summaries}, last_update
+
+  def _get_rollups(self, params):
+    """Gets the statistics rollups.
+
+    Args:
+      params (dict): The request parameters.
+
+    Returns:
+      tuple(dict, None): The result with the serialized rollups keyed by name.
+    """
+    rollups = self.server.state_manager.get_task_rollups(
+        params.get('instance') or config.INSTANCE_ID,
+        self._get_int(params, 'days'))
+    result = {name: rollup.to_dict() for name, rollup in rollups.items()}
+    return {'rollups': result}, None
+
+  def _is_not_modified(self, etag, last_update):
+    """Checks the conditional request headers.
+
+    Args:
+      etag (str): The ETag of the response.
+      last_update (float): The last update time of the response in seconds
+          since the epoch, or None if it is not known.
+
+    Returns:
+      bool: True if the client already has the current response.
+    """
+    if_none_match = self.headers.get('If-None-Match')
+    if if_none_match:
+      # Weak comparison, as the ETag does not depend on the content encoding.
+      tags = [
+          tag.strip().replace('W/', '', 1) for tag in if_none_match.split(',')
+      ]
+      return '*' in tags or etag.replace('W/', '', 1) in tags
+    if_modified_since = self.headers.get('If-Modified-Since')
+    if if_modified_since and last_update:
+      parsed = email_utils.parsedate_tz(if_modified_since)
+      if parsed:
+        return int(last_update) <= email_utils.mktime_tz(parsed)
+    return False
+
+  def _send_result(self, result, last_update=None):
+    """Sends a JSON result, compressed and conditional if possible.
+
+    Args:
+      result (dict): The result to send.
+      last_update (float): The last update time of the result in seconds since
+          the epoch, or None if it is not known.
+    """
+    body = json.dumps(result, sort_keys=True).encode('utf-8')
+    headers = OrderedDict()
+    headers['ETag'] = 'W/"{0:s}"'.format(hashlib.sha1(body).hexdigest())
+    if last_update:
+      headers['Last-Modified'] = email_utils.formatdate(
+          last_update, usegmt=True)
+    headers['Vary'] = 'Accept-Encoding'
+
+    if self._is_not_modified(headers['ETag'], last_update):
+      self._send(304, None, headers)
+      return
+    accept_encoding = self.headers.get('Accept-Encoding') or ''
+    if 'gzip' in accept_encoding and len(body) >= GZIP_MIN_SIZE:
+      data = io.BytesIO()
+      with gzip.GzipFile(fileobj=data, mode='wb') as gzip_file:
+        gzip_file.write(body)
+      body = data.getvalue()
+      headers['Content-Encoding'] = 'gzip'
+    self._send(200, body, headers)
+
+  def _send_error(self, code, message):
+    """Sends an error response.
+
+    Args:
+      code (int): The HTTP status code.
+      message (str): The error message.
+    """
+    body = json.dumps({'error': message}).encode('utf-8')
+    self._send(code, body)
+
+  def _send(self, code, body, headers=None):
+    """Sends a response.
+
+    Args:
+      code (int): The HTTP status code.
+      body (bytes): The response body, or None to send no body.
+      headers (dict): Additional response headers.
+    """
+    self.send_response(code)
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    if body is not None:
+      self.send_header('Content-Type', 'application/json')
+      self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    if body is not None:
+      self.wfile.write(body)
+
+
+class StatusAPIServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """Serves the status API from the state manager in a background thread.
+
+  Attributes:
+    state_manager (BaseStateManager): The state manager to query.
+  """
+
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, state_manager, host=None, port=None):
+    """Initialization for StatusAPIServer.
+
+    Args:
+      state_manager (BaseStateManager): The state manager to query.
+      host (str): The address to listen on, by default STATUS_API_HOST.
+      port (int): The port to listen on, by default STATUS_API_PORT.
+    """
+    config.LoadConfig()
+    host = config.STATUS_API_HOST if host is None else host
+    port = config.STATUS_API_PORT if port is None else port
+    BaseHTTPServer.HTTPServer.__init__(
+        self, (host or '', int(port)), StatusAPIRequestHandler)
+    self.state_manager = state_manager
+    self._thread = None
+
+  def start(self):
+    """Starts serving requests in a background thread."""
+    self._thread = threading.Thread(
+        target=self.serve_forever, name='StatusAPIServer')
+    self._thread.daemon = True
+    self._thread.start()
+    log.info(
+        'Serving the status API on {0!s} port {1:d}'.format(
+            self.server_address[0], self.server_address[1]))
+
+  def stop(self):
+    """Stops serving requests."""
+    self.shutdown()
+    self.server_close()
+
+
+class StatusAPIClient(object):
+  """Queries the status API over pooled keep-alive connections.
+
+  Responses are kept with their ETag, so that results that did not change
+  since the last identical query are not sent again.
+
+  Attributes:
+    url (str): The base URL of the status API.
+  """
+
+  # Maximum number of responses to keep for conditional requests.
+  MAX_CACHED_RESPONSES = 64
+
+  def __init__(self, url=None, timeout=60):
+    """Initialization for StatusAPIClient.
+
+    Args:
+      url (str): The base URL of the status API, by default STATUS_API_URL.
+      timeout (int): The number of seconds to wait for a response.
+
+    Raises:
+      TurbiniaException: If no URL is set.
+    """
+    config.LoadConfig()
+    self.url = (url or config.STATUS_API_URL or '').rstrip('/')
+    if not self.url:
+      raise TurbiniaException(
+          'STATUS_API_URL needs to be set to use the status API.')
+    retries = urllib3.Retry(
+        total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+        raise_on_status=False)
+    self._pool = urllib3.PoolManager(
+        retries=retries, timeout=urllib3.Timeout(connect=10, read=timeout))
+    self._responses = OrderedDict()
+
+  def _get(self, path, params):
+    """Sends a GET request to the status API.
+
+    Args:
+      path (str): The endpoint path.
+      params (dict): The request parameters.  Parameters without a value are
+          not sent.
+
+    Returns:
+      dict: The JSON decoded result.
+
+    Raises:
+      TurbiniaException: If the request failed.
+    """
+    params = sorted((key, value) for key, value in params.items() if value)
+    url = '{0:s}{1:s}?{2:s}'.format(self.url, path, urlparse.urlencode(params))
+    headers = {'Accept-Encoding': 'gzip'}
+    cached = self._responses.get(url)
+    if cached:
+      headers['If-None-Match'] = cached[0]
+    try:
+      response = self._pool.request('GET', url, headers=headers)
+    except urllib3.exceptions.HTTPError as e:
+      raise TurbiniaException(
+          'Could not query the status API at {0:s}: {1!s}'.format(url, e))
+
+    if response.status == 304 and cached:
+      data = cached[1]
+    elif response.status == 200:
+      data = response.data
+      etag = response.headers.get('ETag')
+      if etag:
+        self._responses.pop(url, None)
+        self._responses[url] = (etag, data)
+        while len(self._responses) > self.MAX_CACHED_RESPONSES:
+          self._responses.popitem(last=False)
+    else:
+      raise TurbiniaException(
+          'Status API request {0:s} failed with status {1:d}: {2!s}'.format(
+              url, response.status, response.data[:1000]))
+
+    try:
+      return json.loads(six.ensure_text(data))
+    except ValueError as e:
+      raise TurbiniaException(
+          'Could not decode status API response from {0:s}: {1!s}'.format(
+              url, e))
+
+  def get_task_data(
+      self, instance, days=0, task_id=None, request_id=None, user=None,
+      fields=None, since=None, page_size=None):
+    """Gets Task data, following the pages of the result.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want history for.
+      task_id (string): The Id of the task.
+      request_id (string): The Id of the request we want tasks for.
+      user (string): The user of the request we want tasks for.
+      fields (list(str)): The Task fields to get, or None for all fields.
+      since (datetime): Only get Tasks last updated at or after this time.
+      page_size (int): The number of Tasks to get per request.
+
+    Returns:
+      List of Task dict objects.
+    """
+    params = {
+        'instance': instance,
+        'days': days,
+        'task_id': task_id,
+        'request_id': request_id,
+        'user': user,
+        'fields': ','.join(fields) if fields else None,
+        'since': since.strftime(DATETIME_FORMAT) if since else None,
+        'limit': page_size
+    }
+    # A Task that is updated while the pages are read can be returned again on
+    # a later page, in which case the later record is kept.
+    tasks = OrderedDict()
+    while True:
+      result = self._get('/tasks', params)
+      for task in result['tasks']:
+        tasks[task.get('id')] = decode_task(task)
+      if not result.get('next_cursor'):
+        break
+      params['cursor'] = result['next_cursor']
+    return list(tasks.values())
+
+  def get_requests(self, instance, days=0, user=None):
+    """Gets a summary of each request.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want history for.
+      user (string): The user of the requests.
+
+    Returns:
+      list(dict): The request summaries with the number of Tasks in each
+          state, most recently updated first.
+    """
+    result = self._get(
+        '/requests', {
+            'instance': instance,
+            'days': days,
+            'user': user
+        })
+    return [decode_task(request) for request in result['requests']]
+
+  def get_task_rollups(self, instance, days=0):
+    """Gets the statistics rollups of completed Tasks.
+
+    Args:
+      instance (string): The Turbinia instance name (by default the same as the
+          INSTANCE_ID in the config).
+      days (int): The number of days we want statistics for.
+
+    Returns:
+      dict: The merged StatsRollup objects keyed by rollup name.
+    """
+    result = self._get('/rollups', {'instance': instance, 'days': days})
+    return {
+        name: stats_rollup.StatsRollup.from_dict(data)
+        for name, data in result['rollups'].items()
+    }
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the status API module."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+from datetime import timedelta
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import mock
+import urllib3
+
+from turbinia import config
+from turbinia import state_manager
+from turbinia import status_api
+from turbinia import TurbiniaException
+from turbinia.workers import TurbiniaTask
+from turbinia.workers import TurbiniaTaskResult
+
+
+class TestStatusAPI(unittest.TestCase):
+  """Tests for the StatusAPIServer and StatusAPIClient classes."""
+
+  def setUp(self):
+    config.LoadConfig()
+    patcher = mock.patch('turbinia.state_manager.sqlite3', sqlite3, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.base_dir = tempfile.mkdtemp(prefix='turbinia-test-status-api')
+    self.state_manager = state_manager.SQLiteStateManager(
+        os.path.join(self.base_dir, 'turbinia.db'))
+    self.instance = config.INSTANCE_ID
+
+    # Five Tasks in two requests, where the last Task is still running.
+    for index in range(5):
+      request_id = 'request1' if index < 3 else 'request2'
+      task = TurbiniaTask(request_id=request_id, requester='testUser')
+      task.result = TurbiniaTaskResult()
+      task.result.successful = True if index < 4 else None
+      task.result.run_time = timedelta(seconds=10)
+      task.result.report_data = 'Report ' * 500
+      task.last_update = datetime.now() - timedelta(minutes=10 - index)
+      self.state_manager.write_new_task(task)
+
+    self.server = status_api.StatusAPIServer(
+        self.state_manager, host='127.0.0.1', port=0)
+    self.server.start()
+    self.url = 'http://127.0.0.1:{0:d}'.format(self.server.server_address[1])
+    self.client = status_api.StatusAPIClient(self.url)
+
+  def tearDown(self):
+    self.server.stop()
+    shutil.rmtree(self.base_dir)
+
+  def testGetTaskData(self):
+    """Tests getting Tasks over multiple pages with selected fields."""
+    tasks = self.client.get_task_data(
+        self.instance, request_id='request1', fields=['name', 'last_update'],
+        page_size=2)
+    self.assertEqual(len(tasks), 3)
+    self.assertEqual(sorted(tasks[0]), ['id', 'last_update', 'name'])
+    self.assertIsInstance(tasks[0]['last_update'], datetime)
+    self.assertLess(tasks[0]['last_update'], tasks[2]['last_update'])
+
+    tasks = self.client.get_task_data(self.instance, page_size=2)
+    self.assertEqual(len(tasks), 5)
+    self.assertEqual(tasks[0]['run_time'], timedelta(seconds=10))
+    self.assertEqual(len(set(task['id'] for task in tasks)), 5)
+
+    since = datetime.now() - timedelta(minutes=7, seconds=30)
+    tasks = self.client.get_task_data(self.instance, since=since)
+    self.assertEqual(len(tasks), 2)
+
+  def testConditionalRequests(self):
+    """Tests compressed responses and conditional requests."""
+    http = urllib3.PoolManager()
+    url = self.url + '/tasks?request_id=request2'
+    response = http.request(
+        'GET', url, headers={'Accept-Encoding': 'gzip'}, decode_content=False)
+    self.assertEqual(response.status, 200)
+    self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+
+    response = http.request('GET', url, headers={'If-None-Match': etag})
+    self.assertEqual(response.status, 304)
+    self.assertEqual(response.data, b'')
+    response = http.request(
+        'GET', url, headers={'If-Modified-Since': last_modified})
+    self.assertEqual(response.status, 304)
+    response = http.request(
+        'GET', url + '&fields=name', headers={'If-None-Match': etag})
+    self.assertEqual(response.status, 200)
+
+  def testGetRequestsAndRollups(self):
+    """Tests the request summaries and statistics rollups."""
+    requests = self.client.get_requests(self.instance)
+    request_ids = [request['request_id'] for request in requests]
+    self.assertEqual(request_ids, ['request2', 'request1'])
+    self.assertEqual(requests[0]['task_count'], 2)
+    self.assertEqual(requests[0]['successful'], 1)
+    self.assertEqual(requests[0]['running'], 1)
+    self.assertEqual(requests[1]['successful'], 3)
+
+    rollups = self.client.get_task_rollups(self.instance)
+    self.assertEqual(rollups['all'].count, 4)
+    self.assertEqual(rollups['all'].mean, 10)
+
+  def testErrors(self):
+    """Tests invalid requests."""
+    self.assertRaises(
+        TurbiniaException, self.client.get_task_data, self.instance,
+        page_size=-1)
+    self.assertRaises(TurbiniaException, self.client._get, '/unknown', {})
+    response = urllib3.PoolManager().request(
+        'GET', self.url + '/tasks?cursor=invalid')
+    self.assertEqual(response.status, 400)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Client side on-disk cache of the Task records of requests."""
+
+from __future__ import unicode_literals
+
+import gzip
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime
+from datetime import timedelta
+
+import six
+
+from turbinia import config
+from turbinia.config import DATETIME_FORMAT
+from turbinia import status_api
+
+log = logging.getLogger('turbinia')
+
+
+class TaskCache(object):
+  """On-disk cache of the Task records of requests.
+
+  The Tasks of each request are cached in a file per instance and request,
+  together with a high-water mark of the last update times seen.  Only the
+  Tasks updated since the high-water mark are fetched again, and completed
+  Tasks are never replaced once they are cached.
+
+  Attributes:
+    cache_dir (str): The directory the cache files are kept in.
+  """
+
+  # Tasks are fetched from this many seconds before the high-water mark,
+  # because the server can write Task updates some time after their last
+  # update time was set on the worker.
+  OVERLAP_SECONDS = 300
+
+  def __init__(self, cache_dir=None):
+    """Initialization for TaskCache.
+
+    Args:
+      cache_dir (str): The cache directory, by default the configured
+          TASK_CACHE_DIR.
+    """
+    config.LoadConfig()
+    self.cache_dir = os.path.expanduser(cache_dir or config.TASK_CACHE_DIR)
+
+  def _get_path(self, instance, request_id):
+    """Gets the path of the cache file of a request.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The Id of the request.
+
+    Returns:
+      str: The path of the cache file.
+    """
+    names = [re.sub(r'[^\w.-]', '_', name) for name in (instance, request_id)]
+    return os.path.join(self.cache_dir, names[0], names[1] + '.json.gz')
+
+  def _load(self, path):
+    """Loads a cache file.
+
+    Args:
+      path (str): The path of the cache file.
+
+    Returns:
+      tuple(dict, datetime): The cached Task dicts keyed by Task id, and the
+          high-water mark, or None if nothing is cached.
+    """
+    if not os.path.exists(path):
+      return {}, None
+    try:
+      with gzip.open(path, 'rb') as cache_file:
+        data = json.loads(six.ensure_text(cache_file.read()))
+      tasks = {
+          task_id: status_api.decode_task(task)
+          for task_id, task in data['tasks'].items()
+      }
+      high_water_mark = datetime.strptime(
+          data['high_water_mark'], DATETIME_FORMAT)
+    except (IOError, OSError, KeyError, TypeError, ValueError) as e:
+      log.warning(
+          'Ignoring invalid Task cache file {0:s}: {1!s}'.format(path, e))
+      return {}, None
+    return tasks, high_water_mark
+
+  def _save(self, path, tasks, high_water_mark):
+    """Saves a cache file.
+
+    Args:
+      path (str): The path of the cache file.
+      tasks (dict): The Task dicts keyed by Task id.
+      high_water_mark (datetime): The latest last update time of the Tasks.
+    """
+    data = {
+        'high_water_mark': high_water_mark.strftime(DATETIME_FORMAT),
+        'tasks': {
+            task_id: status_api.encode_task(task)
+            for task_id, task in tasks.items()
+        }
+    }
+    directory = os.path.dirname(path)
+    # Write to a temporary file first so that concurrent clients never read a
+    # partial file.
+    temp_path = '{0:s}.{1:s}.tmp'.format(path, uuid.uuid4().hex[:8])
+    try:
+      if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+      with gzip.open(temp_path, 'wb') as cache_file:
+        cache_file.write(json.dumps(data).encode('utf-8'))
+      os.rename(temp_path, path)
+    except (IOError, OSError) as e:
+      log.warning(
+          'Could not write Task cache file {0:s}: {1!s}'.format(path, e))
+      if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+  def get_task_data(self, instance, request_id, fetch_tasks):
+    """Gets the Tasks of a request, only fetching the Tasks that changed.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The Id of the request.
+      fetch_tasks (function): Called with a datetime to fetch the Tasks of the
+          request last updated at or after that time, or with None to fetch
+          all Tasks of the request.  Returns a list of Task dicts.
+
+    Returns:
+      List of Task dict objects.
+    """
+    path = self._get_path(instance, request_id)
+    tasks, high_water_mark = self._load(path)
+    since = None
+    if high_water_mark:
+      since = high_water_mark - timedelta(seconds=self.OVERLAP_SECONDS)
+
+    updates = fetch_tasks(since)
+    log.debug(
+        'Fetched {0:d} updated Tasks for request {1:s} with {2:d} cached '
+        'Tasks'.format(len(updates), request_id, len(tasks)))
+    for task in updates:
+      cached_task = tasks.get(task.get('id'))
+      if cached_task and cached_task.get('successful') is not None:
+        # Completed Tasks do not change anymore.
+        continue
+      tasks[task.get('id')] = task
+      last_update = task.get('last_update')
+      if last_update and (not high_water_mark or last_update > high_water_mark):
+        high_water_mark = last_update
+
+    if high_water_mark and updates:
+      self._save(path, tasks, high_water_mark)
+    return list(tasks.values())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the task cache module."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+from datetime import timedelta
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from turbinia import task_cache
+
+
+class TestTaskCache(unittest.TestCase):
+  """Tests for the TaskCache class."""
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp(prefix='turbinia-test-task-cache')
+    self.cache = task_cache.TaskCache(self.cache_dir)
+    self.last_update = datetime(2020, 1, 1, 12, 0, 0)
+
+  def tearDown(self):
+    shutil.rmtree(self.cache_dir)
+
+  def _get_task(self, task_id, successful, minutes=0, status='running'):
+    """Creates a Task dict."""
+    return {
+        'id': task_id,
+        'request_id': 'request1',
+        'successful': successful,
+        'status': status,
+        'run_time': timedelta(seconds=10),
+        'last_update': self.last_update + timedelta(minutes=minutes)
+    }
+
+  def testGetTaskData(self):
+    """Tests that only updated Tasks are fetched and merged."""
+    fetch_tasks = mock.MagicMock(
+        return_value=[
+            self._get_task('task1', True),
+            self._get_task('task2', None)
+        ])
+    tasks = self.cache.get_task_data('instance', 'request1', fetch_tasks)
+    fetch_tasks.assert_called_once_with(None)
+    self.assertEqual(len(tasks), 2)
+    self.assertTrue(
+        os.path.exists(
+            os.path.join(self.cache_dir, 'instance', 'request1.json.gz')))
+
+    # A new cache object reads the cache file, and only fetches the Tasks
+    # updated since the high-water mark.
+    cache = task_cache.TaskCache(self.cache_dir)
+    fetch_tasks = mock.MagicMock(
+        return_value=[
+            self._get_task('task1', False, 1, 'changed'),
+            self._get_task('task2', True, 1, 'completed'),
+            self._get_task('task3', None, 2)
+        ])
+    tasks = cache.get_task_data('instance', 'request1', fetch_tasks)
+    fetch_tasks.assert_called_once_with(
+        self.last_update - timedelta(seconds=cache.OVERLAP_SECONDS))
+    tasks = {task['id']: task for task in tasks}
+    self.assertEqual(sorted(tasks), ['task1', 'task2', 'task3'])
+    # Completed Tasks are not replaced.
+    self.assertEqual(tasks['task1']['status'], 'running')
+    self.assertEqual(tasks['task2']['status'], 'completed')
+    self.assertEqual(tasks['task2']['run_time'], timedelta(seconds=10))
+
+    fetch_tasks = mock.MagicMock(return_value=[])
+    tasks = cache.get_task_data('instance', 'request1', fetch_tasks)
+    fetch_tasks.assert_called_once_with(
+        self.last_update + timedelta(minutes=2) -
+        timedelta(seconds=cache.OVERLAP_SECONDS))
+    self.assertEqual(len(tasks), 3)
+
+  def testInvalidCacheFile(self):
+    """Tests that invalid cache files are ignored."""
+    path = os.path.join(self.cache_dir, 'instance', 'request1.json.gz')
+    os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as cache_file:
+      cache_file.write(b'invalid')
+    fetch_tasks = mock.MagicMock(return_value=[self._get_task('task1', None)])
+    tasks = self.cache.get_task_data('instance', 'request1', fetch_tasks)
+    fetch_tasks.assert_called_once_with(None)
+    self.assertEqual(len(tasks), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
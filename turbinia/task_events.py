@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Task state change events pushed from the state manager to clients."""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+
+import six
+from six.moves import queue
+
+from turbinia import config
+from turbinia.config import DATETIME_FORMAT
+
+log = logging.getLogger('turbinia')
+
+# The Task fields that are sent in an event.
+EVENT_FIELDS = (
+    'id', 'instance', 'name', 'request_id', 'requester', 'status', 'successful',
+    'worker_name', 'last_update')
+# The Task fields that define the state of a Task.  Events are only sent when
+# one of these changes.
+STATE_FIELDS = ('status', 'successful')
+
+
+def get_task_event(task_data):
+  """Creates a Task state change event from a Task dict.
+
+  Args:
+    task_data (dict): The Task dict, as created by the state manager.
+
+  Returns:
+    dict: The event.
+  """
+  event = {field: task_data.get(field) for field in EVENT_FIELDS}
+  if isinstance(event['last_update'], datetime):
+    event['last_update'] = event['last_update'].strftime(DATETIME_FORMAT)
+  return event
+
+
+def decode_task_event(data):
+  """Decodes a serialized Task state change event.
+
+  Args:
+    data (bytes|str): The JSON serialized event.
+
+  Returns:
+    dict: The event, or None if it could not be decoded.
+  """
+  try:
+    event = json.loads(six.ensure_text(data))
+    if event.get('last_update'):
+      event['last_update'] = datetime.strptime(
+          event['last_update'], DATETIME_FORMAT)
+  except (TypeError, ValueError) as exception:
+    log.warning('Could not decode Task event: {0!s}'.format(exception))
+    return None
+  return event
+
+
+def get_state(task_data):
+  """Gets the state of a Task, to detect state changes.
+
+  Args:
+    task_data (dict): A Task dict or event.
+
+  Returns:
+    tuple: The values of the state fields.
+  """
+  return tuple(task_data.get(field) for field in STATE_FIELDS)
+
+
+def get_redis_channel(instance, request_id=None):
+  """Gets the Redis channel the events of a request are published on.
+
+  Args:
+    instance (str): The Turbinia instance name.
+    request_id (str): The id of the request, or None to get a pattern that
+        matches the channels of all requests.
+
+  Returns:
+    str: The channel name or pattern.
+  """
+  return ':'.join(['TurbiniaTaskEvents', instance, request_id or '*'])
+
+
+class TaskEventSubscriber(object):
+  """Receives Task state change events."""
+
+  def get_events(self, timeout):
+    """Waits for Task state change events.
+
+    Args:
+      timeout (float): The maximum number of seconds to wait for an event.
+
+    Returns:
+      list(dict): The received events, which is empty if none were received
+          before the timeout.
+    """
+    raise NotImplementedError
+
+  def close(self):
+    """Stops receiving events."""
+
+
+class RedisTaskEventSubscriber(TaskEventSubscriber):
+  """Receives Task state change events through Redis pub/sub."""
+
+  def __init__(self, client, instance, request_id=None):
+    """Initialization for RedisTaskEventSubscriber.
+
+    Args:
+      client (redis.StrictRedis): The Redis client.
+      instance (str): The Turbinia instance name.
+      request_id (str): The request to receive events for, or None for all
+          requests.
+    """
+    self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+    channel = get_redis_channel(instance, request_id)
+    if request_id:
+      self._pubsub.subscribe(channel)
+    else:
+      self._pubsub.psubscribe(channel)
+
+  def get_events(self, timeout):
+    events = []
+    deadline = time.time() + timeout
+    message = self._pubsub.get_message(timeout=timeout)
+    while message or (not events and time.time() < deadline):
+      if message:
+        event = decode_task_event(message['data'])
+        if event:
+          events.append(event)
+        # Drain any other events that are already waiting.
+        message = self._pubsub.get_message(timeout=0)
+      else:
+        message = self._pubsub.get_message(
+            timeout=max(0, deadline - time.time()))
+    return events
+
+  def close(self):
+    self._pubsub.close()
+
+
+class PubSubTaskEventPublisher(object):
+  """Publishes Task state change events to a Google Cloud Pub/Sub topic.
+
+  Attributes:
+    topic_path (str): The full path of the Pub/Sub topic.
+  """
+
+  def __init__(self, topic_name):
+    """Initialization for PubSubTaskEventPublisher.
+
+    Args:
+      topic_name (str): The name of the Pub/Sub topic.
+    """
+    from google.cloud import exceptions
+    from google.cloud import pubsub
+
+    config.LoadConfig()
+    self._publisher = pubsub.PublisherClient()
+    self.topic_path = self._publisher.topic_path(
+        config.TURBINIA_PROJECT, topic_name)
+    try:
+      self._publisher.create_topic(self.topic_path)
+    except exceptions.Conflict:
+      log.debug('PubSub topic {0:s} already exists.'.format(self.topic_path))
+
+  def publish(self, event):
+    """Publishes an event without waiting for it to be sent.
+
+    Args:
+      event (dict): The Task state change event.
+    """
+    self._publisher.publish(
+        self.topic_path,
+        json.dumps(event).encode('utf-8'), instance=event['instance'] or '',
+        request_id=event['request_id'] or '')
+
+
+class PubSubTaskEventSubscriber(TaskEventSubscriber):
+  """Receives Task state change events from a Google Cloud Pub/Sub topic.
+
+  Each subscriber creates its own temporary subscription, which is deleted
+  again when the subscriber is closed.  Subscriptions that are left behind,
+  e.g. by a client that was killed, expire after they have been inactive for
+  SUBSCRIPTION_TTL, and keep unacknowledged events for MESSAGE_RETENTION
+  only.
+  """
+
+  # Shortest expiration time and message retention duration in seconds that
+  # Pub/Sub allows for a subscription.
+  SUBSCRIPTION_TTL = 24 * 60 * 60
+  MESSAGE_RETENTION = 10 * 60
+
+  def __init__(self, topic_name, instance, request_id=None):
+    """Initialization for PubSubTaskEventSubscriber.
+
+    Args:
+      topic_name (str): The name of the Pub/Sub topic.
+      instance (str): The Turbinia instance name.
+      request_id (str): The request to receive events for, or None for all
+          requests.
+    """
+    from google.cloud import pubsub
+
+    config.LoadConfig()
+    self._instance = instance
+    self._request_id = request_id
+    self._queue = queue.Queue()
+    self._subscriber = pubsub.SubscriberClient()
+    topic_path = self._subscriber.topic_path(
+        config.TURBINIA_PROJECT, topic_name)
+    subscription_name = '{0:s}-{1:s}'.format(topic_name, uuid.uuid4().hex)
+    self._subscription_path = self._subscriber.subscription_path(
+        config.TURBINIA_PROJECT, subscription_name)
+    retention = {'seconds': self.MESSAGE_RETENTION}
+    expiration_policy = {'ttl': {'seconds': self.SUBSCRIPTION_TTL}}
+    self._subscriber.create_subscription(
+        self._subscription_path, topic_path,
+        message_retention_duration=retention,
+        expiration_policy=expiration_policy)
+    self._future = self._subscriber.subscribe(
+        self._subscription_path, self._callback)
+
+  def _callback(self, message):
+    """Callback function that places matching events in the queue.
+
+    Args:
+      message: A pubsub message object
+    """
+    message.ack()
+    attributes = message.attributes
+    if attributes.get('instance') != self._instance:
+      return
+    if self._request_id and attributes.get('request_id') != self._request_id:
+      return
+    event = decode_task_event(message.data)
+    if event:
+      self._queue.put(event)
+
+  def get_events(self, timeout):
+    try:
+      events = [self._queue.get(timeout=timeout)]
+    except queue.Empty:
+      return []
+    while not self._queue.empty():
+      events.append(self._queue.get_nowait())
+    return events
+
+  def close(self):
+    self._future.cancel()
+    self._subscriber.delete_subscription(self._subscription_path)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the Task state change events."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+import json
+import unittest
+
+import mock
+
+from turbinia import task_events
+
+
+class TestTaskEvents(unittest.TestCase):
+  """Tests for the Task event functions."""
+
+  def testGetAndDecodeTaskEvent(self):
+    """Tests creating and decoding an event."""
+    task_data = {
+        'id': 'task1',
+        'instance': 'inst',
+        'request_id': 'request1',
+        'status': 'Running',
+        'successful': None,
+        'last_update': datetime(2020, 1, 2),
+        'report_data': 'Long report'
+    }
+    event = task_events.get_task_event(task_data)
+    self.assertNotIn('report_data', event)
+    decoded = task_events.decode_task_event(json.dumps(event).encode('utf-8'))
+    self.assertEqual(decoded['last_update'], datetime(2020, 1, 2))
+    self.assertEqual(task_events.get_state(decoded), ('Running', None))
+    self.assertIsNone(task_events.decode_task_event(b'not json'))
+
+
+class TestRedisTaskEventSubscriber(unittest.TestCase):
+  """Tests for the RedisTaskEventSubscriber class."""
+
+  def testGetEvents(self):
+    """Tests subscribing to and receiving events."""
+    client = mock.MagicMock()
+    pubsub = client.pubsub.return_value
+    subscriber = task_events.RedisTaskEventSubscriber(
+        client, 'inst', request_id='request1')
+    pubsub.subscribe.assert_called_with('TurbiniaTaskEvents:inst:request1')
+
+    pubsub.get_message.side_effect = [{
+        'data': b'{"id": "task1"}'
+    }, {
+        'data': b'{"id": "task2"}'
+    }, None]
+    events = subscriber.get_events(1)
+    self.assertEqual([event['id'] for event in events], ['task1', 'task2'])
+
+    pubsub.get_message.side_effect = None
+    pubsub.get_message.return_value = None
+    self.assertEqual(subscriber.get_events(0), [])
+    subscriber.close()
+    pubsub.close.assert_called_once()
+
+  def testSubscribeAllRequests(self):
+    """Tests subscribing to the events of all requests."""
+    client = mock.MagicMock()
+    task_events.RedisTaskEventSubscriber(client, 'inst')
+    client.pubsub.return_value.psubscribe.assert_called_with(
+        'TurbiniaTaskEvents:inst:*')
+
+
+class TestPubSubTaskEventSubscriber(unittest.TestCase):
+  """Tests for the PubSubTaskEventSubscriber class."""
+
+  @mock.patch('google.cloud.pubsub.SubscriberClient')
+  def testCallback(self, mock_subscriber):
+    """Tests that only events of the request are received."""
+    subscriber = task_events.PubSubTaskEventSubscriber(
+        'topic', 'inst', request_id='request1')
+    client = mock_subscriber.return_value
+    # Subscriptions left behind expire after a day.
+    expiration_policy = {'ttl': {'seconds': 86400}}
+    client.create_subscription.assert_called_once_with(
+        client.subscription_path.return_value, client.topic_path.return_value,
+        message_retention_duration={'seconds': 600},
+        expiration_policy=expiration_policy)
+
+    for request_id, task_id in (('request1', 'task1'), ('request2', 'task2')):
+      message = mock.MagicMock()
+      message.attributes = {'instance': 'inst', 'request_id': request_id}
+      message.data = json.dumps({'id': task_id}).encode('utf-8')
+      # pylint: disable=protected-access
+      subscriber._callback(message)
+      message.ack.assert_called_once()
+
+    self.assertEqual(subscriber.get_events(0), [{'id': 'task1'}])
+    self.assertEqual(subscriber.get_events(0), [])
+    subscriber.close()
+    client.delete_subscription.assert_called_once()
+
+
+if __name__ == '__main__':
+  unittest.main()
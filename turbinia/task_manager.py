@@ -154,6 +154,7 @@ class BaseTaskManager(object):
       raise turbinia.TurbiniaException(
           'Jobs must be registered before evidence can be added')
     log.info('Adding new evidence: {0:s}'.format(str(evidence_)))
+    self.state_manager.write_evidence(evidence_)
     job_count = 0
     jobs_whitelist = evidence_.config.get('jobs_whitelist', [])
     jobs_blacklist = evidence_.config.get('jobs_blacklist', [])
@@ -277,17 +278,13 @@ class BaseTaskManager(object):
         'Request {0:s} done, but not finalized, creating FinalizeRequestJob '
         '{1:s}'.format(request_id, final_job.id))
 
-    # Finalize tasks use EvidenceCollection with all evidence created by the
-    # request or job.
-    final_evidence = evidence.EvidenceCollection()
+    # Finalize tasks use an EvidenceCollection that resolves all evidence
+    # created by the request from the state manager, so the size of the Task
+    # does not depend on the amount of evidence.
+    final_evidence = evidence.EvidenceCollection(resolve_request_evidence=True)
     final_evidence.request_id = request_id
     self.running_jobs.append(final_job)
 
-    # Gather evidence created by every Job in the request.
-    for running_job in self.running_jobs:
-      if running_job.request_id == request_id:
-        final_evidence.collection.extend(running_job.evidence.collection)
-
     for finalize_task in final_job.create_tasks([final_evidence]):
       self.add_task(finalize_task, final_job, final_evidence)
 
@@ -316,6 +313,10 @@ class BaseTaskManager(object):
       task.job_name = job.name
       job.tasks.append(task)
     self.state_manager.write_new_task(task)
+    if isinstance(evidence_, evidence.EvidenceCollection):
+      # Collections are resolved from the state manager on the worker, so make
+      # sure that all buffered evidence and task state has been written.
+      self.state_manager.flush()
     self.enqueue_task(task, evidence_)
 
   def remove_jobs(self, request_id):
@@ -404,9 +405,13 @@ class BaseTaskManager(object):
         log.info(
             'Task {0:s} from {1:s} returned Evidence {2:s}'.format(
                 task_result.task_name, task_result.worker_name, evidence_.name))
+        if task_result.input_evidence:
+          self.state_manager.write_evidence_edge(
+              task_result.input_evidence.id, evidence_.id, task_result.task_id,
+              task_result.request_id)
         self.add_evidence(evidence_)
         if job:
-          job.evidence.add_evidence(evidence_)
+          job.evidence.add_evidence_reference(evidence_)
       else:
         log.error(
             'Task {0:s} from {1:s} returned non-Evidence output type '
@@ -453,6 +458,7 @@ class BaseTaskManager(object):
     # request since everything is complete.
     elif request_done and request_finalized:
       self.remove_jobs(request_id)
+      self.state_manager.complete_request(config.INSTANCE_ID, request_id)
 
   def process_tasks(self):
     """Process any tasks that need to be processed.
@@ -465,25 +471,30 @@ class BaseTaskManager(object):
   def run(self, under_test=False):
     """Main run loop for TaskManager."""
     log.info('Starting Task Manager run loop')
-    while True:
-      # pylint: disable=expression-not-assigned
-      [self.add_evidence(x) for x in self.get_evidence()]
-
-      for task in self.process_tasks():
-        if task.result:
-          job = self.process_result(task.result)
-          if job:
-            self.process_job(job, task)
-
-      [self.state_manager.update_task(t) for t in self.tasks]
-      if config.SINGLE_RUN and self.check_done():
-        log.info('No more tasks to process.  Exiting now.')
-        return
-
-      if under_test:
-        break
-
-      time.sleep(config.SLEEP_TIME)
+    try:
+      while True:
+        # pylint: disable=expression-not-assigned
+        [self.add_evidence(x) for x in self.get_evidence()]
+
+        for task in self.process_tasks():
+          if task.result:
+            job = self.process_result(task.result)
+            if job:
+              self.process_job(job, task)
+
+        [self.state_manager.update_task(t) for t in self.tasks]
+        # Write all of the task updates of this iteration together.
+        self.state_manager.flush()
+        if config.SINGLE_RUN and self.check_done():
+          log.info('No more tasks to process.  Exiting now.')
+          return
+
+        if under_test:
+          break
+
+        time.sleep(config.SLEEP_TIME)
+    finally:
+      self.state_manager.flush()
 
 
 class CeleryTaskManager(BaseTaskManager):
@@ -18,6 +18,7 @@ from __future__ import unicode_literals
 
 import mock
 
+from turbinia import evidence
 from turbinia import task_manager
 from turbinia.jobs import manager as jobs_manager
 from turbinia.jobs import plaso
@@ -55,6 +56,7 @@ class TestTaskManager(TestTurbiniaTaskBase):
     self.manager.jobs = [job]
     self.manager.add_evidence(self.evidence)
 
+    self.manager.state_manager.write_evidence.assert_called_with(self.evidence)
     self.manager.add_task.assert_called()
     test_job = self.manager.running_jobs[0]
     test_job.create_tasks.assert_called()
@@ -164,13 +166,19 @@ class TestTaskManager(TestTurbiniaTaskBase):
     self.job1.id = job_id
     self.result.job_id = job_id
     self.result.evidence.append(self.evidence)
+    self.result.input_evidence = evidence.RawDisk(source_path='/tmp/foo.img')
+    self.result.task_id = 'testTaskID'
+    self.result.request_id = 'testRequestID'
     self.manager.add_evidence = mock.MagicMock()
     self.manager.running_jobs.append(self.job1)
     test_job = self.manager.process_result(self.result)
     self.assertEqual(test_job.id, job_id)
     self.assertEqual(test_job, self.manager.running_jobs[0])
-    self.assertEqual(test_job.evidence.collection[0], self.evidence)
+    self.assertEqual(test_job.evidence.references[0]['id'], self.evidence.id)
     self.manager.add_evidence.assert_called_with(self.evidence)
+    self.manager.state_manager.write_evidence_edge.assert_called_with(
+        self.result.input_evidence.id, self.evidence.id, 'testTaskID',
+        'testRequestID')
 
   def testFinalizeResultBadEvidence(self):
     """Tests process_result method with bad input evidence."""
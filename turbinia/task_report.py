@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Streaming markdown reports of Turbinia Tasks."""
+
+from __future__ import unicode_literals
+
+from collections import Counter
+import functools
+from operator import itemgetter
+import threading
+
+from turbinia import config
+from turbinia.lib import text_formatter as fmt
+from turbinia.workers import Priority
+
+# Report sections in the order they are written.
+HIGH_PRIORITY = 'High Priority'
+SUCCESSFUL = 'Successful'
+FAILED = 'Failed'
+RUNNING = 'Scheduled or Running'
+SECTIONS = (HIGH_PRIORITY, SUCCESSFUL, FAILED, RUNNING)
+SUCCESS_SECTIONS = {True: SUCCESSFUL, False: FAILED, None: RUNNING}
+
+# The Task fields kept in memory for each Task while a report is written.
+SUMMARY_FIELDS = (
+    'id', 'name', 'report_priority', 'request_id', 'requester', 'status',
+    'successful', 'worker_name')
+
+# Number of Tasks read from the state manager at a time.
+PAGE_SIZE = 100
+
+
+def format_task_detail(task, show_files=False, max_report_lines=None):
+  """Formats a single task in detail.
+
+  Args:
+    task (dict): The task to format data for
+    show_files (bool): Whether we want to print out log file paths
+    max_report_lines (int): The maximum number of lines of report data to
+        include, or None to include all report data.
+
+  Returns:
+    list: Formatted task data
+  """
+  report = []
+  saved_paths = task.get('saved_paths') or []
+  status = task.get('status') or 'No task status'
+
+  report.append(fmt.heading2(task.get('name')))
+  line = '{0:s} {1:s}'.format(fmt.bold('Status:'), status)
+  report.append(fmt.bullet(line))
+  report.append(fmt.bullet('Task Id: {0:s}'.format(task.get('id'))))
+  report.append(
+      fmt.bullet('Executed on worker {0:s}'.format(task.get('worker_name'))))
+  if task.get('report_data'):
+    report.append('')
+    report.append(fmt.heading3('Task Reported Data'))
+    lines = task.get('report_data').splitlines()
+    if max_report_lines is not None and len(lines) > max_report_lines:
+      truncated = len(lines) - max_report_lines
+      lines = lines[:max_report_lines]
+      lines.append(
+          '[{0:d} more lines of reported data truncated]'.format(truncated))
+    report.extend(lines)
+  if show_files:
+    report.append('')
+    report.append(fmt.heading3('Saved Task Files:'))
+    for path in saved_paths:
+      report.append(fmt.bullet(fmt.code(path)))
+    report.append('')
+  return report
+
+
+def format_task(task, show_files=False):
+  """Formats a single task in short form.
+
+  Args:
+    task (dict): The task to format data for
+    show_files (bool): Whether we want to print out log file paths
+
+  Returns:
+    list: Formatted task data
+  """
+  report = []
+  saved_paths = task.get('saved_paths') or []
+  status = task.get('status') or 'No task status'
+  report.append(fmt.bullet('{0:s}: {1:s}'.format(task.get('name'), status)))
+  if show_files:
+    for path in saved_paths:
+      report.append(fmt.bullet(fmt.code(path), level=2))
+    report.append('')
+  return report
+
+
+def iter_request_tasks(state_manager, instance, request_id, page_size=None):
+  """Reads the Tasks of a request from the state manager a page at a time.
+
+  Args:
+    state_manager (BaseStateManager|TaskReader): The state manager to read
+        from.
+    instance (str): The Turbinia instance name.
+    request_id (str): The Id of the request.
+    page_size (int): The number of Tasks to read at a time, by default
+        PAGE_SIZE.
+
+  Yields:
+    dict: The Task dicts.
+  """
+  page_size = page_size or PAGE_SIZE
+  task_ids = state_manager.get_request_task_ids(instance, request_id)
+  for index in range(0, len(task_ids), page_size):
+    for task in state_manager.get_tasks(instance,
+                                        task_ids[index:index + page_size]):
+      yield task
+
+
+class TaskReader(object):
+  """Read-only access to the Task records in the configured state manager.
+
+  The state manager is created on first use and shared by all readers in the
+  process, so that reports written by the same worker reuse its connection.
+  Only the methods needed to read the Tasks of a request are exposed.
+  """
+
+  _state_manager = None
+  _lock = threading.Lock()
+
+  @classmethod
+  def _get_state_manager(cls):
+    """Gets the shared state manager.
+
+    Returns:
+      BaseStateManager: The state manager.
+    """
+    with cls._lock:
+      if cls._state_manager is None:
+        # Doing a delayed import to avoid circular dependencies.
+        from turbinia import state_manager
+        cls._state_manager = state_manager.get_state_manager()
+      return cls._state_manager
+
+  def get_request_task_ids(self, instance, request_id):
+    """Gets the ids of the Tasks of a request.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      request_id (str): The Id of the request.
+
+    Returns:
+      list(str): The sorted Task ids.
+    """
+    return self._get_state_manager().get_request_task_ids(instance, request_id)
+
+  def get_tasks(self, instance, task_ids):
+    """Gets Task dicts by their ids.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      task_ids (list(str)): The ids of the Tasks.
+
+    Returns:
+      list(dict): The Task dicts.  Tasks that do not exist are skipped.
+    """
+    return self._get_state_manager().get_tasks(instance, task_ids)
+
+
+class TaskReportWriter(object):
+  """Writes the markdown report of Tasks incrementally.
+
+  Only a small summary of each Task is kept while the report is written.  The
+  large fields of the Tasks that are reported in detail are read a page at a
+  time while their section is written, so memory use does not depend on the
+  size of the reported data.  Long sections and reported data can be cut off,
+  in which case the omitted Tasks are summarized.
+
+  Attributes:
+    all_fields (bool): Whether to include the saved file paths of the Tasks.
+    full_report (bool): Whether to include the reported data of high priority
+        Tasks.
+    max_report_lines (int): The maximum number of lines of reported data per
+        Task, or None for no limit.
+    max_section_tasks (int|dict): The maximum number of Tasks listed per
+        section, either for all sections or keyed by section name.  None means
+        no limit.
+    priority_filter (int): Tasks with a report priority up to this value are
+        reported as high priority Tasks.
+  """
+
+  def __init__(
+      self, output, priority_filter=Priority.HIGH, full_report=False,
+      all_fields=False, max_section_tasks=None, max_report_lines=None):
+    """Initialization for TaskReportWriter.
+
+    Args:
+      output (file): The text file-like object to write the report to.
+      priority_filter (int): Tasks with a report priority up to this value are
+          reported as high priority Tasks.
+      full_report (bool): Whether to include the reported data of high
+          priority Tasks.
+      all_fields (bool): Whether to include the saved file paths of the Tasks.
+      max_section_tasks (int|dict): The maximum number of Tasks listed per
+          section, either for all sections or keyed by section name.
+      max_report_lines (int): The maximum number of lines of reported data per
+          Task.
+    """
+    self._output = output
+    self._lines_written = 0
+    self.priority_filter = priority_filter
+    self.full_report = full_report
+    self.all_fields = all_fields
+    self.max_section_tasks = max_section_tasks
+    self.max_report_lines = max_report_lines
+
+  def _write(self, lines):
+    """Writes lines of the report.
+
+    Args:
+      lines (list(str)): The lines to write.
+    """
+    for line in lines:
+      if self._lines_written:
+        self._output.write('\n')
+      self._output.write(line)
+      self._lines_written += 1
+
+  def _get_max_tasks(self, section):
+    """Gets the maximum number of Tasks listed in a section.
+
+    Args:
+      section (str): The section name.
+
+    Returns:
+      int: The maximum number of Tasks, or None for no limit.
+    """
+    if isinstance(self.max_section_tasks, dict):
+      return self.max_section_tasks.get(section)
+    return self.max_section_tasks
+
+  def _write_details(self, tasks, get_tasks):
+    """Writes Tasks in detail, reading the full Tasks a page at a time.
+
+    Args:
+      tasks (list(dict)): The Tasks to write.
+      get_tasks (function): Called with a list of Task ids to get the full
+          Task dicts, or None if the Tasks are complete.
+    """
+    for index in range(0, len(tasks), PAGE_SIZE):
+      page = tasks[index:index + PAGE_SIZE]
+      if get_tasks:
+        full_tasks = get_tasks([task['id'] for task in page])
+        full_tasks = {task.get('id'): task for task in full_tasks}
+        # Tasks that were removed in the meantime are written from their
+        # summary.
+        page = [full_tasks.get(task['id'], task) for task in page]
+      for task in page:
+        self._write(
+            format_task_detail(
+                task, show_files=self.all_fields,
+                max_report_lines=self.max_report_lines))
+
+  def _write_omitted(self, tasks):
+    """Writes a summary of the Tasks omitted from a section.
+
+    Args:
+      tasks (list(dict)): The omitted Tasks.
+    """
+    counts = Counter(task.get('name') or 'Unknown task' for task in tasks)
+    names = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    names = ', '.join(
+        '{0:s} ({1:d})'.format(name, count) for name, count in names)
+    self._write([
+        fmt.bullet(
+            '{0:d} more Tasks not listed: {1:s}'.format(len(tasks), names))
+    ])
+
+  def write(self, tasks, get_tasks=None):
+    """Writes the report.
+
+    Args:
+      tasks (iterable(dict)): The Task dicts to report on.  Unless get_tasks is
+          set, these need to include the report_data of high priority Tasks.
+      get_tasks (function): Called with a list of Task ids to get the full Task
+          dicts of the Tasks reported in detail, or None to use the Task dicts
+          in tasks.
+
+    Returns:
+      int: The number of Tasks in the report.  Nothing is written if there are
+          no Tasks.
+    """
+    fields = SUMMARY_FIELDS
+    if self.all_fields:
+      fields += ('saved_paths',)
+    sections = {section: [] for section in SECTIONS}
+    first_task = None
+    for task in tasks:
+      summary = {field: task.get(field) for field in fields}
+      # 0 is a valid value, so checking against specific values
+      if summary['report_priority'] in (None, ''):
+        summary['report_priority'] = Priority.LOW
+      if summary['report_priority'] <= self.priority_filter:
+        section = HIGH_PRIORITY
+      else:
+        section = SUCCESS_SECTIONS[summary['successful']]
+      if self.full_report and section == HIGH_PRIORITY and not get_tasks:
+        summary['report_data'] = task.get('report_data')
+      sections[section].append(summary)
+      if (not first_task or
+          summary['report_priority'] < first_task['report_priority']):
+        first_task = summary
+    if not first_task:
+      return 0
+
+    # Generate report header
+    num_results = sum(len(section_tasks) for section_tasks in sections.values())
+    self._write([
+        '\n',
+        fmt.heading1(
+            'Turbinia report {0:s}'.format(first_task.get('request_id'))),
+        fmt.bullet(
+            'Processed {0:d} Tasks for user {1:s}'.format(
+                num_results, first_task.get('requester')))
+    ])
+
+    # Tasks with a higher priority are listed first in each section.
+    for section in SECTIONS:
+      section_tasks = sorted(
+          sections.pop(section), key=itemgetter('report_priority'))
+      self._write(['', fmt.heading1('{0:s} Tasks'.format(section))])
+      if not section_tasks:
+        self._write([fmt.bullet('None')])
+      max_tasks = self._get_max_tasks(section)
+      listed_tasks = section_tasks[:max_tasks]
+      if self.full_report and section == HIGH_PRIORITY:
+        self._write_details(listed_tasks, get_tasks)
+      else:
+        for task in listed_tasks:
+          self._write(format_task(task, show_files=self.all_fields))
+      if len(listed_tasks) < len(section_tasks):
+        self._write_omitted(section_tasks[len(listed_tasks):])
+    return num_results
+
+
+def write_request_report(output, request_id, instance=None, reader=None):
+  """Writes the full report of a request straight from the state manager.
+
+  Unlike TurbiniaClient.write_task_status, this does not set up a client and
+  its task manager, so it is cheap to call from a worker.
+
+  Args:
+    output (file): The text file-like object to write the report to.
+    request_id (str): The Id of the request.
+    instance (str): The Turbinia instance name, by default the configured
+        INSTANCE_ID.
+    reader (TaskReader): The reader to read the Tasks with, by default one that
+        shares the state manager of the process.
+
+  Returns:
+    int: The number of Tasks in the report.
+  """
+  config.LoadConfig()
+  instance = instance or config.INSTANCE_ID
+  reader = reader or TaskReader()
+  writer = TaskReportWriter(
+      output, full_report=True,
+      max_section_tasks=config.REPORT_MAX_SECTION_TASKS,
+      max_report_lines=config.REPORT_MAX_DATA_LINES)
+  tasks = iter_request_tasks(reader, instance, request_id)
+  return writer.write(tasks, functools.partial(reader.get_tasks, instance))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the task report module."""
+
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import mock
+
+from turbinia import state_manager
+from turbinia import task_report
+from turbinia.workers import Priority
+from turbinia.workers import TurbiniaTask
+from turbinia.workers import TurbiniaTaskResult
+
+
+class TestTaskReportWriter(unittest.TestCase):
+  """Tests for the TaskReportWriter class."""
+
+  def setUp(self):
+    self.tasks = []
+    for index in range(6):
+      self.tasks.append({
+          'id': 'task{0:d}'.format(index),
+          'name': 'PlasoTask' if index % 2 else 'GrepTask',
+          'request_id': 'request1',
+          'requester': 'testUser',
+          'report_priority': Priority.CRITICAL if index < 2 else None,
+          'report_data': '\n'.join(['Line'] * 5),
+          'status': 'Completed',
+          'successful': True,
+          'worker_name': 'worker1'
+      })
+    self.output = io.StringIO()
+
+  def testWrite(self):
+    """Tests writing a report with sections cut off."""
+    writer = task_report.TaskReportWriter(
+        self.output, full_report=True, max_report_lines=2,
+        max_section_tasks={task_report.SUCCESSFUL: 1})
+    self.assertEqual(writer.write(self.tasks), 6)
+    report = self.output.getvalue()
+    self.assertIn('Processed 6 Tasks for user testUser', report)
+    self.assertEqual(report.count('## GrepTask'), 1)
+    self.assertEqual(report.count('## PlasoTask'), 1)
+    self.assertEqual(
+        report.count('[3 more lines of reported data truncated]'), 2)
+    self.assertIn(
+        '3 more Tasks not listed: PlasoTask (2), GrepTask (1)', report)
+    self.assertFalse(report.endswith('\n'))
+
+  def testWriteWithGetTasks(self):
+    """Tests that detailed Tasks are read by their ids."""
+    summaries = [{
+        field: task.get(field) for field in task_report.SUMMARY_FIELDS
+    } for task in self.tasks]
+    tasks = {task['id']: task for task in self.tasks}
+    get_tasks = mock.MagicMock(
+        side_effect=lambda task_ids: [tasks[task_id] for task_id in task_ids])
+    writer = task_report.TaskReportWriter(self.output, full_report=True)
+    writer.write(iter(summaries), get_tasks)
+    get_tasks.assert_called_once_with(['task0', 'task1'])
+    self.assertEqual(self.output.getvalue().count('### Task Reported Data'), 2)
+
+  def testWriteNoTasks(self):
+    """Tests that nothing is written without Tasks."""
+    writer = task_report.TaskReportWriter(self.output)
+    self.assertEqual(writer.write([]), 0)
+    self.assertEqual(self.output.getvalue(), '')
+
+  def testIterRequestTasks(self):
+    """Tests reading the Tasks of a request in pages."""
+    mock_state_manager = mock.MagicMock()
+    mock_state_manager.get_request_task_ids.return_value = ['a', 'b', 'c']
+    mock_state_manager.get_tasks.side_effect = (
+        lambda _, task_ids: [dict(id=task_id) for task_id in task_ids])
+    tasks = task_report.iter_request_tasks(
+        mock_state_manager, 'instance', 'request1', page_size=2)
+    self.assertEqual([task['id'] for task in tasks], ['a', 'b', 'c'])
+    mock_state_manager.get_tasks.assert_has_calls(
+        [mock.call('instance', ['a', 'b']),
+         mock.call('instance', ['c'])])
+
+
+class TestWriteRequestReport(unittest.TestCase):
+  """Tests for writing reports straight from the state manager."""
+
+  def setUp(self):
+    patcher = mock.patch('turbinia.state_manager.sqlite3', sqlite3, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.tmp_dir = tempfile.mkdtemp(prefix='turbinia-test-task-report')
+    self.state_manager = state_manager.SQLiteStateManager(
+        os.path.join(self.tmp_dir, 'turbinia.db'))
+    for priority in (Priority.HIGH, Priority.LOW, Priority.LOW):
+      task = TurbiniaTask(request_id='request1', requester='testUser')
+      task.result = TurbiniaTaskResult()
+      task.result.successful = True
+      task.result.report_priority = priority
+      task.result.report_data = 'Reported data'
+      self.state_manager.write_new_task(task)
+
+  def tearDown(self):
+    shutil.rmtree(self.tmp_dir)
+    # pylint: disable=protected-access
+    task_report.TaskReader._state_manager = None
+
+  @mock.patch('turbinia.state_manager.get_state_manager')
+  def testWriteRequestReport(self, mock_get_state_manager):
+    """Tests that the state manager is shared by the readers."""
+    mock_get_state_manager.return_value = self.state_manager
+    for _ in range(2):
+      output = io.StringIO()
+      self.assertEqual(task_report.write_request_report(output, 'request1'), 3)
+    mock_get_state_manager.assert_called_once_with()
+    report = output.getvalue()
+    self.assertIn('Processed 3 Tasks for user testUser', report)
+    self.assertEqual(report.count('Reported data'), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Retention and archival of Task records in the state manager."""
+
+from __future__ import unicode_literals
+
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import uuid
+from datetime import datetime
+from datetime import timedelta
+
+import six
+
+from turbinia import config
+from turbinia.config import DATETIME_FORMAT
+from turbinia import TurbiniaException
+from turbinia.lib import stats_rollup
+
+log = logging.getLogger('turbinia')
+
+# Task states that a retention time can be configured for.
+STATE_SUCCESSFUL = 'successful'
+STATE_FAILED = 'failed'
+STATE_RUNNING = 'running'
+STATES = (STATE_SUCCESSFUL, STATE_FAILED, STATE_RUNNING)
+
+
+def get_task_state(task):
+  """Gets the retention state of a Task.
+
+  Args:
+    task (dict): The Task dict.
+
+  Returns:
+    str: One of STATES.
+  """
+  if task.get('successful') is None:
+    return STATE_RUNNING
+  return STATE_SUCCESSFUL if task['successful'] else STATE_FAILED
+
+
+class TaskArchive(object):
+  """Compressed archive of Task records that were removed from the state store.
+
+  Task records are stored as gzip compressed JSON lines files, with one
+  directory per instance and per day of the last update of the Tasks:
+  <path>/<instance>/<YYYY-MM-DD>/tasks-<time>-<id>.jsonl.gz.  Files are never
+  modified after they are written, so every compaction run adds new files.
+  The path can be a local directory or a gs:// path.
+
+  Attributes:
+    path (str): The base path of the archive.
+  """
+
+  FILE_PATTERN = re.compile(r'^tasks-.*\.jsonl\.gz$')
+  DAY_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+  def __init__(self, path=None):
+    """Initialization for TaskArchive.
+
+    Args:
+      path (str): The base path of the archive, by default the configured
+          TASK_ARCHIVE_PATH.
+
+    Raises:
+      TurbiniaException: If no archive path is set.
+    """
+    config.LoadConfig()
+    self.path = path or config.TASK_ARCHIVE_PATH
+    if not self.path:
+      raise TurbiniaException(
+          'TASK_ARCHIVE_PATH needs to be set to archive Task records.')
+    self._bucket = None
+    self._prefix = None
+    match = re.match(r'gs://([^/]+)/?(.*)$', self.path)
+    if match:
+      from google.cloud import storage
+      client = storage.Client(project=config.TURBINIA_PROJECT)
+      self._bucket = client.bucket(match.group(1))
+      self._prefix = match.group(2).rstrip('/')
+
+  def _join(self, *parts):
+    """Joins a path in the archive.
+
+    Args:
+      *parts (str): The path components relative to the archive path.
+
+    Returns:
+      str: The local path, or the GCS object name.
+    """
+    if self._bucket:
+      return '/'.join([self._prefix] + list(parts)).lstrip('/')
+    return os.path.join(self.path, *parts)
+
+  def _list(self, *parts):
+    """Lists the entries of a directory in the archive.
+
+    Args:
+      *parts (str): The directory relative to the archive path.
+
+    Returns:
+      list(str): The sorted names of the entries in the directory.
+    """
+    path = self._join(*parts)
+    if not self._bucket:
+      return sorted(os.listdir(path)) if os.path.isdir(path) else []
+    prefix = path + '/'
+    iterator = self._bucket.list_blobs(prefix=prefix, delimiter='/')
+    names = [blob.name[len(prefix):] for blob in iterator]
+    names.extend(p[len(prefix):].rstrip('/') for p in iterator.prefixes)
+    return sorted(names)
+
+  def _write(self, data, *parts):
+    """Writes a file to the archive.
+
+    Args:
+      data (bytes): The file content.
+      *parts (str): The file path relative to the archive path.
+    """
+    path = self._join(*parts)
+    if self._bucket:
+      self._bucket.blob(path).upload_from_string(
+          data, content_type='application/gzip')
+      return
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    # Write to a temporary file first so that readers never see partial files.
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file_object:
+      file_object.write(data)
+    os.rename(temp_path, path)
+
+  def _read(self, *parts):
+    """Reads a file from the archive.
+
+    Args:
+      *parts (str): The file path relative to the archive path.
+
+    Returns:
+      file: A file-like object with the file content.
+    """
+    path = self._join(*parts)
+    if self._bucket:
+      return io.BytesIO(self._bucket.blob(path).download_as_string())
+    return open(path, 'rb')
+
+  @staticmethod
+  def _encode_task(task):
+    """Encodes a Task dict as a JSON line.
+
+    Args:
+      task (dict): The Task dict.
+
+    Returns:
+      bytes: The JSON encoded Task followed by a newline.
+    """
+    task = dict(task)
+    if isinstance(task.get('last_update'), datetime):
+      task['last_update'] = task['last_update'].strftime(DATETIME_FORMAT)
+    if isinstance(task.get('run_time'), timedelta):
+      task['run_time'] = task['run_time'].total_seconds()
+    return (json.dumps(task, sort_keys=True) + '\n').encode('utf-8')
+
+  @staticmethod
+  def _decode_task(line):
+    """Decodes a JSON line into a Task dict.
+
+    Args:
+      line (bytes): The JSON encoded Task.
+
+    Returns:
+      dict: The Task dict.
+    """
+    task = json.loads(six.ensure_text(line))
+    if task.get('last_update'):
+      task['last_update'] = datetime.strptime(
+          task['last_update'], DATETIME_FORMAT)
+    if task.get('run_time'):
+      task['run_time'] = timedelta(seconds=task['run_time'])
+    return task
+
+  def _read_tasks(self, *parts):
+    """Reads the Task records of an archive file.
+
+    Args:
+      *parts (str): The file path relative to the archive path.
+
+    Yields:
+      dict: The Task dicts.
+    """
+    with self._read(*parts) as file_object:
+      with gzip.GzipFile(fileobj=file_object, mode='rb') as gzip_file:
+        for line in gzip_file:
+          yield self._decode_task(line)
+
+  def write_tasks(self, instance, tasks):
+    """Writes Task records into one new archive file per day.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      tasks (list(dict)): The Task dicts to archive.
+
+    Returns:
+      list(str): The paths of the written archive files.
+    """
+    days = {}
+    for task in tasks:
+      day = stats_rollup.get_day(task.get('last_update') or datetime.now())
+      days.setdefault(day, []).append(task)
+
+    file_name = 'tasks-{0:s}-{1:s}.jsonl.gz'.format(
+        datetime.now().strftime('%Y%m%dT%H%M%S'),
+        uuid.uuid4().hex[:8])
+    paths = []
+    for day, day_tasks in sorted(days.items()):
+      data = io.BytesIO()
+      with gzip.GzipFile(fileobj=data, mode='wb') as gzip_file:
+        for task in day_tasks:
+          gzip_file.write(self._encode_task(task))
+      self._write(data.getvalue(), instance, day, file_name)
+      paths.append(self._join(instance, day, file_name))
+    return paths
+
+  def get_task_data(
+      self, instance, days=0, task_id=None, request_id=None, user=None):
+    """Gets archived Task records.
+
+    Only the archive files of the days in the time window are read, but
+    queries by task, request or user need to read all files in that window.
+
+    Args:
+      instance (str): The Turbinia instance name.
+      days (int): The number of days we want history for, or 0 for all
+          history.
+      task_id (str): The Id of the task.
+      request_id (str): The Id of the request we want tasks for.
+      user (str): The user of the request we want tasks for.
+
+    Returns:
+      list(dict): The Task dicts.  A Task that was archived more than once
+          is only returned once, with its latest record.
+    """
+    start_day = stats_rollup.get_start_day(days)
+    start_time = datetime.now() - timedelta(days=days) if days else None
+    # Files are listed in the order they were written, so later records of the
+    # same Task replace earlier ones.
+    tasks = {}
+    for day in self._list(instance):
+      if not self.DAY_PATTERN.match(day) or (start_day and day < start_day):
+        continue
+      for file_name in self._list(instance, day):
+        if not self.FILE_PATTERN.match(file_name):
+          continue
+        for task in self._read_tasks(instance, day, file_name):
+          if task_id and task.get('id') != task_id:
+            continue
+          if request_id and task.get('request_id') != request_id:
+            continue
+          if user and task.get('requester') != user:
+            continue
+          last_update = task.get('last_update')
+          if start_time and last_update and last_update < start_time:
+            continue
+          tasks[task.get('id')] = task
+    return list(tasks.values())
+
+  def get_expired_requests(self, state_manager_, instance, days):
+    """Gets the expired requests of archived Tasks.
+
+    A request is expired when all of its Tasks have completed, and none of them
+    have been updated within the given number of days.  Requests that still
+    have Task records in the state manager are left to
+    BaseStateManager.get_expired_requests(), as those records are newer than
+    the archived ones.
+
+    Args:
+      state_manager_ (BaseStateManager): The state manager the Tasks were
+          archived from.
+      instance (str): The Turbinia instance name.
+      days (int): The number of days since the last update of a request.
+
+    Returns:
+      list(str): The ids of the expired requests.
+    """
+    # pylint: disable=protected-access
+    request_ids = state_manager_._get_expired_requests(
+        self.get_task_data(instance), days)
+    return [
+        request_id for request_id in request_ids
+        if not state_manager_.get_request_task_ids(instance, request_id)
+    ]
+
+
+class TaskRetentionManager(object):
+  """Moves Task records that are past their retention time into the archive.
+
+  Task records that were not updated for longer than the retention time of
+  their state are written to the TaskArchive and then deleted from the state
+  manager, so that the size of the state store stays flat under steady load.
+  The statistics rollups are kept, so statistics still cover archived Tasks.
+
+  Attributes:
+    archive (TaskArchive): The archive to move expired Task records into.
+    retention_days (dict): The number of days to keep Task records for, keyed
+        by Task state.  States without a retention time are kept forever.
+  """
+
+  # Number of Task records archived and deleted at a time.
+  BATCH_SIZE = 1000
+
+  def __init__(self, state_manager, retention_days=None, archive=None):
+    """Initialization for TaskRetentionManager.
+
+    Args:
+      state_manager (BaseStateManager): State manager to remove Tasks from.
+      retention_days (dict|int): The number of days to keep Task records for
+          keyed by state, or a single number of days for completed Tasks.  By
+          default the configured TASK_RETENTION_DAYS.
+      archive (TaskArchive): The archive, by default one at the configured
+          TASK_ARCHIVE_PATH.
+
+    Raises:
+      TurbiniaException: If no retention time is set.
+    """
+    config.LoadConfig()
+    self.state_manager = state_manager
+    if retention_days is None:
+      retention_days = config.TASK_RETENTION_DAYS
+    if isinstance(retention_days, int):
+      retention_days = {
+          STATE_SUCCESSFUL: retention_days,
+          STATE_FAILED: retention_days
+      }
+    self.retention_days = {
+        state: days
+        for state, days in (retention_days or {}).items()
+        if state in STATES and days
+    }
+    if not self.retention_days:
+      raise TurbiniaException(
+          'TASK_RETENTION_DAYS needs to be set to compact Task records.')
+    self.archive = archive or TaskArchive()
+
+  def _is_expired(self, task, now):
+    """Checks whether a Task is past the retention time of its state.
+
+    Args:
+      task (dict): The Task dict.
+      now (datetime): The current time.
+
+    Returns:
+      bool: True if the Task record should be archived.
+    """
+    days = self.retention_days.get(get_task_state(task))
+    last_update = task.get('last_update')
+    if not days or not last_update:
+      return False
+    if last_update.tzinfo:
+      last_update = last_update.replace(tzinfo=None)
+    return last_update < now - timedelta(days=days)
+
+  def run(self, instance=None, dry_run=False):
+    """Archives and deletes all expired Task records.
+
+    Args:
+      instance (str): The Turbinia instance name, by default the configured
+          INSTANCE_ID.
+      dry_run (bool): Only count the Task records that would be archived.
+
+    Returns:
+      dict: The number of archived (or to be archived) Task records keyed by
+          Task state.
+    """
+    instance = instance or config.INSTANCE_ID
+    # Task records written by older versions are only found by
+    # get_task_ids_updated_before() once they have been migrated.
+    if not dry_run:
+      self.state_manager.migrate()
+    now = datetime.now()
+    cutoff = now - timedelta(days=min(self.retention_days.values()))
+    task_ids = self.state_manager.get_task_ids_updated_before(instance, cutoff)
+    log.info(
+        'Found {0:d} Task records last updated before {1!s}'.format(
+            len(task_ids), cutoff))
+
+    counts = {state: 0 for state in STATES}
+    for index in range(0, len(task_ids), self.BATCH_SIZE):
+      tasks = self.state_manager.get_tasks(
+          instance, task_ids[index:index + self.BATCH_SIZE])
+      tasks = [task for task in tasks if self._is_expired(task, now)]
+      if not tasks:
+        continue
+      if not dry_run:
+        # Records are only deleted once they are safely in the archive.
+        paths = self.archive.write_tasks(instance, tasks)
+        self.state_manager.delete_tasks(tasks)
+        log.info(
+            'Archived {0:d} Task records into {1:s}'.format(
+                len(tasks), ', '.join(paths)))
+      for task in tasks:
+        counts[get_task_state(task)] += 1
+    return counts
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Copyright 2020 Google Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the task retention module."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+from datetime import timedelta
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import mock
+
+from turbinia import config
+from turbinia import output_manager
+from turbinia import output_retention
+from turbinia import state_manager
+from turbinia import task_retention
+from turbinia import TurbiniaException
+from turbinia.workers import TurbiniaTask
+from turbinia.workers import TurbiniaTaskResult
+
+
+class TestTaskRetentionManager(unittest.TestCase):
+  """Tests for the TaskRetentionManager and TaskArchive classes."""
+
+  def setUp(self):
+    config.LoadConfig()
+    patcher = mock.patch('turbinia.state_manager.sqlite3', sqlite3, create=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.base_dir = tempfile.mkdtemp(prefix='turbinia-test-task-retention')
+    self.state_manager = state_manager.SQLiteStateManager(
+        os.path.join(self.base_dir, 'turbinia.db'))
+    self.archive = task_retention.TaskArchive(
+        os.path.join(self.base_dir, 'archive'))
+    self.instance = config.INSTANCE_ID
+
+    self.tasks = {}
+    test_tasks = [
+        ('old_success', True, 40),
+        ('old_failure', False, 40),
+        ('old_running', None, 40),
+        ('new_success', True, 1),
+    ]
+    for name, successful, days in test_tasks:
+      task = TurbiniaTask(request_id=name, requester='testUser')
+      task.result = TurbiniaTaskResult()
+      task.result.successful = successful
+      task.result.run_time = timedelta(seconds=5)
+      task.last_update = datetime.now() - timedelta(days=days)
+      self.state_manager.write_new_task(task)
+      self.tasks[name] = task
+
+  def tearDown(self):
+    shutil.rmtree(self.base_dir)
+
+  def _get_manager(self, retention_days):
+    """Gets a TaskRetentionManager for the test state manager and archive."""
+    return task_retention.TaskRetentionManager(
+        self.state_manager, retention_days=retention_days, archive=self.archive)
+
+  def testCompact(self):
+    """Tests that expired Task records are moved into the archive."""
+    manager = self._get_manager({'successful': 30, 'failed': 30})
+    with mock.patch.object(self.state_manager, 'migrate') as mock_migrate:
+      counts = manager.run()
+    # Legacy records are migrated first so that they can be found.
+    mock_migrate.assert_called_once_with()
+    self.assertEqual(counts, {'successful': 1, 'failed': 1, 'running': 0})
+
+    remaining = self.state_manager.get_task_data(self.instance)
+    self.assertEqual(
+        sorted(task['request_id'] for task in remaining),
+        ['new_success', 'old_running'])
+
+    archived = self.archive.get_task_data(self.instance)
+    self.assertEqual(
+        sorted(task['request_id'] for task in archived),
+        ['old_failure', 'old_success'])
+    self.assertEqual(archived[0]['run_time'], timedelta(seconds=5))
+    self.assertIsInstance(archived[0]['last_update'], datetime)
+    request_tasks = self.archive.get_task_data(
+        self.instance, request_id='old_failure')
+    self.assertEqual(len(request_tasks), 1)
+    self.assertEqual(self.archive.get_task_data(self.instance, days=30), [])
+
+    # Running Tasks are only archived with their own retention time.
+    counts = self._get_manager({'running': 30}).run()
+    self.assertEqual(counts['running'], 1)
+    self.assertEqual(len(self.archive.get_task_data(self.instance)), 3)
+
+  def testCompactAndRemoveOutput(self):
+    """Tests that the output of compacted requests is still removed."""
+    layout_save = config.OUTPUT_DIR_LAYOUT
+    config.OUTPUT_DIR_LAYOUT = output_manager.LAYOUT_HIERARCHICAL
+    self.addCleanup(setattr, config, 'OUTPUT_DIR_LAYOUT', layout_save)
+    output_dir = os.path.join(self.base_dir, 'output')
+    tmp_dir = os.path.join(self.base_dir, 'tmp')
+    for request_id in self.tasks:
+      os.makedirs(
+          os.path.join(
+              output_dir, output_manager.get_request_output_path(request_id)))
+
+    self._get_manager(30).run()
+    output_retention_manager = output_retention.OutputRetentionManager(
+        self.state_manager, retention_days=7, output_dirs=[output_dir],
+        tmp_dirs=[tmp_dir], task_archive=self.archive)
+    removed = output_retention_manager.run()
+    self.assertEqual(
+        sorted(request_id for request_id, _, _, _ in removed),
+        ['old_failure', 'old_success'])
+
+  def testCompactDryRun(self):
+    """Tests that a dry run does not archive or delete Task records."""
+    counts = self._get_manager(30).run(dry_run=True)
+    self.assertEqual(counts, {'successful': 1, 'failed': 1, 'running': 0})
+    self.assertEqual(len(self.state_manager.get_task_data(self.instance)), 4)
+    self.assertEqual(self.archive.get_task_data(self.instance), [])
+
+  def testNoRetention(self):
+    """Tests that a retention time is required."""
+    self.assertRaises(TurbiniaException, self._get_manager, {'running': None})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -51,6 +51,75 @@ def csv_list(string):
   return string.split(',')
 
 
+def check_evidence(evidence_):
+  """Checks that Evidence can be processed by this Turbinia instance.
+
+  Args:
+    evidence_ (Evidence): The Evidence to check.
+
+  Raises:
+    TurbiniaException: If the Evidence type is not supported by this instance.
+  """
+  if config.SHARED_FILESYSTEM and evidence_.cloud_only:
+    raise TurbiniaException(
+        'The evidence type {0:s} is Cloud only, and this instance of '
+        'Turbinia is not a cloud instance.'.format(evidence_.type))
+  elif not config.SHARED_FILESYSTEM and not evidence_.cloud_only:
+    raise TurbiniaException(
+        'The evidence type {0:s} cannot run on Cloud instances of '
+        'Turbinia. Consider wrapping it in a '
+        'GoogleCloudDiskRawEmbedded or other Cloud compatible '
+        'object'.format(evidence_.type))
+
+
+def get_recipe(args, filter_patterns=None):
+  """Gets the recipe for new requests from the command line arguments.
+
+  Args:
+    args (argparse.Namespace): The parsed command line arguments.
+    filter_patterns (list(str)): The patterns read from the filter patterns
+        file.
+
+  Returns:
+    dict: The serialized recipe.
+
+  Raises:
+    TurbiniaException: If a recipe is combined with other processing options.
+  """
+  if args.recipe:
+    if (args.jobs_blacklist or args.jobs_whitelist or
+        args.filter_patterns_file or args.recipe_config):
+      raise TurbiniaException(
+          'Specifying a recipe is incompatible with defining'
+          ' jobs white/black lists, filter patterns or recipe_config'
+          'parameters separately.')
+    recipe_obj = TurbiniaRecipe(
+        os.path.join(config.RECIPE_FILE_DIR, args.recipe))
+    recipe_obj.load()
+    return recipe_obj.serialize()
+
+  recipe = {}
+  if args.filter_patterns_file:
+    recipe['filter_patterns'] = filter_patterns
+  if args.jobs_blacklist:
+    recipe['jobs_blacklist'] = args.jobs_blacklist
+  if args.jobs_whitelist:
+    recipe['jobs_whitelist'] = args.jobs_whitelist
+  return recipe
+
+
+def print_requests(requests):
+  """Prints the ids and Evidence names of published requests.
+
+  Args:
+    requests (list(TurbiniaRequest)): The requests that have been published.
+  """
+  for request in requests:
+    names = [evidence_item.name for evidence_item in request.evidence]
+    print('{0:s}\t{1:s}'.format(request.request_id, ', '.join(names)))
+  sys.stdout.flush()
+
+
 def main():
   """Main function for turbiniactl"""
   # TODO(aarontp): Allow for single run mode when
@@ -201,6 +270,31 @@ def main():
   parser_bitlocker.add_argument(
       '-n', '--name', help='Descriptive name of the evidence', required=False)
 
+  # Parser options for submitting many pieces of Evidence at once
+  parser_batch = subparsers.add_parser(
+      'batch', help='Process many pieces of Evidence from a manifest file or a '
+      'glob of local paths, with one request per piece of Evidence by default')
+  parser_batch.add_argument(
+      '-m', '--manifest', help='JSON file with a list of Evidence attributes, '
+      'each with a "type" attribute naming the Evidence type, e.g. '
+      '[{"type": "RawDisk", "source_path": "/evidence/disk1.dd"}]',
+      required=False)
+  parser_batch.add_argument(
+      '-g', '--glob', help='Glob pattern of local Evidence paths, e.g. '
+      '"/evidence/case1/*.dd"', required=False)
+  parser_batch.add_argument(
+      '-t', '--evidence_type', default='RawDisk',
+      help='The Evidence type for paths matching --glob')
+  parser_batch.add_argument(
+      '-e', '--evidence_per_request', default=1, type=int,
+      help='Number of pieces of Evidence to put in each request')
+  parser_batch.add_argument(
+      '-b', '--batch_size', type=int, required=False,
+      help='Number of requests to send at a time')
+  parser_batch.add_argument(
+      '--rate', type=float, required=False,
+      help='Maximum number of requests to send per second')
+
   # Parser options for Google Cloud Disk Evidence type
   parser_googleclouddisk = subparsers.add_parser(
       'googleclouddisk',
@@ -331,6 +425,10 @@ def main():
   # Parser options for Turbinia status command
   parser_status = subparsers.add_parser(
       'status', help='Get Turbinia Task status')
+  parser_status.add_argument(
+      '-A', '--archived', action='store_true', required=False,
+      help='Also search the Task records archived by '
+      '"turbiniactl maintenance compact"')
   parser_status.add_argument(
       '-c', '--close_tasks', action='store_true',
       help='Close tasks based on Request ID or Task ID', required=False)
@@ -344,6 +442,10 @@ def main():
   parser_status.add_argument(
       '-f', '--force', help='Gatekeeper for --close_tasks', action='store_true',
       required=False)
+  parser_status.add_argument(
+      '-F', '--follow', action='store_true', required=False,
+      help='Print Task state changes of the request given with --request_id '
+      'as they happen, until the request has completed')
   parser_status.add_argument(
       '-r', '--request_id', help='Show tasks with this Request ID',
       required=False)
@@ -371,6 +473,39 @@ def main():
   # Server
   subparsers.add_parser('server', help='Run Turbinia Server')
 
+  # Remove expired request output
+  parser_cleanupoutput = subparsers.add_parser(
+      'cleanupoutput',
+      help='Delete or archive the local output of requests that completed '
+      'more than OUTPUT_RETENTION_DAYS ago')
+  parser_cleanupoutput.add_argument(
+      '-D', '--dry_run', action='store_true',
+      help='Only show the output that would be removed', required=False)
+  parser_cleanupoutput.add_argument(
+      '-d', '--days', type=int, required=False,
+      help='Number of days to keep request output for, overrides '
+      'OUTPUT_RETENTION_DAYS')
+
+  # State store maintenance
+  parser_maintenance = subparsers.add_parser(
+      'maintenance', help='Maintenance of the Turbinia state store')
+  maintenance_subparsers = parser_maintenance.add_subparsers(
+      dest='maintenance_command', title='Maintenance commands')
+  parser_compact = maintenance_subparsers.add_parser(
+      'compact', help='Move Task records that are older than '
+      'TASK_RETENTION_DAYS into the archive at TASK_ARCHIVE_PATH')
+  parser_compact.add_argument(
+      '-D', '--dry_run', action='store_true',
+      help='Only show the number of Task records that would be archived',
+      required=False)
+  parser_compact.add_argument(
+      '-d', '--days', type=int, required=False,
+      help='Number of days to keep completed Task records for, overrides '
+      'TASK_RETENTION_DAYS')
+  maintenance_subparsers.add_parser(
+      'migrate', help='Convert Task records written by older versions of '
+      'Turbinia, this is also done when the server starts')
+
   args = parser.parse_args()
 
   # Load the config before final logger setup so we can the find the path to the
@@ -613,44 +748,109 @@ def main():
           client.format_task_statistics(
               instance=config.INSTANCE_ID, project=config.TURBINIA_PROJECT,
               region=region, days=args.days_history, task_id=args.task_id,
-              request_id=args.request_id, user=args.user, csv=args.csv))
+              request_id=args.request_id, user=args.user, csv=args.csv,
+              archived=args.archived))
       sys.exit(0)
 
-    if args.wait and args.request_id:
+    if (args.wait or args.follow) and args.request_id:
+      callback = None
+      if args.follow:
+        callback = lambda task: print(client.format_task_event(task))
       client.wait_for_request(
           instance=config.INSTANCE_ID, project=config.TURBINIA_PROJECT,
           region=region, request_id=args.request_id, user=args.user,
-          poll_interval=args.poll_interval)
-    elif args.wait and not args.request_id:
+          poll_interval=args.poll_interval, callback=callback)
+    elif args.wait or args.follow:
       log.info(
-          '--wait requires --request_id, which is not specified. '
+          '--wait and --follow require --request_id, which is not specified. '
           'turbiniactl will exit without waiting.')
 
-    print(
-        client.format_task_status(
-            instance=config.INSTANCE_ID, project=config.TURBINIA_PROJECT,
-            region=region, days=args.days_history, task_id=args.task_id,
-            request_id=args.request_id, user=args.user,
-            all_fields=args.all_fields, full_report=args.full_report,
-            priority_filter=args.priority_filter))
+    # The report is written while the Tasks are read so that reports of large
+    # requests are not built up in memory first.
+    client.write_task_status(
+        sys.stdout, instance=config.INSTANCE_ID,
+        project=config.TURBINIA_PROJECT, region=region, days=args.days_history,
+        task_id=args.task_id, request_id=args.request_id, user=args.user,
+        all_fields=args.all_fields, full_report=args.full_report,
+        priority_filter=args.priority_filter, archived=args.archived)
+    sys.stdout.write('\n')
   elif args.command == 'listjobs':
     log.info('Available Jobs:')
     client.list_jobs()
+  elif args.command == 'cleanupoutput':
+    from turbinia import output_retention
+    from turbinia import state_manager
+    retention_manager = output_retention.OutputRetentionManager(
+        state_manager.get_state_manager(), retention_days=args.days)
+    removed = retention_manager.run(dry_run=args.dry_run)
+    for request_id, request_dir, size, action in removed:
+      print(
+          '{0:s}\t{1:s}\t{2:d}\t{3:s}'.format(
+              request_id, request_dir, size,
+              'would be ' + action if args.dry_run else action))
+    print(
+        '{0:d} bytes of output in {1:d} directories {2:s}'.format(
+            sum(entry[2] for entry in removed), len(removed),
+            'would be removed' if args.dry_run else 'removed'))
+  elif args.command == 'maintenance' and args.maintenance_command == 'compact':
+    from turbinia import task_retention
+    from turbinia import state_manager
+    retention_manager = task_retention.TaskRetentionManager(
+        state_manager.get_state_manager(), retention_days=args.days)
+    counts = retention_manager.run(dry_run=args.dry_run)
+    for state, count in sorted(counts.items()):
+      print('{0:s}\t{1:d}'.format(state, count))
+    print(
+        '{0:d} Task records {1:s}'.format(
+            sum(counts.values()),
+            'would be archived' if args.dry_run else 'archived'))
+  elif args.command == 'maintenance' and args.maintenance_command == 'migrate':
+    from turbinia import state_manager
+    count = state_manager.get_state_manager().migrate()
+    print('{0:d} Task records converted'.format(count))
+  elif args.command == 'batch':
+    from turbinia import request_batch
+    if bool(args.manifest) == bool(args.glob):
+      log.error('Exactly one of --manifest or --glob must be specified')
+      sys.exit(1)
+    if args.run_local:
+      log.error('--run_local cannot be used with batch requests')
+      sys.exit(1)
+    try:
+      if args.manifest:
+        batch_evidence = request_batch.load_manifest(args.manifest)
+      else:
+        batch_evidence = request_batch.glob_evidence(
+            args.glob, args.evidence_type)
+      if not args.force_evidence:
+        for evidence_item in batch_evidence:
+          check_evidence(evidence_item)
+      recipe = get_recipe(args, filter_patterns)
+      requests = request_batch.create_requests(
+          batch_evidence, requester=getpass.getuser(), recipe=recipe,
+          evidence_per_request=args.evidence_per_request)
+    except TurbiniaException as exception:
+      log.error(str(exception))
+      sys.exit(1)
+
+    if args.dump_json:
+      for request in requests:
+        print(request.to_json())
+      sys.exit(0)
+    log.info(
+        'Creating {0:d} requests for {1:d} pieces of evidence'.format(
+            len(requests), len(batch_evidence)))
+    submitter = request_batch.BatchSubmitter(
+        client.send_requests, batch_size=args.batch_size, rate=args.rate)
+    submitter.submit(requests, callback=print_requests)
   else:
     log.warning('Command {0!s} not implemented.'.format(args.command))
 
   if evidence_ and not args.force_evidence:
-    if config.SHARED_FILESYSTEM and evidence_.cloud_only:
-      log.error(
-          'The evidence type {0:s} is Cloud only, and this instance of '
-          'Turbinia is not a cloud instance.'.format(evidence_.type))
-      sys.exit(1)
-    elif not config.SHARED_FILESYSTEM and not evidence_.cloud_only:
-      log.error(
-          'The evidence type {0:s} cannot run on Cloud instances of '
-          'Turbinia. Consider wrapping it in a '
-          'GoogleCloudDiskRawEmbedded or other Cloud compatible '
-          'object'.format(evidence_.type))
+    try:
+      check_evidence(evidence_)
+    except TurbiniaException as exception:
+      log.error(str(exception))
       sys.exit(1)
 
   # If we have evidence to process and we also want to run as a server, then
@@ -666,26 +866,7 @@ def main():
     request = TurbiniaRequest(
         request_id=args.request_id, requester=getpass.getuser())
     request.evidence.append(evidence_)
-    if args.recipe:
-      if (args.jobs_blacklist or args.jobs_whitelist or
-          args.filter_patterns_file or args.recipe_config):
-        raise TurbiniaException(
-            'Specifying a recipe is incompatible with defining'
-            ' jobs white/black lists, filter patterns or recipe_config'
-            'parameters separately.'
-        )
-      recipe_obj = TurbiniaRecipe(
-          os.path.join(config.RECIPE_FILE_DIR, args.recipe))
-      recipe_obj.load()
-      request.recipe = recipe_obj.serialize()
-    else:
-      request.recipe = {}
-      if args.filter_patterns_file:
-        request.recipe['filter_patterns'] = filter_patterns
-      if args.jobs_blacklist:
-        request.recipe['jobs_blacklist'] = args.jobs_blacklist
-      if args.jobs_whitelist:
-        request.recipe['jobs_whitelist'] = args.jobs_whitelist
+    request.recipe = get_recipe(args, filter_patterns)
     if args.dump_json:
       print(request.to_json().encode('utf-8'))
       sys.exit(0)
@@ -166,12 +166,16 @@ class TurbiniaTaskResult(object):
     self.log(status)
     self.status = status
 
+    # Copyable evidence is saved together so that Tasks creating many output
+    # files can save them concurrently.
+    copyable_evidence = []
     for evidence in self.evidence:
       if evidence.source_path:
         if os.path.exists(evidence.source_path):
-          self.saved_paths.append(evidence.source_path)
           if not task.run_local and evidence.copyable:
-            task.output_manager.save_evidence(evidence, self)
+            copyable_evidence.append(evidence)
+          else:
+            self.saved_paths.append(evidence.source_path)
         else:
           self.log(
               'Evidence {0:s} has missing file at source_path {1!s} so '
@@ -184,6 +188,9 @@ class TurbiniaTaskResult(object):
       if not evidence.request_id:
         evidence.request_id = self.request_id
 
+    if copyable_evidence:
+      task.output_manager.queue_evidence_batch(copyable_evidence, self)
+
     try:
       self.input_evidence.postprocess()
     # Adding a broad exception here because we want to try post-processing
@@ -206,7 +213,7 @@ class TurbiniaTaskResult(object):
         f.write('\n'.join(self._log))
         f.write('\n')
       if not task.run_local:
-        task.output_manager.save_local_file(logfile, self)
+        task.output_manager.queue_local_file(logfile, self)
 
     self.closed = True
     log.debug('Result close successful. Status is [{0:s}]'.format(self.status))
@@ -331,6 +338,11 @@ class TurbiniaTask(object):
             evidence created from this task.
   """
 
+  # Whether this Task reads copyable Evidence with Evidence.open() instead of
+  # from a local copy, so that the Evidence data is only fetched from storage
+  # as it is read rather than retrieved in full before the Task runs.
+  STREAMING_EVIDENCE = False
+
   # The list of attributes that we will persist into storage
   STORED_ATTRIBUTES = [
       'id', 'job_id', 'last_update', 'name', 'request_id', 'requester'
@@ -449,7 +461,7 @@ class TurbiniaTask(object):
         continue
       result.log('Output log file found at {0:s}'.format(file_))
       if not self.run_local:
-        self.output_manager.save_local_file(file_, result)
+        self.output_manager.queue_local_file(file_, result)
 
     if ret not in success_codes:
       message = 'Execution of [{0!s}] failed with status {1:d}'.format(cmd, ret)
@@ -466,7 +478,7 @@ class TurbiniaTask(object):
           continue
         result.log('Output save file at {0:s}'.format(file_))
         if not self.run_local:
-          self.output_manager.save_local_file(file_, result)
+          self.output_manager.queue_local_file(file_, result)
 
       for evidence in new_evidence:
         # If the local path is set in the Evidence, we check to make sure that
@@ -514,11 +526,17 @@ class TurbiniaTask(object):
           request_id=self.request_id, job_id=self.job_id)
       self.result.setup(self)
 
+    streaming = False
     if not self.run_local:
       if evidence.copyable and not config.SHARED_FILESYSTEM:
-        self.output_manager.retrieve_evidence(evidence)
+        if self.STREAMING_EVIDENCE and evidence.saved_path:
+          streaming = True
+          evidence.set_remote_opener(self.output_manager.open_evidence)
+        else:
+          self.output_manager.retrieve_evidence(evidence)
 
-    if evidence.source_path and not os.path.exists(evidence.source_path):
+    if (evidence.source_path and not streaming and
+        not os.path.exists(evidence.source_path)):
       raise TurbiniaException(
           'Evidence source path {0:s} does not exist'.format(
               evidence.source_path))
@@ -556,7 +574,8 @@ class TurbiniaTask(object):
       try:
         log.debug('Checking TurbiniaTaskResult for serializability')
         pickle.dumps(result)
-      except (TypeError, pickle.PicklingError) as exception:
+      except (TypeError, NotImplementedError,
+              pickle.PicklingError) as exception:
         bad_message = (
             'Error pickling TurbiniaTaskResult object. Returning a new result '
             'with the pickling error, and all previous result data will be '
@@ -691,6 +710,19 @@ class TurbiniaTask(object):
         # Check the result again after closing to make sure it's still good.
         self.result = self.validate_result(self.result)
 
+    # Output is saved in the background, and waiting for it happens outside of
+    # the lock so that the next Task can start on this host in the meantime.
+    # The result is only returned once all output has been saved.
+    try:
+      self.output_manager.wait_for_uploads()
+    except TurbiniaException as exception:
+      message = 'Saving output for Task {0:s} failed: {1!s}'.format(
+          self.name, exception)
+      log.error(message)
+      self.result.log(message, level=logging.ERROR)
+      self.result.successful = False
+      self.result.status = message
+
     if original_result_id != self.result.id:
       log.debug(
           'Result object {0:s} is different from original {1!s} after task '
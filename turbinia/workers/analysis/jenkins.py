@@ -24,6 +24,8 @@ from turbinia.evidence import ReportText
 from turbinia.lib import text_formatter as fmt
 from turbinia.workers import TurbiniaTask
 from turbinia.workers import Priority
+from turbinia.workers.docker import get_source_paths
+from turbinia.workers.docker import merge_container_reports
 from turbinia.lib.utils import extract_files
 from turbinia.lib.utils import bruteforce_password_hashes
 
@@ -31,34 +33,28 @@ from turbinia.lib.utils import bruteforce_password_hashes
 class JenkinsAnalysisTask(TurbiniaTask):
   """Task to analyze a Jenkins install."""
 
-  def run(self, evidence, result):
-    """Run the Jenkins worker.
+  def _analyze_path(self, disk_path, output_dir):
+    """Analyzes the Jenkins install of a file system.
 
     Args:
-        evidence (Evidence object):  The evidence to process
-        result (TurbiniaTaskResult): The object to place task results into.
+      disk_path (str): Path to the file system.
+      output_dir (str): Path to the directory to extract files to.
 
     Returns:
-        TurbiniaTaskResult object.
-    """
-
-    # Where to store the resulting output file.
-    output_file_name = 'jenkins_analysis.txt'
-    output_file_path = os.path.join(self.output_dir, output_file_name)
-
-    # What type of evidence we should output.
-    output_evidence = ReportText(source_path=output_file_path)
+      Tuple(
+        report_text(str): The report data
+        report_priority(int): The priority of the report (0 - 100)
+        summary(str): A summary of the report (used for task status)
+      )
 
+    Raises:
+      TurbiniaException: If the files can not be extracted.
+    """
     # TODO(aarontp): We should find a more optimal solution for this because
     # this requires traversing the entire filesystem and extracting more files
     # than we need.  Tracked in https://github.com/google/turbinia/issues/402
-    try:
-      collected_artifacts = extract_files(
-          file_name='config.xml', disk_path=evidence.local_path,
-          output_dir=os.path.join(self.output_dir, 'artifacts'))
-    except TurbiniaException as e:
-      result.close(self, success=False, status=str(e))
-      return result
+    collected_artifacts = extract_files(
+        file_name='config.xml', disk_path=disk_path, output_dir=output_dir)
 
     jenkins_artifacts = []
     jenkins_re = re.compile(r'^.*jenkins[^\/]*(\/users\/[^\/]+)*\/config\.xml$')
@@ -80,7 +76,39 @@ class JenkinsAnalysisTask(TurbiniaTask):
 
       credentials.extend(extracted_credentials)
 
-    (report, priority, summary) = self.analyze_jenkins(version, credentials)
+    return self.analyze_jenkins(version, credentials)
+
+  def run(self, evidence, result):
+    """Run the Jenkins worker.
+
+    Args:
+        evidence (Evidence object):  The evidence to process
+        result (TurbiniaTaskResult): The object to place task results into.
+
+    Returns:
+        TurbiniaTaskResult object.
+    """
+
+    # Where to store the resulting output file.
+    output_file_name = 'jenkins_analysis.txt'
+    output_file_path = os.path.join(self.output_dir, output_file_name)
+
+    # What type of evidence we should output.
+    output_evidence = ReportText(source_path=output_file_path)
+
+    reports = []
+    try:
+      for container_id, source_path in get_source_paths(evidence):
+        output_dir = os.path.join(self.output_dir, 'artifacts')
+        if container_id:
+          output_dir = os.path.join(output_dir, container_id)
+        container_report = self._analyze_path(source_path, output_dir)
+        reports.append((container_id,) + container_report)
+    except TurbiniaException as e:
+      result.close(self, success=False, status=str(e))
+      return result
+
+    (report, priority, summary) = merge_container_reports(reports)
     output_evidence.text_data = report
     result.report_data = report
     result.report_priority = priority
@@ -11,11 +11,13 @@
 
 from __future__ import unicode_literals
 
+import logging
 import os
 
 from turbinia import config
 from turbinia.evidence import ExportedFileArtifact
 from turbinia.workers import TurbiniaTask
+from turbinia.workers.docker import get_source_paths
 
 
 class FileArtifactExtractionTask(TurbiniaTask):
@@ -30,7 +32,7 @@ class FileArtifactExtractionTask(TurbiniaTask):
       'vss_stores': 'all',
       'extensions': [],
       'names': [],
-      'signatures': [], 
+      'signatures': [],
       'date_filter': ''
   }
 
@@ -44,7 +46,7 @@ class FileArtifactExtractionTask(TurbiniaTask):
         if v:
           cmd.extend([prepend + k, ','.join(v)])
       elif isinstance(v, bool):
-        if v: 
+        if v:
           cmd.append(prepend + k)
       elif isinstance(v, str):
         if v:
@@ -68,19 +70,30 @@ class FileArtifactExtractionTask(TurbiniaTask):
     if self.task_variant:
       self.task_conf.update(evidence.config[self.task_variant])
 
-    cmd = self.build_command()
-
-    if config.DEBUG_TASKS:
-      cmd.append('-d')
-    cmd.append(evidence.local_path)
-
-    result.log('Running image_export as [{0:s}]'.format(' '.join(cmd)))
-
-    ret, _ = self.execute(cmd, result, log_files=[image_export_log])
-    if ret:
-      result.close(
-          self, False, 'image_export.py failed')
-            
+    source_paths = get_source_paths(evidence)
+    failed = []
+    for container_id, source_path in source_paths:
+      cmd = self.build_command()
+
+      if config.DEBUG_TASKS:
+        cmd.append('-d')
+      if container_id:
+        cmd.extend(['-w', os.path.join(export_directory, container_id)])
+      cmd.append(source_path)
+
+      result.log('Running image_export as [{0:s}]'.format(' '.join(cmd)))
+
+      ret, _ = self.execute(cmd, result, log_files=[image_export_log])
+      if ret:
+        # The other containers of a DockerContainerCollection are still
+        # exported when one of them fails.
+        result.log(
+            'image_export.py failed for {0:s}'.format(source_path),
+            level=logging.ERROR)
+        failed.append(container_id or source_path)
+
+    if len(failed) == len(source_paths):
+      result.close(self, False, 'image_export.py failed')
       return result
 
     for dirpath, _, filenames in os.walk(export_directory):
@@ -91,8 +104,11 @@ class FileArtifactExtractionTask(TurbiniaTask):
         result.log('Adding artifact {0:s}'.format(filename))
         result.add_evidence(exported_artifact, evidence.config)
 
-    result.close(
-        self, True, 'Extracted {0:d} new {1:s} artifacts'.format(
-            len(result.evidence), self.artifact_name))
+    status = 'Extracted {0:d} new {1:s} artifacts'.format(
+        len(result.evidence), self.artifact_name)
+    if failed:
+      status = '{0:s}, image_export.py failed for containers {1:s}'.format(
+          status, ', '.join(failed))
+    result.close(self, True, status)
 
     return result
@@ -15,29 +15,80 @@
 
 from __future__ import unicode_literals
 
-import json
 import logging
 import os
-import subprocess
 
+from turbinia import config
 from turbinia import TurbiniaException
 from turbinia.evidence import DockerContainer
+from turbinia.evidence import DockerContainerCollection
+from turbinia.lib import text_formatter as fmt
+from turbinia.processors import docker
 from turbinia.workers import Priority
 from turbinia.workers import TurbiniaTask
 
 log = logging.getLogger('turbinia')
 
 
+def get_source_paths(evidence, path_attribute='local_path'):
+  """Gets the file systems to analyze from an Evidence.
+
+  A DockerContainerCollection has multiple container file systems mounted,
+  which are analyzed separately.
+
+  Args:
+    evidence (Evidence): The Evidence to analyze.
+    path_attribute (str): The name of the Evidence attribute with the path of
+        Evidence that is not a DockerContainerCollection.
+
+  Returns:
+    list(tuple): The container ID, or None if the Evidence is not a
+        DockerContainerCollection, and the path of each file system.
+  """
+  if isinstance(evidence, DockerContainerCollection):
+    return sorted(evidence.mount_paths.items())
+  return [(None, getattr(evidence, path_attribute))]
+
+
+def merge_container_reports(reports):
+  """Merges the reports of the file systems returned by get_source_paths().
+
+  Args:
+    reports (list(tuple)): The container ID, report text, priority and summary
+        of each analyzed file system.
+
+  Returns:
+    Tuple(
+      report_text(str): The report data
+      report_priority(int): The priority of the report (0 - 100)
+      summary(str): A summary of the report (used for task status)
+    )
+  """
+  if len(reports) == 1 and reports[0][0] is None:
+    return tuple(reports[0][1:])
+  if not reports:
+    return ('', Priority.LOW, 'No containers to analyze')
+
+  report = []
+  for container_id, report_text, _, _ in reports:
+    report.append(fmt.heading3('Container {0:s}'.format(container_id)))
+    report.append(report_text)
+  priority = min(report_priority for _, _, report_priority, _ in reports)
+  summaries = [
+      summary for _, _, report_priority, summary in reports
+      if report_priority == priority
+  ]
+  summary = '{0:s} in {1:d} of {2:d} containers'.format(
+      summaries[0], len(summaries), len(reports))
+  return ('\n'.join(report), priority, summary)
+
+
 class DockerContainersEnumerationTask(TurbiniaTask):
   """Enumerates Docker containers on Linux"""
 
   def GetContainers(self, evidence):
     """Lists the containers from an input Evidence.
 
-    We use subprocess to run the DockerExplorer script, instead of using the
-    Python module, because we need to make sure all DockerExplorer code runs
-    as root.
-
     Args:
       evidence (Evidence): the input Evidence.
 
@@ -47,42 +98,17 @@ class DockerContainersEnumerationTask(TurbiniaTask):
     Raises:
       TurbiniaException: when the docker-explorer tool failed to run.
     """
-
     docker_dir = os.path.join(evidence.mount_path, 'var', 'lib', 'docker')
-
-    containers_info = None
-
-    de_binary = None
-    for path in os.environ['PATH'].split(os.pathsep):
-      tentative_path = os.path.join(path, 'de.py')
-      if os.path.exists(tentative_path):
-        de_binary = tentative_path
-        break
-    if not de_binary:
-      raise TurbiniaException('Could not find docker-explorer script: de.py')
-
-    # TODO(rgayon): use docker-explorer exposed constant when
-    # https://github.com/google/docker-explorer/issues/80 is in.
-    docker_explorer_command = [
-        'sudo', de_binary, '-r', docker_dir, 'list', 'all_containers'
-    ]
-    log.info('Running {0:s}'.format(' '.join(docker_explorer_command)))
-    try:
-      json_string = subprocess.check_output(docker_explorer_command).decode(
-          'utf-8')
-    except json.JSONDecodeError as e:
-      raise TurbiniaException(
-          'Error decoding JSON output from de.py: {0!s}'.format(e))
-    except subprocess.CalledProcessError as e:
-      raise TurbiniaException('de.py returned an error: {0!s}'.format(e))
-
-    containers_info = json.loads(json_string)
-
-    return containers_info
+    mount_manager = docker.DockerContainerMountManager(docker_dir)
+    return mount_manager.list_containers()
 
   def run(self, evidence, result):
     """Run the docker-explorer tool to list containerss.
 
+    When the DOCKER_CONTAINER_BATCH_SIZE config option is set, the containers
+    are grouped into DockerContainerCollection evidence of up to that many
+    containers, instead of creating a DockerContainer evidence per container.
+
     Args:
        evidence (Evidence object):  The evidence to process
        result (TurbiniaTaskResult): The object to place task results into.
@@ -98,13 +124,20 @@ class DockerContainersEnumerationTask(TurbiniaTask):
         'Error enumerating Docker containers, evidence has no mounted '
         'filesystem')
     found_containers = []
+    batch_size = config.DOCKER_CONTAINER_BATCH_SIZE
     try:
       containers_info = self.GetContainers(evidence)
       for container_info in containers_info:
         container_id = container_info.get('container_id')
         found_containers.append(container_id)
-        container_evidence = DockerContainer(container_id=container_id)
-        result.add_evidence(container_evidence, evidence.config)
+        if not batch_size:
+          container_evidence = DockerContainer(container_id=container_id)
+          result.add_evidence(container_evidence, evidence.config)
+      if batch_size:
+        for index in range(0, len(found_containers), batch_size):
+          container_evidence = DockerContainerCollection(
+              container_ids=found_containers[index:index + batch_size])
+          result.add_evidence(container_evidence, evidence.config)
       success = True
       status_report = 'Found {0!s} containers: {1:s}'.format(
           len(found_containers), ' '.join(found_containers))
@@ -22,7 +22,9 @@ import textwrap
 import mock
 
 from turbinia.evidence import BulkExtractorOutput
+from turbinia.workers import artifact
 from turbinia.workers import docker
+from turbinia.workers import Priority
 from turbinia.workers.workers_test import TestTurbiniaTaskBase
 from turbinia.workers import TurbiniaTaskResult
 
@@ -61,6 +63,89 @@ class DockerTaskTest(TestTurbiniaTaskBase):
     self.assertEqual(len(result.evidence), 2)
     self.assertEqual(result.report_data, 'Found 2 containers: 12 3a')
 
+  @mock.patch('turbinia.workers.docker.config')
+  @mock.patch(
+      'turbinia.workers.docker.DockerContainersEnumerationTask.GetContainers')
+  def testDockerContainersEnumerationRunBatched(
+      self, get_containers_mock, config_mock):
+    """Test DockerContainersEnumeration task run with batched containers."""
+    config_mock.DOCKER_CONTAINER_BATCH_SIZE = 2
+    get_containers_mock.return_value = [
+        {
+            'container_id': '12'
+        },
+        {
+            'container_id': '3a'
+        },
+        {
+            'container_id': '4b'
+        },
+    ]
+    result = self.task.run(self.evidence, self.result)
+
+    self.assertEqual(len(result.evidence), 2)
+    self.assertIsInstance(result.evidence[0], docker.DockerContainerCollection)
+    self.assertEqual(result.evidence[0].container_ids, ['12', '3a'])
+    self.assertEqual(result.evidence[1].container_ids, ['4b'])
+    self.assertEqual(result.report_data, 'Found 3 containers: 12 3a 4b')
+
+
+class DockerContainerCollectionTest(TestTurbiniaTaskBase):
+  """Tests for Tasks processing DockerContainerCollection evidence."""
+
+  def setUp(self):
+    # pylint: disable=arguments-differ
+    super(DockerContainerCollectionTest,
+          self).setUp(task_class=artifact.FileArtifactExtractionTask)
+    self.setResults(mock_run=False)
+    self.task.output_dir = self.task.base_output_dir
+    self.task.artifact_name = 'TestArtifact'
+    self.collection = docker.DockerContainerCollection(
+        container_ids=['12', '3a'])
+    self.collection.mount_paths = {'12': '/mnt/12', '3a': '/mnt/3a'}
+
+  def testGetSourcePaths(self):
+    """Test getting the file systems of collections and other evidence."""
+    source_paths = docker.get_source_paths(self.collection)
+    self.assertEqual(source_paths, [('12', '/mnt/12'), ('3a', '/mnt/3a')])
+    self.evidence.device_path = '/dev/loop0'
+    self.assertEqual(
+        docker.get_source_paths(self.evidence, path_attribute='device_path'),
+        [(None, '/dev/loop0')])
+
+  def testMergeContainerReports(self):
+    """Test merging the reports of the containers of a collection."""
+    reports = [
+        ('12', 'Report 12', Priority.LOW, 'Nothing found'),
+        ('3a', 'Report 3a', Priority.CRITICAL, 'Issues found'),
+    ]
+    report, priority, summary = docker.merge_container_reports(reports)
+    self.assertIn('Container 3a', report)
+    self.assertIn('Report 12', report)
+    self.assertEqual(priority, Priority.CRITICAL)
+    self.assertEqual(summary, 'Issues found in 1 of 2 containers')
+    self.assertEqual(
+        docker.merge_container_reports(
+            [(None, 'Report', Priority.LOW, 'Nothing found')]),
+        ('Report', Priority.LOW, 'Nothing found'))
+
+  def testFileArtifactExtractionFailure(self):
+    """Test that the other containers are exported when one fails."""
+    self.task.execute = mock.MagicMock(side_effect=[(1, None), (0, None)])
+    self.task.run(self.collection, self.result)
+    self.assertEqual(self.task.execute.call_count, 2)
+    self.assertEqual(self.task.execute.call_args[0][0][-1], '/mnt/3a')
+    self.result.close.assert_called_once()
+    close_args = self.result.close.call_args[0]
+    self.assertTrue(close_args[1])
+    self.assertIn('image_export.py failed for containers 12', close_args[2])
+
+    self.result.close.reset_mock()
+    self.task.execute = mock.MagicMock(return_value=(1, None))
+    self.task.run(self.collection, self.result)
+    self.result.close.assert_called_once_with(
+        self.task, False, 'image_export.py failed')
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -16,9 +16,10 @@
 
 from __future__ import unicode_literals
 
+import io
 import os
 
-from turbinia import config
+from turbinia import task_report
 from turbinia.evidence import FinalReport
 from turbinia.workers import TurbiniaTask
 
@@ -39,20 +40,12 @@ class FinalizeRequestTask(TurbiniaTask):
     Returns:
         TurbiniaTaskResult: Task execution results.
     """
-    # Doing a delayed import to avoid circular dependencies.
-    from turbinia.client import TurbiniaClient
-    client = TurbiniaClient()
-
     report_file = os.path.join(
         self.tmp_dir, 'final_turbinia_report_{0:s}.md'.format(self.id))
     report = FinalReport(source_path=report_file)
-    report_data = client.format_task_status(
-        config.INSTANCE_ID, config.TURBINIA_PROJECT, config.TURBINIA_REGION,
-        request_id=evidence.request_id, full_report=True)
-
     result.log('Writing report data to [{0:s}]'.format(report.local_path))
-    with open(report.local_path, 'wb') as file_handle:
-      file_handle.write(report_data.encode('utf-8'))
+    with io.open(report.local_path, 'w', encoding='utf-8') as file_handle:
+      task_report.write_request_report(file_handle, evidence.request_id)
 
     result.add_evidence(report, evidence.config)
     result.close(self, True)
@@ -28,6 +28,8 @@ from turbinia.evidence import ReportText
 from turbinia.lib.utils import extract_artifacts
 from turbinia.workers import TurbiniaTask
 from turbinia.workers import Priority
+from turbinia.workers.docker import get_source_paths
+from turbinia.workers.docker import merge_container_reports
 
 log = logging.getLogger('turbinia')
 
@@ -114,20 +116,27 @@ class HadoopAnalysisTask(TurbiniaTask):
     output_evidence = ReportText(source_path=output_file_path)
 
     try:
-      # We don't use FileArtifactExtractionTask as it export one evidence per
-      # file extracted
-      output_dir = os.path.join(self.output_dir, 'artifacts')
-      collected_artifacts = extract_artifacts(
-          artifact_names=['HadoopAppRoot'], disk_path=evidence.device_path,
-          output_dir=output_dir)
-
-      (report, priority, summary) = self._AnalyzeHadoopAppRoot(
-          collected_artifacts, output_dir)
-      if not report:
-        raise TurbiniaException(
-            'Report generated by _AnalyzeHadoopAppRoot() is empty')
-
-      output_evidence.text_data = '\n'.join(report)
+      reports = []
+      source_paths = get_source_paths(evidence, path_attribute='device_path')
+      for container_id, source_path in source_paths:
+        # We don't use FileArtifactExtractionTask as it export one evidence per
+        # file extracted
+        output_dir = os.path.join(self.output_dir, 'artifacts')
+        if container_id:
+          output_dir = os.path.join(output_dir, container_id)
+        collected_artifacts = extract_artifacts(
+            artifact_names=['HadoopAppRoot'], disk_path=source_path,
+            output_dir=output_dir)
+
+        (report, priority, summary) = self._AnalyzeHadoopAppRoot(
+            collected_artifacts, output_dir)
+        if not report:
+          raise TurbiniaException(
+              'Report generated by _AnalyzeHadoopAppRoot() is empty')
+        reports.append((container_id, '\n'.join(report), priority, summary))
+
+      (report, priority, summary) = merge_container_reports(reports)
+      output_evidence.text_data = report
       result.report_data = output_evidence.text_data
 
       # Write the report to the output file.
@@ -19,10 +19,12 @@ from __future__ import unicode_literals
 import json
 import os
 import tempfile
+import threading
 import unittest
 import mock
 
 from turbinia import evidence
+from turbinia import output_manager
 from turbinia import TurbiniaException
 from turbinia.workers import TurbiniaTask
 from turbinia.workers import TurbiniaTaskResult
@@ -187,6 +189,50 @@ class TestTurbiniaTask(TestTurbiniaTaskBase):
     self.assertEqual(type(new_result), TurbiniaTaskResult)
     self.assertIn(canary_status, new_result.status)
 
+  @mock.patch('turbinia.workers.config')
+  def testTurbiniaTaskSetupStreamingEvidence(self, mock_config):
+    """Test that streaming Tasks do not retrieve copyable evidence."""
+    mock_config.SHARED_FILESYSTEM = False
+    plaso_file = evidence.PlasoFile(source_path='/nonexistent/file.plaso')
+    plaso_file.saved_path = 'gs://bucket/output/file.plaso'
+    self.task.result = self.result
+
+    with mock.patch.object(self.task_class, 'STREAMING_EVIDENCE', True):
+      self.task.setup(plaso_file)
+    self.task.output_manager.retrieve_evidence.assert_not_called()
+    plaso_file.open()
+    self.task.output_manager.open_evidence.assert_called_once_with(plaso_file)
+
+    # Tasks do not stream Evidence by default.
+    self.assertRaises(TurbiniaException, self.task.setup, plaso_file)
+    self.task.output_manager.retrieve_evidence.assert_called_once_with(
+        plaso_file)
+
+  @mock.patch('turbinia.workers.config')
+  @mock.patch.object(output_manager.OutputManager, 'get_local_output_dirs')
+  @mock.patch.object(output_manager.OutputManager, 'setup')
+  def testTurbiniaTaskValidateResultStreamingEvidence(
+      self, _, mock_get_local_output_dirs, mock_config):
+    """Tests validate_result with streamed input evidence."""
+    mock_config.SHARED_FILESYSTEM = False
+    mock_get_local_output_dirs.return_value = (None, None)
+    plaso_file = evidence.PlasoFile(source_path='/nonexistent/file.plaso')
+    plaso_file.saved_path = 'gs://bucket/output/file.plaso'
+    self.task.output_manager = output_manager.OutputManager()
+    self.task.output_manager.is_setup = True
+    # Pending uploads can not be pickled along with the Output Manager.
+    # pylint: disable=protected-access
+    self.task.output_manager._pending_uploads.append(
+        ('/tmp/file', threading.Lock()))
+
+    with mock.patch.object(self.task_class, 'STREAMING_EVIDENCE', True):
+      result = self.task.setup(plaso_file)
+    result.status = 'GoodStatus'
+    new_result = self.task.validate_result(result)
+    self.assertIs(new_result, result)
+    self.assertEqual(new_result.status, 'GoodStatus')
+    self.assertIs(new_result.input_evidence, plaso_file)
+
   def testTurbiniaTaskValidateResultGoodResult(self):
     """Tests validate_result with good result."""
     self.result.status = 'GoodStatus'